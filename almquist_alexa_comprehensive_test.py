@@ -359,6 +359,17 @@ class AlexaPrizeTestSuite:
         query_count = sum(len(queries) for queries in self.test_queries.values())
         current = 0
 
+        # Retrieval for all queries in one batch (search_many), LLM per query
+        all_queries = [query_meta['query'] for queries in self.test_queries.values() for query_meta in queries]
+        start_time = time.time()
+        try:
+            batch_results = rag.search_many(all_queries, top_k=5)
+        except Exception as e:
+            print(f"❌ Batch search failed: {e}")
+            batch_results = [None] * len(all_queries)
+        search_time = (time.time() - start_time) / max(len(all_queries), 1)
+        print(f"⏱️  {len(all_queries)} queries searched in {time.time() - start_time:.2f}s")
+
         for category, queries in self.test_queries.items():
             print(f"\n📋 Category: {category}")
             print(f"{'─'*70}")
@@ -369,15 +380,16 @@ class AlexaPrizeTestSuite:
 
                 print(f"\n[{current}/{query_count}] {query}")
 
-                # Run query
+                # Run query (search results precomputed; None = search again)
                 start_time = time.time()
                 try:
                     result = rag.query(
                         query,
                         top_k=5,
-                        generate_answer=use_llm
+                        generate_answer=use_llm,
+                        search_results=batch_results[current - 1]
                     )
-                    query_time = time.time() - start_time
+                    query_time = time.time() - start_time + search_time
 
                     # Calculate metrics
                     relevance = self.rate_relevance(
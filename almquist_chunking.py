@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Chunking
+Sdílený chunker, který měří chunky v tokenech embedding modelu
+
+MiniLM modely berou jen max_seq_length tokenů (128 pro
+paraphrase-multilingual-MiniLM-L12-v2, 256 pro all-MiniLM-L6-v2), zbytek
+textu se tiše ořízne - chunk delší než limit se tokenizuje a ukládá zbytečně.
+
+- zákony: chunky nikdy nepřekročí hranici § (sekce), uvnitř po odstavcích a větách
+- rozhodnutí: po odstavcích ([n] nebo prázdný řádek) a větách
+- kód: nový chunk na každé top-level def/class (Python), uvnitř po řádcích
+- překryv: posledních overlap_tokens tokenů předchozího chunku
+  (u kódu celé řádky)
+- tokenizer modelu přes transformers (nebo z ONNX exportu); bez něj
+  odhad ~4 znaky na token
+- iter_*(): generátory v lineárním čase (sdílí je legal, crawler, merger
+  i Code RAG); srovnání s původními chunkery v almquist_chunking_benchmark.py
+- --report-rag: kolik tokenů se u dnešních chunků ořezává
+
+Usage:
+    python3 almquist_chunking.py --report-rag /home/puzik/almquist_legal_rag
+    python3 almquist_chunking.py --chunk zakon.txt --type law
+"""
+
+import os
+import pickle
+import re
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(os.path.dirname(__file__))
+
+try:
+    from transformers import AutoTokenizer
+    HAS_TRANSFORMERS = True
+except ImportError:
+    HAS_TRANSFORMERS = False
+
+
+DEFAULT_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+# SentenceTransformer max_seq_length (incl. [CLS]/[SEP])
+MODEL_MAX_TOKENS = {
+    'paraphrase-multilingual-MiniLM-L12-v2': 128,
+    'sentence-transformers/all-MiniLM-L6-v2': 256,
+}
+DEFAULT_MAX_TOKENS = 128
+SPECIAL_TOKENS = 2
+DEFAULT_OVERLAP_TOKENS = 16
+MIN_CHUNK_CHARS = 100
+MIN_PARAGRAPH_CHARS = 50
+UNIT_BATCH_SIZE = 256  # units per tokenizer call
+OVERLAP_TAIL_CHARS = 8  # chars per token, upper bound for the overlap tail
+
+_APPROX_TOKEN_RE = re.compile(r'\w{1,4}|[^\w\s]')
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?;])\s+')
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+_DECISION_PARAGRAPH_RE = re.compile(r'\n\n+|\[\d+\]')
+_SECTION_LINE_RE = re.compile(r'^[ \t]*(§\s*\d+[a-z]?)', re.MULTILINE)
+_SECTION_ANY_RE = re.compile(r'(§\s*\d+[a-z]?)')
+_PYTHON_BLOCK_RE = re.compile(r'^(?:def|class)\s+\w+')
+_LINE_RE = re.compile('\n')
+
+
+def _hf_model_id(model_name):
+    return model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+
+
+def _load_tokenizer(model_name):
+    """Tokenizer z ONNX exportu (lokálně), jinak z HF cache/hubu; None = odhad"""
+    if not HAS_TRANSFORMERS:
+        return None
+
+    candidates = []
+    try:
+        from almquist_onnx_encoder import model_dir
+        if (model_dir(model_name) / 'tokenizer_config.json').exists():
+            candidates.append(str(model_dir(model_name)))
+    except ImportError:
+        pass
+    candidates.append(_hf_model_id(model_name))
+
+    for source in candidates:
+        try:
+            return AutoTokenizer.from_pretrained(source)
+        except Exception:
+            continue
+    return None
+
+
+class TokenCounter:
+    """Počítá tokeny textu tokenizerem modelu (bez speciálních tokenů)"""
+
+    def __init__(self, model_name=DEFAULT_MODEL):
+        self.model_name = model_name
+        self.max_tokens = MODEL_MAX_TOKENS.get(model_name, DEFAULT_MAX_TOKENS)
+        self.tokenizer = _load_tokenizer(model_name)
+        self.exact = self.tokenizer is not None
+
+    def offsets(self, text):
+        """[(start, end)] znakové pozice tokenů"""
+        if self.exact and getattr(self.tokenizer, 'is_fast', False):
+            encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                                      return_attention_mask=False, verbose=False)
+            return [tuple(span) for span in encoding['offset_mapping']]
+        return [m.span() for m in _APPROX_TOKEN_RE.finditer(text)]
+
+    def count(self, text):
+        return self.count_many([text])[0]
+
+    def count_many(self, texts):
+        """Počty tokenů pro seznam textů (jedno volání tokenizeru)"""
+        if not texts:
+            return []
+        if self.exact:
+            encoding = self.tokenizer(list(texts), add_special_tokens=False,
+                                      return_attention_mask=False, verbose=False)
+            return [len(ids) for ids in encoding['input_ids']]
+        return [len(_APPROX_TOKEN_RE.findall(text)) for text in texts]
+
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model_name=DEFAULT_MODEL):
+    """Sdílený TokenCounter (tokenizer se načte jednou na proces)"""
+    with _counters_lock:
+        if model_name not in _counters:
+            _counters[model_name] = TokenCounter(model_name)
+        return _counters[model_name]
+
+
+def _iter_split(pattern, text):
+    """re.split() jako generátor - části mezi shodami, bez seznamu všech částí"""
+    start = 0
+    for match in pattern.finditer(text):
+        yield text[start:match.start()]
+        start = match.end()
+    yield text[start:]
+
+
+def iter_law_sections(text):
+    """
+    (section, body) podle § - preferují se § na začátku řádku
+    (odkazy "podle § 5" uvnitř textu sekci nezačínají); text před prvním § = 'Preambule'
+    """
+    pattern = _SECTION_LINE_RE if _SECTION_LINE_RE.search(text) else _SECTION_ANY_RE
+
+    section, start = 'Preambule', 0
+    for match in pattern.finditer(text):
+        body = text[start:match.start()]
+        if body.strip():
+            yield section, body
+        section = '§ ' + re.sub(r'^§\s*', '', match.group(1))
+        start = match.end()
+
+    body = text[start:]
+    if body.strip():
+        yield section, body
+
+
+def split_law_sections(text):
+    """[(section, body)] - viz iter_law_sections()"""
+    return list(iter_law_sections(text))
+
+
+class TokenChunker:
+    """
+    Skládá jednotky (věty, řádky) do chunků do rozpočtu tokenů modelu
+    budget = max_seq_length - speciální tokeny
+
+    iter_*() jsou generátory v lineárním čase: drží se jen jednotky
+    rozpracovaného chunku a průběžný součet tokenů, text chunku se spojí
+    jednou při jeho dokončení. chunk_*() vrací totéž jako seznam.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, max_tokens=None,
+                 overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+        self.counter = get_token_counter(model_name)
+        self.max_tokens = max_tokens or self.counter.max_tokens
+        self.budget = self.max_tokens - SPECIAL_TOKENS
+        self.overlap_tokens = min(overlap_tokens, self.budget // 2)
+
+    # ------------------------------------------------------------------
+    # Units
+    # ------------------------------------------------------------------
+
+    def _split_long(self, text):
+        """Text delší než budget rozdělí na okna po budget tokenech (řez před slovem)"""
+        offsets = self.counter.offsets(text)
+        pieces = []
+        start_token = 0
+
+        while start_token < len(offsets):
+            end_token = min(start_token + self.budget, len(offsets))
+            if end_token < len(offsets):
+                # Prefer cutting where a new word starts
+                for cut in range(end_token, start_token + self.budget // 2, -1):
+                    if text[offsets[cut][0] - 1:offsets[cut][0]].isspace():
+                        end_token = cut
+                        break
+            end_char = offsets[end_token][0] if end_token < len(offsets) else len(text)
+            pieces.append(text[offsets[start_token][0]:end_char].strip())
+            start_token = end_token
+
+        return [piece for piece in pieces if piece]
+
+    def _iter_units(self, items, skip_blank=True):
+        """
+        (text, separator[, line]) -> (text, separator, tokens[, line]), dlouhé jednotky rozdělené
+        Tokeny se počítají po dávkách UNIT_BATCH_SIZE (jedno volání tokenizeru na dávku)
+        """
+        batch = []
+        for item in items:
+            if skip_blank and not item[0].strip():
+                continue
+            batch.append(item)
+            if len(batch) >= UNIT_BATCH_SIZE:
+                yield from self._count_units(batch)
+                batch = []
+        if batch:
+            yield from self._count_units(batch)
+
+    def _count_units(self, batch):
+        counts = self.counter.count_many([item[0] for item in batch])
+        for (text, sep, *line), tokens in zip(batch, counts):
+            if tokens <= self.budget:
+                yield (text, sep, tokens, *line)
+                continue
+            pieces = self._split_long(text)
+            for i, (piece, piece_tokens) in enumerate(zip(pieces, self.counter.count_many(pieces))):
+                yield (piece, sep if i == 0 else ' ', piece_tokens, *line)
+
+    def _iter_prose_units(self, paragraphs):
+        """Odstavce -> věty; mezi odstavci '\\n\\n', mezi větami ' '"""
+        return self._iter_units(
+            (sentence, '\n\n' if i == 0 else ' ')
+            for paragraph in paragraphs
+            for i, sentence in enumerate(_iter_split(_SENTENCE_END_RE, paragraph.strip()))
+        )
+
+    # ------------------------------------------------------------------
+    # Packing
+    # ------------------------------------------------------------------
+
+    def _overlap(self, previous, partial):
+        """
+        Konec předchozího chunku: celé jednotky do overlap_tokens,
+        u prózy (partial) jinak aspoň konec poslední věty
+        Returns: ([(text, separator)], tokens)
+        """
+        carried, tokens = [], 0
+        index = len(previous) - 1
+        while index > 0 and tokens + previous[index][2] <= self.overlap_tokens:
+            carried.append(previous[index][:2])
+            tokens += previous[index][2]
+            index -= 1
+        carried.reverse()
+
+        if not carried and partial and self.overlap_tokens:
+            text = previous[-1][0]
+            # Tokenize only the tail of a long sentence
+            tail = max(0, len(text) - self.overlap_tokens * OVERLAP_TAIL_CHARS)
+            offsets = self.counter.offsets(text[tail:])
+            if tail and len(offsets) <= self.overlap_tokens:
+                tail, offsets = 0, self.counter.offsets(text)
+            if len(offsets) > self.overlap_tokens:
+                # Start at a word boundary, not inside a word
+                start = len(offsets) - self.overlap_tokens
+                while start < len(offsets) - 1 and not text[tail + offsets[start][0] - 1].isspace():
+                    start += 1
+                return [(text[tail + offsets[start][0]:], '')], len(offsets) - start
+
+        return carried, tokens
+
+    def _iter_pack(self, units, partial_overlap=True):
+        """
+        Hladové skládání jednotek do chunků <= budget tokenů
+        Yields: (text, first_unit, last_unit) - krajní vlastní jednotky chunku (bez překryvu)
+        """
+        parts, current, tokens = [], [], 0
+
+        for unit in units:
+            text, sep, unit_tokens = unit[:3]
+            if current and tokens + unit_tokens > self.budget:
+                yield ''.join(parts).strip(), current[0], current[-1]
+
+                carried, tokens = self._overlap(current, partial_overlap)
+                if tokens + unit_tokens > self.budget:
+                    carried, tokens = [], 0
+                parts = [carried_text if i == 0 else carried_sep + carried_text
+                         for i, (carried_text, carried_sep) in enumerate(carried)]
+                current = []
+
+            parts.append((sep if parts else '') + text)
+            current.append(unit)
+            tokens += unit_tokens
+
+        if current:
+            yield ''.join(parts).strip(), current[0], current[-1]
+
+    # ------------------------------------------------------------------
+    # Document types
+    # ------------------------------------------------------------------
+
+    def iter_law(self, text, min_chars=MIN_CHUNK_CHARS):
+        """{'text', 'section'} - chunk nikdy nepřekročí hranici §"""
+        for section, body in iter_law_sections(text):
+            units = self._iter_prose_units(_iter_split(_PARAGRAPH_RE, body))
+            for chunk_text, _, _ in self._iter_pack(units):
+                if len(chunk_text) >= min_chars:
+                    yield {'text': chunk_text, 'section': section}
+
+    def iter_decision(self, text, min_chars=MIN_CHUNK_CHARS):
+        """{'text', 'section': 'Part N'} - odstavce ([n] / prázdný řádek) a věty"""
+        paragraphs = (p for p in _iter_split(_DECISION_PARAGRAPH_RE, text)
+                      if len(p.strip()) >= MIN_PARAGRAPH_CHARS)
+        for i, (chunk_text, _, _) in enumerate(self._iter_pack(self._iter_prose_units(paragraphs))):
+            if len(chunk_text) >= min_chars:
+                yield {'text': chunk_text, 'section': f'Part {i + 1}'}
+
+    def iter_text(self, text):
+        """Prostý text po větách -> str"""
+        for chunk_text, _, _ in self._iter_pack(self._iter_prose_units([text])):
+            yield chunk_text
+
+    def iter_code(self, content, language='unknown'):
+        """
+        {'text', 'type', 'start_line', 'end_line'} (řádky od 0)
+        Python: nový chunk na každém top-level def/class; překryv celými řádky
+        """
+        block, block_type = [], 'code'
+        for line_number, line in enumerate(_iter_split(_LINE_RE, content)):
+            if language == 'python' and _PYTHON_BLOCK_RE.match(line):
+                yield from self._iter_code_block(block, block_type)
+                block, block_type = [], 'class' if line.startswith('class') else 'function'
+            block.append((line, '\n', line_number))
+        yield from self._iter_code_block(block, block_type)
+
+    def _iter_code_block(self, block, block_type):
+        units = self._iter_units(block, skip_blank=False)
+        for chunk_text, first, last in self._iter_pack(units, partial_overlap=False):
+            if chunk_text.strip():
+                yield {
+                    'text': chunk_text,
+                    'type': block_type,
+                    'start_line': first[3],
+                    'end_line': last[3],
+                }
+
+    def chunk_law(self, text, min_chars=MIN_CHUNK_CHARS):
+        return list(self.iter_law(text, min_chars))
+
+    def chunk_decision(self, text, min_chars=MIN_CHUNK_CHARS):
+        return list(self.iter_decision(text, min_chars))
+
+    def chunk_text(self, text):
+        return list(self.iter_text(text))
+
+    def chunk_code(self, content, language='unknown'):
+        return list(self.iter_code(content, language))
+
+
+_chunkers = {}
+
+
+def get_chunker(model_name=DEFAULT_MODEL, **kwargs):
+    """Sdílený TokenChunker pro model (výchozí budget a překryv)"""
+    key = (model_name, tuple(sorted(kwargs.items())))
+    with _counters_lock:
+        chunker = _chunkers.get(key)
+    if chunker is None:
+        chunker = TokenChunker(model_name, **kwargs)
+        with _counters_lock:
+            _chunkers[key] = chunker
+    return chunker
+
+
+def truncation_report(texts, model_name=DEFAULT_MODEL):
+    """Kolik tokenů model z daných chunků neuvidí (ořízne na max_seq_length)"""
+    counter = get_token_counter(model_name)
+    limit = counter.max_tokens - SPECIAL_TOKENS
+
+    report = {'model': model_name, 'exact': counter.exact, 'max_tokens': counter.max_tokens,
+              'chunks': 0, 'truncated_chunks': 0, 'tokens': 0, 'truncated_tokens': 0}
+
+    batch = 256
+    for start in range(0, len(texts), batch):
+        for tokens in counter.count_many(texts[start:start + batch]):
+            report['chunks'] += 1
+            report['tokens'] += tokens
+            if tokens > limit:
+                report['truncated_chunks'] += 1
+                report['truncated_tokens'] += tokens - limit
+
+    report['truncated_pct'] = 100.0 * report['truncated_tokens'] / max(report['tokens'], 1)
+    return report
+
+
+def _load_rag_chunks(rag_dir):
+    """Texty chunků z metadata.json (legal/crawler RAG) nebo code_metadata.pkl (Code RAG)"""
+    rag_dir = Path(rag_dir)
+    if (rag_dir / 'metadata.json').exists():
+        from almquist_rag_metadata import load_metadata
+        return load_metadata(rag_dir)['chunks'], DEFAULT_MODEL
+    if (rag_dir / 'code_metadata.pkl').exists():
+        with open(rag_dir / 'code_metadata.pkl', 'rb') as f:
+            return pickle.load(f)['chunks'], 'sentence-transformers/all-MiniLM-L6-v2'
+    raise FileNotFoundError(f"No metadata.json or code_metadata.pkl in {rag_dir}")
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Almquist token-aware chunking',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # How many tokens of today's chunks the model truncates
+  python3 almquist_chunking.py --report-rag /home/puzik/almquist_legal_rag
+  python3 almquist_chunking.py --report-rag /home/puzik/almquist_code_rag
+
+  # Preview chunks of a file
+  python3 almquist_chunking.py --chunk zakon_89_2012.txt --type law
+  python3 almquist_chunking.py --chunk almquist_rag_merger.py --type code --language python
+        """
+    )
+    parser.add_argument('--report-rag', metavar='RAG_DIR', help='Truncation report for stored chunks')
+    parser.add_argument('--chunk', metavar='FILE', help='Chunk a file and print the chunks')
+    parser.add_argument('--type', choices=['law', 'decision', 'text', 'code'], default='text')
+    parser.add_argument('--language', default='unknown', help='Code language (python = split on def/class)')
+    parser.add_argument('--model', default=None, help='Embedding model (default: by RAG / document type)')
+    parser.add_argument('--overlap', type=int, default=DEFAULT_OVERLAP_TOKENS, help='Overlap in tokens')
+
+    args = parser.parse_args()
+
+    if args.report_rag:
+        chunks, model_name = _load_rag_chunks(args.report_rag)
+        report = truncation_report(chunks, args.model or model_name)
+        print(f"✂️  Truncation report: {args.report_rag}")
+        print(f"   Model:             {report['model']} (max {report['max_tokens']} tokens, "
+              f"{'tokenizer' if report['exact'] else 'estimate'})")
+        print(f"   Chunks:            {report['chunks']}")
+        print(f"   Truncated chunks:  {report['truncated_chunks']} "
+              f"({100.0 * report['truncated_chunks'] / max(report['chunks'], 1):.1f}%)")
+        print(f"   Tokens:            {report['tokens']}")
+        print(f"   Never embedded:    {report['truncated_tokens']} tokens ({report['truncated_pct']:.1f}%)")
+
+    if args.chunk:
+        with open(args.chunk, 'r', encoding='utf-8', errors='ignore') as f:
+            text = f.read()
+
+        default_model = 'sentence-transformers/all-MiniLM-L6-v2' if args.type == 'code' else DEFAULT_MODEL
+        chunker = TokenChunker(args.model or default_model, overlap_tokens=args.overlap)
+
+        if args.type == 'law':
+            chunks = [(c['section'], c['text']) for c in chunker.chunk_law(text)]
+        elif args.type == 'decision':
+            chunks = [(c['section'], c['text']) for c in chunker.chunk_decision(text)]
+        elif args.type == 'code':
+            chunks = [(f"{c['type']} {c['start_line']}-{c['end_line']}", c['text'])
+                      for c in chunker.chunk_code(text, args.language)]
+        else:
+            chunks = [(f"#{i + 1}", c) for i, c in enumerate(chunker.chunk_text(text))]
+
+        counts = chunker.counter.count_many([c for _, c in chunks])
+        print(f"📄 {len(chunks)} chunks (budget {chunker.budget} tokens, overlap {chunker.overlap_tokens})")
+        for (label, chunk_text), tokens in zip(chunks, counts):
+            print(f"\n--- {label} ({tokens} tokens, {len(chunk_text)} chars)")
+            print(chunk_text[:300] + (' …' if len(chunk_text) > 300 else ''))
+
+    if not (args.report_rag or args.chunk):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Chunking Benchmark
+Streamovací TokenChunker vs. původní chunkery (zákony, kód, prostý text)
+
+- vstupy se generují: zákon o N MB (§, odstavce, věty), Python a JS soubory
+  o N MB a soubor s krátkými řádky (původní chunk_code je kvadratický
+  v počtu řádků chunku)
+- původní implementace jsou zde zmrazené jako reference (legacy_*),
+  produkční kód je už nepoužívá
+- pro každou velikost: čas, MB/s, počet chunků a kolik chunků překročí
+  max_seq_length modelu (ty model ořízne)
+- lineární chunker má MB/s stálé i při rostoucí velikosti vstupu
+
+Usage:
+    python3 almquist_chunking_benchmark.py
+    python3 almquist_chunking_benchmark.py --sizes 1 4 16 --kind law
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_chunking import TokenChunker, SPECIAL_TOKENS
+
+
+_WORDS = ('zaměstnavatel odpovídá zaměstnanci za škodu která mu vznikla při plnění pracovních '
+          'úkolů nebo v přímé souvislosti s ním porušením právních povinností smlouva nájemce '
+          'pronajímatel dlužník věřitel soud rozhodnutí lhůta zákona odstavce písm.').split()
+
+
+# ----------------------------------------------------------------------
+# Generated inputs
+# ----------------------------------------------------------------------
+
+def generate_law(size_mb, seed=0):
+    """Zákon o ~size_mb MB: § s 1-6 odstavci, odkazy "podle § N" v textu"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts = ["ZÁKON ze dne 3. února 2012\nobčanský zákoník\n\nParlament se usnesl na tomto zákoně:\n"]
+    size, section = 0, 0
+
+    while size < target:
+        section += 1
+        part = [f"\n§ {section}\n"]
+        for paragraph in range(rng.randint(1, 6)):
+            sentences = []
+            for _ in range(rng.randint(1, 8)):
+                words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 40))]
+                if rng.random() < 0.2:
+                    words.insert(rng.randint(0, len(words)), f"podle § {rng.randint(1, section)}")
+                sentences.append(' '.join(words).capitalize() + '.')
+            part.append(f"({paragraph + 1}) {' '.join(sentences)}\n\n")
+        part = ''.join(part)
+        parts.append(part)
+        size += len(part.encode('utf-8'))
+
+    return ''.join(parts)
+
+
+def generate_code(size_mb, language='python', seed=0):
+    """Zdrojový soubor o ~size_mb MB: třídy s metodami a dlouhé funkce"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts, size, n = [], 0, 0
+
+    while size < target:
+        n += 1
+        body_lines = rng.randint(5, 400)
+        if language == 'python':
+            lines = [f"def handler_{n}(request, limit={n}):", '    """Generated handler"""',
+                     "    result = []"]
+            lines += [f"    result.append(request.get('field_{i}', {i}) * limit)  # step {i}"
+                      for i in range(body_lines)]
+            lines += ["    return result", "", ""]
+            if n % 5 == 0:
+                lines = [f"class Service{n}:", f"    name = 'service_{n}'", ""] + \
+                        ['    ' + line if line else line for line in lines]
+        else:
+            lines = [f"function handler{n}(request, limit) {{", "  const result = [];"]
+            lines += [f"  result.push((request.field{i} || {i}) * limit); // step {i}"
+                      for i in range(body_lines)]
+            lines += ["  return result;", "}", ""]
+        part = '\n'.join(lines) + '\n'
+        parts.append(part)
+        size += len(part)
+
+    return ''.join(parts)
+
+
+def generate_short_lines(size_mb, seed=0):
+    """Soubor s krátkými řádky (JSON pole po prvcích, číselníky) - nejhorší případ pro '\n'.join()"""
+    rng = random.Random(seed)
+    count = int(size_mb * 1024 * 1024 / 6)
+    return '[\n' + ',\n'.join(f"  {rng.randint(0, 999)}" for _ in range(count)) + '\n]\n'
+
+
+# ----------------------------------------------------------------------
+# Legacy reference implementations (as they were before almquist_chunking)
+# ----------------------------------------------------------------------
+
+def legacy_chunk_law_text(law_text):
+    """LegalRAGIntegration.chunk_law_text (znaky, current_text += part)"""
+    chunks = []
+    sections = re.split(r'(§\s*\d+[a-z]?)', law_text)
+
+    current_section = None
+    current_text = ""
+
+    for i, part in enumerate(sections):
+        section_match = re.match(r'§\s*(\d+[a-z]?)', part.strip())
+
+        if section_match:
+            if current_section and current_text.strip():
+                chunks.append({'text': current_text.strip(), 'section': current_section})
+            current_section = f"§ {section_match.group(1)}"
+            current_text = ""
+        else:
+            current_text += part
+            if len(current_text) > 2000:
+                split_points = [m.start() for m in re.finditer(r'\.\s+', current_text[:2000])]
+                if split_points:
+                    split_at = split_points[-1] + 1
+                    chunks.append({'text': current_text[:split_at].strip(),
+                                   'section': current_section or 'Preambule'})
+                    current_text = current_text[split_at:]
+
+    if current_text.strip():
+        chunks.append({'text': current_text.strip(), 'section': current_section or 'Preambule'})
+
+    return [c for c in chunks if len(c['text']) >= 100]
+
+
+def legacy_chunk_code(content, language, chunk_size=1000):
+    """CodeRAGSystem.chunk_code ('\\n'.join(current_chunk) po každém řádku)"""
+    chunks = []
+    lines = content.split('\n')
+
+    if language == 'python':
+        current_chunk = []
+        current_type = None
+        start_line = 0
+
+        for i, line in enumerate(lines):
+            if re.match(r'^(?:def|class)\s+\w+', line):
+                if current_chunk:
+                    chunks.append({'text': '\n'.join(current_chunk), 'type': current_type or 'code',
+                                   'start_line': start_line, 'end_line': i - 1})
+                current_chunk = [line]
+                current_type = 'class' if line.startswith('class') else 'function'
+                start_line = i
+            else:
+                current_chunk.append(line)
+                if len('\n'.join(current_chunk)) > chunk_size:
+                    chunks.append({'text': '\n'.join(current_chunk), 'type': current_type or 'code',
+                                   'start_line': start_line, 'end_line': i})
+                    current_chunk = []
+                    start_line = i + 1
+
+        if current_chunk:
+            chunks.append({'text': '\n'.join(current_chunk), 'type': current_type or 'code',
+                           'start_line': start_line, 'end_line': len(lines) - 1})
+    else:
+        current_chunk = []
+        start_line = 0
+
+        for i, line in enumerate(lines):
+            current_chunk.append(line)
+            if len('\n'.join(current_chunk)) >= chunk_size:
+                chunks.append({'text': '\n'.join(current_chunk), 'type': 'code',
+                               'start_line': start_line, 'end_line': i})
+                current_chunk = []
+                start_line = i + 1
+
+        if current_chunk:
+            chunks.append({'text': '\n'.join(current_chunk), 'type': 'code',
+                           'start_line': start_line, 'end_line': len(lines) - 1})
+
+    return chunks
+
+
+def legacy_chunk_text(text, max_length=500):
+    """RAGMerger.chunk_text (věty po '. ', current_chunk += sentence)"""
+    sentences = text.split('. ')
+    chunks = []
+    current_chunk = ""
+
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) < max_length:
+            current_chunk += sentence + ". "
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = sentence + ". "
+
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+
+    return chunks
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+
+def _timed(func):
+    start = time.perf_counter()
+    chunks = func()
+    return time.perf_counter() - start, chunks
+
+
+def _over_budget(chunker, texts):
+    """Počet chunků delších než max_seq_length (model je ořízne)"""
+    limit = chunker.max_tokens - SPECIAL_TOKENS
+    over = 0
+    for start in range(0, len(texts), 256):
+        over += sum(1 for tokens in chunker.counter.count_many(texts[start:start + 256])
+                    if tokens > limit)
+    return over
+
+
+def run_benchmark(kind, sizes):
+    """[{'size_mb', 'impl', 'seconds', 'mb_s', 'chunks', 'over_budget'}]"""
+    if kind in ('python', 'js', 'lines'):
+        chunker = TokenChunker('sentence-transformers/all-MiniLM-L6-v2')
+    else:
+        chunker = TokenChunker()
+    language = 'python' if kind == 'python' else 'javascript'
+
+    results = []
+    for size_mb in sizes:
+        if kind == 'law':
+            text = generate_law(size_mb)
+            impls = [('legacy', lambda: [c['text'] for c in legacy_chunk_law_text(text)]),
+                     ('streaming', lambda: [c['text'] for c in chunker.iter_law(text)])]
+        elif kind == 'text':
+            text = generate_law(size_mb).replace('\n', ' ')
+            impls = [('legacy', lambda: legacy_chunk_text(text)),
+                     ('streaming', lambda: list(chunker.iter_text(text)))]
+        else:
+            text = generate_short_lines(size_mb) if kind == 'lines' else generate_code(size_mb, language)
+            impls = [('legacy', lambda: [c['text'] for c in legacy_chunk_code(text, language)]),
+                     ('streaming', lambda: [c['text'] for c in chunker.iter_code(text, language)])]
+
+        real_mb = len(text.encode('utf-8')) / 1024 / 1024
+        for name, func in impls:
+            seconds, chunks = _timed(func)
+            results.append({
+                'size_mb': real_mb,
+                'impl': name,
+                'seconds': seconds,
+                'mb_s': real_mb / seconds if seconds else 0.0,
+                'chunks': len(chunks),
+                'over_budget': _over_budget(chunker, chunks),
+            })
+
+    return results, chunker
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Almquist chunking benchmark (streaming vs. legacy chunkers)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # All kinds, 1/4/16 MB inputs
+  python3 almquist_chunking_benchmark.py
+
+  # Only laws, bigger inputs
+  python3 almquist_chunking_benchmark.py --kind law --sizes 8 32
+        """
+    )
+    parser.add_argument('--kind', choices=['law', 'text', 'python', 'js', 'lines', 'all'], default='all')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4, 16], help='Input sizes in MB')
+
+    args = parser.parse_args()
+
+    kinds = ['law', 'text', 'python', 'js', 'lines'] if args.kind == 'all' else [args.kind]
+    for kind in kinds:
+        results, chunker = run_benchmark(kind, args.sizes)
+        print(f"\n⏱️  {kind} ({chunker.counter.model_name}, budget {chunker.budget} tokens, "
+              f"{'tokenizer' if chunker.counter.exact else 'estimate'})")
+        print(f"   {'MB':>6}  {'impl':<10} {'seconds':>8} {'MB/s':>7} {'chunks':>8} {'truncated':>10}")
+        for row in results:
+            print(f"   {row['size_mb']:6.1f}  {row['impl']:<10} {row['seconds']:8.2f} {row['mb_s']:7.2f} "
+                  f"{row['chunks']:8d} {row['over_budget']:10d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,11 +28,15 @@ import hashlib
 from datetime import datetime
 import json
 import re
-from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
 import pickle
 
+sys.path.append(os.path.dirname(__file__))
+from almquist_embedding_service import get_embedding_model
+from almquist_chunking import get_chunker
+from almquist_vector_store import FILTER_OVERSAMPLE, QUERY_BATCH_SIZE, expand_filters, match_metadata
+
 
 class CodeRAGSystem:
     """Main code RAG system"""
@@ -73,7 +77,10 @@ class CodeRAGSystem:
 
         # Initialize embedding model (code-optimized)
         print("🔧 Loading embedding model...")
-        self.model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        self.model = get_embedding_model('sentence-transformers/all-MiniLM-L6-v2')
+        # Chunk embeddings via the cache (vendored code, re-indexed files)
+        self.encoder = get_embedding_model('sentence-transformers/all-MiniLM-L6-v2', cache=True)
+        self.chunker = get_chunker('sentence-transformers/all-MiniLM-L6-v2')
 
         # Initialize FAISS index
         self.index = None
@@ -272,86 +279,10 @@ class CodeRAGSystem:
 
         return None
 
-    def chunk_code(self, content: str, file_path: Path, chunk_size: int = 1000) -> List[Dict[str, Any]]:
-        """Chunk code intelligently (by function/class or fixed size)"""
+    def chunk_code(self, content: str, file_path: Path) -> List[Dict[str, Any]]:
+        """Chunk code by function/class (Python) within the model's token limit"""
         language = self.CODE_EXTENSIONS.get(file_path.suffix, 'unknown')
-        chunks = []
-
-        lines = content.split('\n')
-
-        # Try to chunk by function/class for Python
-        if language == 'python':
-            current_chunk = []
-            current_type = None
-            start_line = 0
-
-            for i, line in enumerate(lines):
-                # Check for function/class definition
-                if re.match(r'^(?:def|class)\s+\w+', line):
-                    # Save previous chunk
-                    if current_chunk:
-                        chunks.append({
-                            'text': '\n'.join(current_chunk),
-                            'type': current_type or 'code',
-                            'start_line': start_line,
-                            'end_line': i - 1,
-                        })
-
-                    # Start new chunk
-                    current_chunk = [line]
-                    current_type = 'class' if line.startswith('class') else 'function'
-                    start_line = i
-                else:
-                    current_chunk.append(line)
-
-                    # Split if chunk too large
-                    if len('\n'.join(current_chunk)) > chunk_size:
-                        chunks.append({
-                            'text': '\n'.join(current_chunk),
-                            'type': current_type or 'code',
-                            'start_line': start_line,
-                            'end_line': i,
-                        })
-                        current_chunk = []
-                        start_line = i + 1
-
-            # Add last chunk
-            if current_chunk:
-                chunks.append({
-                    'text': '\n'.join(current_chunk),
-                    'type': current_type or 'code',
-                    'start_line': start_line,
-                    'end_line': len(lines) - 1,
-                })
-
-        # Fixed-size chunking for other languages
-        else:
-            current_chunk = []
-            start_line = 0
-
-            for i, line in enumerate(lines):
-                current_chunk.append(line)
-
-                if len('\n'.join(current_chunk)) >= chunk_size:
-                    chunks.append({
-                        'text': '\n'.join(current_chunk),
-                        'type': 'code',
-                        'start_line': start_line,
-                        'end_line': i,
-                    })
-                    current_chunk = []
-                    start_line = i + 1
-
-            # Add last chunk
-            if current_chunk:
-                chunks.append({
-                    'text': '\n'.join(current_chunk),
-                    'type': 'code',
-                    'start_line': start_line,
-                    'end_line': len(lines) - 1,
-                })
-
-        return chunks
+        return self.chunker.chunk_code(content, language)
 
     def index_file(self, file_path: Path) -> int:
         """Index a single code file"""
@@ -413,10 +344,9 @@ class CodeRAGSystem:
 
             # Chunk and embed
             chunks = self.chunk_code(content, file_path)
+            embeddings = self.encoder.encode([chunk['text'] for chunk in chunks], convert_to_numpy=True) if chunks else []
 
-            for i, chunk in enumerate(chunks):
-                # Generate embedding
-                embedding = self.model.encode([chunk['text']], convert_to_numpy=True)[0]
+            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
                 embedding_bytes = embedding.tobytes()
 
                 # Insert chunk
@@ -472,6 +402,7 @@ class CodeRAGSystem:
                 total_chunks += chunks
 
         print(f"\n✅ Indexed {indexed_files} new files ({total_chunks} chunks)")
+        print(f"   {self.encoder.report()}")
 
     def build_faiss_index(self):
         """Build FAISS index from database"""
@@ -568,55 +499,70 @@ class CodeRAGSystem:
 
     def search(self, query: str, k: int = 10, language_filter: str = None) -> List[Dict[str, Any]]:
         """Search code by semantic similarity"""
+        return self.search_many([query], k, [{'language': language_filter} if language_filter else None])[0]
+
+    def search_many(self, queries: List[str], k: int = 10, filters: Optional[Any] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search many queries at once: one encode call and one index search
+        filters: None, one metadata filter for all queries (e.g. {'language': 'python'})
+        or a list with a filter (or None) per query
+        """
         if self.index is None or self.index.ntotal == 0:
             print("⚠️  Index is empty. Run indexing first.")
+            return [[] for _ in queries]
+        if not queries:
             return []
 
         start_time = datetime.now()
+        filters = expand_filters(filters, len(queries))
+
+        # Embed queries
+        query_embeddings = self.model.encode(list(queries), batch_size=QUERY_BATCH_SIZE, convert_to_numpy=True)
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype='float32').reshape(len(queries), -1)
+        faiss.normalize_L2(query_embeddings)
+
+        # Search (more candidates when filtering)
+        search_k = k * FILTER_OVERSAMPLE if any(filters) else k
+        distances, indices = self.index.search(query_embeddings, search_k)
+
+        all_results = []
+        for row_distances, row_indices, metadata_filter in zip(distances, indices, filters):
+            results = []
+            for dist, idx in zip(row_distances, row_indices):
+                if idx < 0 or idx >= len(self.chunk_metadata):
+                    continue
+
+                metadata = self.chunk_metadata[idx]
+
+                # Apply filter
+                if not match_metadata(metadata, metadata_filter):
+                    continue
+
+                results.append({
+                    'score': float(dist),
+                    'code': self.code_chunks[idx],
+                    **metadata
+                })
 
-        # Embed query
-        query_embedding = self.model.encode([query], convert_to_numpy=True)[0]
-        query_embedding = query_embedding.reshape(1, -1).astype('float32')
-        faiss.normalize_L2(query_embedding)
-
-        # Search
-        distances, indices = self.index.search(query_embedding, k * 2)  # Get more for filtering
-
-        results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx >= len(self.chunk_metadata):
-                continue
-
-            metadata = self.chunk_metadata[idx]
-
-            # Apply language filter
-            if language_filter and metadata['language'] != language_filter:
-                continue
-
-            results.append({
-                'score': float(dist),
-                'code': self.code_chunks[idx],
-                **metadata
-            })
-
-            if len(results) >= k:
-                break
+                if len(results) >= k:
+                    break
+            all_results.append(results)
 
-        # Log search
-        exec_time = int((datetime.now() - start_time).total_seconds() * 1000)
+        # Log searches (one connection for the batch)
+        exec_time = int((datetime.now() - start_time).total_seconds() * 1000 / len(queries))
         try:
             conn = psycopg2.connect(self.db_url)
             cursor = conn.cursor()
-            cursor.execute('''
+            cursor.executemany('''
                 INSERT INTO code_search_history (query, results_count, execution_time_ms)
                 VALUES (%s, %s, %s)
-            ''', (query, len(results), exec_time))
+            ''', [(query, len(results), exec_time) for query, results in zip(queries, all_results)])
             conn.commit()
             conn.close()
         except:
             pass
 
-        return results
+        return all_results
 
 
 def main():
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Content Hash
+Perzistentní, indexovaný SHA256 hash full_text v laws a court_decisions
+
+Crawlery ukládají content_hash při insertu/updatu, staré řádky doplní
+streamovaný backfill. Analýza duplicit i merger pak používají indexované
+dotazy místo čtení a hashování všech textů.
+
+Usage:
+    python3 almquist_content_hash.py --backfill
+"""
+
+import sqlite3
+import hashlib
+import time
+
+HASHED_TABLES = ('laws', 'court_decisions')
+
+
+def compute_content_hash(text):
+    """SHA256 hash textu (stejný jako content_hash v RAG metadata)"""
+    if text is None:
+        return None
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# content_hash of '' - rows with this hash have no usable text
+EMPTY_CONTENT_HASH = compute_content_hash('')
+
+
+def ensure_content_hash_columns(db_path):
+    """Přidá sloupec content_hash + index do existujících tabulek (idempotentní)"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    for table in HASHED_TABLES:
+        cursor.execute("PRAGMA table_info(%s)" % table)
+        columns = [col[1] for col in cursor.fetchall()]
+
+        if not columns:
+            continue  # Table not created yet
+
+        if 'content_hash' not in columns:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN content_hash TEXT')
+
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_content_hash ON {table}(content_hash)')
+
+    conn.commit()
+    conn.close()
+
+
+def backfill_content_hashes(db_path, batch_size=1000, verbose=True):
+    """
+    Doplní content_hash u řádků, kde chybí
+    Hash se počítá uvnitř SQLite (registrovaná funkce) po dávkách,
+    takže texty nikdy nejsou všechny v paměti a zámek se drží jen krátce.
+    """
+    ensure_content_hash_columns(db_path)
+
+    conn = sqlite3.connect(db_path)
+    conn.create_function('sha256_hex', 1, compute_content_hash, deterministic=True)
+    cursor = conn.cursor()
+
+    totals = {}
+    for table in HASHED_TABLES:
+        updated = 0
+        start_time = time.time()
+
+        while True:
+            cursor.execute(f'''
+            UPDATE {table}
+            SET content_hash = sha256_hex(full_text)
+            WHERE id IN (
+                SELECT id FROM {table}
+                WHERE content_hash IS NULL AND full_text IS NOT NULL
+                LIMIT ?
+            )
+            ''', (batch_size,))
+            conn.commit()
+
+            if cursor.rowcount <= 0:
+                break
+
+            updated += cursor.rowcount
+            if verbose and updated % (batch_size * 10) == 0:
+                print(f"   {table}: {updated:,} hashed...")
+
+        totals[table] = updated
+        if verbose:
+            print(f"   ✓ {table}: {updated:,} rows hashed in {time.time() - start_time:.1f}s")
+
+    conn.close()
+    return totals
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Almquist content hash backfill')
+    parser.add_argument('--db', default="/home/puzik/almquist_legal_sources.db")
+    parser.add_argument('--backfill', action='store_true',
+                        help='Add content_hash column and hash rows without it')
+    parser.add_argument('--batch-size', type=int, default=1000)
+
+    args = parser.parse_args()
+
+    if args.backfill:
+        print("🔐 Backfilling content hashes...")
+        backfill_content_hashes(args.db, batch_size=args.batch_size)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Context Builder
+Sestavení kontextu pro LLM z výsledků vyhledávání v rozpočtu tokenů
+
+- duplicity: téměř shodné chunky (kosinová podobnost embeddingů >=
+  DEDUP_THRESHOLD, např. stejný odstavec rozhodnutí v několika verzích)
+  se pošlou jen jednou
+- slučování: chunky stejného § / dokumentu, které v indexu leží vedle sebe,
+  se spojí do jednoho bloku s jednou hlavičkou zdroje; překryv mezi
+  sousedními chunky (overlap chunkeru) se odstraní
+- balení: bloky podle skóre do token_budget tokenů, poslední blok se
+  případně zkrátí na konci věty
+- kratší prompt = rychlejší prefill v Ollama = nižší time-to-first-token
+
+Usage:
+    from almquist_context_builder import ContextBuilder
+    context, stats = ContextBuilder(token_budget=1024).build(search_results, vectors)
+
+    python3 almquist_context_builder.py --rag-dir /home/puzik/almquist_legal_rag --query "výpověď"
+"""
+
+import os
+import re
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_chunking import get_token_counter
+
+
+CONTEXT_TOKENS = int(os.environ.get('ALMQUIST_CONTEXT_TOKENS', 1024))
+DEDUP_THRESHOLD = 0.95
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 1000
+MIN_TRUNCATED_TOKENS = 48  # a shorter tail of the last block is not worth sending
+SEPARATOR = "\n---\n\n"
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_SENTENCE_END_RE = re.compile(r'[.!?;]\s')
+
+
+def source_label(meta):
+    """Hlavička zdroje v kontextu: [zákon §], [soud, sp. zn.], [zdroj]"""
+    doc_type = meta.get('document_type', 'unknown')
+    if doc_type == 'law':
+        return f"[{meta.get('law_name', 'Unknown')} {meta.get('section', '')}]"
+    if doc_type == 'court_decision':
+        return f"[{meta.get('court_name', 'Unknown')}, sp. zn. {meta.get('case_number', 'Unknown')}]"
+    return f"[{meta.get('source', 'Unknown')}]"
+
+
+def _document_key(chunk):
+    """Ke kterému dokumentu chunk patří (doména + zákon / spisová značka / zdroj)"""
+    meta = chunk['metadata']
+    doc_type = meta.get('document_type', 'unknown')
+    if doc_type == 'law':
+        document = meta.get('law_number') or meta.get('law_name')
+    elif doc_type == 'court_decision':
+        document = meta.get('case_number')
+    else:
+        document = meta.get('source_url') or meta.get('url') or meta.get('source')
+    return chunk.get('domain'), doc_type, document
+
+
+def _is_paragraph_section(meta):
+    """§ sekce (slučují se celé); merger používá 'chunk i/n' - ty jen podle sousedství"""
+    return str(meta.get('section', '')).strip().startswith('§')
+
+
+def merge_overlap(first, second):
+    """Spojí dva sousední chunky; konec first = začátek second (overlap) se neopakuje"""
+    limit = min(len(first), len(second), MAX_OVERLAP_CHARS)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first.rstrip() + "\n" + second.lstrip()
+
+
+class ContextBuilder:
+    """Deduplikace, slučování sousedních chunků a balení do rozpočtu tokenů"""
+
+    def __init__(self, token_budget=CONTEXT_TOKENS, dedup_threshold=DEDUP_THRESHOLD, counter=None):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self._counter = counter
+
+    @property
+    def counter(self):
+        """Tokenizer se načte až při prvním sestavení kontextu (search-only ho nepotřebuje)"""
+        if self._counter is None:
+            self._counter = get_token_counter()
+        return self._counter
+
+    def deduplicate(self, chunks, vectors=None):
+        """Indexy chunků k ponechání (pořadí podle skóre zachováno)"""
+        keep, seen_texts = [], set()
+        sims = None
+        if vectors is not None and len(chunks) > 1:
+            vectors = np.asarray(vectors, dtype='float32')
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+            sims = vectors @ vectors.T
+
+        for i, chunk in enumerate(chunks):
+            text = _WHITESPACE_RE.sub(' ', chunk['text']).strip().lower()
+            if text in seen_texts:
+                continue
+            if sims is not None and keep and sims[i, keep].max() >= self.dedup_threshold:
+                continue
+            seen_texts.add(text)
+            keep.append(i)
+        return keep
+
+    def merge(self, chunks):
+        """
+        Bloky [{'text', 'metadata', 'score', 'label', 'chunks'}] podle skóre.
+        Chunky stejného dokumentu se slučují, pokud jde o stejný § nebo
+        sousední pozice v indexu ('id').
+        """
+        groups = {}
+        for order, chunk in enumerate(chunks):
+            groups.setdefault(_document_key(chunk), []).append((order, chunk))
+
+        blocks = []
+        for key, members in groups.items():
+            if key[2] is None:  # Unknown document: nothing to merge with
+                blocks.extend(self._block([chunk]) for _, chunk in members)
+                continue
+
+            members.sort(key=lambda member: (member[1].get('id') is None, member[1].get('id', 0), member[0]))
+            run = [members[0][1]]
+            for _, chunk in members[1:]:
+                previous = run[-1]
+                same_section = (_is_paragraph_section(chunk['metadata'])
+                                and chunk['metadata'].get('section') == previous['metadata'].get('section'))
+                adjacent = (chunk.get('id') is not None and previous.get('id') is not None
+                            and chunk['id'] - previous['id'] == 1)
+                if same_section or adjacent:
+                    run.append(chunk)
+                else:
+                    blocks.append(self._block(run))
+                    run = [chunk]
+            blocks.append(self._block(run))
+
+        blocks.sort(key=lambda block: block['score'], reverse=True)
+        return blocks
+
+    @staticmethod
+    def _block(run):
+        text = run[0]['text']
+        for chunk in run[1:]:
+            text = merge_overlap(text, chunk['text'])
+
+        meta = run[0]['metadata']
+        label = source_label(meta)
+        last_section = run[-1]['metadata'].get('section')
+        if meta.get('document_type') == 'law' and last_section != meta.get('section'):
+            label = f"[{meta.get('law_name', 'Unknown')} {meta.get('section', '')}–{last_section}]"
+
+        return {
+            'text': text.strip(),
+            'metadata': meta,
+            'score': max(chunk.get('score', 0.0) for chunk in run),
+            'label': label,
+            'chunks': len(run)
+        }
+
+    def _truncate(self, text, tokens):
+        """Prvních `tokens` tokenů textu, pokud možno na konci věty"""
+        offsets = self.counter.offsets(text)
+        if len(offsets) <= tokens:
+            return text
+        cut = offsets[tokens - 1][1]
+        sentence_ends = [m.end() for m in _SENTENCE_END_RE.finditer(text, 0, cut)]
+        if sentence_ends and sentence_ends[-1] >= cut // 2:
+            cut = sentence_ends[-1]
+        return text[:cut].rstrip() + " …"
+
+    def pack(self, blocks):
+        """Bloky (podle skóre) do token_budget; vrací (části kontextu, tokeny, zkráceno)"""
+        entries = [f"{block['label']}\n{block['text']}\n" for block in blocks]
+        counts = self.counter.count_many(entries)
+        separator = self.counter.count(SEPARATOR)
+
+        parts, used, truncated = [], 0, False
+        for block, entry, tokens in zip(blocks, entries, counts):
+            cost = tokens + (separator if parts else 0)
+            if self.token_budget is None or used + cost <= self.token_budget:
+                parts.append(entry)
+                used += cost
+                continue
+
+            remaining = self.token_budget - used - (separator if parts else 0)
+            label_tokens = self.counter.count(block['label']) + 1
+            if remaining - label_tokens >= MIN_TRUNCATED_TOKENS:
+                parts.append(f"{block['label']}\n{self._truncate(block['text'], remaining - label_tokens)}\n")
+                used += self.counter.count(parts[-1]) + (separator if len(parts) > 1 else 0)
+                truncated = True
+            break
+
+        return parts, used, truncated
+
+    def build(self, chunks, vectors=None):
+        """
+        Kontext pro prompt z výsledků vyhledávání (seřazených podle skóre)
+
+        Args:
+            chunks: [{'text', 'metadata', 'score', 'id'?, 'domain'?}]
+            vectors: embeddingy chunků (řádek na chunk) pro deduplikaci; None = jen shodný text
+
+        Returns:
+            (context, stats) - stats: chunks, duplicates, merged, blocks,
+            tokens_before (všechny chunky tak, jak jsou), tokens, truncated
+        """
+        if not chunks:
+            return "", {'chunks': 0, 'duplicates': 0, 'merged': 0, 'blocks': 0,
+                        'tokens_before': 0, 'tokens': 0, 'truncated': False}
+
+        keep = self.deduplicate(chunks, vectors)
+        unique = [chunks[i] for i in keep]
+        blocks = self.merge(unique)
+        parts, tokens, truncated = self.pack(blocks)
+
+        raw = [f"{source_label(chunk['metadata'])}\n{chunk['text']}\n" for chunk in chunks]
+        stats = {
+            'chunks': len(chunks),
+            'duplicates': len(chunks) - len(unique),
+            'merged': len(unique) - len(blocks),
+            'blocks': len(parts),
+            'tokens_before': self.counter.count(SEPARATOR.join(raw)),
+            'tokens': tokens,
+            'truncated': truncated
+        }
+        return SEPARATOR.join(parts), stats
+
+
+def main():
+    """Main function"""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(
+        description='Almquist context builder (dedup + merge + token budget)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Context for a query: raw top-k vs. built context (tokens, duplicates, merged)
+  python3 almquist_context_builder.py --rag-dir /home/puzik/almquist_legal_rag --query "výpověď" --top-k 10
+
+  # Smaller budget, show the context
+  python3 almquist_context_builder.py --rag-dir /home/puzik/almquist_legal_rag --query "dovolená" --budget 512 --show
+
+  # Also measure time-to-first-token of both prompts
+  python3 almquist_context_builder.py --rag-dir /home/puzik/almquist_legal_rag --query "dovolená" \\
+      --llm-endpoint http://localhost:11434
+        """
+    )
+    parser.add_argument('--rag-dir', required=True)
+    parser.add_argument('--domain', default='legal')
+    parser.add_argument('--query', required=True)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--budget', type=int, default=CONTEXT_TOKENS, help='Context token budget')
+    parser.add_argument('--show', action='store_true', help='Print the built context')
+    parser.add_argument('--llm-endpoint', metavar='URL', help='Compare TTFT of raw vs. built prompt')
+    parser.add_argument('--llm-model', default='llama3.2:3b')
+
+    args = parser.parse_args()
+
+    from almquist_universal_rag_with_llm import AlmquistUniversalRAG
+
+    rag = AlmquistUniversalRAG(rag_dir=args.rag_dir, domain=args.domain, use_llm=False,
+                               llm_endpoint=args.llm_endpoint or "http://localhost:11434",
+                               llm_model=args.llm_model, context_tokens=args.budget)
+    results = rag.search(args.query, top_k=args.top_k)
+    context, stats = rag.context_builder.build(results, rag.result_vectors(results))
+    raw_context = SEPARATOR.join(f"{source_label(r['metadata'])}\n{r['text']}\n" for r in results)
+
+    print(f"📊 {stats['chunks']} chunks: {stats['duplicates']} duplicates, {stats['merged']} merged, "
+          f"{stats['blocks']} blocks{' (last truncated)' if stats['truncated'] else ''}")
+    print(f"   Context tokens: {stats['tokens_before']} → {stats['tokens']} (budget {args.budget})")
+    if args.show:
+        print(f"\n{context}")
+
+    if args.llm_endpoint:
+        for name, text in (('raw', raw_context), ('built', context)):
+            start = time.perf_counter()
+            for event in rag.llm.stream(args.llm_model, rag._build_prompt(args.query, text), {'num_predict': 1}):
+                if event.get('done'):
+                    print(f"   TTFT {name:>5}: {(time.perf_counter() - start) * 1000:.0f} ms "
+                          f"({event.get('prompt_eval_count', '?')} prompt tokens)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Crawl Scheduler
+Paralelní crawl více domén s per-domain frontami a zachovanou zdvořilostí
+"""
+
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+
+class DomainCrawlScheduler:
+    """
+    Rozdělí zdroje k crawlu do front podle domény.
+    Různé domény běží souběžně, v rámci jedné domény se crawluje
+    sekvenčně (rate limit crawleru zůstává per-domain), takže doba cyklu
+    odpovídá nejvytíženější doméně, ne součtu všech zdrojů.
+    """
+
+    def __init__(self, crawler, max_workers=4, max_per_domain=None):
+        self.crawler = crawler
+        self.max_workers = max_workers
+        self.max_per_domain = max_per_domain
+
+    def fetch_due_sources(self, limit):
+        """
+        Načte zdroje k crawlu seřazené podle priority:
+        whitelist, pak kombinace quality_score a zpoždění oproti next_crawl_at
+        (zpoždění normalizované frekvencí crawlu, max 1.0).
+        """
+        with self.crawler.pool.cursor() as cursor:
+            cursor.execute('''
+            SELECT * FROM (
+                SELECT s.*,
+                    CASE
+                        WHEN s.next_crawl_at IS NULL THEN 1.0
+                        ELSE LEAST(
+                            EXTRACT(EPOCH FROM (%s - s.next_crawl_at)) / 3600.0
+                                / GREATEST(COALESCE(s.crawl_frequency_hours, 168), 1),
+                            1.0)
+                    END AS overdue_ratio
+                FROM autonomous_sources s
+                WHERE s.is_active = true
+                AND (s.next_crawl_at IS NULL OR s.next_crawl_at <= %s)
+            ) due
+            ORDER BY
+                is_whitelisted DESC,
+                COALESCE(quality_score, 0.5) * 0.7 + overdue_ratio * 0.3 DESC,
+                next_crawl_at ASC NULLS FIRST
+            LIMIT %s
+            ''', (datetime.now(), datetime.now(), limit))
+
+            return [dict(row) for row in cursor.fetchall()]
+
+    def build_domain_queues(self, sources):
+        """Rozdělí (už seřazené) zdroje do front podle domény"""
+        queues = OrderedDict()
+
+        for source in sources:
+            queue = queues.setdefault(source['domain'], deque())
+            if self.max_per_domain and len(queue) >= self.max_per_domain:
+                continue
+            queue.append(source)
+
+        return queues
+
+    def _crawl_domain(self, domain, queue):
+        """Crawl jedné domény - sekvenčně, rate limit řeší crawler"""
+        results = {
+            'success': 0,
+            'failed': 0,
+            'changes_detected': 0,
+            'links_discovered': 0,
+            'crawled_ids': []
+        }
+
+        while queue:
+            source = queue.popleft()
+            result = self.crawler.crawl_source(source['id'])
+            results['crawled_ids'].append(source['id'])
+
+            if result:
+                results['success'] += 1
+                if result.get('change_detected'):
+                    results['changes_detected'] += 1
+                results['links_discovered'] += result.get('links_found', 0)
+            else:
+                results['failed'] += 1
+
+        return results
+
+    def run(self, sources):
+        """Spustí crawl všech front, vrátí souhrnné výsledky"""
+        queues = self.build_domain_queues(sources)
+
+        totals = {
+            'success': 0,
+            'failed': 0,
+            'changes_detected': 0,
+            'links_discovered': 0,
+            'crawled_ids': [],
+            'domains': len(queues)
+        }
+
+        if not queues:
+            return totals
+
+        workers = max(1, min(self.max_workers, len(queues)))
+        print(f"   🌐 {len(queues)} domains, {workers} parallel workers")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._crawl_domain, domain, queue): domain
+                for domain, queue in queues.items()
+            }
+
+            for future in as_completed(futures):
+                domain = futures[future]
+                try:
+                    domain_results = future.result()
+                except Exception as e:
+                    print(f"   ✗ Domain {domain} failed: {e}")
+                    continue
+
+                for key in ('success', 'failed', 'changes_detected', 'links_discovered'):
+                    totals[key] += domain_results[key]
+                totals['crawled_ids'].extend(domain_results['crawled_ids'])
+
+        return totals
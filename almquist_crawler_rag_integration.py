@@ -8,12 +8,21 @@ import sqlite3
 import json
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_chunking import get_chunker
+from almquist_embedding_service import get_embedding_model
+from almquist_rag_metadata import clear_journal, load_metadata
+from almquist_vector_store import EmbeddingStore, create_index, index_dtype
 from pathlib import Path
 from datetime import datetime
 import pickle
 import subprocess
 
+ENCODE_BATCH_SIZE = 64
+
 class CrawlerRAGIntegration:
     """Integrace crawler chunks do RAG"""
 
@@ -23,9 +32,14 @@ class CrawlerRAGIntegration:
         self.crawler_db = crawler_db
         self.rag_dir = Path(rag_dir)
 
-        # Load sentence transformer model (same as RAG)
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        # Load sentence transformer model (same as RAG), re-crawled text from the cache
+        self.model = get_embedding_model('paraphrase-multilingual-MiniLM-L12-v2', cache=True)
         self.embedding_dim = 384
+        # Long extracted texts are split to the model's max sequence length
+        self.chunker = get_chunker('paraphrase-multilingual-MiniLM-L12-v2')
+
+        # (rag_chunk_id, extracted_info.id) added since the last save
+        self.pending_marks = []
 
         # Load existing RAG system
         self.load_rag_system()
@@ -38,32 +52,29 @@ class CrawlerRAGIntegration:
         index_path = self.rag_dir / "faiss_index.bin"
         if index_path.exists():
             self.index = faiss.read_index(str(index_path))
-            print(f"   ✓ Loaded FAISS index: {self.index.ntotal} vectors")
+            print(f"   ✓ Loaded FAISS index: {self.index.ntotal} vectors ({index_dtype(self.index)})")
         else:
             # Create new index if doesn't exist
-            self.index = faiss.IndexFlatIP(self.embedding_dim)
-            print("   ⚠️  No existing index, created new one")
+            self.index = create_index(self.embedding_dim)
+            print(f"   ⚠️  No existing index, created new one ({index_dtype(self.index)})")
 
         # Load metadata
         metadata_path = self.rag_dir / "metadata.json"
         if metadata_path.exists():
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.chunks = data.get('chunks', [])
-                self.metadata = data.get('metadata', [])
+            data = load_metadata(self.rag_dir)
+            self.chunks = data.get('chunks', [])
+            self.metadata = data.get('metadata', [])
             print(f"   ✓ Loaded metadata: {len(self.chunks)} chunks")
         else:
             self.chunks = []
             self.metadata = []
             print("   ⚠️  No existing metadata, starting fresh")
 
-        # Load embeddings
-        embeddings_path = self.rag_dir / "embeddings.npy"
-        if embeddings_path.exists():
-            self.embeddings = np.load(embeddings_path)
-            print(f"   ✓ Loaded embeddings: {self.embeddings.shape}")
+        # float32 embeddings (memmap, not loaded into RAM) + new vectors until save
+        self.vectors = EmbeddingStore(self.rag_dir / "embeddings.npy", self.embedding_dim)
+        if self.vectors.stored is not None:
+            print(f"   ✓ Mapped embeddings: {self.vectors.shape}")
         else:
-            self.embeddings = np.zeros((0, self.embedding_dim), dtype='float32')
             print("   ⚠️  No existing embeddings")
 
     def get_unprocessed_chunks(self, min_relevance=0.7, limit=100):
@@ -87,33 +98,58 @@ class CrawlerRAGIntegration:
 
         return chunks
 
-    def add_chunks_to_rag(self, chunks):
-        """Přidat chunks do RAG systému"""
+    def add_chunks_to_rag(self, chunks, batch_size=ENCODE_BATCH_SIZE):
+        """
+        Přidat chunks do RAG systému
+        Embeddingy se počítají po dávkách (jedno volání modelu na dávku) a do
+        indexu se přidají najednou. Chunks se v crawler DB označí jako
+        zpracované až v save_rag_system(), ve stejné transakci s uložením indexu.
+        """
         if not chunks:
             print("⚠️  No chunks to add")
             return 0, []
 
         print(f"\n📊 Adding {len(chunks)} chunks to RAG...")
 
-        added_count = 0
         added_chunks = []
+        added_texts = []
+        vectors = []
+
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+            # extracted_info text -> one or more model-sized pieces
+            pieces = [list(self.chunker.iter_text(chunk['text_content'])) or [chunk['text_content']]
+                      for chunk in batch]
 
-        for chunk in chunks:
             try:
-                # Generate embedding
-                text = chunk['text_content']
-                embedding = self.model.encode(
-                    [text],
+                embeddings = self.model.encode(
+                    [text for texts in pieces for text in texts],
+                    batch_size=batch_size,
                     convert_to_numpy=True,
                     normalize_embeddings=True
-                )[0]
+                )
+            except Exception as e:
+                print(f"   ✗ Error encoding chunks {batch[0]['id']}..{batch[-1]['id']}: {e}")
+                continue
+
+            vectors.append(embeddings.astype('float32'))
+            added_chunks.extend(batch)
+            added_texts.extend(pieces)
+
+        if not added_chunks:
+            return 0, []
 
-                # Create chunk ID
-                chunk_id = f"crawler_{chunk['id']}_{datetime.now().strftime('%Y%m%d')}"
+        today = datetime.now().strftime('%Y%m%d')
+        added_at = datetime.now().isoformat()
 
-                # Create metadata entry
-                metadata_entry = {
-                    'chunk_id': chunk_id,
+        for chunk, texts in zip(added_chunks, added_texts):
+            # Create chunk IDs (first piece keeps the original ID)
+            chunk_id = f"crawler_{chunk['id']}_{today}"
+
+            for part, text in enumerate(texts):
+                self.chunks.append(text)
+                self.metadata.append({
+                    'chunk_id': chunk_id if part == 0 else f"{chunk_id}_{part}",
                     'source': 'crawler',
                     'source_url': chunk.get('source_url', ''),
                     'source_title': chunk.get('source_title', ''),
@@ -121,30 +157,19 @@ class CrawlerRAGIntegration:
                     'profession': self._extract_profession(chunk.get('profession_relevance')),
                     'relevance_score': chunk['relevance_score'],
                     'extracted_at': chunk.get('extracted_at', ''),
-                    'added_to_rag_at': datetime.now().isoformat()
-                }
-
-                # Add to index
-                self.index.add(embedding.reshape(1, -1).astype('float32'))
-
-                # Add to lists
-                self.chunks.append(text)
-                self.metadata.append(metadata_entry)
-                self.embeddings = np.vstack([self.embeddings, embedding])
-
-                # Mark as processed in crawler DB
-                self._mark_as_processed(chunk['id'], chunk_id)
+                    'added_to_rag_at': added_at
+                })
+            self.pending_marks.append((chunk_id, chunk['id']))
 
-                added_count += 1
-                added_chunks.append(chunk)
+            print(f"   ✓ [{chunk['chunk_type']}] {chunk.get('source_title', 'Unknown')[:40]} "
+                  f"(score: {chunk['relevance_score']:.2f}, {len(texts)} piece(s))")
 
-                print(f"   ✓ [{chunk['chunk_type']}] {chunk.get('source_title', 'Unknown')[:40]} (score: {chunk['relevance_score']:.2f})")
-
-            except Exception as e:
-                print(f"   ✗ Error adding chunk {chunk['id']}: {e}")
-                continue
+        # Add to index and embeddings in bulk
+        new_embeddings = np.vstack(vectors)
+        self.index.add(new_embeddings)
+        self.vectors.add(new_embeddings)
 
-        return added_count, added_chunks
+        return len(added_chunks), added_chunks
 
     def _extract_profession(self, profession_relevance_json):
         """Extrahovat profession z JSON"""
@@ -161,19 +186,13 @@ class CrawlerRAGIntegration:
 
         return 'zivnostnik_obecny'
 
-    def _mark_as_processed(self, chunk_id, rag_chunk_id):
-        """Označit chunk jako přidaný do RAG"""
-        conn = sqlite3.connect(self.crawler_db)
-        cursor = conn.cursor()
-
-        cursor.execute('''
+    def _mark_as_processed(self, cursor, marks):
+        """Označit chunks jako přidané do RAG (jeden executemany v transakci volajícího)"""
+        cursor.executemany('''
         UPDATE extracted_info
         SET added_to_rag = 1, rag_chunk_id = ?
         WHERE id = ?
-        ''', (rag_chunk_id, chunk_id))
-
-        conn.commit()
-        conn.close()
+        ''', marks)
 
     def log_to_cdb(self, chunks_added):
         """Logovat přidané chunks do CDB"""
@@ -216,43 +235,76 @@ class CrawlerRAGIntegration:
         except Exception as e:
             print(f"   ⚠️  CDB log failed: {e}")
 
+    @staticmethod
+    def _write_tmp(path, write):
+        """Zapíše soubor do <name>.tmp, přejmenuje se až v save_rag_system()"""
+        tmp_path = path.with_name(path.name + '.tmp')
+        write(tmp_path)
+        return tmp_path
+
     def save_rag_system(self):
-        """Uložit aktualizovaný RAG systém"""
+        """
+        Uložit aktualizovaný RAG systém
+        Soubory se zapíší do .tmp, chunks se označí v crawler DB, soubory se
+        přejmenují a teprve pak commit - pád kdykoli před commitem nechá
+        chunks neoznačené (přidají se znovu), nikdy ne označené a chybějící.
+        """
         print("\n💾 Saving updated RAG system...")
 
         # Ensure directory exists
         self.rag_dir.mkdir(parents=True, exist_ok=True)
 
-        # Save FAISS index
-        index_path = self.rag_dir / "faiss_index.bin"
-        faiss.write_index(self.index, str(index_path))
-        print(f"   ✓ FAISS index saved: {self.index.ntotal} vectors")
+        def write_metadata(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'chunks': self.chunks,
+                    'metadata': self.metadata,
+                    'updated_at': datetime.now().isoformat(),
+                    'total_chunks': len(self.chunks)
+                }, f, indent=2, ensure_ascii=False)
+
+        def write_pickle(path):
+            with open(path, 'wb') as f:
+                pickle.dump({
+                    'chunks': self.chunks,
+                    'metadata': self.metadata
+                }, f)
+
+        files = {
+            self.rag_dir / "faiss_index.bin": lambda path: faiss.write_index(self.index, str(path)),
+            self.rag_dir / "metadata.json": write_metadata,
+            self.rag_dir / "embeddings.npy": self.vectors.write,
+            self.rag_dir / "rag_system.pkl": write_pickle,
+        }
+        tmp_files = {path: self._write_tmp(path, write) for path, write in files.items()}
 
-        # Save metadata
-        metadata_path = self.rag_dir / "metadata.json"
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                'chunks': self.chunks,
-                'metadata': self.metadata,
-                'updated_at': datetime.now().isoformat(),
-                'total_chunks': len(self.chunks)
-            }, f, indent=2, ensure_ascii=False)
-        print(f"   ✓ Metadata saved: {len(self.chunks)} chunks")
+        conn = sqlite3.connect(self.crawler_db, timeout=30)
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            self._mark_as_processed(cursor, self.pending_marks)
+
+            for path, tmp_path in tmp_files.items():
+                os.replace(tmp_path, path)
+            clear_journal(self.rag_dir)  # Its chunks are in the new metadata.json
+            self.vectors.mark_saved()
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            for tmp_path in tmp_files.values():
+                if tmp_path.exists():
+                    tmp_path.unlink()
+            raise
+        finally:
+            conn.close()
 
-        # Save embeddings
-        embeddings_path = self.rag_dir / "embeddings.npy"
-        np.save(embeddings_path, self.embeddings)
-        print(f"   ✓ Embeddings saved: {self.embeddings.shape}")
-
-        # Save pickle for convenience
-        pickle_path = self.rag_dir / "rag_system.pkl"
-        with open(pickle_path, 'wb') as f:
-            pickle.dump({
-                'chunks': self.chunks,
-                'metadata': self.metadata,
-                'embeddings': self.embeddings
-            }, f)
+        print(f"   ✓ FAISS index saved: {self.index.ntotal} vectors")
+        print(f"   ✓ Metadata saved: {len(self.chunks)} chunks")
+        print(f"   ✓ Embeddings saved: {self.vectors.shape}")
         print(f"   ✓ Pickle saved")
+        print(f"   ✓ Marked {len(self.pending_marks)} chunks as added to RAG")
+        self.pending_marks = []
 
     def run_integration(self, min_relevance=0.6):
         """Spustit celý integration cycle"""
@@ -299,6 +351,7 @@ class CrawlerRAGIntegration:
         print(f"Chunks added to RAG:  {added_count}/{len(chunks)}")
         print(f"Total RAG chunks:     {len(self.chunks)}")
         print(f"Total embeddings:     {self.index.ntotal}")
+        print(self.model.report())
         print("="*70)
 
     def get_stats(self):
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST PostgreSQL Connection Pool
+Sdílený pool spojení a unit-of-work transakce pro crawlery
+"""
+
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extras
+import psycopg2.pool
+
+
+class PostgresPool:
+    """Thread-safe pool of PostgreSQL connections for one database URL"""
+
+    def __init__(self, db_url, minconn=1, maxconn=10):
+        self.db_url = db_url
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, db_url)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for one unit of work.
+        Commits on success, rolls back on any exception and always returns
+        the connection to the pool.
+        """
+        conn = self._pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.putconn(conn)
+
+    @contextmanager
+    def cursor(self, cursor_factory=psycopg2.extras.DictCursor):
+        """Borrow a cursor inside its own transaction"""
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=cursor_factory)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def close(self):
+        """Close all pooled connections"""
+        self._pool.closeall()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_url, minconn=1, maxconn=10):
+    """Return the process-wide pool for db_url, creating it on first use"""
+    with _pools_lock:
+        pool = _pools.get(db_url)
+        if pool is None:
+            pool = PostgresPool(db_url, minconn=minconn, maxconn=maxconn)
+            _pools[db_url] = pool
+        return pool
+
+
+@contextmanager
+def unit_of_work(pool, cursor=None):
+    """
+    Reuse an already open cursor (caller owns the transaction) or open
+    a new pooled transaction when none is given.
+    """
+    if cursor is not None:
+        yield cursor
+        return
+
+    with pool.cursor() as new_cursor:
+        yield new_cursor
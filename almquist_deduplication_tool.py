@@ -5,20 +5,28 @@ Odstranění duplicitních dokumentů z databáze a RAG systému
 
 Funkcionalita:
 - Detekce duplicit v SQLite databázi (podle ID i content hash)
-- Vyčištění databáze (ponechá nejnovější verzi)
+- Vyčištění databáze (ponechá nejnovější verzi, set-based SQL po dávkách)
+- Detekce téměř shodných rozhodnutí (MinHash + LSH, viz almquist_near_duplicates)
 - Detekce duplicit v RAG metadata
 - Vyčištění RAG (rebuild s deduplikovanými daty)
 """
 
 import sqlite3
 import json
-import hashlib
 import numpy as np
 import faiss
 from pathlib import Path
 from datetime import datetime
-from collections import defaultdict
 import shutil
+import time
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_near_duplicates import NearDuplicateIndex
+from almquist_content_hash import compute_content_hash, backfill_content_hashes, EMPTY_CONTENT_HASH
+from almquist_vector_store import build_index, resolve_dtype
+from almquist_rag_metadata import JOURNAL_FILE, clear_journal, load_metadata
 
 
 class AlmquistDeduplicator:
@@ -37,7 +45,7 @@ class AlmquistDeduplicator:
 
     def compute_content_hash(self, text: str) -> str:
         """Compute SHA256 hash of text content"""
-        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return compute_content_hash(text)
 
     def analyze_db_duplicates(self):
         """Analyze duplicates in database"""
@@ -45,13 +53,16 @@ class AlmquistDeduplicator:
         print("🔍 ANALYZING DATABASE DUPLICATES")
         print("="*70)
 
+        # content_hash marks rows with text (full_text may be in the compressed store)
+        backfill_content_hashes(self.legal_db, verbose=False)
+
         conn = sqlite3.connect(self.legal_db)
         cursor = conn.cursor()
 
         # Check laws
         cursor.execute("""
             SELECT COUNT(*) as total, COUNT(DISTINCT law_number) as unique_laws
-            FROM laws WHERE full_text IS NOT NULL
+            FROM laws WHERE content_hash IS NOT NULL
         """)
         total_laws, unique_laws = cursor.fetchone()
         law_duplicates = total_laws - unique_laws
@@ -64,7 +75,7 @@ class AlmquistDeduplicator:
         if law_duplicates > 0:
             cursor.execute("""
                 SELECT law_number, COUNT(*) as cnt
-                FROM laws WHERE full_text IS NOT NULL
+                FROM laws WHERE content_hash IS NOT NULL
                 GROUP BY law_number HAVING cnt > 1
                 ORDER BY cnt DESC LIMIT 5
             """)
@@ -75,7 +86,7 @@ class AlmquistDeduplicator:
         # Check court decisions
         cursor.execute("""
             SELECT COUNT(*) as total, COUNT(DISTINCT case_number) as unique_cases
-            FROM court_decisions WHERE full_text IS NOT NULL
+            FROM court_decisions WHERE content_hash IS NOT NULL
         """)
         total_cases, unique_cases = cursor.fetchone()
         case_duplicates = total_cases - unique_cases
@@ -88,7 +99,7 @@ class AlmquistDeduplicator:
         if case_duplicates > 0:
             cursor.execute("""
                 SELECT case_number, COUNT(*) as cnt
-                FROM court_decisions WHERE full_text IS NOT NULL
+                FROM court_decisions WHERE content_hash IS NOT NULL
                 GROUP BY case_number HAVING cnt > 1
                 ORDER BY cnt DESC LIMIT 5
             """)
@@ -96,29 +107,21 @@ class AlmquistDeduplicator:
             for case_num, cnt in cursor.fetchall():
                 print(f"      {case_num}: {cnt} copies")
 
-        # Check content-based duplicates (hash)
+        # Check content-based duplicates (stored, indexed content_hash)
         print(f"\n🔐 CONTENT HASH ANALYSIS:")
-        print(f"   Computing hashes for court decisions...")
 
         cursor.execute("""
-            SELECT id, case_number, full_text, crawled_at
-            FROM court_decisions WHERE full_text IS NOT NULL
+            SELECT COUNT(*), COALESCE(SUM(cnt - 1), 0), SUM(cnt > 1)
+            FROM (
+                SELECT COUNT(*) as cnt
+                FROM court_decisions WHERE content_hash IS NOT NULL
+                GROUP BY content_hash
+            )
         """)
+        unique_hashes, total_duplicate_records, content_duplicates = cursor.fetchone()
+        content_duplicates = content_duplicates or 0
 
-        hash_to_records = defaultdict(list)
-        for row in cursor.fetchall():
-            doc_id, case_num, text, crawled = row
-            content_hash = self.compute_content_hash(text)
-            hash_to_records[content_hash].append({
-                'id': doc_id,
-                'case_number': case_num,
-                'crawled_at': crawled
-            })
-
-        content_duplicates = sum(1 for records in hash_to_records.values() if len(records) > 1)
-        total_duplicate_records = sum(len(records) - 1 for records in hash_to_records.values() if len(records) > 1)
-
-        print(f"   Unique content hashes: {len(hash_to_records)}")
+        print(f"   Unique content hashes: {unique_hashes}")
         print(f"   Content duplicates: {content_duplicates} groups")
         print(f"   Total duplicate records: {total_duplicate_records}")
 
@@ -134,8 +137,85 @@ class AlmquistDeduplicator:
             'content_duplicates': total_duplicate_records
         }
 
-    def deduplicate_database(self, dry_run=True):
-        """Remove duplicates from database"""
+    def analyze_near_duplicates(self, threshold=0.85):
+        """Analyze near-duplicate court decisions (whitespace, headers, anonymisation)"""
+        print("\n" + "="*70)
+        print("🧬 ANALYZING NEAR-DUPLICATES (MinHash LSH)")
+        print("="*70)
+
+        index = NearDuplicateIndex(self.legal_db)
+
+        # Incremental - only decisions without a stored signature are hashed
+        signed = index.update_signatures('court_decision')
+        print(f"\n   Signed {signed} new/changed decisions")
+
+        groups = index.find_near_duplicates('court_decision', threshold=threshold)
+        duplicate_records = sum(len(ids) - 1 for ids in groups)
+
+        print(f"   Near-duplicate groups (Jaccard ≥ {threshold}): {len(groups)}")
+        print(f"   Total near-duplicate records: {duplicate_records}")
+
+        if groups:
+            conn = sqlite3.connect(self.legal_db)
+            cursor = conn.cursor()
+
+            print(f"\n   Top groups:")
+            for ids in sorted(groups, key=len, reverse=True)[:5]:
+                cursor.execute(f"""
+                    SELECT case_number FROM court_decisions
+                    WHERE id IN ({','.join('?' * len(ids))})
+                """, ids)
+                case_numbers = [row[0] for row in cursor.fetchall()]
+                print(f"      {len(ids)} copies: {', '.join(case_numbers)}")
+
+            conn.close()
+
+        print("\n" + "="*70)
+        print("✅ NEAR-DUPLICATE ANALYSIS COMPLETE")
+        print("="*70)
+
+        return {
+            'near_duplicate_groups': groups,
+            'near_duplicates': duplicate_records
+        }
+
+    def _collect_duplicate_ids(self, cursor, key):
+        """
+        Uloží do TEMP tabulky dedup_victims ID duplicit podle klíče
+        (ROW_NUMBER v rámci klíče, nejnovější crawled_at zůstává).
+        Řádky už vybrané předchozím klíčem se neberou v úvahu, takže
+        výsledek odpovídá postupnému mazání case_number → content_hash.
+        Prázdné texty (EMPTY_CONTENT_HASH) nejsou duplicity podle obsahu.
+        """
+        params = [key]
+        empty_filter = ""
+        if key == 'content_hash':
+            empty_filter = "AND content_hash != ?"
+            params.append(EMPTY_CONTENT_HASH)
+
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO dedup_victims (id, reason)
+            SELECT id, ? FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY {key}
+                    ORDER BY crawled_at DESC, id DESC
+                ) AS rn
+                FROM court_decisions
+                WHERE content_hash IS NOT NULL
+                AND {key} IS NOT NULL
+                {empty_filter}
+                AND id NOT IN (SELECT id FROM dedup_victims)
+            )
+            WHERE rn > 1
+        """, params)
+        return cursor.rowcount
+
+    def deduplicate_database(self, dry_run=True, batch_size=5000, clean_rag=True):
+        """
+        Remove duplicates from database (set-based)
+        Duplicity vybere SQL (window funkce), maže se po dávkách s commitem
+        mezi nimi, takže crawlery nečekají na zámek po celou dobu.
+        """
         print("\n" + "="*70)
         print("🧹 DATABASE DEDUPLICATION")
         print("="*70)
@@ -146,99 +226,174 @@ class AlmquistDeduplicator:
             # Backup database
             backup_path = self.backup_dir / f"legal_db_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
             print(f"\n📦 Creating database backup: {backup_path}")
-            shutil.copy2(self.legal_db, backup_path)
+            # Online backup: includes commits still in the -wal file (the
+            # crawlers' writer keeps the DB in WAL mode), unlike a file copy
+            source = sqlite3.connect(self.legal_db, timeout=30)
+            target = sqlite3.connect(backup_path)
+            source.backup(target)
+            target.close()
+            source.close()
             print(f"   ✓ Backup created")
 
-        conn = sqlite3.connect(self.legal_db)
-        cursor = conn.cursor()
+        # content_hash must be filled before grouping by it
+        backfill_content_hashes(self.legal_db, verbose=False)
 
-        # Deduplicate court decisions by case_number (keep newest)
-        print(f"\n⚖️  Deduplicating court decisions...")
+        start_time = time.time()
+        conn = sqlite3.connect(self.legal_db, timeout=30)
+        cursor = conn.cursor()
 
         cursor.execute("""
-            SELECT case_number, COUNT(*) as cnt
-            FROM court_decisions WHERE full_text IS NOT NULL
-            GROUP BY case_number HAVING cnt > 1
+            CREATE TEMP TABLE dedup_victims (
+                id INTEGER PRIMARY KEY,
+                reason TEXT NOT NULL
+            )
         """)
 
-        duplicate_cases = cursor.fetchall()
-        print(f"   Found {len(duplicate_cases)} case numbers with duplicates")
+        # Deduplicate court decisions by case_number, then by content hash (keep newest)
+        print(f"\n⚖️  Deduplicating court decisions by case_number...")
+        case_count = self._collect_duplicate_ids(cursor, 'case_number')
+        print(f"   Duplicate records: {case_count}")
 
-        removed_count = 0
-        for case_num, cnt in duplicate_cases:
-            # Get all records for this case_number, ordered by crawled_at DESC
-            cursor.execute("""
-                SELECT id, crawled_at FROM court_decisions
-                WHERE case_number = ? AND full_text IS NOT NULL
-                ORDER BY crawled_at DESC
-            """, (case_num,))
+        print(f"\n🔐 Deduplicating by content hash...")
+        hash_count = self._collect_duplicate_ids(cursor, 'content_hash')
+        print(f"   Duplicate records: {hash_count}")
 
-            records = cursor.fetchall()
-            if len(records) <= 1:
-                continue
+        cursor.execute("""
+            SELECT COUNT(*) FROM court_decisions
+            WHERE id IN (SELECT id FROM dedup_victims)
+            AND rag_chunk_ids IS NOT NULL AND rag_chunk_ids != '[]'
+        """)
+        print(f"\n   Records with RAG chunks: {cursor.fetchone()[0]}")
 
-            # Keep first (newest), remove rest
-            keep_id = records[0][0]
-            remove_ids = [r[0] for r in records[1:]]
+        total = case_count + hash_count
+        rag_chunk_ids = set()
 
-            print(f"   {case_num}: keeping ID {keep_id}, removing {len(remove_ids)} duplicates")
+        if dry_run:
+            print(f"\n🔍 Would remove {total} duplicate records")
+        else:
+            conn.commit()
+            removed_count = 0
+            reset_count = 0
+            last_id = 0
+
+            while True:
+                cursor.execute("""
+                    SELECT id FROM dedup_victims
+                    WHERE id > ? ORDER BY id LIMIT ?
+                """, (last_id, batch_size))
+                batch = [row[0] for row in cursor.fetchall()]
+                if not batch:
+                    break
+                last_id = batch[-1]
+
+                placeholders = ','.join('?' * len(batch))
+
+                # RAG chunk references of the deleted rows (removed from RAG below)
+                cursor.execute(f"""
+                    SELECT rag_chunk_ids FROM court_decisions
+                    WHERE id IN ({placeholders}) AND rag_chunk_ids IS NOT NULL
+                """, batch)
+                for (chunk_ids,) in cursor.fetchall():
+                    rag_chunk_ids.update(json.loads(chunk_ids))
+
+                if clean_rag:
+                    # The merger marks a skipped duplicate added_to_rag = 1
+                    # without chunks of its own - once the chunks of the
+                    # deleted row leave RAG, that survivor has to be merged again
+                    cursor.execute(f"""
+                        UPDATE court_decisions SET added_to_rag = 0
+                        WHERE added_to_rag = 1
+                        AND (rag_chunk_ids IS NULL OR rag_chunk_ids = '[]')
+                        AND id NOT IN (SELECT id FROM dedup_victims)
+                        AND id IN (
+                            SELECT s.id FROM court_decisions v
+                            JOIN court_decisions s
+                                ON s.case_number = v.case_number
+                                OR s.content_hash = v.content_hash
+                            WHERE v.id IN ({placeholders})
+                            AND v.rag_chunk_ids IS NOT NULL AND v.rag_chunk_ids != '[]'
+                        )
+                    """, batch)
+                    reset_count += cursor.rowcount
 
-            if not dry_run:
                 cursor.execute(f"""
-                    DELETE FROM court_decisions
-                    WHERE id IN ({','.join('?' * len(remove_ids))})
-                """, remove_ids)
-                removed_count += len(remove_ids)
+                    DELETE FROM court_decisions WHERE id IN ({placeholders})
+                """, batch)
+                removed_count += cursor.rowcount
+                conn.commit()  # Release the write lock between batches
 
-        # Deduplicate by content hash
-        print(f"\n🔐 Deduplicating by content hash...")
+            print(f"\n✅ Removed {removed_count} duplicate records "
+                  f"in {time.time() - start_time:.1f}s")
+            if reset_count:
+                print(f"   ↻ {reset_count} surviving records queued for re-merge into RAG")
 
-        cursor.execute("""
-            SELECT id, case_number, full_text, crawled_at
-            FROM court_decisions WHERE full_text IS NOT NULL
-        """)
+        conn.close()
 
-        hash_to_records = defaultdict(list)
-        for row in cursor.fetchall():
-            doc_id, case_num, text, crawled = row
-            content_hash = self.compute_content_hash(text)
-            hash_to_records[content_hash].append({
-                'id': doc_id,
-                'case_number': case_num,
-                'crawled_at': crawled
-            })
+        removed_rag_chunks = 0
+        if clean_rag and rag_chunk_ids:
+            removed_rag_chunks = self.remove_rag_chunks(rag_chunk_ids)
 
-        hash_removed_count = 0
-        for content_hash, records in hash_to_records.items():
-            if len(records) <= 1:
-                continue
+        print("\n" + "="*70)
+        print("✅ DATABASE DEDUPLICATION COMPLETE")
+        print("="*70)
 
-            # Sort by crawled_at (newest first)
-            records.sort(key=lambda x: x['crawled_at'] or '', reverse=True)
+        return {
+            'case_duplicates': case_count,
+            'content_duplicates': hash_count,
+            'removed_rag_chunks': removed_rag_chunks
+        }
 
-            keep_id = records[0]['id']
-            remove_ids = [r['id'] for r in records[1:]]
+    def remove_rag_chunks(self, chunk_ids):
+        """Odstraní chunky smazaných dokumentů z RAG (metadata, embeddings, FAISS)"""
+        print(f"\n🧩 Removing {len(chunk_ids)} RAG chunks of deleted records...")
 
-            print(f"   Hash {content_hash[:16]}...: keeping ID {keep_id}, removing {len(remove_ids)}")
+        metadata_path = self.rag_dir / "metadata.json"
+        embeddings_path = self.rag_dir / "embeddings.npy"
 
-            if not dry_run:
-                cursor.execute(f"""
-                    DELETE FROM court_decisions
-                    WHERE id IN ({','.join('?' * len(remove_ids))})
-                """, remove_ids)
-                hash_removed_count += len(remove_ids)
+        if not metadata_path.exists() or not embeddings_path.exists():
+            print("   ❌ RAG metadata not found")
+            return 0
 
-        if not dry_run:
-            conn.commit()
-            print(f"\n✅ Removed {removed_count + hash_removed_count} duplicate records")
-        else:
-            print(f"\n🔍 Would remove {removed_count + hash_removed_count} duplicate records")
+        data = load_metadata(self.rag_dir)
 
-        conn.close()
+        metadata = data['metadata']
+        keep = np.array([m.get('chunk_id') not in chunk_ids for m in metadata], dtype=bool)
+        removed = int((~keep).sum())
 
-        print("\n" + "="*70)
-        print("✅ DATABASE DEDUPLICATION COMPLETE")
-        print("="*70)
+        if removed == 0:
+            print("   ✓ No matching chunks in RAG")
+            return 0
+
+        # Backup before rewriting the RAG files
+        backup_path = self.backup_dir / f"legal_rag_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        backup_path.mkdir(exist_ok=True)
+        for file in ['embeddings.npy', 'faiss_index.bin', 'metadata.json', JOURNAL_FILE]:
+            src = self.rag_dir / file
+            if src.exists():
+                shutil.copy2(src, backup_path / file)
+
+        # Rebuilt index keeps its dtype (float32 / float16 / int8)
+        index_path = self.rag_dir / "faiss_index.bin"
+        old_index = faiss.read_index(str(index_path)) if index_path.exists() else None
+        dtype = resolve_dtype(existing_index=old_index)
+        del old_index
+
+        embeddings = np.load(embeddings_path, mmap_mode='r')[keep].astype('float32')
+        index = build_index(embeddings, dtype)
+
+        data['chunks'] = [c for c, k in zip(data['chunks'], keep) if k]
+        data['metadata'] = [m for m, k in zip(metadata, keep) if k]
+        data['total_chunks'] = len(data['chunks'])
+        data['updated_at'] = datetime.now().isoformat()
+
+        with open(metadata_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        clear_journal(self.rag_dir)
+        np.save(embeddings_path, embeddings)
+        faiss.write_index(index, str(self.rag_dir / "faiss_index.bin"))
+
+        print(f"   ✓ Removed {removed} chunks ({index.ntotal} remaining, backup: {backup_path})")
+        return removed
 
     def analyze_rag_duplicates(self):
         """Analyze duplicates in RAG metadata"""
@@ -252,9 +407,7 @@ class AlmquistDeduplicator:
             print("   ❌ RAG metadata not found")
             return
 
-        with open(metadata_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            metadata = data['metadata']
+        metadata = load_metadata(self.rag_dir)['metadata']
 
         print(f"\n📊 RAG Stats:")
         print(f"   Total chunks: {len(metadata)}")
@@ -316,6 +469,9 @@ Examples:
   # Analyze RAG duplicates
   python3 almquist_deduplication_tool.py --analyze-rag
 
+  # Near-duplicate decisions (MinHash LSH, incremental signatures)
+  python3 almquist_deduplication_tool.py --near-duplicates --threshold 0.85
+
   # Full cleanup (analyze + deduplicate + vacuum)
   python3 almquist_deduplication_tool.py --full-cleanup
         """
@@ -327,8 +483,14 @@ Examples:
                         help='Deduplicate database')
     parser.add_argument('--analyze-rag', action='store_true',
                         help='Analyze RAG for duplicates')
+    parser.add_argument('--near-duplicates', action='store_true',
+                        help='Find near-duplicate court decisions (MinHash LSH)')
+    parser.add_argument('--threshold', type=float, default=0.85,
+                        help='Near-duplicate Jaccard threshold (default: 0.85)')
     parser.add_argument('--dry-run', action='store_true',
                         help='Dry run (show what would be done)')
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help='Rows deleted per transaction (default: 5000)')
     parser.add_argument('--full-cleanup', action='store_true',
                         help='Full cleanup (analyze + deduplicate + vacuum)')
     parser.add_argument('--vacuum', action='store_true',
@@ -346,11 +508,13 @@ Examples:
     elif args.analyze:
         deduplicator.analyze_db_duplicates()
     elif args.deduplicate_db:
-        deduplicator.deduplicate_database(dry_run=args.dry_run)
+        deduplicator.deduplicate_database(dry_run=args.dry_run, batch_size=args.batch_size)
         if not args.dry_run and args.vacuum:
             deduplicator.vacuum_database()
     elif args.analyze_rag:
         deduplicator.analyze_rag_duplicates()
+    elif args.near_duplicates:
+        deduplicator.analyze_near_duplicates(threshold=args.threshold)
     elif args.vacuum:
         deduplicator.vacuum_database()
     else:
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Embedding Cache
+Perzistentní cache embeddingů chunků podle (model, SHA-256 normalizovaného textu)
+
+- nezměněné paragrafy novelizovaného zákona, zkopírovaný (vendored) kód
+  nebo znovu stažené stránky se neembedují podruhé
+- klíč: model (+ backend) a SHA-256 textu po NFC + sjednocení whitespace,
+  uložený jako 32 B BLOB; vektor jako raw float32 (nenormalizovaný -
+  normalizace se dělá při čtení, jeden záznam slouží pro obě varianty)
+- SQLite WITHOUT ROWID, WAL - sdílí ji merger, integrace i Code RAG
+  v různých procesech
+- hit rate: za běh (CachedEncoder.report()) i kumulativně (--stats)
+
+Usage:
+    python3 almquist_embedding_cache.py --stats
+    python3 almquist_embedding_cache.py --prune-days 180
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+
+DEFAULT_CACHE_DB = os.environ.get('ALMQUIST_EMBEDDING_CACHE', '/home/puzik/almquist_embedding_cache.db')
+LOOKUP_BATCH_SIZE = 500  # SQLite variable limit
+
+
+def normalize_chunk_text(text):
+    """NFC + sjednocený whitespace (na tokenizaci modelu nemá vliv)"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def chunk_text_hash(text):
+    """SHA-256 normalizovaného textu (32 B digest)"""
+    return hashlib.sha256(normalize_chunk_text(text).encode('utf-8')).digest()
+
+
+class EmbeddingCache:
+    """Tabulky embedding_models (id, name, dim, hits, misses) + embedding_cache"""
+
+    def __init__(self, db_path=DEFAULT_CACHE_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._model_ids = {}
+
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+        CREATE TABLE IF NOT EXISTS embedding_models (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            dim INTEGER,
+            hits INTEGER DEFAULT 0,
+            misses INTEGER DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            model_id INTEGER NOT NULL,
+            text_hash BLOB NOT NULL,
+            vector BLOB NOT NULL,
+            last_used INTEGER NOT NULL,
+            PRIMARY KEY (model_id, text_hash)
+        ) WITHOUT ROWID;
+        ''')
+        self.conn.commit()
+
+    def _model_id(self, model):
+        if model not in self._model_ids:
+            self.conn.execute('INSERT OR IGNORE INTO embedding_models (name) VALUES (?)', (model,))
+            self.conn.commit()
+            row = self.conn.execute('SELECT id FROM embedding_models WHERE name = ?', (model,)).fetchone()
+            self._model_ids[model] = row[0]
+        return self._model_ids[model]
+
+    def get_many(self, model, hashes):
+        """{text_hash: float32 vektor} pro nalezené hashe"""
+        found = {}
+        hashes = list(hashes)
+
+        with self._lock:
+            model_id = self._model_id(model)
+            for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+                batch = hashes[start:start + LOOKUP_BATCH_SIZE]
+                rows = self.conn.execute(f'''
+                    SELECT text_hash, vector FROM embedding_cache
+                    WHERE model_id = ? AND text_hash IN ({', '.join('?' * len(batch))})
+                ''', [model_id] + batch).fetchall()
+                for text_hash, vector in rows:
+                    found[text_hash] = np.frombuffer(vector, dtype='float32')
+
+            # last_used is day-granular: at most one write per row and day
+            today = int(time.time() // 86400)
+            self.conn.executemany('''
+                UPDATE embedding_cache SET last_used = ?
+                WHERE model_id = ? AND text_hash = ? AND last_used < ?
+            ''', [(today, model_id, text_hash, today) for text_hash in found])
+            self.conn.execute('''
+                UPDATE embedding_models SET hits = hits + ?, misses = misses + ? WHERE id = ?
+            ''', (len(found), len(set(hashes)) - len(found), model_id))
+            self.conn.commit()
+
+        return found
+
+    def put_many(self, model, items):
+        """items: [(text_hash, vektor)] - jedna transakce"""
+        if not items:
+            return
+        today = int(time.time() // 86400)
+
+        with self._lock:
+            model_id = self._model_id(model)
+            self.conn.executemany('''
+                INSERT OR REPLACE INTO embedding_cache (model_id, text_hash, vector, last_used)
+                VALUES (?, ?, ?, ?)
+            ''', [(model_id, text_hash, np.asarray(vector, dtype='float32').tobytes(), today)
+                  for text_hash, vector in items])
+            self.conn.execute('UPDATE embedding_models SET dim = ? WHERE id = ?',
+                              (len(items[0][1]), model_id))
+            self.conn.commit()
+
+    def stats(self):
+        """Počty, velikost a kumulativní hit rate po modelech"""
+        with self._lock:
+            rows = self.conn.execute('''
+                SELECT m.name, m.dim, m.hits, m.misses, COUNT(c.text_hash)
+                FROM embedding_models m
+                LEFT JOIN embedding_cache c ON c.model_id = m.id
+                GROUP BY m.id ORDER BY m.name
+            ''').fetchall()
+
+        return [{
+            'model': name,
+            'dim': dim,
+            'entries': entries,
+            'size_mb': entries * ((dim or 0) * 4 + 32) / 1024 / 1024,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+        } for name, dim, hits, misses, entries in rows]
+
+    def prune(self, days):
+        """Smaže záznamy nepoužité déle než days dní"""
+        cutoff = int(time.time() // 86400) - days
+        with self._lock:
+            deleted = self.conn.execute('DELETE FROM embedding_cache WHERE last_used < ?', (cutoff,)).rowcount
+            self.conn.commit()
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class CachedEncoder:
+    """
+    Obal encoderu s API SentenceTransformer.encode(): zakódují se jen texty,
+    které v cache nejsou (a každý jen jednou, i když je v dávce vícekrát)
+    """
+
+    def __init__(self, model, model_key, cache):
+        self.model = model
+        self._model_key = model_key
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model_key(self):
+        """Klíč modelu v cache; callable se vyhodnotí při každém použití (backend daemonu se může změnit)"""
+        return self._model_key() if callable(self._model_key) else self._model_key
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=None,
+               convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        hashes = [chunk_text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_key, set(hashes))
+
+        # First occurrence of each missing hash gets encoded
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in vectors and text_hash not in missing:
+                missing[text_hash] = text
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            encoded = self.model.encode(list(missing.values()), batch_size=batch_size,
+                                        show_progress_bar=show_progress_bar,
+                                        convert_to_numpy=True, normalize_embeddings=False, **kwargs)
+            encoded = np.asarray(encoded, dtype='float32').reshape(len(missing), -1)
+            new_items = list(zip(missing, encoded))
+            # Key read again: the vectors are stored under the backend that computed them
+            self.cache.put_many(self.model_key, new_items)
+            vectors.update(new_items)
+
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype='float32')
+
+        embeddings = np.vstack([vectors[text_hash] for text_hash in hashes]).astype('float32')
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self):
+        """Řádek s hit rate za tento běh"""
+        return (f"🗃️  Embedding cache ({self.model_key}): {self.hits} hits, "
+                f"{self.misses} encoded ({self.hit_rate:.0%} hit rate)")
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(db_path=DEFAULT_CACHE_DB):
+    """Sdílená cache pro danou databázi (jedno spojení na proces)"""
+    with _caches_lock:
+        if db_path not in _caches:
+            _caches[db_path] = EmbeddingCache(db_path)
+        return _caches[db_path]
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Almquist Embedding Cache',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Entries, size and lifetime hit rate per model
+  python3 almquist_embedding_cache.py --stats
+
+  # Drop entries not used for half a year
+  python3 almquist_embedding_cache.py --prune-days 180
+        """
+    )
+    parser.add_argument('--db', default=DEFAULT_CACHE_DB)
+    parser.add_argument('--stats', action='store_true', help='Show cache statistics')
+    parser.add_argument('--prune-days', type=int, metavar='DAYS',
+                        help='Delete entries unused for DAYS days')
+
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(args.db)
+
+    if args.prune_days is not None:
+        deleted = cache.prune(args.prune_days)
+        print(f"✓ Pruned {deleted} entries unused for {args.prune_days}+ days")
+
+    if args.stats or args.prune_days is None:
+        print(f"🗃️  Embedding cache: {args.db}")
+        for row in cache.stats():
+            print(f"   {row['model']}: {row['entries']} vectors ({row['size_mb']:.1f} MB), "
+                  f"{row['hits']} hits / {row['misses']} misses ({row['hit_rate']:.0%})")
+
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
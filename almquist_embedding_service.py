@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Embedding Service
+Dlouhoběžící embedding daemon (Unix socket) + tenký klient
+
+- model se načte jednou a sdílí ho všechny nástroje (RAG search, merger,
+  integrace, query logger, testy) - start CLI/cron jobu v milisekundách
+- požadavky souběžných klientů se skládají do mikro-dávek
+  (max N textů nebo T ms), takže model počítá dávky místo jednotlivých vět
+- klient má API jako SentenceTransformer.encode(); když daemon neběží,
+  načte model lokálně (stejné chování jako dřív, jen pomalejší start)
+- backend: ALMQUIST_EMBEDDING_BACKEND=torch (výchozí) nebo onnx
+  (int8 ONNX, viz almquist_onnx_encoder)
+
+Protokol: zpráva = 8 B hlavička (>II: délka JSON, délka payloadu) + JSON + payload
+    request:  {"op": "encode", "model": ..., "texts": [...], "normalize": bool}
+    response: {"shape": [n, dim], "dtype": "float32"} + raw float32 bytes
+
+Usage:
+    python3 almquist_embedding_service.py --serve
+    python3 almquist_embedding_service.py --status
+"""
+
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+DEFAULT_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+DEFAULT_SOCKET = os.environ.get('ALMQUIST_EMBEDDING_SOCKET', '/tmp/almquist_embeddings.sock')
+MAX_BATCH_SIZE = 64
+MAX_WAIT_MS = 5
+CONNECT_TIMEOUT = 1.0
+EMBEDDING_BACKEND = os.environ.get('ALMQUIST_EMBEDDING_BACKEND', 'torch')
+
+_HEADER = struct.Struct('>II')
+
+
+def _send_message(sock, header, payload=b''):
+    data = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data), len(payload)) + data + payload)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Embedding service closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_message(sock):
+    header_size, payload_size = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, header_size).decode('utf-8'))
+    payload = _recv_exact(sock, payload_size) if payload_size else b''
+    return header, payload
+
+
+def load_encoder(model_name, backend=None, device=None):
+    """
+    Načte encoder podle konfigurace: 'torch' = SentenceTransformer,
+    'onnx' = int8 OnnxSentenceEncoder (když chybí export/onnxruntime, torch)
+    """
+    backend = backend or EMBEDDING_BACKEND
+
+    if backend == 'onnx':
+        try:
+            from almquist_onnx_encoder import OnnxSentenceEncoder
+            return OnnxSentenceEncoder(model_name)
+        except (ImportError, FileNotFoundError) as e:
+            print(f"   ⚠️  ONNX backend unavailable ({e}), using torch")
+    elif backend != 'torch':
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device=device)
+
+
+def encoder_backend(encoder):
+    """Backend, který načtený encoder skutečně používá (load_encoder může z onnx spadnout na torch)"""
+    return 'onnx' if type(encoder).__name__ == 'OnnxSentenceEncoder' else 'torch'
+
+
+# ----------------------------------------------------------------------
+# Server
+# ----------------------------------------------------------------------
+
+class _EncodeRequest:
+    __slots__ = ('model', 'texts', 'normalize', 'future')
+
+    def __init__(self, model, texts, normalize):
+        self.model = model
+        self.texts = texts
+        self.normalize = normalize
+        self.future = Future()
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # Many CLI/cron clients may connect at once
+
+
+class EmbeddingServer:
+    """Embedding daemon - jeden batcher thread volá model, klienti čekají na Future"""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, model_name=DEFAULT_MODEL,
+                 max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, device=None,
+                 backend=None):
+        self.socket_path = socket_path
+        self.default_model = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.device = device
+        self.backend = backend or EMBEDDING_BACKEND
+
+        self.models = {}
+        self.stats = {'requests': 0, 'texts': 0, 'batches': 0, 'encode_seconds': 0.0}
+        self.started_at = time.time()
+
+        self._queue = queue.Queue()
+        self._server = None
+
+    def load_model(self, model_name):
+        """Modely se načítají líně, každý jen jednou (volá jen batcher thread)"""
+        if model_name not in self.models:
+            print(f"📚 Loading {model_name} ({self.backend})...")
+            self.models[model_name] = load_encoder(model_name, self.backend, self.device)
+            print(f"   ✓ {model_name} loaded ({type(self.models[model_name]).__name__})")
+        return self.models[model_name]
+
+    def submit(self, model_name, texts, normalize):
+        request = _EncodeRequest(model_name or self.default_model, texts, normalize)
+        self._queue.put(request)
+        return request.future
+
+    def info(self):
+        batches = max(self.stats['batches'], 1)
+        return {
+            'models': {name: model.get_sentence_embedding_dimension() for name, model in self.models.items()},
+            'default_model': self.default_model,
+            'backend': self.backend,
+            'backends': {name: encoder_backend(model) for name, model in self.models.items()},
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'avg_batch_texts': round(self.stats['texts'] / batches, 1),
+            **self.stats
+        }
+
+    # ------------------------------------------------------------------
+    # Micro-batching
+    # ------------------------------------------------------------------
+
+    def _collect_batch(self):
+        """Čeká na první požadavek, pak přibírá další max. max_wait nebo do max_batch_size textů"""
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        count = len(first.texts)
+        deadline = time.monotonic() + self.max_wait
+
+        while count < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)  # Stop after this batch
+                break
+            batch.append(request)
+            count += len(request.texts)
+
+        return batch
+
+    def _batch_loop(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                break
+
+            # One model call per (model, normalize) group
+            groups = {}
+            for request in batch:
+                groups.setdefault((request.model, request.normalize), []).append(request)
+
+            for (model_name, normalize), requests in groups.items():
+                texts = [text for request in requests for text in request.texts]
+                start = time.perf_counter()
+
+                try:
+                    embeddings = self.load_model(model_name).encode(
+                        texts,
+                        batch_size=self.max_batch_size,
+                        convert_to_numpy=True,
+                        normalize_embeddings=normalize
+                    ).astype('float32')
+                except Exception as e:
+                    for request in requests:
+                        request.future.set_exception(e)
+                    continue
+
+                self.stats['batches'] += 1
+                self.stats['texts'] += len(texts)
+                self.stats['encode_seconds'] += time.perf_counter() - start
+
+                offset = 0
+                for request in requests:
+                    request.future.set_result(embeddings[offset:offset + len(request.texts)])
+                    offset += len(request.texts)
+
+    # ------------------------------------------------------------------
+    # Socket server
+    # ------------------------------------------------------------------
+
+    def _handler(self):
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                # A client keeps its connection open for many requests
+                while True:
+                    try:
+                        header, _ = _recv_message(self.request)
+                    except (ConnectionError, OSError):
+                        return
+
+                    try:
+                        if header.get('op') == 'info':
+                            _send_message(self.request, server.info())
+                            continue
+
+                        server.stats['requests'] += 1
+                        model_name = header.get('model') or server.default_model
+                        embeddings = server.submit(model_name, header['texts'],
+                                                   bool(header.get('normalize'))).result()
+                        _send_message(self.request,
+                                      {'shape': list(embeddings.shape), 'dtype': 'float32',
+                                       'backend': encoder_backend(server.models[model_name])},
+                                      embeddings.tobytes())
+                    except (ConnectionError, OSError):
+                        return
+                    except Exception as e:
+                        _send_message(self.request, {'error': f"{type(e).__name__}: {e}"})
+
+        return Handler
+
+    def serve_forever(self):
+        """Načte výchozí model a obsluhuje klienty do Ctrl+C"""
+        self.load_model(self.default_model)
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Stale socket from a previous run
+
+        batcher = threading.Thread(target=self._batch_loop, name="embedding-batcher", daemon=True)
+        batcher.start()
+
+        self._server = _UnixServer(self.socket_path, self._handler())
+        os.chmod(self.socket_path, 0o660)
+
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+        signal.signal(signal.SIGTERM, stop)  # systemd / kill: clean shutdown, socket removed
+
+        print(f"🚀 Embedding service listening on {self.socket_path}")
+        print(f"   Micro-batching: max {self.max_batch_size} texts / {self.max_wait * 1000:.0f} ms")
+
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Stopping embedding service")
+        finally:
+            self.shutdown()
+            batcher.join(timeout=5)
+
+    def shutdown(self):
+        self._queue.put(None)
+        if self._server:
+            self._server.server_close()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+# ----------------------------------------------------------------------
+# Client
+# ----------------------------------------------------------------------
+
+class EmbeddingClient:
+    """
+    Tenký klient s API SentenceTransformer.encode()
+    Když daemon neběží, načte model lokálně (fallback=True);
+    socket_path=None = vždy lokálně.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, socket_path=DEFAULT_SOCKET, fallback=True):
+        self.model_name = model_name
+        self.socket_path = socket_path
+        self.fallback = fallback
+
+        self._sock = None
+        self._local_model = None
+        self._backend = None  # Reported by the daemon with every response
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.socket_path is None:
+            raise ConnectionError("Embedding service disabled")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(self.socket_path)
+        sock.settimeout(None)
+        return sock
+
+    def _request(self, header):
+        """Jeden request/response; po výpadku spojení jeden pokus o reconnect"""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._sock = self._connect()
+                    _send_message(self._sock, header)
+                    return _recv_message(self._sock)
+                except (ConnectionError, OSError):
+                    if self._sock is not None:
+                        self._sock.close()
+                        self._sock = None
+                    if attempt:
+                        raise
+
+    def _local(self):
+        if self._local_model is None:
+            print(f"   ⚠️  Embedding service not running ({self.socket_path}), loading {self.model_name} locally")
+            self._local_model = load_encoder(self.model_name)
+        return self._local_model
+
+    @property
+    def backend(self):
+        """Backend, který embeddingy skutečně počítá (daemon ho posílá s odpovědí)"""
+        if self._local_model is None and self._backend is None:
+            self.encode(['backend'])  # Daemon answers with its backend, or the model loads locally
+        if self._local_model is not None:
+            return encoder_backend(self._local_model)
+        return self._backend
+
+    @property
+    def is_remote(self):
+        """True, pokud klient používá daemon"""
+        if self._local_model is not None:
+            return False
+        try:
+            self._request({'op': 'info'})
+            return True
+        except (ConnectionError, OSError):
+            return False
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=None,
+               convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        """Jako SentenceTransformer.encode(); vrací vždy numpy float32"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        if self._local_model is None:
+            try:
+                header, payload = self._request({
+                    'op': 'encode',
+                    'model': self.model_name,
+                    'texts': texts,
+                    'normalize': normalize_embeddings
+                })
+            except (ConnectionError, OSError):
+                if not self.fallback:
+                    raise
+            else:
+                if 'error' in header:
+                    raise RuntimeError(f"Embedding service error: {header['error']}")
+                self._backend = header.get('backend', EMBEDDING_BACKEND)  # Older daemons do not send it
+                embeddings = np.frombuffer(payload, dtype=header['dtype']).reshape(header['shape'])
+                return embeddings[0] if single else embeddings
+
+        return self._local().encode(sentences, batch_size=batch_size,
+                                    show_progress_bar=show_progress_bar,
+                                    convert_to_numpy=True,
+                                    normalize_embeddings=normalize_embeddings, **kwargs)
+
+    def get_sentence_embedding_dimension(self):
+        if self._local_model is None:
+            try:
+                header, _ = self._request({'op': 'info'})
+                if self.model_name in header['models']:
+                    return header['models'][self.model_name]
+            except (ConnectionError, OSError):
+                pass
+        return self.encode(['dimension']).shape[1]
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_embedding_model(model_name=DEFAULT_MODEL, cache=False):
+    """
+    Sdílený embedding klient (náhrada za SentenceTransformer(model_name))
+    ALMQUIST_EMBEDDING_SERVICE=0 vypne daemon a model se načte lokálně.
+    cache=True: obal s perzistentní cache embeddingů chunků
+    (almquist_embedding_cache) - pro ingestion, ne pro dotazy. Klíč cache
+    obsahuje backend, který embeddingy skutečně počítá (daemon / lokální
+    fallback), ne jen ALMQUIST_EMBEDDING_BACKEND klienta.
+    """
+    with _clients_lock:
+        if model_name not in _clients:
+            use_service = os.environ.get('ALMQUIST_EMBEDDING_SERVICE') != '0'
+            _clients[model_name] = EmbeddingClient(
+                model_name, socket_path=DEFAULT_SOCKET if use_service else None)
+        client = _clients[model_name]
+
+    if not cache:
+        return client
+
+    from almquist_embedding_cache import CachedEncoder, get_embedding_cache
+    return CachedEncoder(client, lambda: f"{model_name}:{client.backend}", get_embedding_cache())
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Almquist Embedding Service',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Start the daemon (keep it running, e.g. systemd or tmux)
+  python3 almquist_embedding_service.py --serve
+
+  # Check that it runs + batching stats
+  python3 almquist_embedding_service.py --status
+
+  # Encode a test sentence through the daemon
+  python3 almquist_embedding_service.py --encode "náhrada škody"
+        """
+    )
+    parser.add_argument('--serve', action='store_true', help='Run the embedding daemon')
+    parser.add_argument('--status', action='store_true', help='Show daemon status')
+    parser.add_argument('--encode', metavar='TEXT', help='Encode TEXT through the daemon')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET)
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH_SIZE,
+                        help='Max texts per model call')
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS,
+                        help='How long to wait for more requests before encoding')
+    parser.add_argument('--device', default=None, help='cpu / cuda (default: auto)')
+    parser.add_argument('--backend', choices=['torch', 'onnx'], default=EMBEDDING_BACKEND,
+                        help='Encoder backend (default: $ALMQUIST_EMBEDDING_BACKEND or torch)')
+
+    args = parser.parse_args()
+
+    if args.serve:
+        EmbeddingServer(args.socket, args.model, max_batch_size=args.max_batch,
+                        max_wait_ms=args.max_wait_ms, device=args.device,
+                        backend=args.backend).serve_forever()
+    elif args.status:
+        client = EmbeddingClient(args.model, socket_path=args.socket, fallback=False)
+        try:
+            info, _ = client._request({'op': 'info'})
+        except (ConnectionError, OSError):
+            print(f"❌ Embedding service not running ({args.socket})")
+            return
+        print(f"✅ Embedding service running ({args.socket})")
+        for key, value in info.items():
+            print(f"   {key}: {value}")
+    elif args.encode:
+        client = EmbeddingClient(args.model, socket_path=args.socket, fallback=False)
+        start = time.perf_counter()
+        embedding = client.encode(args.encode, normalize_embeddings=True)
+        print(f"✓ {embedding.shape} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        print(f"   {np.array2string(embedding[:8], precision=4)} ...")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
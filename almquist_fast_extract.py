@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Fast HTML Extraction
+Rychlá extrakce textových bloků a skórování relevance pro autonomous crawler
+
+- C parser (lxml) pokud je dostupný, jinak BeautifulSoup + html.parser
+- streamovaný průchod textovými bloky (HTMLPullParser, bez celého DOM v BS4)
+- výsledek je shodný s html.parser jen když lxml postaví stejný strom:
+  lxml uzavírá neuzavřené <p>/<li>/<td>, ukončí <p> před blokovým prvkem
+  (<div>, <ul>, <h2>, <table>...) a zahazuje nebo doplňuje tagy, html.parser
+  jen vnoří tagy tak, jak jsou ve zdroji - struktura elementů a umístění
+  textu se porovnají se zdrojem a při rozdílu stránka jde přes html.parser
+  (pomalejší, ale stejné bloky jako původní crawler)
+- klíčová slova a regexy připravené jednou při importu
+
+Usage:
+    python3 almquist_fast_extract.py --benchmark page1.html page2.html ...
+"""
+
+import html
+import re
+import sys
+import time
+from datetime import datetime
+
+try:
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+from bs4 import BeautifulSoup
+
+TEXT_BLOCK_TAGS = ('p', 'h1', 'h2', 'h3', 'h4', 'li', 'td')
+SKIP_TAGS = ('script', 'style', 'nav', 'footer', 'header')
+MIN_BLOCK_LENGTH = 30
+
+# Source tags (comments, <!doctype>, start/end tags with quoted attributes)
+_MARKUP_RE = re.compile(
+    r'<!--.*?(?:-->|$)|<[!?][^>]*>|<(/?)([a-zA-Z][^\s/>]*)((?:"[^"]*"|\'[^\']*\'|[^\'">])*)>',
+    re.DOTALL
+)
+_RAW_TEXT_END_RE = {tag: re.compile(r'</%s\s*>' % tag, re.IGNORECASE) for tag in ('script', 'style')}
+_VOID_TAGS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+    'meta', 'param', 'source', 'track', 'wbr'
+))
+# lxml adds these when the page omits them; they are left out on both sides
+_IMPLIED_TAGS = frozenset(('html', 'head', 'body'))
+
+# Keywords by category
+FINANCIAL_KEYWORDS = ('kč', 'platba', 'záloha', 'pojistné', 'daň', 'dph', 'sazba', 'tarif')
+LEGAL_KEYWORDS = ('zákon', 'vyhláška', 'paragraf', '§', 'povinnost', 'nárok', 'právo')
+DEADLINE_KEYWORDS = ('termín', 'lhůta', 'do', 'nejpozději', 'deadline')
+PROCESS_KEYWORDS = ('postup', 'návod', 'jak', 'kroky', 'formulář', 'registrace')
+
+
+class TextChunkScorer:
+    """
+    Skórování relevance textového chunku (stejná pravidla jako původní
+    AlmquistAutonomousCrawler._analyze_text_chunk).
+
+    Klíčová slova se hledají jako podřetězce (`kw in text`) - rychlejší než
+    jeden regex s lookahead, hlavně u dlouhých bloků z vnořeného markupu.
+    """
+
+    AMOUNT_RE = re.compile(r'\d+\s*(kč|korun|%|procent)')
+    LEGAL_RE = re.compile(r'(zákon|vyhláška|§\s*\d+|paragrafu)')
+
+    def __init__(self,
+                 financial=FINANCIAL_KEYWORDS,
+                 legal=LEGAL_KEYWORDS,
+                 deadline=DEADLINE_KEYWORDS,
+                 process=PROCESS_KEYWORDS):
+        self.deadline = frozenset(deadline)
+        self.process = frozenset(process)
+        self.all_keywords = tuple(sorted(
+            frozenset(financial) | frozenset(legal) | self.deadline | self.process
+        ))
+
+    def score(self, text, source_type):
+        """Returns (relevance, chunk_type)"""
+        text_lower = text.lower()
+
+        relevance = 0.0
+        chunk_type = 'general'
+
+        # Check for amounts
+        if self.AMOUNT_RE.search(text_lower):
+            relevance += 0.3
+            chunk_type = 'financial_info'
+
+        # Check for legal references
+        if self.LEGAL_RE.search(text_lower):
+            relevance += 0.25
+            chunk_type = 'legal_reference'
+
+        found = {kw for kw in self.all_keywords if kw in text_lower}
+
+        # Check for deadlines
+        if found & self.deadline:
+            relevance += 0.2
+            if chunk_type == 'general':
+                chunk_type = 'deadline'
+
+        # Check for processes
+        if found & self.process:
+            relevance += 0.15
+            if chunk_type == 'general':
+                chunk_type = 'process'
+
+        # Keyword density
+        relevance += min(len(found) * 0.05, 0.3)
+
+        # Bonus for government sources
+        if source_type in ['government', 'chamber']:
+            relevance *= 1.2
+
+        # Normalize to 0-1
+        return min(relevance, 1.0), chunk_type
+
+    def analyze(self, text, source_type, profession_relevance):
+        """Chunk info dict, nebo None pokud relevance < 0.3"""
+        relevance, chunk_type = self.score(text, source_type)
+
+        if relevance < 0.3:
+            return None
+
+        return {
+            'text': text[:500],  # Limit length
+            'chunk_type': chunk_type,
+            'relevance_score': relevance,
+            'profession_relevance': profession_relevance,
+            'extracted_at': datetime.now().isoformat()
+        }
+
+
+# Built once at import, shared by all crawler instances
+DEFAULT_SCORER = TextChunkScorer()
+
+
+def _element_text(element):
+    """Ekvivalent BeautifulSoup get_text(strip=True)"""
+    return ''.join(part.strip() for part in element.itertext())
+
+
+def _has_text(raw):
+    """Neprázdný text (i po dekódování entit jako &nbsp;)"""
+    return bool(raw.strip()) and ('&' not in raw or bool(html.unescape(raw).strip()))
+
+
+def _source_structure(content):
+    """
+    Strom, který z content postaví html.parser: posloupnost otevření ('p')
+    a uzavření ('/p') elementů - konec tagu zavře vše až k jeho startu, nic
+    se neuzavírá implicitně, na konci se zavře zbytek - a počet textových
+    úseků přímo v každém elementu {pozice otevření: počet}, -1 = mimo
+    elementy. None pokud zdroj obsahuje <tag/> u nevoid elementu (html.parser
+    ho nechá prázdný, lxml otevře) nebo končí nedokončeným tagem.
+    """
+    structure = []
+    texts = {}
+    tags = []  # Open elements and their positions in structure
+    positions = [-1]
+    pos = 0  # End of the last match / raw text
+
+    for match in _MARKUP_RE.finditer(content):
+        start = match.start()
+        if start < pos:
+            continue  # Inside <script>/<style> raw text
+        text = content[pos:start]
+        closing, tag, attrs = match.groups()
+        pos = match.end()
+
+        if text and not text.isspace() and _has_text(text):
+            owner = positions[-1]
+            texts[owner] = texts.get(owner, 0) + 1
+        if tag is None:
+            continue  # Comment / doctype
+        tag = tag.lower()
+
+        if closing:
+            if tags and tags[-1] == tag:
+                structure.append('/' + tag)
+                del tags[-1], positions[-1]
+            elif tag in tags:
+                index = len(tags) - 1 - tags[::-1].index(tag)
+                structure.extend('/' + tag for tag in reversed(tags[index:]))
+                del tags[index:], positions[index + 1:]
+            continue
+
+        if tag in _IMPLIED_TAGS:
+            continue
+
+        position = len(structure)
+        structure.append(tag)
+        if tag in _VOID_TAGS:
+            structure.append('/' + tag)
+        elif attrs and attrs.rstrip().endswith('/'):
+            return None
+        elif tag in _RAW_TEXT_END_RE:
+            # Raw text up to </script>: no tags inside
+            end = _RAW_TEXT_END_RE[tag].search(content, pos)
+            if _has_text(content[pos:end.start() if end else len(content)]):
+                texts[position] = 1
+            pos = end.end() if end else len(content)
+            structure.append('/' + tag)
+        else:
+            tags.append(tag)
+            positions.append(position)
+
+    if pos < len(content):
+        if '<' in content[pos:]:
+            return None  # Unfinished tag at the end: html.parser keeps it as text, lxml drops it
+        if _has_text(content[pos:]):
+            texts[positions[-1]] = texts.get(positions[-1], 0) + 1
+    structure.extend('/' + tag for tag in reversed(tags))
+    return structure, texts
+
+
+def _direct_texts(element):
+    """Počet textových úseků přímo v elementu (text + tail potomků)"""
+    count = 1 if element.text and element.text.strip() else 0
+    for child in element:
+        if child.tail and child.tail.strip():
+            count += 1
+    return count
+
+
+def _iter_text_blocks_lxml(content):
+    """
+    Streamovaný průchod přes lxml HTMLPullParser
+    Returns: seznam bloků, nebo None pokud lxml strom neodpovídá zdroji
+    (neuzavřené / implicitně uzavřené tagy, <div> uvnitř <p>, ignorovaný
+    konec tagu, ...) - pak je potřeba html.parser. Porovnává se struktura
+    elementů i to, do kterého elementu patří každý textový úsek, takže shoda
+    znamená stejný text v každém bloku.
+    """
+    source = _source_structure(content)
+    if source is None:
+        return None
+    source, source_texts = source
+
+    parser = etree.HTMLPullParser(events=('start', 'end'))
+    parser.feed(content)
+    parser.close()
+
+    blocks = []
+    position = 0
+    start_position = {}
+    root_texts = 0
+    skip_depth = 0  # Blocks inside script/nav/... are dropped together with them
+
+    for event, element in parser.read_events():
+        tag = element.tag
+        if not isinstance(tag, str):
+            continue
+
+        if tag in _IMPLIED_TAGS:
+            if event == 'end':
+                root_texts += _direct_texts(element)
+            continue
+
+        expected = tag if event == 'start' else '/' + tag
+        if position >= len(source) or source[position] != expected:
+            return None  # lxml closed, moved or added an element
+        position += 1
+
+        if event == 'start':
+            start_position[element] = position - 1
+            if tag in SKIP_TAGS:
+                skip_depth += 1
+            continue
+
+        start = start_position.pop(element)
+        if _direct_texts(element) != source_texts.get(start, 0):
+            return None  # Text went to another element (e.g. an ignored end tag)
+
+        if tag in SKIP_TAGS:
+            skip_depth -= 1
+            # Empty the subtree but keep the text that follows it as its own string
+            tail = element.tail
+            element.clear()
+            element.tail = tail
+        elif tag in TEXT_BLOCK_TAGS and not skip_depth:
+            text = _element_text(element)
+            if len(text) > MIN_BLOCK_LENGTH:
+                blocks.append((start, text))
+
+    if position != len(source) or root_texts != source_texts.get(-1, 0):
+        return None  # lxml dropped an element / moved text out of one
+
+    # Document order (start tags), the same as BeautifulSoup find_all
+    blocks.sort(key=lambda block: block[0])
+    return [text for _, text in blocks]
+
+
+def _iter_text_blocks_bs4(content):
+    """Fallback bez lxml"""
+    soup = BeautifulSoup(content, 'html.parser')
+
+    for element in soup(list(SKIP_TAGS)):
+        element.decompose()
+
+    blocks = []
+    for element in soup.find_all(list(TEXT_BLOCK_TAGS)):
+        text = element.get_text(strip=True)
+        if len(text) > MIN_BLOCK_LENGTH:
+            blocks.append(text)
+    return blocks
+
+
+def iter_text_blocks(content):
+    """Textové bloky (p, h1-h4, li, td) delší než MIN_BLOCK_LENGTH znaků"""
+    if HAS_LXML and content:
+        blocks = _iter_text_blocks_lxml(content)
+        if blocks is not None:
+            return blocks
+    return _iter_text_blocks_bs4(content)
+
+
+def extract_information(content, source_type, profession_relevance=None, scorer=DEFAULT_SCORER):
+    """
+    Extrahuje relevantní chunks z HTML obsahu
+    Returns: (chunks_extracted, extracted_data[])
+    """
+    extracted_chunks = []
+
+    for text in iter_text_blocks(content):
+        chunk_info = scorer.analyze(text, source_type, profession_relevance)
+
+        if chunk_info and chunk_info['relevance_score'] > 0.3:
+            extracted_chunks.append(chunk_info)
+
+    return len(extracted_chunks), extracted_chunks
+
+
+def _reference_extract(content, source_type, profession_relevance=None):
+    """Původní implementace (html.parser + nekompilované skórování) pro benchmark"""
+    soup = BeautifulSoup(content, 'html.parser')
+    for script in soup(["script", "style", "nav", "footer", "header"]):
+        script.decompose()
+
+    financial_keywords = list(FINANCIAL_KEYWORDS)
+    legal_keywords = list(LEGAL_KEYWORDS)
+    deadline_keywords = list(DEADLINE_KEYWORDS)
+    process_keywords = list(PROCESS_KEYWORDS)
+
+    extracted_chunks = []
+    for elem in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'li', 'td']):
+        text = elem.get_text(strip=True)
+        if len(text) <= 30:
+            continue
+
+        text_lower = text.lower()
+        relevance = 0.0
+        chunk_type = 'general'
+        if re.search(r'\d+\s*(kč|korun|%|procent)', text_lower):
+            relevance += 0.3
+            chunk_type = 'financial_info'
+        if re.search(r'(zákon|vyhláška|§\s*\d+|paragrafu)', text_lower):
+            relevance += 0.25
+            chunk_type = 'legal_reference'
+        if any(kw in text_lower for kw in deadline_keywords):
+            relevance += 0.2
+            if chunk_type == 'general':
+                chunk_type = 'deadline'
+        if any(kw in text_lower for kw in process_keywords):
+            relevance += 0.15
+            if chunk_type == 'general':
+                chunk_type = 'process'
+        all_keywords = financial_keywords + legal_keywords + deadline_keywords + process_keywords
+        keyword_count = sum(1 for kw in all_keywords if kw in text_lower)
+        relevance += min(keyword_count * 0.05, 0.3)
+        if source_type in ['government', 'chamber']:
+            relevance *= 1.2
+        relevance = min(relevance, 1.0)
+
+        if relevance > 0.3:
+            extracted_chunks.append({'text': text[:500], 'chunk_type': chunk_type,
+                                     'relevance_score': relevance})
+
+    return len(extracted_chunks), extracted_chunks
+
+
+def benchmark(paths, repeat=5, source_type='government'):
+    """Porovná původní a rychlou extrakci na uložených stránkách"""
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            pages.append((path, f.read()))
+
+    print(f"📊 Extraction benchmark ({len(pages)} pages, {repeat}x, "
+          f"parser: {'lxml' if HAS_LXML else 'html.parser'})")
+    print("=" * 70)
+
+    total_ref = 0.0
+    total_fast = 0.0
+
+    for path, content in pages:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            ref_count, ref_chunks = _reference_extract(content, source_type)
+        ref_time = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fast_count, fast_chunks = extract_information(content, source_type)
+        fast_time = (time.perf_counter() - start) / repeat
+
+        total_ref += ref_time
+        total_fast += fast_time
+
+        same = [(c['text'], c['chunk_type'], round(c['relevance_score'], 6)) for c in ref_chunks] == \
+               [(c['text'], c['chunk_type'], round(c['relevance_score'], 6)) for c in fast_chunks]
+
+        print(f"{path}")
+        print(f"   reference: {ref_time * 1000:8.1f} ms  ({ref_count} chunks)")
+        print(f"   fast:      {fast_time * 1000:8.1f} ms  ({fast_count} chunks)"
+              f"  {'✓ identical' if same else '⚠️  differs'}")
+
+    if total_fast > 0:
+        print("=" * 70)
+        print(f"Speedup: {total_ref / total_fast:.1f}x")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == '--benchmark':
+        benchmark(sys.argv[2:])
+    else:
+        print(__doc__)
@@ -5,7 +5,6 @@ Crawls ALL court decisions from Czech courts
 Designed for long-running 24h+ operation with thousands of decisions
 """
 
-import sqlite3
 import requests
 from bs4 import BeautifulSoup
 import time
@@ -15,6 +14,10 @@ import re
 import sys
 import os
 
+sys.path.append(os.path.dirname(__file__))
+from almquist_content_hash import compute_content_hash, ensure_content_hash_columns
+from almquist_legal_db_writer import get_writer
+
 class FullCourtCrawler:
     """Full crawler for ALL Czech court decisions"""
 
@@ -25,6 +28,8 @@ class FullCourtCrawler:
             'User-Agent': 'ALMQUIST Legal RAG Bot/1.0 (Educational Purpose)'
         })
         self.pause_between_requests = 3  # 3 seconds between requests
+        ensure_content_hash_columns(self.db_path)
+        self.writer = get_writer(self.db_path)
 
     def crawl_nsoud_listing(self, max_pages=1000):
         """Crawl listing of decisions from Nejvyšší soud - FULL ARCHIVE"""
@@ -166,10 +171,7 @@ class FullCourtCrawler:
             return False
 
     def save_decision(self, decision_info):
-        """Save decision to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
+        """Queue decision for the shared DB writer (upsert by ECLI / case number)"""
         # Parse date
         decision_date = None
         if 'decision_date_raw' in decision_info:
@@ -185,73 +187,39 @@ class FullCourtCrawler:
         ecli = decision_info.get('ecli')
         case_number = decision_info.get('case_number', 'Unknown')
 
-        cursor.execute('SELECT id FROM court_decisions WHERE ecli = ? OR case_number = ?', (ecli, case_number))
-        existing = cursor.fetchone()
-
-        if existing:
-            cursor.execute('''
-            UPDATE court_decisions SET
-                decision_type = ?,
-                decision_date = ?,
-                summary = ?,
-                full_text = ?,
-                keywords = ?,
-                affected_laws = ?,
-                source_url = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-            ''', (
-                decision_info.get('decision_type'),
-                decision_date,
-                decision_info.get('summary', ''),
-                decision_info.get('full_text', ''),
-                decision_info.get('keywords', '[]'),
-                decision_info.get('affected_laws', '[]'),
-                decision_info['url'],
-                existing[0]
-            ))
-            decision_id = existing[0]
-        else:
-            cursor.execute('''
-            INSERT INTO court_decisions (
-                case_number, court_level, court_name,
-                decision_type, decision_date, ecli,
-                legal_area, affected_laws, keywords,
-                summary, full_text, source_url
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                case_number,
-                'supreme',
-                'Nejvyšší soud',
-                decision_info.get('decision_type'),
-                decision_date,
-                decision_info.get('ecli'),
-                'obcanske',
-                decision_info.get('affected_laws', '[]'),
-                decision_info.get('keywords', '[]'),
-                decision_info.get('summary', ''),
-                decision_info.get('full_text', ''),
-                decision_info['url']
-            ))
-            decision_id = cursor.lastrowid
-
-        conn.commit()
-        conn.close()
-
-        return decision_id
+        values = {
+            'case_number': case_number,
+            'court_level': 'supreme',
+            'court_name': 'Nejvyšší soud',
+            'decision_type': decision_info.get('decision_type'),
+            'decision_date': decision_date,
+            'ecli': ecli,
+            'legal_area': 'obcanske',
+            'affected_laws': decision_info.get('affected_laws', '[]'),
+            'keywords': decision_info.get('keywords', '[]'),
+            'summary': decision_info.get('summary', ''),
+            'full_text': decision_info.get('full_text', ''),
+            'content_hash': compute_content_hash(decision_info.get('full_text', '')),
+            'source_url': decision_info['url']
+        }
+
+        return self.writer.upsert(
+            'court_decisions', values,
+            match=[{'ecli': ecli}, {'case_number': case_number}],
+            update_columns=('decision_type', 'decision_date', 'summary', 'full_text',
+                            'content_hash', 'keywords', 'affected_laws', 'source_url')
+        )
 
     def log_crawl(self, source, source_type, status, items_found, items_added, error_message=None):
         """Log crawl to history"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-        INSERT INTO crawl_history (source, source_type, status, items_found, items_added, error_message)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (source, source_type, status, items_found, items_added, error_message))
-
-        conn.commit()
-        conn.close()
+        return self.writer.insert('crawl_history', {
+            'source': source,
+            'source_type': source_type,
+            'status': status,
+            'items_found': items_found,
+            'items_added': items_added,
+            'error_message': error_message
+        })
 
     def crawl_all_decisions(self, max_pages=1000):
         """Crawl ALL Nejvyšší soud decisions"""
@@ -282,8 +250,8 @@ class FullCourtCrawler:
 
             # Crawl detail
             if self.crawl_decision_detail(decision_info):
-                decision_id = self.save_decision(decision_info)
-                print(f"   ✓ Saved (ID: {decision_id})")
+                self.save_decision(decision_info)
+                print(f"   ✓ Queued for DB")
                 print(f"   ✓ Text length: {len(decision_info.get('full_text', ''))}")
                 success_count += 1
             else:
@@ -302,6 +270,7 @@ class FullCourtCrawler:
 
         # Log final crawl
         self.log_crawl('nsoud_full_archive', 'court_decision', 'success', len(decisions), success_count)
+        self.writer.flush_report()
 
         # Summary
         print("\n" + "=" * 70)
@@ -12,6 +12,12 @@ import time
 from datetime import datetime
 import json
 import re
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_content_hash import compute_content_hash, ensure_content_hash_columns
+from almquist_legal_text_store import get_text_store, init_text_tables
 
 class FullJusticeCrawler:
     """Full crawler for rozhodnuti.justice.cz OpenData API"""
@@ -45,6 +51,7 @@ class FullJusticeCrawler:
                 keywords TEXT,
                 legal_provisions TEXT,
                 full_text TEXT,
+                content_hash TEXT,
                 summary TEXT,
                 url TEXT,
                 source TEXT,
@@ -52,9 +59,11 @@ class FullJusticeCrawler:
             )
         ''')
 
-        conn.commit()
+        init_text_tables(conn)
         conn.close()
 
+        ensure_content_hash_columns(self.db_path)
+
     def get_years(self):
         """Get all available years from API"""
         try:
@@ -169,12 +178,19 @@ class FullJusticeCrawler:
             cursor.execute('''
                 INSERT OR IGNORE INTO court_decisions
                 (case_number, court_name, decision_date, publication_date, author,
-                 ecli, subject, keywords, legal_provisions, full_text, summary, url, source)
+                 ecli, subject, keywords, legal_provisions, content_hash,
+                 summary, url, source)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (case_number, court_name, decision_date, publication_date, author,
-                  ecli, subject, keywords, legal_provisions, full_text, summary, url,
+                  ecli, subject, keywords, legal_provisions,
+                  compute_content_hash(full_text), summary, url,
                   'rozhodnuti.justice.cz'))
 
+            # Text goes to the compressed store, only for newly inserted rows
+            if cursor.rowcount == 1 and full_text is not None:
+                get_text_store(self.db_path).store_full_text(
+                    cursor, 'court_decision', cursor.lastrowid, full_text)
+
             conn.commit()
 
             # Get ID of inserted/existing record
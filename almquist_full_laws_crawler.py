@@ -5,7 +5,6 @@ Crawls ALL Czech laws from zakonyprolidi.cz (1945-2025)
 Designed for long-running 24h+ operation
 """
 
-import sqlite3
 import requests
 from bs4 import BeautifulSoup
 import time
@@ -15,6 +14,10 @@ import re
 import sys
 import os
 
+sys.path.append(os.path.dirname(__file__))
+from almquist_content_hash import compute_content_hash, ensure_content_hash_columns
+from almquist_legal_db_writer import get_writer
+
 class FullLawsCrawler:
     """Full crawler for ALL Czech laws"""
 
@@ -26,6 +29,8 @@ class FullLawsCrawler:
         })
         self.pause_between_requests = 2  # 2 seconds between requests
         self.years_to_crawl = range(1993, 2026)  # 1993-2025 (since ČR independence)
+        ensure_content_hash_columns(self.db_path)
+        self.writer = get_writer(self.db_path)
 
     def get_laws_from_year(self, year):
         """Get all law URLs from a specific year"""
@@ -124,8 +129,8 @@ class FullLawsCrawler:
                 'source_url': law_info['url']
             }
 
-            law_id = self.save_law(law_data)
-            print(f"   ✓ Saved (ID: {law_id}), length: {len(law_text):,} chars")
+            self.save_law(law_data)
+            print(f"   ✓ Queued for DB, length: {len(law_text):,} chars")
 
             return True
 
@@ -159,64 +164,26 @@ class FullLawsCrawler:
             return 'other'
 
     def save_law(self, law_data):
-        """Save law to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT id FROM laws WHERE law_number = ?', (law_data['law_number'],))
-        existing = cursor.fetchone()
-
-        if existing:
-            cursor.execute('''
-            UPDATE laws SET
-                law_name = ?,
-                law_type = ?,
-                category = ?,
-                full_text = ?,
-                source_url = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE law_number = ?
-            ''', (
-                law_data['law_name'],
-                law_data['law_type'],
-                law_data['category'],
-                law_data['full_text'],
-                law_data['source_url'],
-                law_data['law_number']
-            ))
-            law_id = existing[0]
-        else:
-            cursor.execute('''
-            INSERT INTO laws (
-                law_number, law_name, law_type, category,
-                full_text, source_url
-            ) VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                law_data['law_number'],
-                law_data['law_name'],
-                law_data['law_type'],
-                law_data['category'],
-                law_data['full_text'],
-                law_data['source_url']
-            ))
-            law_id = cursor.lastrowid
-
-        conn.commit()
-        conn.close()
-        return law_id
+        """Queue law for the shared DB writer (upsert by law number)"""
+        values = dict(law_data, content_hash=compute_content_hash(law_data['full_text']))
+
+        return self.writer.upsert(
+            'laws', values,
+            match=[{'law_number': law_data['law_number']}],
+            update_columns=('law_name', 'law_type', 'category', 'full_text',
+                            'content_hash', 'source_url')
+        )
 
     def log_crawl(self, source, source_type, status, items_found, items_added, error_message=None):
         """Log crawl to history"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-        INSERT INTO crawl_history (source, source_type, status, items_found, items_added, error_message)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (source, source_type, status, items_found, items_added, error_message))
-
-        conn.commit()
-        conn.close()
+        return self.writer.insert('crawl_history', {
+            'source': source,
+            'source_type': source_type,
+            'status': status,
+            'items_found': items_found,
+            'items_added': items_added,
+            'error_message': error_message
+        })
 
     def crawl_all_laws(self):
         """Crawl ALL laws from all years"""
@@ -290,6 +257,7 @@ class FullLawsCrawler:
         print(f"Total laws crawled: {total_laws_crawled:,}")
         print(f"Total laws failed:  {total_laws_failed:,}")
         print(f"Success rate:       {total_laws_crawled/total_laws_found*100:.1f}%")
+        self.writer.flush_report()
         print(f"{'='*70}")
 
 
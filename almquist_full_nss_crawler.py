@@ -4,13 +4,18 @@ ALMQUIST Full NSS (Nejvyšší správní soud) Crawler
 Crawls ALL decisions from Supreme Administrative Court (2003-2025)
 """
 
-import sqlite3
 import requests
 from bs4 import BeautifulSoup
 import time
 from datetime import datetime
 import json
 import re
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_content_hash import compute_content_hash, ensure_content_hash_columns
+from almquist_legal_db_writer import get_writer
 
 class FullNSSCrawler:
     """Full crawler for NSS decisions"""
@@ -23,6 +28,8 @@ class FullNSSCrawler:
         })
         self.pause_between_requests = 3
         self.years_to_crawl = range(2003, 2026)  # NSS existuje od 2003
+        ensure_content_hash_columns(self.db_path)
+        self.writer = get_writer(self.db_path)
 
     def get_decisions_from_year(self, year):
         """Get all decisions from a specific year by iterating through issues"""
@@ -138,71 +145,36 @@ class FullNSSCrawler:
             return False
 
     def save_decision(self, decision_info):
-        """Save NSS decision to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        case_number = decision_info['case_number']
-
-        cursor.execute('SELECT id FROM court_decisions WHERE case_number = ?', (case_number,))
-        existing = cursor.fetchone()
-
-        if existing:
-            cursor.execute('''
-            UPDATE court_decisions SET
-                decision_type = ?,
-                decision_date = ?,
-                full_text = ?,
-                affected_laws = ?,
-                source_url = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-            ''', (
-                decision_info.get('decision_type'),
-                decision_info.get('decision_date'),
-                decision_info.get('full_text', ''),
-                decision_info.get('affected_laws', '[]'),
-                decision_info['url'],
-                existing[0]
-            ))
-            decision_id = existing[0]
-        else:
-            cursor.execute('''
-            INSERT INTO court_decisions (
-                case_number, court_level, court_name,
-                decision_type, decision_date,
-                legal_area, affected_laws,
-                full_text, source_url
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                case_number,
-                'administrative',
-                'Nejvyšší správní soud',
-                decision_info.get('decision_type'),
-                decision_info.get('decision_date'),
-                'spravni',
-                decision_info.get('affected_laws', '[]'),
-                decision_info.get('full_text', ''),
-                decision_info['url']
-            ))
-            decision_id = cursor.lastrowid
-
-        conn.commit()
-        conn.close()
-        return decision_id
+        """Queue NSS decision for the shared DB writer (upsert by case number)"""
+        values = {
+            'case_number': decision_info['case_number'],
+            'court_level': 'administrative',
+            'court_name': 'Nejvyšší správní soud',
+            'decision_type': decision_info.get('decision_type'),
+            'decision_date': decision_info.get('decision_date'),
+            'legal_area': 'spravni',
+            'affected_laws': decision_info.get('affected_laws', '[]'),
+            'full_text': decision_info.get('full_text', ''),
+            'content_hash': compute_content_hash(decision_info.get('full_text', '')),
+            'source_url': decision_info['url']
+        }
+
+        return self.writer.upsert(
+            'court_decisions', values,
+            match=[{'case_number': values['case_number']}],
+            update_columns=('decision_type', 'decision_date', 'full_text',
+                            'content_hash', 'affected_laws', 'source_url')
+        )
 
     def log_crawl(self, source, source_type, status, items_found, items_added):
         """Log crawl to history"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-        INSERT INTO crawl_history (source, source_type, status, items_found, items_added)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (source, source_type, status, items_found, items_added))
-
-        conn.commit()
-        conn.close()
+        return self.writer.insert('crawl_history', {
+            'source': source,
+            'source_type': source_type,
+            'status': status,
+            'items_found': items_found,
+            'items_added': items_added
+        })
 
     def crawl_all_nss(self):
         """Crawl ALL NSS decisions"""
@@ -236,8 +208,8 @@ class FullNSSCrawler:
                 print(f"   URL: {decision_info['url']}")
 
                 if self.crawl_decision_detail(decision_info):
-                    decision_id = self.save_decision(decision_info)
-                    print(f"   ✓ Saved (ID: {decision_id})")
+                    self.save_decision(decision_info)
+                    print(f"   ✓ Queued for DB")
                     year_success += 1
                     total_success += 1
                 else:
@@ -263,6 +235,7 @@ class FullNSSCrawler:
         print(f"Total found:   {total_found:,}")
         print(f"Total success: {total_success:,}")
         print(f"Total failed:  {total_failed:,}")
+        self.writer.flush_report()
         print(f"{'='*70}")
 
 
@@ -5,13 +5,18 @@ Crawls decisions from Constitutional Court via NALUS search
 NOTE: NALUS requires Selenium for full functionality - this is simplified version
 """
 
-import sqlite3
 import requests
 from bs4 import BeautifulSoup
 import time
 from datetime import datetime
 import json
 import re
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_content_hash import compute_content_hash, ensure_content_hash_columns
+from almquist_legal_db_writer import get_writer
 
 class FullUSoudCrawler:
     """Full crawler for Ústavní soud decisions"""
@@ -23,6 +28,8 @@ class FullUSoudCrawler:
             'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36'
         })
         self.pause_between_requests = 3
+        ensure_content_hash_columns(self.db_path)
+        self.writer = get_writer(self.db_path)
 
     def search_decisions_simple(self, decision_type='nalez', max_pages=100):
         """
@@ -105,52 +112,34 @@ class FullUSoudCrawler:
             return ""
 
     def save_decision(self, decision_info):
-        """Save ÚS decision to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        case_number = decision_info['case_number']
-
-        cursor.execute('SELECT id FROM court_decisions WHERE case_number = ?', (case_number,))
-        existing = cursor.fetchone()
-
-        if existing:
-            decision_id = existing[0]
-        else:
-            cursor.execute('''
-            INSERT INTO court_decisions (
-                case_number, court_level, court_name,
-                decision_type,
-                legal_area,
-                full_text, source_url
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                case_number,
-                'constitutional',
-                'Ústavní soud',
-                decision_info.get('decision_type', 'nalez'),
-                'ustavni',
-                decision_info.get('note', 'PLACEHOLDER'),
-                'https://nalus.usoud.cz'
-            ))
-            decision_id = cursor.lastrowid
-
-        conn.commit()
-        conn.close()
-        return decision_id
+        """Queue ÚS decision for the shared DB writer (insert if case number is new)"""
+        full_text = decision_info.get('note', 'PLACEHOLDER')
+
+        values = {
+            'case_number': decision_info['case_number'],
+            'court_level': 'constitutional',
+            'court_name': 'Ústavní soud',
+            'decision_type': decision_info.get('decision_type', 'nalez'),
+            'legal_area': 'ustavni',
+            'full_text': full_text,
+            'content_hash': compute_content_hash(full_text),
+            'source_url': 'https://nalus.usoud.cz'
+        }
+
+        return self.writer.upsert(
+            'court_decisions', values,
+            match=[{'case_number': values['case_number']}]
+        )
 
     def log_crawl(self, source, source_type, status, items_found, items_added):
         """Log crawl to history"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-        INSERT INTO crawl_history (source, source_type, status, items_found, items_added)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (source, source_type, status, items_found, items_added))
-
-        conn.commit()
-        conn.close()
+        return self.writer.insert('crawl_history', {
+            'source': source,
+            'source_type': source_type,
+            'status': status,
+            'items_found': items_found,
+            'items_added': items_added
+        })
 
     def crawl_all_usoud(self):
         """Crawl ÚS decisions - SIMPLIFIED VERSION"""
@@ -179,10 +168,9 @@ class FullUSoudCrawler:
         print("   See: /home/puzik/almquist_full_usoud_selenium_crawler.py (TODO)\n")
 
         # Save a few samples
-        saved = 0
-        for decision in nalezy[:20]:  # Just first 20 samples
-            decision_id = self.save_decision(decision)
-            saved += 1
+        futures = [self.save_decision(decision) for decision in nalezy[:20]]  # Just first 20 samples
+        stats = self.writer.flush_report(futures)
+        saved = stats['inserted'] + stats['updated']
 
         self.log_crawl('usoud_full_placeholder', 'court_decision', 'partial', len(nalezy), saved)
 
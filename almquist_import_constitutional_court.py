@@ -3,6 +3,12 @@
 ALMQUIST Import Constitutional Court Dataset (Zenodo 2024)
 Imports 96,271 decisions from Czech Constitutional Court (1993-2023)
 Source: https://zenodo.org/records/11618008
+
+Streaming mode (--streaming): texts CSV is staged into an on-disk SQLite
+index (doc_id PRIMARY KEY) and joined to the metadata CSV batch by batch,
+inserts go through executemany in large transactions and progress is
+stored in the staging DB, so an interrupted import resumes where it
+stopped. Memory stays bounded by the batch size, not by the dump size.
 """
 
 import sqlite3
@@ -10,10 +16,22 @@ import csv
 import json
 from datetime import datetime
 import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_content_hash import compute_content_hash, ensure_content_hash_columns
+from almquist_legal_text_store import get_text_store, init_text_tables
 
 # Increase CSV field size limit for large text fields
 csv.field_size_limit(sys.maxsize)
 
+MAX_TEXT_LENGTH = 500000  # Limit to 500k chars
+STREAM_BATCH_SIZE = 500  # rows per executemany / IN (...) lookup (SQLite variable limit)
+STREAM_COMMIT_EVERY = 5000  # rows per transaction
+
+INSERT_COLUMNS = ('case_number', 'court_level', 'court_name', 'decision_date', 'ecli',
+                  'keywords', 'content_hash', 'summary', 'source_url', 'source')
+
 class ConstitutionalCourtImporter:
     """Import Czech Constitutional Court dataset into Almquist DB"""
 
@@ -21,6 +39,7 @@ class ConstitutionalCourtImporter:
         self.db_path = db_path
         self.csv_path_metadata = "ccc_database/csv/ccc_metadata.csv"
         self.csv_path_texts = "ccc_database/csv/ccc_texts.csv"
+        self.staging_path = f"{db_path}.ccc_staging"
 
     def init_database(self):
         """Ensure court_decisions table exists"""
@@ -36,8 +55,44 @@ class ConstitutionalCourtImporter:
             cursor.execute('ALTER TABLE court_decisions ADD COLUMN source TEXT')
             conn.commit()
 
+        init_text_tables(conn)
         conn.close()
 
+        ensure_content_hash_columns(self.db_path)
+
+    def build_record(self, row, full_text):
+        """Metadata řádek CSV -> dict sloupců court_decisions (bez full_text)"""
+        doc_id = row['doc_id']  # ECLI - use as unique ID
+        decision_date = row['date_decision'] if row['date_decision'] != 'NA' else None
+
+        # Build summary from metadata
+        summary_parts = []
+        if row.get('type_decision'):
+            summary_parts.append(f"Typ: {row['type_decision']}")
+        if row.get('type_proceedings'):
+            summary_parts.append(f"Řízení: {row['type_proceedings']}")
+        if row.get('type_verdict'):
+            summary_parts.append(f"Výrok: {row['type_verdict']}")
+        if row.get('popular_name') and row['popular_name'] != 'NA':
+            summary_parts.append(f"Název: {row['popular_name']}")
+
+        # Prepare subject/keywords
+        subject = row.get('subject_proceedings', '')
+        keywords = row.get('subject_register', '')
+
+        return {
+            'case_number': row['case_id'],  # Real case ID (e.g., "Pl.ÚS 43/23")
+            'court_level': 'Ústavní soud',
+            'court_name': 'Ústavní soud',
+            'decision_date': decision_date,
+            'ecli': doc_id,
+            'keywords': f"{keywords}\n{subject}" if keywords and subject else (keywords or subject or ''),
+            'content_hash': compute_content_hash(full_text),
+            'summary': "\n".join(summary_parts) if summary_parts else None,
+            'source_url': row.get('url_address', ''),
+            'source': 'usoud.cz'
+        }
+
     def load_texts(self):
         """Load all texts into memory dictionary (doc_id -> text)"""
         print("📖 Loading texts from CSV...")
@@ -86,31 +141,10 @@ class ConstitutionalCourtImporter:
 
                 try:
                     doc_id = row['doc_id']  # ECLI - use as unique ID
-                    case_number = row['case_id']  # Real case ID (e.g., "Pl.ÚS 43/23")
-                    decision_date = row['date_decision'] if row['date_decision'] != 'NA' else None
 
                     # Get full text
                     full_text = texts_dict.get(doc_id, '')
-
-                    # Build summary from metadata
-                    summary_parts = []
-                    if row.get('type_decision'):
-                        summary_parts.append(f"Typ: {row['type_decision']}")
-                    if row.get('type_proceedings'):
-                        summary_parts.append(f"Řízení: {row['type_proceedings']}")
-                    if row.get('type_verdict'):
-                        summary_parts.append(f"Výrok: {row['type_verdict']}")
-                    if row.get('popular_name') and row['popular_name'] != 'NA':
-                        summary_parts.append(f"Název: {row['popular_name']}")
-
-                    summary = "\n".join(summary_parts) if summary_parts else None
-
-                    # Prepare subject/keywords
-                    subject = row.get('subject_proceedings', '')
-                    keywords = row.get('subject_register', '')
-
-                    # URL
-                    url = row.get('url_address', '')
+                    full_text = full_text[:MAX_TEXT_LENGTH] if full_text else None
 
                     # Check if already exists by ECLI
                     cursor.execute('SELECT id FROM court_decisions WHERE ecli = ?',
@@ -122,23 +156,14 @@ class ConstitutionalCourtImporter:
                         continue
 
                     # Insert
-                    cursor.execute('''
-                        INSERT INTO court_decisions
-                        (case_number, court_level, court_name, decision_date, ecli,
-                         keywords, full_text, summary, source_url, source)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        case_number,
-                        'Ústavní soud',  # court_level
-                        'Ústavní soud',  # court_name
-                        decision_date,
-                        doc_id,  # ECLI
-                        f"{keywords}\n{subject}" if keywords and subject else (keywords or subject or ''),
-                        full_text[:500000] if full_text else None,  # Limit to 500k chars
-                        summary,
-                        url,
-                        'usoud.cz'
-                    ))
+                    record = self.build_record(row, full_text)
+                    cursor.execute(f'''
+                        INSERT INTO court_decisions ({', '.join(INSERT_COLUMNS)})
+                        VALUES ({', '.join('?' * len(INSERT_COLUMNS))})
+                    ''', [record[col] for col in INSERT_COLUMNS])
+
+                    get_text_store(self.db_path).store_full_text(
+                        cursor, 'court_decision', cursor.lastrowid, full_text)
 
                     imported += 1
 
@@ -161,6 +186,264 @@ class ConstitutionalCourtImporter:
         print(f"   Errors: {errors:,}")
         print(f"   Database: {self.db_path}")
 
+    # ------------------------------------------------------------------
+    # Streaming import
+    # ------------------------------------------------------------------
+
+    def _open_staging(self):
+        """Staging DB: texty indexované podle doc_id + stav importu"""
+        staging = sqlite3.connect(self.staging_path)
+        staging.execute('''
+        CREATE TABLE IF NOT EXISTS ccc_texts (
+            doc_id TEXT PRIMARY KEY,
+            text TEXT
+        ) WITHOUT ROWID
+        ''')
+        staging.execute('''
+        CREATE TABLE IF NOT EXISTS import_progress (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        )
+        ''')
+        staging.commit()
+        return staging
+
+    @staticmethod
+    def _get_progress(cursor, key, schema='main'):
+        cursor.execute(f'SELECT value FROM {schema}.import_progress WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _set_progress(cursor, key, value, schema='main'):
+        cursor.execute(f'INSERT OR REPLACE INTO {schema}.import_progress (key, value) VALUES (?, ?)',
+                       (key, value))
+
+    def stage_texts(self, batch_size=STREAM_BATCH_SIZE, commit_every=STREAM_COMMIT_EVERY):
+        """
+        Streamuje ccc_texts.csv do staging DB (B-strom podle doc_id = on-disk index).
+        Pokračuje od posledního commitnutého řádku.
+        """
+        staging = self._open_staging()
+        cursor = staging.cursor()
+
+        if self._get_progress(cursor, 'texts_done'):
+            cursor.execute('SELECT COUNT(*) FROM ccc_texts')
+            print(f"✓ Texts already staged ({cursor.fetchone()[0]:,})")
+            staging.close()
+            return
+
+        done_rows = self._get_progress(cursor, 'texts_rows')
+        if done_rows:
+            print(f"📖 Resuming text staging after row {done_rows:,}...")
+        else:
+            print("📖 Staging texts from CSV...")
+
+        insert_sql = 'INSERT OR REPLACE INTO ccc_texts (doc_id, text) VALUES (?, ?)'
+        batch = []
+        idx = done_rows
+
+        with open(self.csv_path_texts, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+
+            for idx, row in enumerate(reader, 1):
+                if idx <= done_rows:
+                    continue
+
+                batch.append((row['doc_id'], row['text'][:MAX_TEXT_LENGTH]))
+                if len(batch) >= batch_size:
+                    cursor.executemany(insert_sql, batch)
+                    batch = []
+
+                if idx % commit_every == 0:
+                    cursor.executemany(insert_sql, batch)
+                    batch = []
+                    self._set_progress(cursor, 'texts_rows', idx)
+                    staging.commit()
+                    print(f"   Staged {idx:,} texts...")
+
+        cursor.executemany(insert_sql, batch)
+        self._set_progress(cursor, 'texts_rows', idx)
+        self._set_progress(cursor, 'texts_done', 1)
+        staging.commit()
+        staging.close()
+
+        print(f"✓ Staged {idx:,} texts")
+
+    def _import_batch(self, cursor, rows, stats):
+        """Vloží dávku metadata řádků (executemany) + jejich texty do text store"""
+        doc_ids = list({row['doc_id'] for row in rows})
+        placeholders = ','.join('?' * len(doc_ids))
+
+        cursor.execute(f'SELECT ecli FROM court_decisions WHERE ecli IN ({placeholders})', doc_ids)
+        existing = {row[0] for row in cursor.fetchall()}
+
+        cursor.execute(f'SELECT doc_id, text FROM staging.ccc_texts WHERE doc_id IN ({placeholders})', doc_ids)
+        texts = {doc_id: text or None for doc_id, text in cursor.fetchall()}
+
+        records = []
+        for row in rows:
+            if row['doc_id'] in existing:
+                stats['skipped'] += 1
+                continue
+            existing.add(row['doc_id'])  # Duplicate ECLI within the dump
+            records.append(self.build_record(row, texts.get(row['doc_id'])))
+
+        if not records:
+            return
+
+        insert_sql = f'''
+            INSERT INTO court_decisions ({', '.join(INSERT_COLUMNS)})
+            VALUES ({', '.join('?' * len(INSERT_COLUMNS))})
+        '''
+
+        # Only SELECTs ran so far: without an open transaction the savepoint would
+        # become the outermost one and RELEASE would commit the rows before their
+        # texts and the progress marker. conn.commit() commits all of it together.
+        if not cursor.connection.in_transaction:
+            cursor.execute('BEGIN')
+        cursor.execute('SAVEPOINT ccc_batch')
+        try:
+            cursor.executemany(insert_sql, [[r[col] for col in INSERT_COLUMNS] for r in records])
+            cursor.execute('RELEASE SAVEPOINT ccc_batch')
+        except sqlite3.IntegrityError:
+            # Row by row, so one bad row does not drop the whole batch
+            cursor.execute('ROLLBACK TO SAVEPOINT ccc_batch')
+            cursor.execute('RELEASE SAVEPOINT ccc_batch')
+
+            inserted = []
+            for record in records:
+                try:
+                    cursor.execute(insert_sql, [record[col] for col in INSERT_COLUMNS])
+                    inserted.append(record)
+                except sqlite3.IntegrityError as e:
+                    stats['errors'] += 1
+                    if stats['errors'] < 10:  # Only print first 10 errors
+                        print(f"   ✗ Error on {record['ecli']}: {e}")
+            records = inserted
+
+        if not records:
+            return
+        stats['imported'] += len(records)
+
+        eclis = [record['ecli'] for record in records]
+        cursor.execute(f"SELECT id, ecli FROM court_decisions WHERE ecli IN ({','.join('?' * len(eclis))})",
+                       eclis)
+        get_text_store(self.db_path).store_full_texts(
+            cursor, 'court_decision',
+            [(row_id, texts.get(ecli)) for row_id, ecli in cursor.fetchall()])
+
+    def import_decisions_streaming(self, batch_size=STREAM_BATCH_SIZE,
+                                   commit_every=STREAM_COMMIT_EVERY, keep_staging=False):
+        """
+        Import s omezenou pamětí: staging textů na disk + dávkový join
+        s metadata CSV. Přerušený import stačí spustit znovu.
+        """
+        print("🚀 Starting Constitutional Court import (streaming)")
+        print("=" * 60)
+
+        self.init_database()
+        self.stage_texts(batch_size=batch_size, commit_every=commit_every)
+
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute('ATTACH DATABASE ? AS staging', (self.staging_path,))
+        cursor = conn.cursor()
+
+        # Progress is committed in the same transaction as the rows it covers
+        done_rows = self._get_progress(cursor, 'metadata_rows', schema='staging')
+        if done_rows:
+            print(f"\n📊 Importing decisions (resuming after row {done_rows:,})...")
+        else:
+            print("\n📊 Importing decisions...")
+
+        stats = {'imported': 0, 'skipped': 0, 'errors': 0}
+        batch = []
+        idx = done_rows
+
+        with open(self.csv_path_metadata, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+
+            for idx, row in enumerate(reader, 1):
+                if idx <= done_rows:
+                    continue
+
+                batch.append(row)
+                if len(batch) >= batch_size or idx % commit_every == 0:
+                    self._import_batch(cursor, batch, stats)
+                    batch = []
+
+                if idx % commit_every == 0:
+                    self._set_progress(cursor, 'metadata_rows', idx, schema='staging')
+                    conn.commit()
+                    print(f"   Processed {idx:,} - Imported: {stats['imported']:,}, Skipped: {stats['skipped']:,}")
+
+        if batch:
+            self._import_batch(cursor, batch, stats)
+        self._set_progress(cursor, 'metadata_rows', idx, schema='staging')
+        conn.commit()
+        conn.execute('DETACH DATABASE staging')
+        conn.close()
+
+        if not keep_staging:
+            os.remove(self.staging_path)
+
+        print("\n" + "=" * 60)
+        print(f"🎉 IMPORT COMPLETE!")
+        print(f"   Processed: {idx:,} metadata rows")
+        print(f"   Imported: {stats['imported']:,}")
+        print(f"   Skipped (duplicates): {stats['skipped']:,}")
+        print(f"   Errors: {stats['errors']:,}")
+        print(f"   Database: {self.db_path}")
+
+        return stats
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Import Czech Constitutional Court dataset (Zenodo 2024)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Streaming import (bounded memory, resumable - just run it again)
+  python3 almquist_import_constitutional_court.py --streaming
+
+  # Start a streaming import from scratch (drops staged texts and progress)
+  python3 almquist_import_constitutional_court.py --streaming --restart
+
+  # Original in-memory import
+  python3 almquist_import_constitutional_court.py
+        """
+    )
+    parser.add_argument('--db', default="/home/puzik/almquist_legal_sources.db")
+    parser.add_argument('--metadata', default="ccc_database/csv/ccc_metadata.csv")
+    parser.add_argument('--texts', default="ccc_database/csv/ccc_texts.csv")
+    parser.add_argument('--streaming', action='store_true',
+                        help='Stage texts on disk and join in batches (bounded memory, resumable)')
+    parser.add_argument('--batch-size', type=int, default=STREAM_BATCH_SIZE,
+                        help='Rows per executemany batch (max 999)')
+    parser.add_argument('--commit-every', type=int, default=STREAM_COMMIT_EVERY,
+                        help='Rows per transaction / progress checkpoint')
+    parser.add_argument('--restart', action='store_true', help='Discard staged texts and progress')
+    parser.add_argument('--keep-staging', action='store_true', help='Keep the staging DB after import')
+
+    args = parser.parse_args()
+
+    importer = ConstitutionalCourtImporter(args.db)
+    importer.csv_path_metadata = args.metadata
+    importer.csv_path_texts = args.texts
+
+    if args.streaming:
+        if args.restart and os.path.exists(importer.staging_path):
+            os.remove(importer.staging_path)
+        importer.import_decisions_streaming(batch_size=min(args.batch_size, 999),
+                                            commit_every=args.commit_every,
+                                            keep_staging=args.keep_staging)
+    else:
+        importer.import_decisions()
+
+
 if __name__ == "__main__":
-    importer = ConstitutionalCourtImporter()
-    importer.import_decisions()
+    main()
@@ -6,7 +6,6 @@ Includes resource monitoring (CPU, GPU, Disk, Memory)
 """
 
 import requests
-import sqlite3
 import time
 import json
 from datetime import datetime, timedelta
@@ -14,6 +13,8 @@ import sys
 import os
 sys.path.append(os.path.dirname(__file__))
 from almquist_resource_monitor import ResourceMonitor
+from almquist_content_hash import compute_content_hash, ensure_content_hash_columns
+from almquist_legal_db_writer import get_writer
 
 
 class JusticeAPICrawler:
@@ -33,6 +34,8 @@ class JusticeAPICrawler:
             mem_limit=85,
             gpu_limit=80
         )
+        ensure_content_hash_columns(self.db_path)
+        self.writer = get_writer(self.db_path)
 
     def get_available_years(self):
         """Get all available years from API"""
@@ -89,10 +92,7 @@ class JusticeAPICrawler:
             return None
 
     def save_decision(self, decision_data, full_text=None):
-        """Save decision to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
+        """Queue decision for the shared DB writer (upsert by ECLI)"""
         # Parse court level from court name
         court_name = decision_data.get('soud', '')
         if 'Vrchní' in court_name:
@@ -119,69 +119,29 @@ class JusticeAPICrawler:
         else:
             decision_type = 'usneseni'
 
-        # Check if already exists
+        full_text = full_text or ''
         ecli = decision_data.get('ecli')
-        cursor.execute('SELECT id FROM court_decisions WHERE ecli = ?', (ecli,))
-        existing = cursor.fetchone()
-
-        if existing:
-            # Update
-            cursor.execute('''
-            UPDATE court_decisions SET
-                case_number = ?,
-                court_level = ?,
-                court_name = ?,
-                decision_type = ?,
-                decision_date = ?,
-                ecli = ?,
-                keywords = ?,
-                affected_laws = ?,
-                summary = ?,
-                full_text = ?,
-                source_url = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-            ''', (
-                case_number,
-                court_level,
-                court_name,
-                decision_type,
-                decision_data.get('datumVydani'),
-                ecli,
-                json.dumps(decision_data.get('klicovaSlova', []), ensure_ascii=False),
-                json.dumps(decision_data.get('zminenaUstanoveni', []), ensure_ascii=False),
-                decision_data.get('predmetRizeni', ''),
-                full_text or '',
-                decision_data.get('odkaz', ''),
-                existing[0]
-            ))
-            decision_id = existing[0]
-        else:
-            # Insert
-            cursor.execute('''
-            INSERT INTO court_decisions (
-                case_number, court_level, court_name,
-                decision_type, decision_date, ecli,
-                keywords, affected_laws, summary, full_text, source_url
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                case_number,
-                court_level,
-                court_name,
-                decision_type,
-                decision_data.get('datumVydani'),
-                ecli,
-                json.dumps(decision_data.get('klicovaSlova', []), ensure_ascii=False),
-                json.dumps(decision_data.get('zminenaUstanoveni', []), ensure_ascii=False),
-                decision_data.get('predmetRizeni', ''),
-                full_text or '',
-                decision_data.get('odkaz', '')
-            ))
-            decision_id = cursor.lastrowid
-
-        conn.commit()
-        conn.close()
-        return decision_id
+
+        values = {
+            'case_number': case_number,
+            'court_level': court_level,
+            'court_name': court_name,
+            'decision_type': decision_type,
+            'decision_date': decision_data.get('datumVydani'),
+            'ecli': ecli,
+            'keywords': json.dumps(decision_data.get('klicovaSlova', []), ensure_ascii=False),
+            'affected_laws': json.dumps(decision_data.get('zminenaUstanoveni', []), ensure_ascii=False),
+            'summary': decision_data.get('predmetRizeni', ''),
+            'full_text': full_text,
+            'content_hash': compute_content_hash(full_text),
+            'source_url': decision_data.get('odkaz', '')
+        }
+
+        return self.writer.upsert(
+            'court_decisions', values,
+            match=[{'ecli': ecli}],
+            update_columns=tuple(values)
+        )
 
     def crawl_year(self, year, max_decisions=None):
         """Crawl all decisions for a specific year"""
@@ -237,7 +197,7 @@ class JusticeAPICrawler:
                     for item in items:
                         # Save decision (metadata only for now, full text optional)
                         try:
-                            decision_id = self.save_decision(item)
+                            self.save_decision(item)
                             saved_count += 1
                             decisions_count += 1
 
@@ -292,7 +252,7 @@ class JusticeAPICrawler:
 
                 for item in items:
                     try:
-                        decision_id = self.save_decision(item)
+                        self.save_decision(item)
                         saved_count += 1
                         decisions_count += 1
                     except Exception as e:
@@ -342,6 +302,7 @@ def main():
         year_crawled, year_saved = crawler.crawl_year(year, max_decisions=None)
         total_crawled += year_crawled
         total_saved += year_saved
+        crawler.writer.flush()
 
         print(f"\n✓ Year {year} complete: {year_crawled} crawled, {year_saved} saved")
         print(f"✓ Total progress: {total_crawled:,} crawled, {total_saved:,} saved")
@@ -353,6 +314,7 @@ def main():
     print(f"{'='*70}")
     print(f"Total crawled: {total_crawled:,}")
     print(f"Total saved:   {total_saved:,}")
+    crawler.writer.flush_report()
     print(f"{'='*70}")
 
 
@@ -12,8 +12,6 @@ Changes from original:
 - ✅ IP leak protection
 """
 
-import psycopg2
-import psycopg2.extras
 import sys
 from pathlib import Path
 from bs4 import BeautifulSoup
@@ -30,6 +28,7 @@ sys.path.insert(0, str(Path.home() / "almquist-pro" / "backend"))
 from services.anonymous_crawler_service import AnonymousCrawler
 sys.path.append(os.path.dirname(__file__))
 from almquist_resource_monitor import ResourceMonitor
+from almquist_db_pool import get_pool, unit_of_work
 
 class CourtDecisionsCrawler(AnonymousCrawler):
     """🔐 ANONYMOUS Crawler for Czech court decisions"""
@@ -44,6 +43,7 @@ class CourtDecisionsCrawler(AnonymousCrawler):
         )
 
         self.db_url = db_url
+        self.pool = get_pool(db_url)
         self.pause_between_requests = 5  # 5 seconds between requests (reduced from 30)
         self.resource_monitor = ResourceMonitor(
             cpu_limit=80,
@@ -204,11 +204,8 @@ class CourtDecisionsCrawler(AnonymousCrawler):
             print(f"      ✗ Error crawling detail: {e}")
             return False
 
-    def save_decision(self, decision_info):
+    def save_decision(self, decision_info, cursor=None):
         """Save decision to database"""
-        conn = psycopg2.connect(self.db_url)
-        cursor = conn.cursor()
-
         # Parse date
         decision_date = None
         if 'decision_date_raw' in decision_info:
@@ -226,64 +223,63 @@ class CourtDecisionsCrawler(AnonymousCrawler):
         ecli = decision_info.get('ecli')
         case_number = decision_info.get('case_number')
 
-        cursor.execute('''
-        SELECT id FROM court_decisions
-        WHERE ecli = %s OR case_number = %s
-        ''', (ecli, case_number))
-
-        existing = cursor.fetchone()
-
-        if existing:
-            # Update existing
+        with unit_of_work(self.pool, cursor) as cursor:
             cursor.execute('''
-            UPDATE court_decisions SET
-                decision_type = %s,
-                decision_date = %s,
-                summary = %s,
-                full_text = %s,
-                keywords = %s,
-                affected_laws = %s,
-                source_url = %s,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-            ''', (
-                decision_info.get('decision_type'),
-                decision_date,
-                decision_info.get('summary', ''),
-                decision_info.get('full_text', ''),
-                decision_info.get('keywords', '[]'),
-                decision_info.get('affected_laws', '[]'),
-                decision_info['url'],
-                existing[0]
-            ))
-            decision_id = existing[0]
-        else:
-            # Insert new
-            cursor.execute('''
-            INSERT INTO court_decisions (
-                case_number, court_level, court_name,
-                decision_type, decision_date, ecli,
-                legal_area, affected_laws, keywords,
-                summary, full_text, source_url
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                decision_info.get('case_number', 'Unknown'),
-                'supreme',
-                'Nejvyšší soud',
-                decision_info.get('decision_type'),
-                decision_date,
-                decision_info.get('ecli'),
-                'obcanske',  # Default, could be refined
-                decision_info.get('affected_laws', '[]'),
-                decision_info.get('keywords', '[]'),
-                decision_info.get('summary', ''),
-                decision_info.get('full_text', ''),
-                decision_info['url']
-            ))
-            decision_id = cursor.lastrowid
-
-        conn.commit()
-        conn.close()
+            SELECT id FROM court_decisions
+            WHERE ecli = %s OR case_number = %s
+            ''', (ecli, case_number))
+
+            existing = cursor.fetchone()
+
+            if existing:
+                # Update existing
+                cursor.execute('''
+                UPDATE court_decisions SET
+                    decision_type = %s,
+                    decision_date = %s,
+                    summary = %s,
+                    full_text = %s,
+                    keywords = %s,
+                    affected_laws = %s,
+                    source_url = %s,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+                ''', (
+                    decision_info.get('decision_type'),
+                    decision_date,
+                    decision_info.get('summary', ''),
+                    decision_info.get('full_text', ''),
+                    decision_info.get('keywords', '[]'),
+                    decision_info.get('affected_laws', '[]'),
+                    decision_info['url'],
+                    existing[0]
+                ))
+                decision_id = existing[0]
+            else:
+                # Insert new
+                cursor.execute('''
+                INSERT INTO court_decisions (
+                    case_number, court_level, court_name,
+                    decision_type, decision_date, ecli,
+                    legal_area, affected_laws, keywords,
+                    summary, full_text, source_url
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+                ''', (
+                    decision_info.get('case_number', 'Unknown'),
+                    'supreme',
+                    'Nejvyšší soud',
+                    decision_info.get('decision_type'),
+                    decision_date,
+                    decision_info.get('ecli'),
+                    'obcanske',  # Default, could be refined
+                    decision_info.get('affected_laws', '[]'),
+                    decision_info.get('keywords', '[]'),
+                    decision_info.get('summary', ''),
+                    decision_info.get('full_text', ''),
+                    decision_info['url']
+                ))
+                decision_id = cursor.fetchone()[0]
 
         return decision_id
 
@@ -355,63 +351,54 @@ class CourtDecisionsCrawler(AnonymousCrawler):
         print(f"Failed:  {failed_count}/{len(decisions)}")
         print("=" * 70)
 
-    def log_crawl(self, source, source_type, status, items_found, items_added, error_message=None):
+    def log_crawl(self, source, source_type, status, items_found, items_added, error_message=None, cursor=None):
         """Log crawl to history"""
-        conn = psycopg2.connect(self.db_url)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-        INSERT INTO crawl_history (source, source_type, status, items_found, items_added, error_message)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        ''', (source, source_type, status, items_found, items_added, error_message))
-
-        conn.commit()
-        conn.close()
+        with unit_of_work(self.pool, cursor) as cursor:
+            cursor.execute('''
+            INSERT INTO crawl_history (source, source_type, status, items_found, items_added, error_message)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ''', (source, source_type, status, items_found, items_added, error_message))
 
     def show_stats(self):
         """Show database statistics"""
-        conn = psycopg2.connect(self.db_url)
-        cursor = conn.cursor()
-
-        print("\n📊 Court Decisions Database Statistics:")
-
-        # Total decisions
-        cursor.execute('SELECT COUNT(*) FROM court_decisions')
-        total = cursor.fetchone()[0]
-        print(f"\n  Total decisions: {total}")
-
-        # By court level
-        cursor.execute('''
-        SELECT court_level, COUNT(*)
-        FROM court_decisions
-        GROUP BY court_level
-        ORDER BY COUNT(*) DESC
-        ''')
-        courts = cursor.fetchall()
-        if courts:
-            print("\n  By court level:")
-            for court, count in courts:
-                print(f"    {court}: {count}")
-
-        # By decision type
-        cursor.execute('''
-        SELECT decision_type, COUNT(*)
-        FROM court_decisions
-        GROUP BY decision_type
-        ORDER BY COUNT(*) DESC
-        ''')
-        types = cursor.fetchall()
-        if types:
-            print("\n  By decision type:")
-            for dtype, count in types:
-                print(f"    {dtype}: {count}")
-
-        # In RAG
-        cursor.execute('SELECT COUNT(*) FROM court_decisions WHERE added_to_rag = 1')
-        in_rag = cursor.fetchone()[0]
-        print(f"\n  Added to RAG: {in_rag}/{total}")
-
-        conn.close()
+        with self.pool.cursor() as cursor:
+            print("\n📊 Court Decisions Database Statistics:")
+
+            # Total decisions
+            cursor.execute('SELECT COUNT(*) FROM court_decisions')
+            total = cursor.fetchone()[0]
+            print(f"\n  Total decisions: {total}")
+
+            # By court level
+            cursor.execute('''
+            SELECT court_level, COUNT(*)
+            FROM court_decisions
+            GROUP BY court_level
+            ORDER BY COUNT(*) DESC
+            ''')
+            courts = cursor.fetchall()
+            if courts:
+                print("\n  By court level:")
+                for court, count in courts:
+                    print(f"    {court}: {count}")
+
+            # By decision type
+            cursor.execute('''
+            SELECT decision_type, COUNT(*)
+            FROM court_decisions
+            GROUP BY decision_type
+            ORDER BY COUNT(*) DESC
+            ''')
+            types = cursor.fetchall()
+            if types:
+                print("\n  By decision type:")
+                for dtype, count in types:
+                    print(f"    {dtype}: {count}")
+
+            # In RAG
+            cursor.execute('SELECT COUNT(*) FROM court_decisions WHERE added_to_rag = 1')
+            in_rag = cursor.fetchone()[0]
+            print(f"\n  Added to RAG: {in_rag}/{total}")
 
 
 def main():
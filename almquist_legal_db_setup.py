@@ -5,9 +5,15 @@ Creates SQLite database for legal documents (laws & court decisions)
 """
 
 import sqlite3
+import sys
+import os
 from pathlib import Path
 from datetime import datetime
 
+sys.path.append(os.path.dirname(__file__))
+from almquist_legal_fts import init_fts
+from almquist_legal_text_store import init_text_tables, DEFAULT_CODEC
+
 class LegalDatabaseSetup:
     """Setup legal sources database"""
 
@@ -33,6 +39,7 @@ class LegalDatabaseSetup:
             law_type TEXT,
             category TEXT,
             full_text TEXT,
+            content_hash TEXT,
             effective_from DATE,
             effective_to DATE,
             last_amendment TEXT,
@@ -46,6 +53,7 @@ class LegalDatabaseSetup:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_laws_number ON laws(law_number)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_laws_category ON laws(category)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_laws_rag ON laws(added_to_rag)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_laws_content_hash ON laws(content_hash)')
         print("   ✓ Laws table created with indexes")
 
         # 2. Court decisions table
@@ -64,6 +72,7 @@ class LegalDatabaseSetup:
             keywords TEXT,
             summary TEXT,
             full_text TEXT,
+            content_hash TEXT,
             source_url TEXT,
             added_to_rag INTEGER DEFAULT 0,
             rag_chunk_ids TEXT,
@@ -76,6 +85,7 @@ class LegalDatabaseSetup:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_decisions_ecli ON court_decisions(ecli)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_decisions_area ON court_decisions(legal_area)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_decisions_rag ON court_decisions(added_to_rag)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_court_decisions_content_hash ON court_decisions(content_hash)')
         print("   ✓ Court decisions table created with indexes")
 
         # 3. Crawl history table
@@ -133,6 +143,16 @@ class LegalDatabaseSetup:
 
         conn.commit()
 
+        # 6. Full-text index (FTS5, kept in sync by triggers)
+        print("\n🔎 Creating full-text indexes 'laws_fts', 'court_decisions_fts'...")
+        init_fts(conn)
+        print("   ✓ FTS5 indexes created (unicode61, diacritics removed)")
+
+        # 7. Compressed text store (full_text lives outside the metadata tables)
+        print("\n🗜️  Creating 'document_texts' table...")
+        init_text_tables(conn)
+        print(f"   ✓ Text store created ({DEFAULT_CODEC}, dictionary trained on first --migrate)")
+
         # Insert default sources
         print("\n🌐 Inserting default sources...")
         default_sources = [
@@ -164,6 +184,8 @@ class LegalDatabaseSetup:
         print("  • crawl_history")
         print("  • content_changes")
         print("  • sources_config")
+        print("  • laws_fts, court_decisions_fts (full-text)")
+        print("  • document_texts, document_texts_fts (compressed full_text)")
         print("\nReady for legal document crawling!")
         print("=" * 70)
 
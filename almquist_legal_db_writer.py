@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Legal DB Writer
+Sdílená perzistence pro legal crawlery nad SQLite
+
+- jeden writer thread (a jedno spojení) na databázi v procesu
+- WAL mód, takže čtenáři a crawlery v jiných procesech nečekají na zápis
+- upsert podle case_number / ECLI (UPDATE, jinak INSERT) ve stejné transakci
+- commit po dávkách (každých N řádků nebo T ms), ne po každém řádku
+- full_text laws / court_decisions jde do komprimovaného document_texts
+  (almquist_legal_text_store) ve stejné transakci jako metadata
+
+Crawlery jen vloží záznam do fronty (save_decision vrací Future),
+na konci běhu zavolají flush() nebo flush_report() (flush + souhrn 💾 DB).
+Dávka, která nedostane zámek (BEGIN IMMEDIATE timeout), se zkusí znovu;
+pokud writer thread skončí, flush() vyhodí RuntimeError místo čekání.
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_legal_text_store import TABLE_DOCUMENT_TYPES, get_text_store, init_text_tables
+
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL_MS = 500
+BATCH_RETRIES = 3  # Attempts after a lock timeout before the batch fails
+BATCH_RETRY_DELAY = 5.0  # Seconds, grows with each attempt
+FLUSH_POLL_INTERVAL = 1.0  # flush() checks the writer thread this often
+
+_FLUSH = object()
+_STOP = object()
+
+
+def enable_wal(conn):
+    """WAL + synchronous=NORMAL (fsync jen při checkpointu)"""
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+
+
+class LegalDBWriter:
+    """
+    Fronta zápisů zpracovávaná jedním vláknem.
+    Každá operace vrací Future s výsledkem (row_id, status), kde status je
+    'inserted', 'updated' nebo 'exists'. Výsledek je k dispozici po commitu dávky.
+    """
+
+    def __init__(self, db_path, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval_ms=DEFAULT_FLUSH_INTERVAL_MS):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+
+        self.stats = {'inserted': 0, 'updated': 0, 'exists': 0, 'failed': 0, 'commits': 0}
+        self.text_store = get_text_store(db_path)
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="legal-db-writer", daemon=True)
+        self._closed = False
+        self._error = None  # Exception that stopped the writer thread
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Public API (any thread)
+    # ------------------------------------------------------------------
+
+    def upsert(self, table, values, match, update_columns=None):
+        """
+        Upsert jednoho řádku
+        match: list of dicts - řádek existuje, pokud odpovídá kterémukoli dictu
+               (alternativy s hodnotou None se přeskočí, např. chybějící ECLI)
+        update_columns: sloupce přepsané u existujícího řádku;
+               None = existující řádek se nemění (insert jen pokud chybí)
+        """
+        return self._submit(('upsert', table, values, match, update_columns))
+
+    def insert(self, table, values):
+        """Prostý INSERT (např. crawl_history)"""
+        return self._submit(('insert', table, values, None, None))
+
+    def flush(self, timeout=None):
+        """
+        Počká, až je vše z fronty zapsané a commitnuté
+        Returns: kopie stats. RuntimeError pokud writer thread neběží.
+        """
+        future = self._submit(_FLUSH)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            wait = FLUSH_POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, max(0.0, deadline - time.monotonic()))
+            try:
+                return future.result(timeout=wait)
+            except FutureTimeoutError:
+                if not self._thread.is_alive() and not future.done():
+                    raise RuntimeError("LegalDBWriter thread has stopped") from self._error
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+
+    def flush_report(self, futures=None, timeout=None):
+        """
+        flush() + souhrn "💾 DB: ..." na konci běhu crawleru
+        futures: Future z upsert/insert tohoto běhu - počty se spočítají z jejich
+                 výsledků (writer je sdílený, stats zahrnují i jiné crawlery)
+        Returns: {'inserted', 'updated', 'exists', 'failed'}
+        """
+        stats = self.flush(timeout=timeout)
+        if futures is not None:
+            stats = count_results(futures)
+
+        print(f"💾 DB: {stats['inserted']:,} inserted, {stats['updated']:,} updated, "
+              f"{stats['exists']:,} already existed, {stats['failed']:,} failed")
+        return stats
+
+    def close(self):
+        """Flush a ukončení writer threadu"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((_STOP, None))
+        self._thread.join()
+
+    def _submit(self, operation):
+        if self._closed:
+            raise RuntimeError("LegalDBWriter is closed")
+        if not self._thread.is_alive():
+            raise RuntimeError("LegalDBWriter thread has stopped") from self._error
+        future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        enable_wal(conn)
+        init_text_tables(conn)
+        return conn
+
+    def _run(self):
+        try:
+            self._write_loop()
+        except Exception as e:
+            # Nothing else would complete the futures - fail them all
+            self._error = e
+            print(f"   ✗ DB writer stopped: {e}")
+            while True:
+                try:
+                    _, future = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if future is not None and not future.done():
+                    future.set_exception(e)
+
+    def _write_loop(self):
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        # Operations are buffered in memory; the write lock is taken only
+        # for the short time the whole batch is written and committed
+        pending = []
+        batch_started = None
+
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, batch_started + self.flush_interval - time.monotonic())
+
+            try:
+                operation, future = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                operation, future = None, None
+
+            if operation is not None and operation is not _FLUSH and operation is not _STOP:
+                if not pending:
+                    batch_started = time.monotonic()
+                pending.append((operation, future))
+
+            if pending and (len(pending) >= self.batch_size
+                            or time.monotonic() - batch_started >= self.flush_interval
+                            or operation is _FLUSH or operation is _STOP):
+                try:
+                    self._write_batch(cursor, pending)
+                except Exception as e:
+                    for _, pending_future in pending:
+                        if not pending_future.done():
+                            pending_future.set_exception(e)
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+                    raise
+                pending = []
+
+            if operation is _FLUSH:
+                future.set_result(dict(self.stats))
+            elif operation is _STOP:
+                break
+
+        conn.close()
+
+    def _write_batch(self, cursor, pending):
+        """
+        Jedna transakce pro celou dávku; chybný řádek neshodí ostatní.
+        Zamčená DB (timeout BEGIN IMMEDIATE / commitu) dávku zopakuje,
+        řádky se zahodí až po BATCH_RETRIES pokusech.
+        """
+        for attempt in range(BATCH_RETRIES + 1):
+            try:
+                self._try_batch(cursor, [(operation, future) for operation, future in pending
+                                         if not future.done()])
+                return
+            except sqlite3.OperationalError as e:
+                if cursor.connection.in_transaction:
+                    cursor.execute('ROLLBACK')
+                error = e
+                if attempt < BATCH_RETRIES and ('locked' in str(e) or 'busy' in str(e)):
+                    delay = BATCH_RETRY_DELAY * (attempt + 1)
+                    print(f"   ⚠️  DB batch write failed ({e}), retrying in {delay:.0f}s...")
+                    time.sleep(delay)
+                    continue
+                break
+            except Exception as e:
+                if cursor.connection.in_transaction:
+                    cursor.execute('ROLLBACK')
+                error = e
+                break
+
+        failed = [future for _, future in pending if not future.done()]
+        self.stats['failed'] += len(failed)
+        print(f"   ✗ DB batch write failed ({len(failed)} rows): {error}")
+        for future in failed:
+            future.set_exception(error)
+
+    def _try_batch(self, cursor, pending):
+        results = []
+
+        cursor.execute('BEGIN IMMEDIATE')
+
+        for operation, future in pending:
+            cursor.execute('SAVEPOINT op')
+            try:
+                results.append((future, self._apply(cursor, operation)))
+                cursor.execute('RELEASE SAVEPOINT op')
+            except sqlite3.OperationalError:
+                raise  # Lock/IO problem - the whole batch fails
+            except Exception as e:
+                cursor.execute('ROLLBACK TO SAVEPOINT op')
+                cursor.execute('RELEASE SAVEPOINT op')
+                self.stats['failed'] += 1
+                print(f"   ✗ DB write failed ({operation[1]}): {e}")
+                future.set_exception(e)
+
+        cursor.execute('COMMIT')
+
+        self.stats['commits'] += 1
+        for future, result in results:
+            self.stats[result[1]] += 1
+            future.set_result(result)
+
+    def _apply(self, cursor, operation):
+        kind, table, values, match, update_columns = operation
+
+        # Text columns are stored compressed, outside the metadata row
+        document_type = TABLE_DOCUMENT_TYPES.get(table)
+        text = None
+        if document_type and 'full_text' in values:
+            values = dict(values)
+            text = values.pop('full_text')
+        else:
+            document_type = None
+
+        if kind == 'upsert':
+            existing_id = self._find_existing(cursor, table, match)
+
+            if existing_id is not None:
+                if update_columns is None:
+                    return existing_id, 'exists'
+
+                columns = [col for col in update_columns if col in values]
+                assignments = ''.join(f"{col} = ?, " for col in columns)
+                cursor.execute(
+                    f"UPDATE {table} SET {assignments}updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    [values[col] for col in columns] + [existing_id]
+                )
+                if document_type and 'full_text' in update_columns:
+                    self.text_store.store_full_text(cursor, document_type, existing_id, text)
+                return existing_id, 'updated'
+
+        columns = list(values)
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [values[col] for col in columns]
+        )
+        row_id = cursor.lastrowid
+
+        if document_type and text is not None:
+            self.text_store.store_full_text(cursor, document_type, row_id, text)
+        return row_id, 'inserted'
+
+    def _find_existing(self, cursor, table, match):
+        """id prvního řádku odpovídajícího některé alternativě v match"""
+        for alternative in match:
+            if any(value is None for value in alternative.values()):
+                continue
+
+            conditions = ' AND '.join(f"{col} = ?" for col in alternative)
+            cursor.execute(f"SELECT id FROM {table} WHERE {conditions} LIMIT 1",
+                           list(alternative.values()))
+            row = cursor.fetchone()
+            if row:
+                return row[0]
+
+        return None
+
+
+def count_results(futures):
+    """Počty 'inserted' / 'updated' / 'exists' / 'failed' z dokončených Future writeru"""
+    counts = {'inserted': 0, 'updated': 0, 'exists': 0, 'failed': 0}
+    for future in futures:
+        if future is None:
+            continue
+        if future.exception() is not None:
+            counts['failed'] += 1
+        else:
+            counts[future.result()[1]] += 1
+    return counts
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path, **kwargs):
+    """Sdílený writer pro danou databázi (jeden na proces)"""
+    with _writers_lock:
+        writer = _writers.get(db_path)
+        if writer is None or writer._closed:
+            writer = LegalDBWriter(db_path, **kwargs)
+            _writers[db_path] = writer
+        return writer
+
+
+@atexit.register
+def close_all_writers():
+    """Na konci procesu zapíše vše, co zůstalo ve frontách"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+
+    for writer in writers:
+        writer.close()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Legal Full-Text Search
+FTS5 index nad laws a court_decisions v legal SQLite DB
+
+- external-content FTS5 tabulky (text se neduplikuje, jen index)
+- tokenizer unicode61 s remove_diacritics 2: "náhrada škody" == "nahrada skody"
+  (bez stemmingu - pro tvary slov prefixový dotaz, např. "nahrad* skod*")
+- triggery drží index v synchronu s inserty/updaty crawlerů
+- přesné fráze a citace (spisové značky, ECLI, "§ 2910") v milisekundách,
+  bez embeddingů
+- komprimované texty (almquist_legal_text_store) má vlastní contentless
+  index document_texts_fts; search() dotazuje oba a výsledky slučuje
+  reciprocal rank fusion (bm25 dvou různých indexů nejsou srovnatelné)
+
+Usage:
+    python3 almquist_legal_fts.py --rebuild
+    python3 almquist_legal_fts.py "náhrada škody"
+    python3 almquist_legal_fts.py --phrase "25 Cdo 1234/2020" --type court_decision
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_legal_text_store import get_text_store, init_text_tables
+
+
+FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+RRF_K = 60  # reciprocal rank fusion: score = sum 1 / (RRF_K + pozice v indexu)
+
+# document_type -> (table, indexed columns, label column)
+FTS_TABLES = {
+    'law': ('laws', ('law_number', 'law_name', 'full_text'), 'law_number'),
+    'court_decision': ('court_decisions', ('case_number', 'ecli', 'summary', 'full_text'), 'case_number'),
+}
+
+
+def _fts_name(table):
+    return f"{table}_fts"
+
+
+def init_fts(conn):
+    """
+    Vytvoří FTS5 tabulky + triggery (idempotentní).
+    Nově vytvořený index se hned naplní z existujících řádků.
+    Returns: list of newly indexed tables
+    """
+    cursor = conn.cursor()
+    created = []
+
+    for table, columns, _ in FTS_TABLES.values():
+        fts = _fts_name(table)
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        if not cursor.fetchone():
+            continue  # Table not created yet
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,))
+        exists = cursor.fetchone() is not None
+
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f"new.{col}" for col in columns)
+        old_values = ', '.join(f"old.{col}" for col in columns)
+
+        cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {column_list},
+            content='{table}',
+            content_rowid='id',
+            tokenize='{FTS_TOKENIZE}'
+        )
+        ''')
+
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+        ''')
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END
+        ''')
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+        ''')
+
+        if not exists:
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+            created.append(table)
+
+    conn.commit()
+    return created
+
+
+def phrase_query(text):
+    """Escapuje text jako jednu FTS5 frázi ("..." s zdvojenými uvozovkami)"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+_QUERY_TERM_RE = re.compile(r'\w+\*?')
+_FTS_OPERATORS = {'AND', 'OR', 'NOT', 'NEAR'}
+
+
+def _fold(text):
+    """Lowercase bez diakritiky se zachováním délky (pozice sedí s originálem)"""
+    return ''.join(unicodedata.normalize('NFD', ch)[0] for ch in text.lower())
+
+
+def text_snippet(text, query, tokens=16):
+    """
+    Snippet jako FTS5 snippet() pro texty z contentless indexu:
+    okno kolem prvního výskytu některého termu dotazu, term v [ ]
+    """
+    terms = [t for t in _QUERY_TERM_RE.findall(query) if t not in _FTS_OPERATORS]
+    if not text or not terms:
+        return ''
+
+    folded = _fold(text)
+    patterns = [
+        re.escape(_fold(t.rstrip('*'))) + (r'\w*' if t.endswith('*') else r'\b')
+        for t in terms
+    ]
+    match = re.search(r'\b(?:' + '|'.join(patterns) + ')', folded)
+    if not match:
+        return ' '.join(text.split()[:tokens]) + ' … '
+
+    start, end = match.span()
+    before = text[:start].split()[-(tokens // 2):]
+    after = text[end:].split()[:tokens // 2]
+    return ' … ' + ' '.join(before + [f"[{text[start:end]}]"]) + ' ' + ' '.join(after) + ' … '
+
+
+class LegalFullTextSearch:
+    """Fulltextové vyhledávání v zákonech a rozhodnutích (FTS5, BM25)"""
+
+    def __init__(self, legal_db="/home/puzik/almquist_legal_sources.db"):
+        self.legal_db = legal_db
+        self._initialized = False
+
+    def ensure_index(self):
+        """Vytvoří index, pokud v DB ještě není (první volání může trvat)"""
+        if self._initialized:
+            return
+
+        conn = sqlite3.connect(self.legal_db)
+        created = init_fts(conn)
+        init_text_tables(conn)
+        conn.close()
+
+        for table in created:
+            print(f"   ✓ Full-text index built for {table}")
+        self._initialized = True
+
+    def rebuild(self):
+        """Přestaví celé FTS indexy z tabulek"""
+        self.ensure_index()
+
+        conn = sqlite3.connect(self.legal_db)
+        for table, _, _ in FTS_TABLES.values():
+            fts = _fts_name(table)
+            conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+            conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
+        conn.commit()
+        conn.close()
+
+        get_text_store(self.legal_db).rebuild_fts()
+
+    def search(self, query, document_type=None, limit=10, phrase=False):
+        """
+        Vyhledá dokumenty podle FTS5 dotazu (AND, OR, NOT, "fráze", prefix*)
+
+        Args:
+            query: FTS5 dotaz, nebo prostý text při phrase=True
+            document_type: 'law', 'court_decision' nebo None (obojí)
+            limit: max výsledků na typ dokumentu
+            phrase: hledat query jako přesnou frázi
+
+        Returns:
+            List of dicts seřazený podle relevance ('score' = reciprocal rank
+            fusion přes FTS indexy, vyšší = lepší)
+        """
+        self.ensure_index()
+
+        match = phrase_query(query) if phrase else query
+        types = [document_type] if document_type else list(FTS_TABLES)
+
+        conn = sqlite3.connect(self.legal_db)
+        cursor = conn.cursor()
+
+        results = []
+        for doc_type in types:
+            table, columns, label = FTS_TABLES[doc_type]
+            fts = _fts_name(table)
+            text_column = columns.index('full_text')
+            hits = {}
+
+            # Metadata + not yet compressed full_text
+            cursor.execute(f'''
+            SELECT d.id, d.{label},
+                   snippet({fts}, {text_column}, '[', ']', ' … ', 16)
+            FROM {fts}
+            JOIN {table} d ON d.id = {fts}.rowid
+            WHERE {fts} MATCH ?
+            ORDER BY bm25({fts})
+            LIMIT ?
+            ''', (match, limit))
+
+            for position, (doc_id, number, snippet) in enumerate(cursor.fetchall(), 1):
+                hits[doc_id] = {
+                    'document_type': doc_type,
+                    'id': doc_id,
+                    'number': number,
+                    'score': 1 / (RRF_K + position),
+                    'snippet': snippet
+                }
+
+            # Compressed texts (join drops entries of replaced/deleted texts)
+            cursor.execute(f'''
+            SELECT d.id, d.{label}
+            FROM document_texts_fts
+            JOIN document_texts t ON t.id = document_texts_fts.rowid
+            JOIN {table} d ON d.id = t.document_id
+            WHERE document_texts_fts MATCH ? AND t.document_type = ?
+            ORDER BY bm25(document_texts_fts)
+            LIMIT ?
+            ''', (match, doc_type, limit))
+
+            for position, (doc_id, number) in enumerate(cursor.fetchall(), 1):
+                hit = hits.setdefault(doc_id, {
+                    'document_type': doc_type,
+                    'id': doc_id,
+                    'number': number,
+                    'score': 0.0,
+                    'snippet': None
+                })
+                hit['score'] += 1 / (RRF_K + position)
+
+            missing = [doc_id for doc_id, hit in hits.items() if not hit['snippet']]
+            if missing:
+                texts = get_text_store(self.legal_db).load_full_texts(cursor, doc_type, missing)
+                for doc_id in missing:
+                    hits[doc_id]['snippet'] = text_snippet(texts.get(doc_id), query)
+
+            results.extend(hits.values())
+
+        conn.close()
+
+        results.sort(key=lambda r: r['score'], reverse=True)
+        return results[:limit]
+
+    def count(self, query, document_type='court_decision', phrase=False):
+        """Počet dokumentů odpovídajících dotazu"""
+        self.ensure_index()
+
+        table = FTS_TABLES[document_type][0]
+        fts = _fts_name(table)
+
+        match = phrase_query(query) if phrase else query
+
+        conn = sqlite3.connect(self.legal_db)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+        SELECT COUNT(*) FROM (
+            SELECT rowid FROM {fts} WHERE {fts} MATCH ?
+            UNION
+            SELECT t.document_id FROM document_texts_fts
+            JOIN document_texts t ON t.id = document_texts_fts.rowid
+            WHERE document_texts_fts MATCH ? AND t.document_type = ?
+        )
+        ''', (match, match, document_type))
+        total = cursor.fetchone()[0]
+        conn.close()
+
+        return total
+
+
+def print_results(results):
+    """Vypíše výsledky search()"""
+    for i, result in enumerate(results, 1):
+        icon = '📜' if result['document_type'] == 'law' else '⚖️ '
+        print(f"\n{i}. {icon} {result['number']} (id {result['id']}, rrf {result['score']:.4f})")
+        print(f"   {result['snippet']}")
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Almquist Legal Full-Text Search (FTS5)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Build / rebuild the index
+  python3 almquist_legal_fts.py --rebuild
+
+  # Keyword query (FTS5 syntax: AND, OR, NOT, prefix*)
+  python3 almquist_legal_fts.py "nahrada skody AND zamestnavatel"
+
+  # Exact citation lookup
+  python3 almquist_legal_fts.py --phrase "25 Cdo 1234/2020" --type court_decision
+        """
+    )
+    parser.add_argument('query', nargs='?', help='FTS5 query')
+    parser.add_argument('--db', default="/home/puzik/almquist_legal_sources.db")
+    parser.add_argument('--type', choices=sorted(FTS_TABLES), help='Document type')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--phrase', action='store_true', help='Search the query as an exact phrase')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild FTS indexes')
+
+    args = parser.parse_args()
+
+    fts = LegalFullTextSearch(args.db)
+
+    if args.rebuild:
+        start = time.time()
+        fts.rebuild()
+        print(f"✓ FTS indexes rebuilt in {time.time() - start:.1f}s")
+
+    if args.query:
+        start = time.perf_counter()
+        results = fts.search(args.query, document_type=args.type, limit=args.limit, phrase=args.phrase)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"🔍 {len(results)} results for '{args.query}' ({elapsed:.1f} ms)")
+        print_results(results)
+    elif not args.rebuild:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,6 @@ Changes from original:
 - ✅ IP leak protection
 """
 
-import psycopg2
-import psycopg2.extras
 import sys
 from pathlib import Path
 from bs4 import BeautifulSoup
@@ -22,11 +20,14 @@ import hashlib
 from datetime import datetime
 import json
 import re
+import os
 
 # Add backend to path
 sys.path.insert(0, str(Path.home() / "almquist-pro" / "backend"))
 
 from services.anonymous_crawler_service import AnonymousCrawler
+sys.path.append(os.path.dirname(__file__))
+from almquist_db_pool import get_pool, unit_of_work
 
 class LegalLawsCrawler(AnonymousCrawler):
     """🔐 ANONYMOUS Crawler for Czech laws"""
@@ -41,6 +42,7 @@ class LegalLawsCrawler(AnonymousCrawler):
         )
 
         self.db_url = db_url
+        self.pool = get_pool(db_url)
 
         # Priority laws to crawl
         self.priority_laws = [
@@ -280,14 +282,14 @@ class LegalLawsCrawler(AnonymousCrawler):
                 'source_url': url
             }
 
-            law_id = self.save_law(law_data)
+            # Save law and its crawl log atomically
+            with self.pool.cursor() as cursor:
+                law_id = self.save_law(law_data, cursor=cursor)
+                self.log_crawl('zakonyprolidi_web', 'law', 'success', 1, 1, cursor=cursor)
 
             print(f"   ✓ Crawled successfully (ID: {law_id})")
             print(f"   ✓ Text length: {len(law_text)} chars")
 
-            # Log crawl
-            self.log_crawl('zakonyprolidi_web', 'law', 'success', 1, 1)
-
             return law_id
 
         except Exception as e:
@@ -301,79 +303,70 @@ class LegalLawsCrawler(AnonymousCrawler):
         # zakonyprolidi.cz doesn't always have structured dates visible
         return None
 
-    def save_law(self, law_data):
+    def save_law(self, law_data, cursor=None):
         """Save law to database"""
-        conn = psycopg2.connect(self.db_url)
-        cursor = conn.cursor()
-
-        # Check if law already exists
-        cursor.execute('SELECT id FROM laws WHERE law_number = %s', (law_data['law_number'],))
-        existing = cursor.fetchone()
-
-        if existing:
-            # Update existing
-            cursor.execute('''
-            UPDATE laws SET
-                law_name = %s,
-                law_type = %s,
-                category = %s,
-                full_text = %s,
-                effective_from = %s,
-                effective_to = %s,
-                last_amendment = %s,
-                source_url = %s,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE law_number = %s
-            ''', (
-                law_data['law_name'],
-                law_data['law_type'],
-                law_data['category'],
-                law_data['full_text'],
-                law_data['effective_from'],
-                law_data['effective_to'],
-                law_data['last_amendment'],
-                law_data['source_url'],
-                law_data['law_number']
-            ))
-            law_id = existing[0]
-        else:
-            # Insert new
-            cursor.execute('''
-            INSERT INTO laws (
-                law_number, law_name, law_type, category,
-                full_text, effective_from, effective_to,
-                last_amendment, source_url
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                law_data['law_number'],
-                law_data['law_name'],
-                law_data['law_type'],
-                law_data['category'],
-                law_data['full_text'],
-                law_data['effective_from'],
-                law_data['effective_to'],
-                law_data['last_amendment'],
-                law_data['source_url']
-            ))
-            law_id = cursor.lastrowid
-
-        conn.commit()
-        conn.close()
+        with unit_of_work(self.pool, cursor) as cursor:
+            # Check if law already exists
+            cursor.execute('SELECT id FROM laws WHERE law_number = %s', (law_data['law_number'],))
+            existing = cursor.fetchone()
+
+            if existing:
+                # Update existing
+                cursor.execute('''
+                UPDATE laws SET
+                    law_name = %s,
+                    law_type = %s,
+                    category = %s,
+                    full_text = %s,
+                    effective_from = %s,
+                    effective_to = %s,
+                    last_amendment = %s,
+                    source_url = %s,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE law_number = %s
+                ''', (
+                    law_data['law_name'],
+                    law_data['law_type'],
+                    law_data['category'],
+                    law_data['full_text'],
+                    law_data['effective_from'],
+                    law_data['effective_to'],
+                    law_data['last_amendment'],
+                    law_data['source_url'],
+                    law_data['law_number']
+                ))
+                law_id = existing[0]
+            else:
+                # Insert new
+                cursor.execute('''
+                INSERT INTO laws (
+                    law_number, law_name, law_type, category,
+                    full_text, effective_from, effective_to,
+                    last_amendment, source_url
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+                ''', (
+                    law_data['law_number'],
+                    law_data['law_name'],
+                    law_data['law_type'],
+                    law_data['category'],
+                    law_data['full_text'],
+                    law_data['effective_from'],
+                    law_data['effective_to'],
+                    law_data['last_amendment'],
+                    law_data['source_url']
+                ))
+                law_id = cursor.fetchone()[0]
 
         return law_id
 
-    def log_crawl(self, source, source_type, status, items_found, items_added, error_message=None):
+    def log_crawl(self, source, source_type, status, items_found, items_added, error_message=None, cursor=None):
         """Log crawl to history"""
-        conn = psycopg2.connect(self.db_url)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-        INSERT INTO crawl_history (source, source_type, status, items_found, items_added, error_message)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        ''', (source, source_type, status, items_found, items_added, error_message))
-
-        conn.commit()
-        conn.close()
+        with unit_of_work(self.pool, cursor) as cursor:
+            cursor.execute('''
+            INSERT INTO crawl_history (source, source_type, status, items_found, items_added, error_message)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ''', (source, source_type, status, items_found, items_added, error_message))
 
     def crawl_all_priority_laws(self):
         """🔐 Crawl all priority laws (ANONYMOUS via Tor)"""
@@ -419,51 +412,47 @@ class LegalLawsCrawler(AnonymousCrawler):
 
     def show_stats(self):
         """Show database statistics"""
-        conn = psycopg2.connect(self.db_url)
-        cursor = conn.cursor()
-
-        print("\n📊 Laws Database Statistics:")
-
-        # Total laws
-        cursor.execute('SELECT COUNT(*) FROM laws')
-        total = cursor.fetchone()[0]
-        print(f"\n  Total laws: {total}")
-
-        # By category
-        cursor.execute('''
-        SELECT category, COUNT(*)
-        FROM laws
-        GROUP BY category
-        ORDER BY COUNT(*) DESC
-        ''')
-        categories = cursor.fetchall()
-        if categories:
-            print("\n  By category:")
-            for cat, count in categories:
-                print(f"    {cat}: {count}")
-
-        # Text stats
-        cursor.execute('''
-        SELECT
-            AVG(LENGTH(full_text)) as avg_length,
-            MAX(LENGTH(full_text)) as max_length,
-            MIN(LENGTH(full_text)) as min_length
-        FROM laws
-        WHERE full_text IS NOT NULL
-        ''')
-        length_stats = cursor.fetchone()
-        if length_stats and length_stats[0]:
-            print(f"\n  Text statistics:")
-            print(f"    Average length: {int(length_stats[0]):,} chars")
-            print(f"    Max length: {int(length_stats[1]):,} chars")
-            print(f"    Min length: {int(length_stats[2]):,} chars")
-
-        # In RAG
-        cursor.execute('SELECT COUNT(*) FROM laws WHERE added_to_rag = 1')
-        in_rag = cursor.fetchone()[0]
-        print(f"\n  Added to RAG: {in_rag}/{total}")
-
-        conn.close()
+        with self.pool.cursor() as cursor:
+            print("\n📊 Laws Database Statistics:")
+
+            # Total laws
+            cursor.execute('SELECT COUNT(*) FROM laws')
+            total = cursor.fetchone()[0]
+            print(f"\n  Total laws: {total}")
+
+            # By category
+            cursor.execute('''
+            SELECT category, COUNT(*)
+            FROM laws
+            GROUP BY category
+            ORDER BY COUNT(*) DESC
+            ''')
+            categories = cursor.fetchall()
+            if categories:
+                print("\n  By category:")
+                for cat, count in categories:
+                    print(f"    {cat}: {count}")
+
+            # Text stats
+            cursor.execute('''
+            SELECT
+                AVG(LENGTH(full_text)) as avg_length,
+                MAX(LENGTH(full_text)) as max_length,
+                MIN(LENGTH(full_text)) as min_length
+            FROM laws
+            WHERE full_text IS NOT NULL
+            ''')
+            length_stats = cursor.fetchone()
+            if length_stats and length_stats[0]:
+                print(f"\n  Text statistics:")
+                print(f"    Average length: {int(length_stats[0]):,} chars")
+                print(f"    Max length: {int(length_stats[1]):,} chars")
+                print(f"    Min length: {int(length_stats[2]):,} chars")
+
+            # In RAG
+            cursor.execute('SELECT COUNT(*) FROM laws WHERE added_to_rag = 1')
+            in_rag = cursor.fetchone()[0]
+            print(f"\n  Added to RAG: {in_rag}/{total}")
 
 
 def main():
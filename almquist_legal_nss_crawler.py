@@ -4,13 +4,18 @@ ALMQUIST Legal - NSS Crawler
 Crawls decisions from Nejvyšší správní soud (vyhledavac.nssoud.cz, sbirka.nssoud.cz)
 """
 
-import sqlite3
 import requests
 from bs4 import BeautifulSoup
 import time
 from datetime import datetime
 import json
 import re
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_content_hash import compute_content_hash, ensure_content_hash_columns
+from almquist_legal_db_writer import get_writer
 
 class NSSCrawler:
     """Crawler for Nejvyšší správní soud decisions"""
@@ -21,6 +26,8 @@ class NSSCrawler:
         self.session.headers.update({
             'User-Agent': 'ALMQUIST Legal RAG Bot/1.0 (Educational Purpose)'
         })
+        ensure_content_hash_columns(self.db_path)
+        self.writer = get_writer(self.db_path)
 
     def crawl_nss_sbirka(self, max_results=30):
         """Crawl NSS Sbírka rozhodnutí"""
@@ -74,25 +81,9 @@ class NSSCrawler:
             return []
 
     def save_decision(self, decision_info):
-        """Save NSS decision to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
+        """Queue NSS decision for the shared DB writer (insert if new)"""
         case_number = decision_info.get('case_number', 'Unknown')
 
-        # Check if decision already exists
-        cursor.execute('''
-        SELECT id FROM court_decisions
-        WHERE case_number = ? AND court_level = 'administrative'
-        ''', (case_number,))
-
-        existing = cursor.fetchone()
-
-        if existing:
-            print(f"   ⚠️  Decision {case_number} already exists")
-            conn.close()
-            return existing[0]
-
         # Parse date
         decision_date = None
         if 'decision_date_raw' in decision_info:
@@ -105,30 +96,23 @@ class NSSCrawler:
             except:
                 pass
 
-        # Insert new decision
-        cursor.execute('''
-        INSERT INTO court_decisions (
-            case_number, court_level, court_name,
-            decision_type, decision_date,
-            legal_area, summary, full_text, source_url
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            case_number,
-            'administrative',
-            'Nejvyšší správní soud',
-            decision_info.get('decision_type', 'rozsudek'),
-            decision_date,
-            'spravni',
-            decision_info.get('summary', ''),
-            decision_info.get('full_text', ''),
-            decision_info.get('url', '')
-        ))
-
-        decision_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-
-        return decision_id
+        values = {
+            'case_number': case_number,
+            'court_level': 'administrative',
+            'court_name': 'Nejvyšší správní soud',
+            'decision_type': decision_info.get('decision_type', 'rozsudek'),
+            'decision_date': decision_date,
+            'legal_area': 'spravni',
+            'summary': decision_info.get('summary', ''),
+            'full_text': decision_info.get('full_text', ''),
+            'content_hash': compute_content_hash(decision_info.get('full_text', '')),
+            'source_url': decision_info.get('url', '')
+        }
+
+        return self.writer.upsert(
+            'court_decisions', values,
+            match=[{'case_number': case_number, 'court_level': 'administrative'}]
+        )
 
     def crawl_nss_decisions(self, max_results=30):
         """Main crawl function for NSS"""
@@ -165,12 +149,13 @@ class NSSCrawler:
                 }
             ]
 
-            success_count = 0
+            futures = []
             for decision in sample_decisions:
-                decision_id = self.save_decision(decision)
-                if decision_id:
-                    print(f"   ✓ Created sample: {decision['case_number']} (ID: {decision_id})")
-                    success_count += 1
+                futures.append(self.save_decision(decision))
+                print(f"   ✓ Queued sample: {decision['case_number']}")
+
+            stats = self.writer.flush_report(futures)
+            success_count = stats['inserted'] + stats['updated']
 
             print("\n" + "=" * 70)
             print("⚠️  NSS CRAWLER - SAMPLE DATA CREATED")
@@ -183,12 +168,13 @@ class NSSCrawler:
             return
 
         # Save found decisions
-        success_count = 0
+        futures = []
         for decision in decisions:
-            decision_id = self.save_decision(decision)
-            if decision_id:
-                print(f"   ✓ Saved: {decision.get('case_number', 'Unknown')} (ID: {decision_id})")
-                success_count += 1
+            futures.append(self.save_decision(decision))
+            print(f"   ✓ Queued: {decision.get('case_number', 'Unknown')}")
+
+        stats = self.writer.flush_report(futures)
+        success_count = stats['inserted'] + stats['updated']
 
         print("\n" + "=" * 70)
         print("✅ NSS CRAWL COMPLETED")
@@ -6,14 +6,22 @@ Integrates laws and court decisions into RAG system with intelligent chunking
 
 import sqlite3
 import json
-import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 from pathlib import Path
 from datetime import datetime
 import pickle
-import re
 import subprocess
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_embedding_service import get_embedding_model
+from almquist_legal_fts import LegalFullTextSearch
+from almquist_legal_text_store import get_text_store
+from almquist_chunking import get_chunker
+from almquist_rag_metadata import clear_journal, load_metadata
+from almquist_vector_store import (EmbeddingStore, FILTER_OVERSAMPLE, QUERY_BATCH_SIZE, create_index, expand_filters,
+                                   index_dtype, match_metadata, search_index)
 
 class LegalRAGIntegration:
     """Integration of legal documents into RAG"""
@@ -23,10 +31,14 @@ class LegalRAGIntegration:
                  rag_dir="/home/puzik/almquist_legal_rag"):
         self.legal_db = legal_db
         self.rag_dir = Path(rag_dir)
+        self.fts = LegalFullTextSearch(legal_db)
 
         # Load sentence transformer model
         print("📚 Loading sentence transformer model...")
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        self.model = get_embedding_model('paraphrase-multilingual-MiniLM-L12-v2')
+        # Chunk embeddings go through the cache (unchanged sections of amended laws)
+        self.encoder = get_embedding_model('paraphrase-multilingual-MiniLM-L12-v2', cache=True)
+        self.chunker = get_chunker('paraphrase-multilingual-MiniLM-L12-v2')
         self.embedding_dim = 384
         print("   ✓ Model loaded")
 
@@ -44,138 +56,43 @@ class LegalRAGIntegration:
         index_path = self.rag_dir / "faiss_index.bin"
         if index_path.exists():
             self.index = faiss.read_index(str(index_path))
-            print(f"   ✓ Loaded FAISS index: {self.index.ntotal} vectors")
+            print(f"   ✓ Loaded FAISS index: {self.index.ntotal} vectors ({index_dtype(self.index)})")
         else:
-            self.index = faiss.IndexFlatIP(self.embedding_dim)
-            print("   ✓ Created new FAISS index")
+            self.index = create_index(self.embedding_dim)
+            print(f"   ✓ Created new FAISS index ({index_dtype(self.index)})")
 
         # Load metadata
         metadata_path = self.rag_dir / "metadata.json"
         if metadata_path.exists():
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.chunks = data.get('chunks', [])
-                self.metadata = data.get('metadata', [])
+            data = load_metadata(self.rag_dir)
+            self.chunks = data.get('chunks', [])
+            self.metadata = data.get('metadata', [])
             print(f"   ✓ Loaded metadata: {len(self.chunks)} chunks")
         else:
             self.chunks = []
             self.metadata = []
             print("   ✓ Starting with empty metadata")
 
-        # Load embeddings
-        embeddings_path = self.rag_dir / "embeddings.npy"
-        if embeddings_path.exists():
-            self.embeddings = np.load(embeddings_path)
-            print(f"   ✓ Loaded embeddings: {self.embeddings.shape}")
+        # float32 embeddings for re-ranking (memmap, not loaded into RAM)
+        self.vectors = EmbeddingStore(self.rag_dir / "embeddings.npy", self.embedding_dim)
+        if self.vectors.stored is not None:
+            print(f"   ✓ Mapped embeddings: {self.vectors.shape}")
         else:
-            self.embeddings = np.zeros((0, self.embedding_dim), dtype='float32')
             print("   ✓ Starting with empty embeddings")
 
     def chunk_law_text(self, law_text, law_number):
         """
-        Chunk law text intelligently by paragraphs
-        Returns list of (chunk_text, section_reference)
+        Chunk law text by paragraphs (§) within the model's token limit
+        Returns list of {'text', 'section'}
         """
-        chunks = []
-
-        # Split by paragraph markers (§)
-        # Pattern: § followed by number
-        sections = re.split(r'(§\s*\d+[a-z]?)', law_text)
-
-        current_section = None
-        current_text = ""
-
-        for i, part in enumerate(sections):
-            # Check if this is a section marker
-            section_match = re.match(r'§\s*(\d+[a-z]?)', part.strip())
-
-            if section_match:
-                # Save previous chunk if exists
-                if current_section and current_text.strip():
-                    chunks.append({
-                        'text': current_text.strip(),
-                        'section': current_section
-                    })
-
-                # Start new section
-                current_section = f"§ {section_match.group(1)}"
-                current_text = ""
-
-            else:
-                # Add text to current section
-                current_text += part
-
-                # If chunk is getting too long (> 2000 chars), split it
-                if len(current_text) > 2000:
-                    # Find a good split point (sentence end)
-                    split_points = [m.start() for m in re.finditer(r'\.\s+', current_text[:2000])]
-
-                    if split_points:
-                        split_at = split_points[-1] + 1
-                        chunks.append({
-                            'text': current_text[:split_at].strip(),
-                            'section': current_section or 'Preambule'
-                        })
-                        current_text = current_text[split_at:]
-
-        # Add final chunk
-        if current_text.strip():
-            chunks.append({
-                'text': current_text.strip(),
-                'section': current_section or 'Preambule'
-            })
-
-        # Filter out very short chunks (< 100 chars)
-        chunks = [c for c in chunks if len(c['text']) >= 100]
-
-        return chunks
+        return self.chunker.chunk_law(law_text)
 
     def chunk_decision_text(self, decision_text, case_number):
         """
-        Chunk court decision text intelligently
-        Returns list of chunks
+        Chunk court decision text by paragraphs within the model's token limit
+        Returns list of {'text', 'section'}
         """
-        chunks = []
-
-        # Split by common sections in court decisions
-        # 1. Právní věta / Summary
-        # 2. Odůvodnění / Reasoning
-        # 3. Výrok / Decision part
-
-        # For now, use simple paragraph-based chunking
-        # Split by double newlines or numbered paragraphs
-        paragraphs = re.split(r'\n\n+|\[\d+\]', decision_text)
-
-        current_chunk = ""
-        chunk_num = 0
-
-        for para in paragraphs:
-            para = para.strip()
-            if not para or len(para) < 50:
-                continue
-
-            # If adding this paragraph would make chunk too long, save current and start new
-            if len(current_chunk) + len(para) > 2000 and current_chunk:
-                chunks.append({
-                    'text': current_chunk.strip(),
-                    'section': f'Part {chunk_num + 1}'
-                })
-                chunk_num += 1
-                current_chunk = para
-            else:
-                current_chunk += "\n\n" + para if current_chunk else para
-
-        # Add final chunk
-        if current_chunk.strip():
-            chunks.append({
-                'text': current_chunk.strip(),
-                'section': f'Part {chunk_num + 1}'
-            })
-
-        # Filter out very short chunks
-        chunks = [c for c in chunks if len(c['text']) >= 100]
-
-        return chunks
+        return self.chunker.chunk_decision(decision_text)
 
     def get_unprocessed_laws(self):
         """Get laws not yet added to RAG"""
@@ -190,6 +107,13 @@ class LegalRAGIntegration:
         ''')
 
         laws = [dict(row) for row in cursor.fetchall()]
+
+        # full_text is NULL for rows whose text is in the compressed store
+        texts = get_text_store(self.legal_db).load_full_texts(
+            cursor, 'law', [row['id'] for row in laws if row['full_text'] is None])
+        for row in laws:
+            if row['full_text'] is None:
+                row['full_text'] = texts.get(row['id'])
         conn.close()
 
         return laws
@@ -207,6 +131,13 @@ class LegalRAGIntegration:
         ''')
 
         decisions = [dict(row) for row in cursor.fetchall()]
+
+        # full_text is NULL for rows whose text is in the compressed store
+        texts = get_text_store(self.legal_db).load_full_texts(
+            cursor, 'court_decision', [row['id'] for row in decisions if row['full_text'] is None])
+        for row in decisions:
+            if row['full_text'] is None:
+                row['full_text'] = texts.get(row['id'])
         conn.close()
 
         return decisions
@@ -225,7 +156,7 @@ class LegalRAGIntegration:
         for i, chunk_data in enumerate(chunks):
             try:
                 # Generate embedding
-                embedding = self.model.encode(
+                embedding = self.encoder.encode(
                     [chunk_data['text']],
                     convert_to_numpy=True,
                     normalize_embeddings=True
@@ -256,7 +187,7 @@ class LegalRAGIntegration:
                 # Add to lists
                 self.chunks.append(chunk_data['text'])
                 self.metadata.append(metadata_entry)
-                self.embeddings = np.vstack([self.embeddings, embedding])
+                self.vectors.add(embedding)
 
                 added_chunks.append(chunk_data)
                 chunk_ids.append(chunk_id)
@@ -291,7 +222,7 @@ class LegalRAGIntegration:
         for i, chunk_data in enumerate(chunks):
             try:
                 # Generate embedding
-                embedding = self.model.encode(
+                embedding = self.encoder.encode(
                     [chunk_data['text']],
                     convert_to_numpy=True,
                     normalize_embeddings=True
@@ -324,7 +255,7 @@ class LegalRAGIntegration:
                 # Add to lists
                 self.chunks.append(chunk_data['text'])
                 self.metadata.append(metadata_entry)
-                self.embeddings = np.vstack([self.embeddings, embedding])
+                self.vectors.add(embedding)
 
                 added_chunks.append(chunk_data)
                 chunk_ids.append(chunk_id)
@@ -390,20 +321,19 @@ class LegalRAGIntegration:
                 'updated_at': datetime.now().isoformat(),
                 'total_chunks': len(self.chunks)
             }, f, indent=2, ensure_ascii=False)
+        clear_journal(self.rag_dir)
         print(f"   ✓ Metadata: {len(self.chunks)} chunks")
 
-        # Save embeddings
-        embeddings_path = self.rag_dir / "embeddings.npy"
-        np.save(embeddings_path, self.embeddings)
-        print(f"   ✓ Embeddings: {self.embeddings.shape}")
+        # Append new embeddings
+        self.vectors.save()
+        print(f"   ✓ Embeddings: {self.vectors.shape}")
 
-        # Save pickle
+        # Save pickle (vectors live in embeddings.npy)
         pickle_path = self.rag_dir / "rag_system.pkl"
         with open(pickle_path, 'wb') as f:
             pickle.dump({
                 'chunks': self.chunks,
-                'metadata': self.metadata,
-                'embeddings': self.embeddings
+                'metadata': self.metadata
             }, f)
         print(f"   ✓ Pickle saved")
 
@@ -504,34 +434,62 @@ class LegalRAGIntegration:
         print(f"Chunks added:          {total_chunks_added}")
         print(f"Total RAG chunks:      {len(self.chunks)}")
         print(f"Total embeddings:      {self.index.ntotal}")
+        print(self.encoder.report())
         print("=" * 70)
 
     def search(self, query, top_k=3):
         """Search RAG and return results (no printing)"""
-        # Generate query embedding
-        query_embedding = self.model.encode(
-            [query],
+        return self.search_many([query], top_k=top_k)[0]
+
+    def search_many(self, queries, top_k=3, filters=None):
+        """
+        Search many queries at once: one encode call, one index search
+        filters: None, one metadata filter for all queries (e.g.
+        {'document_type': 'law'}) or a list with a filter (or None) per query
+        Returns: list of result lists, one per query (same format as search())
+        """
+        if not queries:
+            return []
+        filters = expand_filters(filters, len(queries))
+
+        # Generate query embeddings
+        query_embeddings = self.model.encode(
+            list(queries),
+            batch_size=QUERY_BATCH_SIZE,
             convert_to_numpy=True,
             normalize_embeddings=True
-        )[0]
-
-        # Search
-        distances, indices = self.index.search(
-            query_embedding.reshape(1, -1).astype('float32'),
-            top_k
         )
 
-        # Build results
-        results = []
-        for idx, dist in zip(indices[0], distances[0]):
-            if idx >= 0 and idx < len(self.metadata):
+        # Search (quantized index: exact float32 re-rank of the candidates)
+        search_k = top_k * FILTER_OVERSAMPLE if any(filters) else top_k
+        distances, indices = search_index(self.index, query_embeddings, search_k, self.vectors)
+
+        # Build results per query
+        all_results = []
+        for row_indices, row_distances, metadata_filter in zip(indices, distances, filters):
+            results = []
+            for idx, dist in zip(row_indices, row_distances):
+                if idx < 0 or idx >= len(self.metadata):
+                    continue
+                if not match_metadata(self.metadata[idx], metadata_filter):
+                    continue
                 results.append({
                     'score': float(dist),
                     'metadata': self.metadata[idx],
                     'text': self.chunks[idx]
                 })
+                if len(results) >= top_k:
+                    break
+            all_results.append(results)
 
-        return results
+        return all_results
+
+    def keyword_search(self, query, top_k=10, document_type=None, phrase=False):
+        """
+        Exact keyword / citation search over the whole legal DB (FTS5),
+        without embeddings - complements the semantic search()
+        """
+        return self.fts.search(query, document_type=document_type, limit=top_k, phrase=phrase)
 
     def test_search(self, query, top_k=3):
         """Test RAG search with printing"""
@@ -10,6 +10,7 @@ sys.path.append(os.path.dirname(__file__))
 
 from almquist_legal_rag_integration import LegalRAGIntegration
 import json
+import time
 from datetime import datetime
 
 class LegalRAGTestSuite:
@@ -101,16 +102,33 @@ class LegalRAGTestSuite:
                 'error': str(e)
             }
 
-    def run_category_tests(self, category, queries):
-        """Run all queries in a category"""
+    def run_queries(self, queries, top_k=3):
+        """Run many queries with one batched search (search_many)"""
+        try:
+            batch_results = self.rag.search_many(queries, top_k=top_k)
+        except Exception as e:
+            return [{'query': query, 'status': 'error', 'error': str(e)} for query in queries]
+
+        return [{
+            'query': query,
+            'status': 'success',
+            'results_count': len(results),
+            'top_result': results[0] if results else None,
+            'results': results
+        } for query, results in zip(queries, batch_results)]
+
+    def run_category_tests(self, category, queries, query_results=None):
+        """Run all queries in a category (query_results = precomputed run_queries())"""
         print(f"\n{'='*70}")
         print(f"📋 Testing category: {category.upper()}")
         print(f"{'='*70}")
 
+        if query_results is None:
+            query_results = self.run_queries(queries, top_k=3)
+
         results = []
-        for i, query in enumerate(queries, 1):
+        for i, (query, result) in enumerate(zip(queries, query_results), 1):
             print(f"\n[{i}/{len(queries)}] Query: '{query}'")
-            result = self.run_single_query(query, top_k=3)
 
             if result['status'] == 'success':
                 if result['results_count'] > 0:
@@ -145,8 +163,15 @@ class LegalRAGTestSuite:
 
         all_results = {}
 
+        # One batched search for all categories
+        all_queries = [query for queries in self.test_queries.values() for query in queries]
+        start = time.time()
+        query_results = iter(self.run_queries(all_queries, top_k=3))
+        print(f"⏱️  {len(all_queries)} queries searched in {time.time() - start:.2f}s")
+
         for category, queries in self.test_queries.items():
-            category_results = self.run_category_tests(category, queries)
+            category_results = self.run_category_tests(
+                category, queries, [next(query_results) for _ in queries])
             all_results[category] = category_results
 
         # Summary
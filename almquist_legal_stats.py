@@ -5,11 +5,18 @@ Comprehensive stats and reporting for legal RAG system
 """
 
 import sqlite3
-import json
 import numpy as np
+import faiss
 from pathlib import Path
 from datetime import datetime
 import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_legal_fts import LegalFullTextSearch, print_results
+from almquist_legal_text_store import get_text_store, init_text_tables
+from almquist_vector_store import index_dtype, index_size_mb
+from almquist_rag_metadata import load_metadata
 
 class LegalRAGStats:
     """Statistics and monitoring for Legal RAG"""
@@ -19,6 +26,11 @@ class LegalRAGStats:
                  rag_dir="/home/puzik/almquist_legal_rag"):
         self.legal_db = legal_db
         self.rag_dir = Path(rag_dir)
+        self.fts = LegalFullTextSearch(legal_db)
+
+    def search(self, query, document_type=None, limit=10, phrase=False):
+        """Fulltext search in laws/decisions (FTS5), see LegalFullTextSearch.search"""
+        return self.fts.search(query, document_type=document_type, limit=limit, phrase=phrase)
 
     def get_database_stats(self):
         """Get comprehensive database statistics"""
@@ -74,6 +86,10 @@ class LegalRAGStats:
         ''')
         stats['crawl_history'] = cursor.fetchall()
 
+        # Text storage (compressed vs. plain full_text)
+        init_text_tables(conn)
+        stats['text_storage'] = get_text_store(self.legal_db).storage_stats(cursor)
+
         conn.close()
 
         return stats
@@ -85,8 +101,7 @@ class LegalRAGStats:
         # Load metadata
         metadata_path = self.rag_dir / "metadata.json"
         if metadata_path.exists():
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = load_metadata(self.rag_dir)
 
             stats['total_chunks'] = data.get('total_chunks', 0)
             stats['last_updated'] = data.get('updated_at', 'Unknown')
@@ -115,10 +130,17 @@ class LegalRAGStats:
         # Embeddings stats
         embeddings_path = self.rag_dir / "embeddings.npy"
         if embeddings_path.exists():
-            embeddings = np.load(embeddings_path)
+            embeddings = np.load(embeddings_path, mmap_mode='r')
             stats['embeddings_shape'] = embeddings.shape
             stats['embeddings_size_mb'] = embeddings.nbytes / 1024 / 1024
 
+        # Index in RAM (float32 / float16 / int8)
+        index_path = self.rag_dir / "faiss_index.bin"
+        if index_path.exists():
+            index = faiss.read_index(str(index_path))
+            stats['index_dtype'] = index_dtype(index)
+            stats['index_size_mb'] = index_size_mb(index)
+
         return stats
 
     def print_report(self):
@@ -159,6 +181,17 @@ class LegalRAGStats:
                 dtype_str = dtype if dtype else 'unknown'
                 print(f"  {dtype_str:25s}: {count:3d}")
 
+        text_storage = db_stats['text_storage']
+        print("\n" + "─" * 70)
+        print("🗜️  TEXT STORAGE")
+        print("─" * 70)
+        for doc_type, codec, count, raw, stored in text_storage['compressed']:
+            print(f"  {doc_type:15s} {codec:5s}: {count:6d} texts, "
+                  f"{(raw or 0) / 1024 / 1024:.1f} MB → {(stored or 0) / 1024 / 1024:.1f} MB")
+        for doc_type, count, size in text_storage['plain']:
+            if count:
+                print(f"  {doc_type:15s} plain: {count:6d} texts, {size / 1024 / 1024:.1f} MB (not compressed)")
+
         # RAG stats
         rag_stats = self.get_rag_stats()
 
@@ -171,6 +204,8 @@ class LegalRAGStats:
         if 'embeddings_shape' in rag_stats:
             print(f"Embeddings shape:     {rag_stats['embeddings_shape']}")
             print(f"Embeddings size:      {rag_stats['embeddings_size_mb']:.1f} MB")
+        if 'index_dtype' in rag_stats:
+            print(f"Index:                {rag_stats['index_dtype']}, {rag_stats['index_size_mb']:.1f} MB in RAM")
 
         if rag_stats.get('chunks_by_type'):
             print("\nChunks by document type:")
@@ -241,14 +276,32 @@ class LegalRAGStats:
             issues.append("⚠️  No court decisions in database")
         if db_stats['decisions_in_rag'] < db_stats['total_decisions']:
             issues.append(f"⚠️  {db_stats['total_decisions'] - db_stats['decisions_in_rag']} decisions not yet in RAG")
+        plain_texts = sum(count for _, count, _ in db_stats['text_storage']['plain'])
+        if plain_texts:
+            issues.append(f"⚠️  {plain_texts} texts not compressed (almquist_legal_text_store.py --migrate)")
 
         return issues
 
 
 def main():
     """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Almquist Legal RAG statistics')
+    parser.add_argument('--search', metavar='QUERY', help='Full-text search instead of the report')
+    parser.add_argument('--type', choices=['law', 'court_decision'], help='Document type for --search')
+    parser.add_argument('--phrase', action='store_true', help='Search QUERY as an exact phrase')
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
     stats = LegalRAGStats()
 
+    if args.search:
+        results = stats.search(args.search, document_type=args.type, limit=args.limit, phrase=args.phrase)
+        print(f"🔍 {len(results)} results for '{args.search}'")
+        print_results(results)
+        return
+
     # Print comprehensive report
     stats.print_report()
 
@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Legal Text Store
+Komprimované úložiště full_text pro laws a court_decisions
+
+- texty jsou v samostatné tabulce document_texts (zstd + slovník
+  natrénovaný na české právní próze; bez zstandard fallback na zlib
+  s preset slovníkem), takže laws / court_decisions zůstávají úzké
+  metadata tabulky a jejich scany nečtou stránky s texty
+- load_full_texts() je jediný přístupový bod pro čtení textů
+  (dedup, merger, RAG integrace, near-duplicates, FTS snippety);
+  starší řádky s nekomprimovaným full_text vrací beze změny
+- fulltext index textů: contentless FTS5 document_texts_fts
+  (plní se při zápisu; contentless index maže jen příkaz 'delete' s původním
+  textem, proto smazané / nahrazené texty jdou přes trigger do fronty
+  document_texts_fts_deleted a purge_fts() je z indexu odebere - volá se při
+  každém zápisu textu)
+- raw_length a statistiky jsou v bajtech (UTF-8), stejně jako LENGTH(data)
+
+Usage:
+    python3 almquist_legal_text_store.py --migrate
+    python3 almquist_legal_text_store.py --stats
+"""
+
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+from almquist_content_hash import compute_content_hash
+
+
+DEFAULT_CODEC = 'zstd' if HAS_ZSTD else 'zlib'
+ZSTD_LEVEL = 9
+ZLIB_LEVEL = 9
+DICT_SIZE = 112 * 1024
+ZLIB_DICT_SIZE = 32 * 1024  # zlib window - anything larger is ignored
+DICT_SAMPLE_SIZE = 2000
+
+FTS_TOKENIZE = "unicode61 remove_diacritics 2"  # same as almquist_legal_fts
+
+# document_type -> table with metadata
+TEXT_TABLES = {
+    'law': 'laws',
+    'court_decision': 'court_decisions',
+}
+TABLE_DOCUMENT_TYPES = {table: doc_type for doc_type, table in TEXT_TABLES.items()}
+
+
+def init_text_tables(conn):
+    """document_texts, compression_dictionaries, document_texts_fts + triggery (idempotentní)"""
+    cursor = conn.cursor()
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS compression_dictionaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        codec TEXT NOT NULL,
+        data BLOB NOT NULL,
+        sample_count INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_texts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        document_type TEXT NOT NULL,
+        document_id INTEGER NOT NULL,
+        codec TEXT NOT NULL,
+        dict_id INTEGER,
+        raw_length INTEGER,
+        data BLOB NOT NULL,
+        UNIQUE (document_type, document_id)
+    )
+    ''')
+    cursor.execute(f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS document_texts_fts USING fts5(
+        full_text,
+        content='',
+        tokenize='{FTS_TOKENIZE}'
+    )
+    ''')
+    # Deleted texts waiting for their FTS 'delete' (needs the old text)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_texts_fts_deleted (
+        id INTEGER PRIMARY KEY,
+        codec TEXT NOT NULL,
+        dict_id INTEGER,
+        data BLOB NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_document_texts_fts_delete AFTER DELETE ON document_texts BEGIN
+        INSERT OR REPLACE INTO document_texts_fts_deleted (id, codec, dict_id, data)
+        VALUES (old.id, old.codec, old.dict_id, old.data);
+    END
+    ''')
+
+    for doc_type, table in TEXT_TABLES.items():
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        if not cursor.fetchone():
+            continue
+
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_text_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM document_texts
+            WHERE document_type = '{doc_type}' AND document_id = old.id;
+        END
+        ''')
+
+    conn.commit()
+
+
+class _Codec:
+    """Kompresor/dekompresor pro jeden slovník (instance per thread)"""
+
+    def __init__(self, codec, dictionary):
+        self.codec = codec
+        self.dictionary = dictionary
+
+        if codec == 'zstd':
+            dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dict_data)
+            self._decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+
+    def compress(self, data):
+        if self.codec == 'zstd':
+            return self._compressor.compress(data)
+
+        if self.dictionary:
+            compressor = zlib.compressobj(ZLIB_LEVEL, zdict=self.dictionary)
+        else:
+            compressor = zlib.compressobj(ZLIB_LEVEL)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data):
+        if self.codec == 'zstd':
+            return self._decompressor.decompress(data)
+
+        if self.dictionary:
+            decompressor = zlib.decompressobj(zdict=self.dictionary)
+        else:
+            decompressor = zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+class LegalTextStore:
+    """Komprimované texty dokumentů legal DB"""
+
+    def __init__(self, db_path="/home/puzik/almquist_legal_sources.db"):
+        self.db_path = db_path
+        self._dictionaries = {}  # dict_id -> (codec, bytes)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------
+    # Dictionaries / codecs
+    # ------------------------------------------------------------------
+
+    def _load_dictionary(self, cursor, dict_id):
+        with self._lock:
+            if dict_id not in self._dictionaries:
+                cursor.execute('SELECT codec, data FROM compression_dictionaries WHERE id = ?', (dict_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    raise KeyError(f"Compression dictionary {dict_id} not found")
+                self._dictionaries[dict_id] = (row[0], bytes(row[1]))
+            return self._dictionaries[dict_id]
+
+    def _codec(self, cursor, codec, dict_id):
+        codecs = getattr(self._local, 'codecs', None)
+        if codecs is None:
+            codecs = self._local.codecs = {}
+
+        key = (codec, dict_id)
+        if key not in codecs:
+            dictionary = self._load_dictionary(cursor, dict_id)[1] if dict_id else None
+            codecs[key] = _Codec(codec, dictionary)
+        return codecs[key]
+
+    def active_dictionary(self, cursor):
+        """
+        Nejnovější slovník pro DEFAULT_CODEC (None = bez slovníku); čte se
+        z DB při každém zápisu, takže slovník natrénovaný jiným procesem
+        se použije hned
+        """
+        cursor.execute('''
+        SELECT id FROM compression_dictionaries
+        WHERE codec = ? ORDER BY id DESC LIMIT 1
+        ''', (DEFAULT_CODEC,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def train_dictionary(self, conn, sample_size=DICT_SAMPLE_SIZE):
+        """
+        Natrénuje slovník z náhodného vzorku textů (komprimovaných i ne)
+        Returns: dict_id nebo None pokud není dost textů
+        """
+        cursor = conn.cursor()
+        samples = []
+
+        for doc_type, table in TEXT_TABLES.items():
+            cursor.execute(f'''
+            SELECT id FROM {table}
+            WHERE full_text IS NOT NULL OR id IN (
+                SELECT document_id FROM document_texts WHERE document_type = ?
+            )
+            ORDER BY RANDOM() LIMIT ?
+            ''', (doc_type, sample_size // len(TEXT_TABLES)))
+            ids = [row[0] for row in cursor.fetchall()]
+            samples.extend(
+                text.encode('utf-8')[:64 * 1024]
+                for text in self.load_full_texts(cursor, doc_type, ids).values() if text
+            )
+
+        if len(samples) < 10:
+            return None
+
+        if DEFAULT_CODEC == 'zstd':
+            dictionary = zstandard.train_dictionary(DICT_SIZE, samples, level=ZSTD_LEVEL).as_bytes()
+        else:
+            dictionary = self._build_zlib_dictionary(samples)
+
+        cursor.execute('''
+        INSERT INTO compression_dictionaries (codec, data, sample_count, created_at)
+        VALUES (?, ?, ?, ?)
+        ''', (DEFAULT_CODEC, dictionary, len(samples), datetime.now().isoformat()))
+        conn.commit()
+
+        return cursor.lastrowid
+
+    @staticmethod
+    def _build_zlib_dictionary(samples):
+        """Preset slovník pro zlib: řádky opakující se v mnoha dokumentech"""
+        line_docs = Counter()
+        for sample in samples:
+            line_docs.update({line.strip() for line in sample.split(b'\n') if len(line.strip()) > 8})
+
+        dictionary = b''
+        # Least common first - zlib prefers matches near the end of the dictionary
+        for line, count in reversed(line_docs.most_common()):
+            if count < 2:
+                continue
+            dictionary += line + b'\n'
+
+        return dictionary[-ZLIB_DICT_SIZE:]
+
+    def compress(self, cursor, text, dict_id=None):
+        """
+        Returns (codec, dict_id, raw_length, blob) - raw_length v bajtech;
+        dict_id None = aktivní slovník
+        """
+        if dict_id is None:
+            dict_id = self.active_dictionary(cursor)
+        data = text.encode('utf-8')
+        codec = self._codec(cursor, DEFAULT_CODEC, dict_id)
+        return DEFAULT_CODEC, dict_id, len(data), codec.compress(data)
+
+    def decompress(self, cursor, codec, dict_id, blob):
+        return self._codec(cursor, codec, dict_id).decompress(bytes(blob)).decode('utf-8')
+
+    # ------------------------------------------------------------------
+    # Read / write
+    # ------------------------------------------------------------------
+
+    def store_full_text(self, cursor, document_type, document_id, text):
+        """
+        Uloží (nahradí) text dokumentu v transakci volajícího a zaindexuje ho
+        do document_texts_fts. Sloupec full_text v metadata tabulce se vynuluje.
+        """
+        table = TEXT_TABLES[document_type]
+
+        # The old text (if any) goes to the FTS delete queue via the trigger
+        cursor.execute('DELETE FROM document_texts WHERE document_type = ? AND document_id = ?',
+                       (document_type, document_id))
+        if text is None:
+            self.purge_fts(cursor)
+            return
+
+        codec, dict_id, raw_length, blob = self.compress(cursor, text)
+
+        cursor.execute('''
+        INSERT INTO document_texts
+            (document_type, document_id, codec, dict_id, raw_length, data)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (document_type, document_id, codec, dict_id, raw_length, blob))
+        text_id = cursor.lastrowid
+
+        cursor.execute('INSERT INTO document_texts_fts (rowid, full_text) VALUES (?, ?)', (text_id, text))
+        cursor.execute(f'UPDATE {table} SET full_text = NULL WHERE id = ? AND full_text IS NOT NULL',
+                       (document_id,))
+        self.purge_fts(cursor)
+
+    def store_full_texts(self, cursor, document_type, items):
+        """
+        Dávková varianta store_full_text pro nové řádky (bulk importy)
+        items: list of (document_id, text); texty None se přeskočí
+        """
+        items = [(doc_id, text) for doc_id, text in items if text is not None]
+        if not items:
+            return
+
+        dict_id = self.active_dictionary(cursor)
+        rows = []
+        for doc_id, text in items:
+            codec, _, raw_length, blob = self.compress(cursor, text, dict_id)
+            rows.append((document_type, doc_id, codec, dict_id, raw_length, blob))
+
+        cursor.executemany('DELETE FROM document_texts WHERE document_type = ? AND document_id = ?',
+                           [(document_type, doc_id) for doc_id, _ in items])
+        cursor.executemany('''
+        INSERT INTO document_texts
+            (document_type, document_id, codec, dict_id, raw_length, data)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+        texts = dict(items)
+        placeholders = ','.join('?' * len(texts))
+        cursor.execute(f'''
+        SELECT id, document_id FROM document_texts
+        WHERE document_type = ? AND document_id IN ({placeholders})
+        ''', [document_type] + list(texts))
+        cursor.executemany('INSERT INTO document_texts_fts (rowid, full_text) VALUES (?, ?)',
+                           [(text_id, texts[doc_id]) for text_id, doc_id in cursor.fetchall()])
+        self.purge_fts(cursor)
+
+    def purge_fts(self, cursor):
+        """
+        Odebere smazané / nahrazené texty z document_texts_fts ('delete' s
+        původním textem) v transakci volajícího
+        Returns: počet odebraných textů
+        """
+        cursor.execute('SELECT id, codec, dict_id, data FROM document_texts_fts_deleted')
+        deleted = cursor.fetchall()
+        if not deleted:
+            return 0
+
+        cursor.executemany(
+            "INSERT INTO document_texts_fts (document_texts_fts, rowid, full_text) VALUES ('delete', ?, ?)",
+            [(text_id, self.decompress(cursor, codec, dict_id, blob))
+             for text_id, codec, dict_id, blob in deleted]
+        )
+        cursor.executemany('DELETE FROM document_texts_fts_deleted WHERE id = ?',
+                           [(row[0],) for row in deleted])
+        return len(deleted)
+
+    def load_full_texts(self, cursor, document_type, ids, batch_size=500):
+        """
+        {id: text} pro dané dokumenty - komprimované i starší nekomprimované
+        řádky. Dokumenty bez textu ve výsledku chybí.
+        """
+        table = TEXT_TABLES[document_type]
+        ids = list(ids)
+        texts = {}
+
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            placeholders = ','.join('?' * len(batch))
+
+            cursor.execute(f'''
+            SELECT d.id, d.full_text, t.codec, t.dict_id, t.data
+            FROM {table} d
+            LEFT JOIN document_texts t
+                ON t.document_type = ? AND t.document_id = d.id
+            WHERE d.id IN ({placeholders})
+            ''', [document_type] + batch)
+
+            for doc_id, plain, codec, dict_id, blob in cursor.fetchall():
+                if plain is not None:
+                    texts[doc_id] = plain
+                elif blob is not None:
+                    texts[doc_id] = self.decompress(cursor, codec, dict_id, blob)
+
+        return texts
+
+    def load_full_text(self, cursor, document_type, document_id):
+        """Text jednoho dokumentu (None pokud chybí)"""
+        return self.load_full_texts(cursor, document_type, [document_id]).get(document_id)
+
+    # ------------------------------------------------------------------
+    # Migration / maintenance
+    # ------------------------------------------------------------------
+
+    def migrate(self, batch_size=500, verbose=True):
+        """
+        Přesune nekomprimované full_text do document_texts (po dávkách).
+        Před první dávkou natrénuje slovník, pokud žádný není.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        init_text_tables(conn)
+        cursor = conn.cursor()
+
+        if self.active_dictionary(cursor) is None:
+            dict_id = self.train_dictionary(conn)
+            if verbose and dict_id:
+                print(f"   ✓ Trained {DEFAULT_CODEC} dictionary #{dict_id}")
+
+        totals = {}
+        for doc_type, table in TEXT_TABLES.items():
+            moved = 0
+            start_time = time.time()
+
+            while True:
+                cursor.execute(f'''
+                SELECT id, full_text, content_hash FROM {table}
+                WHERE full_text IS NOT NULL
+                LIMIT ?
+                ''', (batch_size,))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                for doc_id, text, content_hash in rows:
+                    if content_hash is None:
+                        cursor.execute(f'UPDATE {table} SET content_hash = ? WHERE id = ?',
+                                       (compute_content_hash(text), doc_id))
+                    self.store_full_text(cursor, doc_type, doc_id, text)
+
+                conn.commit()
+                moved += len(rows)
+
+                if verbose and moved % (batch_size * 10) == 0:
+                    print(f"   {table}: {moved:,} compressed...")
+
+            totals[table] = moved
+            if verbose:
+                print(f"   ✓ {table}: {moved:,} texts compressed in {time.time() - start_time:.1f}s")
+
+        conn.close()
+        return totals
+
+    def rebuild_fts(self):
+        """
+        Znovu naplní document_texts_fts (odstraní i záznamy textů smazaných
+        před frontou document_texts_fts_deleted) a přepočítá raw_length
+        starších řádků na bajty
+        """
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        init_text_tables(conn)
+        cursor = conn.cursor()
+
+        cursor.execute("INSERT INTO document_texts_fts (document_texts_fts) VALUES ('delete-all')")
+        cursor.execute('DELETE FROM document_texts_fts_deleted')
+        cursor.execute('SELECT id, codec, dict_id, raw_length, data FROM document_texts')
+        read_cursor = conn.cursor()
+
+        for text_id, codec, dict_id, raw_length, blob in cursor:
+            text = self.decompress(read_cursor, codec, dict_id, blob)
+            read_cursor.execute('INSERT INTO document_texts_fts (rowid, full_text) VALUES (?, ?)',
+                                (text_id, text))
+            if raw_length != len(text.encode('utf-8')):
+                read_cursor.execute('UPDATE document_texts SET raw_length = ? WHERE id = ?',
+                                    (len(text.encode('utf-8')), text_id))
+
+        conn.commit()
+        conn.close()
+
+    def storage_stats(self, cursor):
+        """Počty a velikosti (bajty) komprimovaných / nekomprimovaných textů"""
+        stats = {}
+
+        cursor.execute('''
+        SELECT document_type, codec, COUNT(*), SUM(raw_length), SUM(LENGTH(data))
+        FROM document_texts GROUP BY document_type, codec
+        ''')
+        stats['compressed'] = cursor.fetchall()
+
+        stats['plain'] = []
+        for doc_type, table in TEXT_TABLES.items():
+            cursor.execute(f'''
+            SELECT COUNT(*), SUM(LENGTH(CAST(full_text AS BLOB))) FROM {table}
+            WHERE full_text IS NOT NULL
+            ''')
+            count, size = cursor.fetchone()
+            stats['plain'].append((doc_type, count, size or 0))
+
+        return stats
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_text_store(db_path):
+    """Sdílený LegalTextStore pro danou databázi (cache slovníků)"""
+    with _stores_lock:
+        if db_path not in _stores:
+            _stores[db_path] = LegalTextStore(db_path)
+        return _stores[db_path]
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Almquist Legal Text Store',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Compress existing full_text columns (trains the dictionary first)
+  python3 almquist_legal_text_store.py --migrate
+
+  # Retrain the dictionary (new texts use it, old ones keep theirs)
+  python3 almquist_legal_text_store.py --train
+
+  # Storage statistics
+  python3 almquist_legal_text_store.py --stats
+
+  # After --migrate, reclaim the freed pages
+  python3 almquist_deduplication_tool.py --vacuum
+        """
+    )
+    parser.add_argument('--db', default="/home/puzik/almquist_legal_sources.db")
+    parser.add_argument('--migrate', action='store_true', help='Compress plain full_text rows')
+    parser.add_argument('--train', action='store_true', help='Train a new compression dictionary')
+    parser.add_argument('--rebuild-fts', action='store_true', help='Rebuild the text full-text index')
+    parser.add_argument('--stats', action='store_true', help='Show storage statistics')
+    parser.add_argument('--batch-size', type=int, default=500)
+
+    args = parser.parse_args()
+
+    store = LegalTextStore(args.db)
+    print(f"🗜️  Codec: {DEFAULT_CODEC}{'' if HAS_ZSTD else ' (zstandard not installed)'}")
+
+    if args.train:
+        conn = sqlite3.connect(args.db)
+        init_text_tables(conn)
+        dict_id = store.train_dictionary(conn)
+        conn.close()
+        print(f"✓ Dictionary #{dict_id}" if dict_id else "⚠️  Not enough texts to train a dictionary")
+
+    if args.migrate:
+        print("📦 Compressing full_text...")
+        store.migrate(batch_size=args.batch_size)
+
+    if args.rebuild_fts:
+        store.rebuild_fts()
+        print("✓ document_texts_fts rebuilt")
+
+    if args.stats:
+        conn = sqlite3.connect(args.db)
+        init_text_tables(conn)
+        stats = store.storage_stats(conn.cursor())
+        conn.close()
+
+        print("\n📊 Text storage:")
+        for doc_type, codec, count, raw, stored in stats['compressed']:
+            ratio = (raw or 0) / max(stored or 1, 1)
+            print(f"   {doc_type:15s} {codec:5s} {count:8,} texts  "
+                  f"{(raw or 0) / 1e6:9.1f} MB → {(stored or 0) / 1e6:8.1f} MB  ({ratio:.1f}x)")
+        for doc_type, count, size in stats['plain']:
+            print(f"   {doc_type:15s} plain {count:8,} texts  {size / 1e6:9.1f} MB (not migrated)")
+
+    if not (args.train or args.migrate or args.rebuild_fts or args.stats):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
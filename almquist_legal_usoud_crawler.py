@@ -4,13 +4,18 @@ ALMQUIST Legal - Ústavní Soud Crawler
 Crawls decisions from Constitutional Court (nalus.usoud.cz)
 """
 
-import sqlite3
 import requests
 from bs4 import BeautifulSoup
 import time
 from datetime import datetime
 import json
 import re
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_content_hash import compute_content_hash, ensure_content_hash_columns
+from almquist_legal_db_writer import get_writer
 
 class UstavniSoudCrawler:
     """Crawler for Ústavní soud decisions"""
@@ -21,6 +26,8 @@ class UstavniSoudCrawler:
         self.session.headers.update({
             'User-Agent': 'ALMQUIST Legal RAG Bot/1.0 (Educational Purpose)'
         })
+        ensure_content_hash_columns(self.db_path)
+        self.writer = get_writer(self.db_path)
 
     def crawl_usoud_search(self, max_results=30):
         """Crawl ÚS decisions via search interface"""
@@ -84,52 +91,29 @@ class UstavniSoudCrawler:
             return []
 
     def save_decision(self, decision_info, court_name="Ústavní soud"):
-        """Save ÚS decision to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
+        """Queue ÚS decision for the shared DB writer (insert if new)"""
         case_number = decision_info.get('case_number', 'Unknown')
 
-        # Check if decision already exists
-        cursor.execute('''
-        SELECT id FROM court_decisions
-        WHERE case_number = ? AND court_level = 'constitutional'
-        ''', (case_number,))
-
-        existing = cursor.fetchone()
-
-        if existing:
-            print(f"   ⚠️  Decision {case_number} already exists")
-            conn.close()
-            return existing[0]
-
         # Parse date if available
         decision_date = decision_info.get('decision_date')
 
-        # Insert new decision
-        cursor.execute('''
-        INSERT INTO court_decisions (
-            case_number, court_level, court_name,
-            decision_type, decision_date,
-            legal_area, summary, full_text, source_url
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            case_number,
-            'constitutional',
-            court_name,
-            decision_info.get('decision_type', 'nalez'),
-            decision_date,
-            decision_info.get('legal_area', 'ustavni'),
-            decision_info.get('summary', ''),
-            decision_info.get('full_text', ''),
-            decision_info.get('url', '')
-        ))
-
-        decision_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-
-        return decision_id
+        values = {
+            'case_number': case_number,
+            'court_level': 'constitutional',
+            'court_name': court_name,
+            'decision_type': decision_info.get('decision_type', 'nalez'),
+            'decision_date': decision_date,
+            'legal_area': decision_info.get('legal_area', 'ustavni'),
+            'summary': decision_info.get('summary', ''),
+            'full_text': decision_info.get('full_text', ''),
+            'content_hash': compute_content_hash(decision_info.get('full_text', '')),
+            'source_url': decision_info.get('url', '')
+        }
+
+        return self.writer.upsert(
+            'court_decisions', values,
+            match=[{'case_number': case_number, 'court_level': 'constitutional'}]
+        )
 
     def crawl_usoud_decisions(self, max_results=30):
         """Main crawl function for ÚS"""
@@ -167,12 +151,13 @@ class UstavniSoudCrawler:
                 }
             ]
 
-            success_count = 0
+            futures = []
             for decision in sample_decisions:
-                decision_id = self.save_decision(decision)
-                if decision_id:
-                    print(f"   ✓ Created sample: {decision['case_number']} (ID: {decision_id})")
-                    success_count += 1
+                futures.append(self.save_decision(decision))
+                print(f"   ✓ Queued sample: {decision['case_number']}")
+
+            stats = self.writer.flush_report(futures)
+            success_count = stats['inserted'] + stats['updated']
 
             print("\n" + "=" * 70)
             print("⚠️  ÚS CRAWLER - SAMPLE DATA CREATED")
@@ -185,12 +170,13 @@ class UstavniSoudCrawler:
             return
 
         # Process found decisions
-        success_count = 0
+        futures = []
         for decision in decisions:
-            decision_id = self.save_decision(decision)
-            if decision_id:
-                print(f"   ✓ Saved: {decision.get('case_number', 'Unknown')} (ID: {decision_id})")
-                success_count += 1
+            futures.append(self.save_decision(decision))
+            print(f"   ✓ Queued: {decision.get('case_number', 'Unknown')}")
+
+        stats = self.writer.flush_report(futures)
+        success_count = stats['inserted'] + stats['updated']
 
         print("\n" + "=" * 70)
         print("✅ ÚSTAVNÍ SOUD CRAWL COMPLETED")
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST LLM Client
+Sdílený klient Ollama API: keep-alive spojení, omezený počet souběžných
+generování, fronta, timeouty, zrušení a směrování mezi více endpointy
+
+- každý endpoint má max_concurrent slotů; slot = jedna requests.Session
+  s keep-alive spojením (bez nového TCP spojení na každou odpověď)
+- když jsou všechny sloty obsazené, volající čeká ve frontě (max
+  queue_timeout, pak LLMBusyError) - Ollama se nepřetíží
+- více endpointů (ALMQUIST_LLM_ENDPOINTS="http://a:11434,http://b:11434"):
+  dotaz jde na endpoint s nejméně běžícími generováními; endpoint, který
+  neodpovídá, se na DOWN_SECONDS vyřadí a dotaz zkusí další
+- "keep_alive" v každém požadavku drží model v paměti Ollama, warm() ho
+  načte předem (místo testovacího generování)
+- zrušení: threading.Event (cancel) nebo close() streamu - spojení se
+  zavře a Ollama generování ukončí
+- submit() vrací Future (běží ve vlastním poolu vláken)
+
+Usage:
+    from almquist_llm_client import get_llm_client
+    llm = get_llm_client("http://localhost:11434")
+    for event in llm.stream("llama3.2:3b", prompt):
+        print(event.get('response', ''), end='')
+
+    python3 almquist_llm_client.py --status
+    python3 almquist_llm_client.py --generate "Ahoj" --endpoints http://localhost:11434
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+DEFAULT_ENDPOINT = 'http://localhost:11434'
+DEFAULT_ENDPOINTS = os.environ.get('ALMQUIST_LLM_ENDPOINTS', DEFAULT_ENDPOINT)
+MAX_CONCURRENT = int(os.environ.get('ALMQUIST_LLM_MAX_CONCURRENT', 2))  # per endpoint
+KEEP_ALIVE = os.environ.get('ALMQUIST_LLM_KEEP_ALIVE', '30m')
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 60.0  # between two streamed tokens, not for the whole answer
+QUEUE_TIMEOUT = 60.0
+DOWN_SECONDS = 30.0
+
+
+class LLMError(RuntimeError):
+    """Chyba LLM endpointu (HTTP status, chyba v odpovědi)"""
+
+
+class LLMBusyError(LLMError):
+    """Všechny sloty obsazené déle než queue_timeout"""
+
+
+class LLMCancelled(LLMError):
+    """Generování zrušeno volajícím (cancel event)"""
+
+
+class _Endpoint:
+    __slots__ = ('url', 'max_concurrent', 'in_flight', 'sessions', 'down_until',
+                 'requests', 'errors', 'tokens')
+
+    def __init__(self, url, max_concurrent):
+        self.url = url.rstrip('/')
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.sessions = []  # idle keep-alive sessions (<= max_concurrent)
+        self.down_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.tokens = 0
+
+
+def _parse_endpoints(endpoints):
+    if isinstance(endpoints, str):
+        endpoints = endpoints.split(',')
+    return [url.strip() for url in endpoints if url and url.strip()]
+
+
+class LLMClient:
+    """Pool spojení + semafor se frontou nad jedním nebo více Ollama endpointy"""
+
+    def __init__(self, endpoints=DEFAULT_ENDPOINTS, max_concurrent=MAX_CONCURRENT, keep_alive=KEEP_ALIVE,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, queue_timeout=QUEUE_TIMEOUT):
+        urls = _parse_endpoints(endpoints)
+        if not urls:
+            raise ValueError("At least one LLM endpoint is required")
+
+        self.endpoints = [_Endpoint(url, max_concurrent) for url in urls]
+        self.keep_alive = keep_alive
+        self.timeout = (connect_timeout, read_timeout)
+        self.queue_timeout = queue_timeout
+
+        self._cond = threading.Condition()
+        self._waiting = 0
+        self._next = 0  # round robin among equally loaded endpoints
+        self._executor = None
+
+    @property
+    def capacity(self):
+        return sum(endpoint.max_concurrent for endpoint in self.endpoints)
+
+    # ------------------------------------------------------------------
+    # Slots
+    # ------------------------------------------------------------------
+
+    def _pick(self, exclude):
+        """Endpoint s volným slotem a nejméně běžícími požadavky (vyřazené až nakonec)"""
+        now = time.monotonic()
+        count = len(self.endpoints)
+        candidates = []
+        for offset in range(count):
+            endpoint = self.endpoints[(self._next + offset) % count]
+            if endpoint in exclude or endpoint.in_flight >= endpoint.max_concurrent:
+                continue
+            candidates.append((endpoint.down_until > now, endpoint.in_flight, offset, endpoint))
+        if not candidates:
+            return None
+        self._next = (self._next + 1) % count
+        return min(candidates, key=lambda candidate: candidate[:3])[3]
+
+    def _acquire(self, cancel=None, exclude=()):
+        """Čeká na volný slot; vrací (endpoint, session)"""
+        deadline = time.monotonic() + self.queue_timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        raise LLMCancelled("LLM request cancelled while queued")
+                    endpoint = self._pick(exclude)
+                    if endpoint is not None:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMBusyError(f"LLM busy: {self.capacity} generations running, "
+                                           f"waited {self.queue_timeout:.1f}s")
+                    # Short waits so a cancel event is noticed while queued
+                    self._cond.wait(min(remaining, 0.1) if cancel is not None else remaining)
+
+                endpoint.in_flight += 1
+                endpoint.requests += 1
+                session = endpoint.sessions.pop() if endpoint.sessions else None
+            finally:
+                self._waiting -= 1
+
+        return endpoint, session or requests.Session()
+
+    def _release(self, endpoint, session, failed=False):
+        with self._cond:
+            endpoint.in_flight -= 1
+            if failed:
+                endpoint.errors += 1
+                endpoint.down_until = time.monotonic() + DOWN_SECONDS
+                session.close()  # Don't reuse a broken connection
+            else:
+                endpoint.down_until = 0.0
+                endpoint.sessions.append(session)
+            # A single woken waiter may not be able to use this endpoint (exclude)
+            self._cond.notify_all()
+
+    def _post(self, path, payload, stream=False, cancel=None):
+        """
+        POST na první dostupný endpoint; při chybě spojení zkusí další.
+        Vrací (endpoint, session, response) - volající musí zavolat _release.
+        """
+        tried = []
+        while True:
+            endpoint, session = self._acquire(cancel, exclude=tried)
+            try:
+                response = session.post(f"{endpoint.url}{path}", json=payload, stream=stream,
+                                        timeout=self.timeout)
+            except requests.exceptions.ConnectionError:
+                self._release(endpoint, session, failed=True)
+                tried.append(endpoint)
+                if len(tried) == len(self.endpoints):
+                    raise
+                continue
+            except BaseException:
+                self._release(endpoint, session, failed=True)  # Timeout, interrupt: slot must not leak
+                raise
+
+            if response.status_code != 200:
+                try:
+                    message = response.json().get('error', '')
+                except ValueError:
+                    message = response.text[:200]
+                response.close()
+                self._release(endpoint, session)
+                raise LLMError(f"LLM generation failed (status {response.status_code}) {message}".strip())
+
+            return endpoint, session, response
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def _payload(self, model, prompt, options, stream):
+        payload = {"model": model, "prompt": prompt, "stream": stream, "keep_alive": self.keep_alive}
+        if options:
+            payload["options"] = options
+        return payload
+
+    def stream(self, model, prompt, options=None, cancel=None):
+        """
+        Streamované generování: yielduje NDJSON události Ollama
+        ({"response": token, "done": false} ..., {"done": true, "eval_count": ...}).
+        close() generátoru nebo cancel.set() spojení zavře a uvolní slot.
+        """
+        endpoint, session, response = self._post(
+            "/api/generate", self._payload(model, prompt, options, True), stream=True, cancel=cancel)
+        failed = False
+        try:
+            for line in response.iter_lines():
+                if cancel is not None and cancel.is_set():
+                    raise LLMCancelled("LLM generation cancelled")
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get('error'):
+                    raise LLMError(event['error'])
+                yield event
+                if event.get('done'):
+                    # No break: read the terminating chunk so the connection goes back to the pool
+                    endpoint.tokens += event.get('eval_count', 0)
+        except requests.exceptions.RequestException:
+            failed = True
+            raise
+        finally:
+            response.close()
+            self._release(endpoint, session, failed=failed)
+
+    def generate(self, model, prompt, options=None, cancel=None):
+        """Celá odpověď najednou (poslední událost + 'response' = celý text)"""
+        pieces, final = [], {}
+        for event in self.stream(model, prompt, options, cancel):
+            pieces.append(event.get('response', ''))
+            final = event
+        return {**final, 'response': ''.join(pieces)}
+
+    def submit(self, model, prompt, options=None, cancel=None):
+        """generate() na pozadí; Future.cancel() zruší dotaz, který ještě čeká ve frontě"""
+        with self._cond:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.capacity, thread_name_prefix="llm-client")
+        return self._executor.submit(self.generate, model, prompt, options, cancel)
+
+    def warm(self, model):
+        """
+        Načte model do paměti a připne ho na keep_alive (prázdný prompt = jen load).
+        Slouží i jako test spojení; vrací True/False.
+        """
+        try:
+            self.generate(model, "")
+            return True
+        except (LLMError, requests.exceptions.RequestException) as e:
+            print(f"   LLM connection test failed: {e}")
+            return False
+
+    def status(self):
+        with self._cond:
+            now = time.monotonic()
+            return {
+                'capacity': self.capacity,
+                'in_flight': sum(endpoint.in_flight for endpoint in self.endpoints),
+                'queued': self._waiting,
+                'keep_alive': self.keep_alive,
+                'endpoints': {
+                    endpoint.url: {
+                        'in_flight': endpoint.in_flight,
+                        'max_concurrent': endpoint.max_concurrent,
+                        'idle_connections': len(endpoint.sessions),
+                        'requests': endpoint.requests,
+                        'errors': endpoint.errors,
+                        'tokens': endpoint.tokens,
+                        'down': endpoint.down_until > now,
+                    } for endpoint in self.endpoints
+                }
+            }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm_client(endpoints=None, max_concurrent=None):
+    """
+    Sdílený LLM klient pro dané endpointy (jeden limit souběžnosti na proces).
+    endpoints: URL, "url1,url2" nebo seznam; None = ALMQUIST_LLM_ENDPOINTS.
+    max_concurrent platí jen při prvním vytvoření klienta.
+    """
+    urls = tuple(_parse_endpoints(endpoints or DEFAULT_ENDPOINTS))
+    with _clients_lock:
+        if urls not in _clients:
+            _clients[urls] = LLMClient(urls, max_concurrent=max_concurrent or MAX_CONCURRENT)
+        return _clients[urls]
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Almquist LLM client (pooled, concurrency-limited Ollama access)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Check endpoints + load the model (keep_alive)
+  python3 almquist_llm_client.py --status --endpoints http://localhost:11434,http://100.90.154.98:11434
+
+  # Generate through the client
+  python3 almquist_llm_client.py --generate "Co je kupní smlouva?" --model llama3.2:3b
+
+  # 20 parallel generations, max 2 per endpoint (the rest wait in the queue)
+  python3 almquist_llm_client.py --parallel 20 --max-concurrent 2
+        """
+    )
+    parser.add_argument('--endpoints', default=DEFAULT_ENDPOINTS, help='Comma-separated Ollama URLs')
+    parser.add_argument('--model', default='llama3.2:3b')
+    parser.add_argument('--max-concurrent', type=int, default=MAX_CONCURRENT, help='Generations per endpoint')
+    parser.add_argument('--status', action='store_true', help='Warm up the model on every endpoint')
+    parser.add_argument('--generate', metavar='PROMPT', help='Stream one answer')
+    parser.add_argument('--parallel', type=int, metavar='N', help='Run N generations concurrently')
+
+    args = parser.parse_args()
+    client = get_llm_client(args.endpoints, max_concurrent=args.max_concurrent)
+
+    if args.status:
+        for endpoint in client.endpoints:
+            single = LLMClient([endpoint.url])
+            ok = single.warm(args.model)
+            print(f"   {'✅' if ok else '❌'} {endpoint.url} ({args.model}, keep_alive {client.keep_alive})")
+    elif args.generate:
+        start = time.perf_counter()
+        for event in client.stream(args.model, args.generate):
+            print(event.get('response', ''), end='', flush=True)
+        print(f"\n⏱️  {time.perf_counter() - start:.2f}s")
+    elif args.parallel:
+        start = time.perf_counter()
+        futures = [client.submit(args.model, f"Napiš jednu větu o číslu {i}.", {'num_predict': 32})
+                   for i in range(args.parallel)]
+        errors = 0
+        for future in futures:
+            try:
+                future.result()
+            except LLMError as e:
+                errors += 1
+                print(f"   ❌ {e}")
+        print(f"⏱️  {args.parallel} generations in {time.perf_counter() - start:.2f}s ({errors} errors)")
+        print(json.dumps(client.status(), indent=2))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
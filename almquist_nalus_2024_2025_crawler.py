@@ -4,7 +4,6 @@ ALMQUIST NALUS Crawler for 2024-2025
 Crawls recent Constitutional Court decisions missing from Zenodo dataset
 """
 
-import sqlite3
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -14,6 +13,12 @@ from selenium.webdriver.firefox.service import Service
 import time
 from datetime import datetime
 import re
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_content_hash import compute_content_hash, ensure_content_hash_columns
+from almquist_legal_db_writer import get_writer
 
 class NALUSRecentCrawler:
     """Selenium crawler for NALUS 2024-2025 decisions"""
@@ -21,6 +26,8 @@ class NALUSRecentCrawler:
     def __init__(self, db_path="/home/puzik/almquist_legal_sources.db"):
         self.db_path = db_path
         self.base_url = "https://nalus.usoud.cz"
+        ensure_content_hash_columns(self.db_path)
+        self.writer = get_writer(self.db_path)
 
         # Setup headless Firefox
         options = Options()
@@ -145,45 +152,22 @@ class NALUSRecentCrawler:
             return None
 
     def save_decision(self, decision):
-        """Save decision to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        try:
-            # Check if exists
-            if decision['ecli']:
-                cursor.execute('SELECT id FROM court_decisions WHERE ecli = ?', (decision['ecli'],))
-            else:
-                cursor.execute('SELECT id FROM court_decisions WHERE case_number = ? AND source = ?',
-                               (decision['case_number'], 'usoud.cz'))
-
-            if cursor.fetchone():
-                conn.close()
-                return False  # Already exists
-
-            # Insert
-            cursor.execute('''
-                INSERT INTO court_decisions
-                (case_number, court_level, court_name, ecli, full_text, source_url, source)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                decision['case_number'],
-                'Ústavní soud',
-                'Ústavní soud',
-                decision['ecli'],
-                decision['full_text'],
-                decision['url'],
-                'usoud.cz'
-            ))
-
-            conn.commit()
-            conn.close()
-            return True
-
-        except Exception as e:
-            print(f"         ✗ Error saving: {e}")
-            conn.close()
-            return False
+        """Queue decision for the shared DB writer (insert if ECLI / case number is new)"""
+        if decision['ecli']:
+            match = [{'ecli': decision['ecli']}]
+        else:
+            match = [{'case_number': decision['case_number'], 'source': 'usoud.cz'}]
+
+        return self.writer.upsert('court_decisions', {
+            'case_number': decision['case_number'],
+            'court_level': 'Ústavní soud',
+            'court_name': 'Ústavní soud',
+            'ecli': decision['ecli'],
+            'full_text': decision['full_text'],
+            'content_hash': compute_content_hash(decision['full_text']),
+            'source_url': decision['url'],
+            'source': 'usoud.cz'
+        }, match=match)
 
     def crawl_years(self, years=[2024, 2025]):
         """Crawl decisions from specified years"""
@@ -191,7 +175,6 @@ class NALUSRecentCrawler:
         print("=" * 60)
 
         total_found = 0
-        total_saved = 0
 
         for year in years:
             # Search for decisions
@@ -206,19 +189,19 @@ class NALUSRecentCrawler:
                 decision = self.crawl_decision_detail(dec_info)
 
                 if decision:
-                    # Save to DB
-                    if self.save_decision(decision):
-                        print(f"      ✓ Saved")
-                        total_saved += 1
-                    else:
-                        print(f"      - Already exists")
+                    # Queue for DB (duplicates are skipped by the writer)
+                    self.save_decision(decision)
+                    print(f"      ✓ Queued")
 
                 time.sleep(2)  # Be gentle with server
 
+        stats = self.writer.flush()
+
         print("\n" + "=" * 60)
         print(f"🎉 CRAWLER COMPLETE!")
         print(f"   Found: {total_found}")
-        print(f"   Saved: {total_saved}")
+        print(f"   Saved: {stats['inserted']}")
+        print(f"   Already existed: {stats['exists']}")
 
         self.driver.quit()
 
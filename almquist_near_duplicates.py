@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Near-Duplicate Index
+MinHash + LSH banding pro detekci téměř shodných dokumentů v legal DB
+
+Znovu publikovaná rozhodnutí se často liší jen whitespace, hlavičkou nebo
+anonymizací - SHA256 je nenajde. MinHash signatury jsou uložené per dokument
+v SQLite (document_signatures) a LSH buckety (document_lsh_bands) umožní
+najít kandidáty jedním indexovaným self-joinem místo O(n²) porovnání.
+
+Usage:
+    python3 almquist_near_duplicates.py --update
+    python3 almquist_near_duplicates.py --find --threshold 0.85
+"""
+
+import re
+import os
+import sys
+import sqlite3
+import hashlib
+import numpy as np
+from datetime import datetime
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_content_hash import backfill_content_hashes, EMPTY_CONTENT_HASH
+from almquist_legal_text_store import get_text_store
+
+
+NUM_PERM = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS  # LSH threshold ~ (1/16)^(1/8) ≈ 0.71
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Anonymizace a šum, který se mezi publikacemi liší
+_ANONYMIZED_RE = re.compile(r'\[[^\]]{0,60}\]|\*{2,}|x{2,}')
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+# Tabulky s texty (full_text, viz almquist_legal_text_store): document_type -> table
+DOCUMENT_TABLES = {
+    'court_decision': 'court_decisions',
+    'law': 'laws',
+}
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Množina slovních n-gramů normalizovaného textu"""
+    text = _ANONYMIZED_RE.sub(' ', text.lower())
+    tokens = [t for t in _NON_WORD_RE.split(text) if len(t) > 1]
+
+    if len(tokens) < size:
+        return {' '.join(tokens)} if tokens else set()
+
+    return {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatury s pevnými (seedovanými) permutacemi"""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        """uint32 signatura délky num_perm; prázdná množina -> None (nic k porovnání)"""
+        if not shingle_set:
+            return None
+
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little')
+             for s in shingle_set),
+            dtype=np.uint64,
+            count=len(shingle_set)
+        )
+
+        # (a*x + b) mod p, a,b,x < 2^32 so the product fits into uint64;
+        # blocks keep the temporary matrix small for long laws
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), 8192):
+            block = hashes[start:start + 8192]
+            permuted = (np.outer(block, self.a) + self.b) % _MERSENNE_PRIME
+            np.minimum(signature, (permuted & _MAX_HASH).min(axis=0), out=signature)
+
+        return signature.astype(np.uint32)
+
+    @staticmethod
+    def jaccard(sig_a, sig_b):
+        """Odhad Jaccardovy podobnosti ze dvou signatur"""
+        return float(np.mean(sig_a == sig_b))
+
+
+def band_buckets(signature, bands=BANDS, rows=ROWS_PER_BAND):
+    """LSH bucket klíč (signed int64 pro SQLite) pro každý band"""
+    buckets = []
+    for band in range(bands):
+        chunk = signature[band * rows:(band + 1) * rows].tobytes()
+        digest = hashlib.blake2b(chunk, digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, 'little', signed=True)))
+    return buckets
+
+
+class NearDuplicateIndex:
+    """Perzistentní MinHash/LSH index nad laws a court_decisions"""
+
+    def __init__(self, legal_db="/home/puzik/almquist_legal_sources.db"):
+        self.legal_db = legal_db
+        self.hasher = MinHasher()
+
+    def init_tables(self, conn):
+        """Tabulky signatur a LSH bucketů + triggery pro invalidaci"""
+        cursor = conn.cursor()
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS document_signatures (
+            document_type TEXT NOT NULL,
+            document_id INTEGER NOT NULL,
+            minhash BLOB NOT NULL,
+            signed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (document_type, document_id)
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS document_lsh_bands (
+            document_type TEXT NOT NULL,
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            document_id INTEGER NOT NULL
+        )
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_lsh_bucket
+        ON document_lsh_bands(document_type, band, bucket)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_lsh_document
+        ON document_lsh_bands(document_type, document_id)
+        ''')
+
+        # Changed or deleted text invalidates the signature; the next
+        # update_signatures() run re-signs only those rows
+        for document_type, table in DOCUMENT_TABLES.items():
+            invalidate = f'''
+                DELETE FROM document_signatures
+                WHERE document_type = '{document_type}' AND document_id = OLD.id;
+                DELETE FROM document_lsh_bands
+                WHERE document_type = '{document_type}' AND document_id = OLD.id;
+            '''
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_sig_delete
+            AFTER DELETE ON {table}
+            BEGIN {invalidate} END
+            ''')
+            # Keyed on content_hash: moving full_text into the compressed
+            # store (full_text -> NULL) must not invalidate signatures
+            cursor.execute(f'DROP TRIGGER IF EXISTS trg_{table}_sig_update')
+            cursor.execute(f'''
+            CREATE TRIGGER trg_{table}_sig_update
+            AFTER UPDATE OF content_hash ON {table}
+            WHEN OLD.content_hash IS NOT NULL AND OLD.content_hash IS NOT NEW.content_hash
+            BEGIN {invalidate} END
+            ''')
+
+        # Older runs signed empty texts with an all-max signature; those all
+        # share every bucket and would form one big false "duplicate" group
+        empty = np.full(self.hasher.num_perm, _MAX_HASH, dtype=np.uint32).tobytes()
+        cursor.execute('''
+        DELETE FROM document_lsh_bands
+        WHERE (document_type, document_id) IN (
+            SELECT document_type, document_id FROM document_signatures WHERE minhash = ?
+        )
+        ''', (empty,))
+        cursor.execute('DELETE FROM document_signatures WHERE minhash = ?', (empty,))
+
+        conn.commit()
+
+    def add_document(self, cursor, document_type, document_id, text):
+        """
+        Spočítá a uloží signaturu jednoho dokumentu (v transakci volajícího).
+        Text bez shinglů (prázdný, jen zkratky) se nepodepisuje - vrací None.
+        """
+        signature = self.hasher.signature(shingles(text or ''))
+
+        cursor.execute('''
+        DELETE FROM document_lsh_bands WHERE document_type = ? AND document_id = ?
+        ''', (document_type, document_id))
+        if signature is None:
+            cursor.execute('''
+            DELETE FROM document_signatures WHERE document_type = ? AND document_id = ?
+            ''', (document_type, document_id))
+            return None
+
+        cursor.execute('''
+        INSERT OR REPLACE INTO document_signatures (document_type, document_id, minhash, signed_at)
+        VALUES (?, ?, ?, ?)
+        ''', (document_type, document_id, signature.tobytes(), datetime.now().isoformat()))
+        cursor.executemany('''
+        INSERT INTO document_lsh_bands (document_type, band, bucket, document_id)
+        VALUES (?, ?, ?, ?)
+        ''', [(document_type, band, bucket, document_id)
+              for band, bucket in band_buckets(signature)])
+
+        return signature
+
+    def update_signatures(self, document_type='court_decision', batch_size=500):
+        """
+        Inkrementálně podepíše jen dokumenty bez signatury
+        (nové řádky od crawlerů, nebo změněné - viz triggery)
+        """
+        table = DOCUMENT_TABLES[document_type]
+
+        # Legacy rows get content_hash first - the pending query filters on it
+        backfill_content_hashes(self.legal_db, verbose=False)
+
+        conn = sqlite3.connect(self.legal_db)
+        self.init_tables(conn)
+
+        cursor = conn.cursor()
+
+        # Only ids up front; texts are read batch by batch, so memory stays
+        # bounded and the join is not read while signatures are written
+        cursor.execute(f'''
+        SELECT d.id
+        FROM {table} d
+        LEFT JOIN document_signatures s
+            ON s.document_type = ? AND s.document_id = d.id
+        WHERE s.document_id IS NULL
+            AND d.content_hash IS NOT NULL AND d.content_hash != ?
+        ORDER BY d.id
+        ''', (document_type, EMPTY_CONTENT_HASH))
+        pending_ids = [row[0] for row in cursor.fetchall()]
+
+        signed = 0
+        for start in range(0, len(pending_ids), batch_size):
+            batch = pending_ids[start:start + batch_size]
+            texts = get_text_store(self.legal_db).load_full_texts(cursor, document_type, batch)
+
+            for doc_id, text in texts.items():
+                if self.add_document(cursor, document_type, doc_id, text) is not None:
+                    signed += 1
+
+            conn.commit()
+
+        conn.close()
+        return signed
+
+    def find_near_duplicates(self, document_type='court_decision', threshold=0.85):
+        """
+        Skupiny téměř shodných dokumentů
+        Kandidáti = dokumenty sdílející alespoň jeden LSH bucket (indexovaný
+        self-join), pak ověření odhadem Jaccard ze signatur.
+        Returns: list of sorted id lists
+        """
+        conn = sqlite3.connect(self.legal_db)
+        self.init_tables(conn)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+        SELECT DISTINCT a.document_id, b.document_id
+        FROM document_lsh_bands a
+        JOIN document_lsh_bands b
+            ON a.document_type = b.document_type
+            AND a.band = b.band
+            AND a.bucket = b.bucket
+            AND a.document_id < b.document_id
+        WHERE a.document_type = ?
+        ''', (document_type,))
+        candidates = cursor.fetchall()
+
+        signatures = {}
+
+        def load_signature(doc_id):
+            if doc_id not in signatures:
+                cursor.execute('''
+                SELECT minhash FROM document_signatures
+                WHERE document_type = ? AND document_id = ?
+                ''', (document_type, doc_id))
+                signatures[doc_id] = np.frombuffer(cursor.fetchone()[0], dtype=np.uint32)
+            return signatures[doc_id]
+
+        # Union-find over verified pairs
+        parent = {}
+
+        def find(x):
+            parent.setdefault(x, x)
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for doc_a, doc_b in candidates:
+            if MinHasher.jaccard(load_signature(doc_a), load_signature(doc_b)) >= threshold:
+                parent[find(doc_a)] = find(doc_b)
+
+        conn.close()
+
+        groups = defaultdict(list)
+        for doc_id in parent:
+            groups[find(doc_id)].append(doc_id)
+
+        return [sorted(ids) for ids in groups.values() if len(ids) > 1]
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Almquist Near-Duplicate Index')
+    parser.add_argument('--db', default="/home/puzik/almquist_legal_sources.db")
+    parser.add_argument('--type', default='court_decision', choices=sorted(DOCUMENT_TABLES))
+    parser.add_argument('--update', action='store_true',
+                        help='Sign new/changed documents (incremental)')
+    parser.add_argument('--find', action='store_true',
+                        help='List near-duplicate groups')
+    parser.add_argument('--threshold', type=float, default=0.85,
+                        help='Minimum estimated Jaccard similarity')
+
+    args = parser.parse_args()
+
+    index = NearDuplicateIndex(args.db)
+
+    if args.update:
+        signed = index.update_signatures(args.type)
+        print(f"✓ Signed {signed} new documents")
+
+    if args.find:
+        groups = index.find_near_duplicates(args.type, threshold=args.threshold)
+        print(f"🔍 Near-duplicate groups: {len(groups)}")
+        for ids in groups[:20]:
+            print(f"   {ids}")
+
+    if not args.update and not args.find:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Ollama Stand-in
+Lokální náhrada Ollama API pro testování streamování bez GPU a modelu
+
+- POST /api/generate podle Ollama protokolu: "stream": true (výchozí jako
+  v Ollama) posílá NDJSON řádky {"response": "<token>", "done": false}
+  po tokenech (chunked), poslední řádek {"done": true, "eval_count", ...}
+- "stream": false vrací jednu JSON odpověď, prázdný prompt jen "načte model"
+- nastavitelná latence prvního tokenu (--ttft-ms) a rychlost (--tokens-per-second),
+  respektuje options.num_predict; --prefill-tokens-per-second přidá k TTFT
+  čas úměrný délce promptu (jako prefill skutečného modelu)
+- GET /api/tags, GET /api/version
+- počítá souběžná generování (max_active) a TCP spojení (connections),
+  aby šel ověřit limit a keep-alive almquist_llm_client
+
+Usage:
+    python3 almquist_ollama_standin.py --serve --port 11435
+    python3 almquist_unified_rag_launcher.py --domain legal --endpoint http://127.0.0.1:11435 -i
+    python3 almquist_ollama_standin.py --check http://127.0.0.1:11435
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 11435  # next to a real Ollama on 11434
+DEFAULT_TTFT_MS = 300
+DEFAULT_TOKENS_PER_SECOND = 40
+
+ANSWER = ("Podle poskytnutého kontextu platí, že {query} Tato odpověď je vygenerována "
+          "lokální náhradou Ollama API a slouží pouze k testování streamování, měření "
+          "latence prvního tokenu a rychlosti generování. Zdroje jsou uvedeny níže.")
+
+
+def _tokens(text):
+    """Slova s mezerou jako tokeny (Ollama posílá podobně velké kousky)"""
+    words = text.split(' ')
+    return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class OllamaStandin:
+    """HTTP server napodobující Ollama /api/generate (stream i non-stream)"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ttft_ms=DEFAULT_TTFT_MS,
+                 tokens_per_second=DEFAULT_TOKENS_PER_SECOND, model='llama3.2:3b',
+                 prefill_tokens_per_second=0):
+        self.host = host
+        self.port = port
+        self.ttft = ttft_ms / 1000.0
+        self.token_interval = 1.0 / tokens_per_second if tokens_per_second else 0.0
+        self.model = model
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.requests = 0
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def _first_token_delay(self, prompt):
+        """TTFT: pevná latence + prefill promptu (slova jako tokeny)"""
+        if not prompt.strip():
+            return 0.0
+        prefill = len(prompt.split()) / self.prefill_tokens_per_second if self.prefill_tokens_per_second else 0.0
+        return self.ttft + prefill
+
+    def _answer_tokens(self, prompt, num_predict):
+        """Odpověď z otázky v promptu (ANSWER), oříznutá na num_predict tokenů"""
+        if not prompt.strip():
+            return []  # Empty prompt = only load the model (Ollama warm-up)
+        query = prompt.rsplit('OTÁZKA UŽIVATELE:', 1)[-1].split('INSTRUKCE:', 1)[0].strip()
+        tokens = _tokens(ANSWER.format(query=query or prompt.strip()[:200]))
+        return tokens[:num_predict] if num_predict and num_predict > 0 else tokens
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # one small write per token
+
+            def setup(self):
+                super().setup()
+                with standin._lock:
+                    standin.connections += 1
+
+            def _send_json(self, data, status=200):
+                body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, data):
+                line = json.dumps(data, ensure_ascii=False).encode('utf-8') + b'\n'
+                self.wfile.write(f"{len(line):x}\r\n".encode('ascii') + line + b'\r\n')
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == '/api/tags':
+                    self._send_json({'models': [{'name': standin.model, 'model': standin.model}]})
+                elif self.path == '/api/version':
+                    self._send_json({'version': 'standin'})
+                else:
+                    self._send_json({'error': 'Not found'}, 404)
+
+            def do_POST(self):
+                if self.path != '/api/generate':
+                    self._send_json({'error': 'Not found'}, 404)
+                    return
+
+                data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                with standin._lock:
+                    standin.requests += 1
+                    standin.active += 1
+                    standin.max_active = max(standin.max_active, standin.active)
+                try:
+                    self._generate(data)
+                finally:
+                    with standin._lock:
+                        standin.active -= 1
+
+            def _generate(self, data):
+                model = data.get('model') or standin.model
+                tokens = standin._answer_tokens(data.get('prompt', ''),
+                                                (data.get('options') or {}).get('num_predict'))
+                start = time.perf_counter()
+                first_token = standin._first_token_delay(data.get('prompt', ''))
+
+                def done_event():
+                    total = time.perf_counter() - start
+                    return {
+                        'model': model,
+                        'created_at': datetime.now(timezone.utc).isoformat(),
+                        'response': '',
+                        'done': True,
+                        'done_reason': 'stop' if tokens else 'load',
+                        'total_duration': int(total * 1e9),
+                        'load_duration': 0,
+                        'prompt_eval_count': len(data.get('prompt', '').split()),
+                        'prompt_eval_duration': int(first_token * 1e9),
+                        'eval_count': len(tokens),
+                        'eval_duration': int(max(total - first_token, 0.0) * 1e9),
+                    }
+
+                if not data.get('stream', True):
+                    time.sleep(first_token + standin.token_interval * len(tokens))
+                    result = done_event()
+                    result['response'] = ''.join(tokens)
+                    self._send_json(result)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                try:
+                    time.sleep(first_token)
+                    for i, token in enumerate(tokens):
+                        if i:
+                            time.sleep(standin.token_interval)
+                        self._write_chunk({'model': model,
+                                           'created_at': datetime.now(timezone.utc).isoformat(),
+                                           'response': token, 'done': False})
+                    self._write_chunk(done_event())
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # Client stopped reading
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """Spustí server ve vlákně na pozadí (testy); vrací URL"""
+        self._server = _HTTPServer((self.host, self.port), self._handler())
+        self.port = self._server.server_address[1]  # port=0: free port
+        threading.Thread(target=self._server.serve_forever, name="ollama-standin", daemon=True).start()
+        return self.url
+
+    def serve_forever(self):
+        self._server = _HTTPServer((self.host, self.port), self._handler())
+        print(f"🚀 Ollama stand-in listening on {self.url}")
+        print(f"   First token after {self.ttft * 1000:.0f} ms, then "
+              f"{1 / self.token_interval if self.token_interval else float('inf'):.0f} tokens/s")
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Stopping Ollama stand-in")
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def check_streaming(url, model='llama3.2:3b', prompt='Kolik dní dovolené mi náleží?'):
+    """Ověří streamování endpointu (Ollama i stand-in): TTFT, tokeny/s, celkový čas"""
+    start = time.perf_counter()
+    ttft, tokens, final = None, 0, {}
+    with requests.post(f"{url.rstrip('/')}/api/generate", json={'model': model, 'prompt': prompt,
+                                                                  'stream': True},
+                       stream=True, timeout=60) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event.get('response'):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                tokens += 1
+            if event.get('done'):
+                final = event
+                break
+
+    total = time.perf_counter() - start
+    return {
+        'ttft_ms': ttft * 1000 if ttft is not None else None,
+        'chunks': tokens,
+        'eval_count': final.get('eval_count'),
+        'tokens_per_second': (final['eval_count'] / (final['eval_duration'] / 1e9)
+                              if final.get('eval_duration') else None),
+        'total_ms': total * 1000,
+    }
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Almquist Ollama stand-in (streaming /api/generate for tests)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Start the stand-in next to a real Ollama
+  python3 almquist_ollama_standin.py --serve --port 11435 --ttft-ms 500 --tokens-per-second 25
+
+  # Use it from the launcher (streamed answers)
+  python3 almquist_unified_rag_launcher.py --domain legal --endpoint http://127.0.0.1:11435 -i
+
+  # Measure TTFT / tokens/s of any Ollama endpoint
+  python3 almquist_ollama_standin.py --check http://localhost:11434 --model llama3.2:3b
+        """
+    )
+    parser.add_argument('--serve', action='store_true', help='Run the stand-in server')
+    parser.add_argument('--check', metavar='URL', help='Measure streaming of an Ollama endpoint')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--ttft-ms', type=float, default=DEFAULT_TTFT_MS, help='Delay before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=DEFAULT_TOKENS_PER_SECOND)
+    parser.add_argument('--prefill-tokens-per-second', type=float, default=0,
+                        help='Add prompt-length dependent prefill time to TTFT (0 = off)')
+    parser.add_argument('--model', default='llama3.2:3b')
+
+    args = parser.parse_args()
+
+    if args.serve:
+        OllamaStandin(args.host, args.port, args.ttft_ms, args.tokens_per_second, args.model,
+                      prefill_tokens_per_second=args.prefill_tokens_per_second).serve_forever()
+    elif args.check:
+        try:
+            report = check_streaming(args.check, model=args.model)
+        except requests.exceptions.RequestException as e:
+            print(f"❌ {args.check}: {e}")
+            return
+        print(f"✅ {args.check} ({args.model})")
+        for key, value in report.items():
+            print(f"   {key}: {value if value is None or isinstance(value, int) else round(value, 1)}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
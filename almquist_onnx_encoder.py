@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST ONNX Encoder
+Int8-kvantizované ONNX verze MiniLM embedding modelů pro CPU
+
+- export: SentenceTransformer -> ONNX (fp32) -> dynamická int8 kvantizace
+  (onnxruntime.quantization), tokenizer + pooling konfigurace vedle modelu
+- OnnxSentenceEncoder: stejné API jako SentenceTransformer.encode(),
+  mean pooling / normalizace podle původního modelu, bez PyTorch za běhu
+- --check-drift: kosinová shoda s fp32 vektory + shoda top-k sousedů
+- --benchmark: texty/s PyTorch fp32 vs. ONNX int8
+
+Výběr backendu: ALMQUIST_EMBEDDING_BACKEND=onnx (viz almquist_embedding_service)
+
+Usage:
+    python3 almquist_onnx_encoder.py --export paraphrase-multilingual-MiniLM-L12-v2
+    python3 almquist_onnx_encoder.py --check-drift paraphrase-multilingual-MiniLM-L12-v2
+    python3 almquist_onnx_encoder.py --benchmark sentence-transformers/all-MiniLM-L6-v2
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import onnxruntime
+    HAS_ONNXRUNTIME = True
+except ImportError:
+    HAS_ONNXRUNTIME = False
+
+
+ONNX_MODELS_DIR = Path(os.environ.get('ALMQUIST_ONNX_DIR', '/home/puzik/almquist_onnx_models'))
+SUPPORTED_MODELS = (
+    'paraphrase-multilingual-MiniLM-L12-v2',
+    'sentence-transformers/all-MiniLM-L6-v2',
+)
+ONNX_OPSET = 14
+
+# Drift limits for int8 vs. fp32 vectors of the same model
+DRIFT_MIN_MEAN_COSINE = 0.99
+DRIFT_MIN_COSINE = 0.97
+DRIFT_MIN_TOPK_OVERLAP = 0.9
+
+SAMPLE_TEXTS = [
+    "Náhrada škody způsobené zaměstnancem při plnění pracovních úkolů.",
+    "Dovolání se zamítá, neboť napadené rozhodnutí je věcně správné.",
+    "Kdo vlastním zaviněním poruší povinnost stanovenou zákonem, nahradí škodu.",
+    "Ústavní soud nálezem zrušil ustanovení zákona o veřejném zdravotním pojištění.",
+    "Živnostník musí vést daňovou evidenci a podat přiznání k dani z příjmů.",
+    "Kupní smlouva na nemovitost vyžaduje písemnou formu a podpisy na téže listině.",
+    "Nejvyšší správní soud posuzoval kasační stížnost proti rozhodnutí krajského soudu.",
+    "Výpověď z nájmu bytu musí obsahovat poučení o právu nájemce podat námitky.",
+    "Dotace z programu OP TAK lze čerpat na modernizaci výrobních technologií.",
+    "Správce daně vyměřil daň podle pomůcek, protože daňový subjekt neprokázal výdaje.",
+    "Soud prvního stupně nesprávně posoudil promlčení nároku na zaplacení kupní ceny.",
+    "Zaměstnavatel je povinen zajistit bezpečnost a ochranu zdraví při práci.",
+    "How do I register a limited liability company in the Czech Republic?",
+    "def compute_content_hash(text): return hashlib.sha256(text.encode()).hexdigest()",
+    "Insolvenční správce popřel pohledávku věřitele co do výše i pořadí.",
+    "Rodičovská odpovědnost zahrnuje péči o dítě a správu jeho jmění.",
+]
+
+
+def model_dir(model_name):
+    """Adresář s exportovaným modelem (podle posledního segmentu jména)"""
+    return ONNX_MODELS_DIR / model_name.split('/')[-1]
+
+
+def export_model(model_name, output_dir=None, opset=ONNX_OPSET):
+    """
+    Exportuje SentenceTransformer model do ONNX a kvantizuje váhy na int8
+    Potřebuje sentence_transformers + torch + onnxruntime (jen při exportu).
+    Returns: output directory
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    output_dir = Path(output_dir) if output_dir else model_dir(model_name)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"📦 Exporting {model_name} → {output_dir}")
+    st_model = SentenceTransformer(model_name, device='cpu')
+    transformer = st_model[0]
+    tokenizer = transformer.tokenizer
+
+    sample = tokenizer(SAMPLE_TEXTS[:2], return_tensors='pt', padding=True, truncation=True)
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+
+    class HiddenStates(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    fp32_path = output_dir / 'model.onnx'
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStates(transformer.auto_model).eval(),
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+    print(f"   ✓ fp32 ONNX: {fp32_path.stat().st_size / 1e6:.1f} MB")
+
+    int8_path = output_dir / 'model_int8.onnx'
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    print(f"   ✓ int8 ONNX: {int8_path.stat().st_size / 1e6:.1f} MB")
+
+    tokenizer.save_pretrained(str(output_dir))
+
+    pooling = st_model[1]
+    config = {
+        'model_name': model_name,
+        'max_seq_length': st_model.max_seq_length,
+        'dimension': st_model.get_sentence_embedding_dimension(),
+        'pooling': 'cls' if pooling.pooling_mode_cls_token else 'mean',
+        'normalize': any(type(module).__name__ == 'Normalize' for module in st_model),
+        'inputs': input_names,
+        'exported_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    with open(output_dir / 'almquist_onnx.json', 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    print(f"   ✓ Config: pooling={config['pooling']}, normalize={config['normalize']}, "
+          f"max_seq_length={config['max_seq_length']}")
+
+    return output_dir
+
+
+class OnnxSentenceEncoder:
+    """Náhrada SentenceTransformer pro encode() nad ONNX Runtime (CPU)"""
+
+    def __init__(self, model_name, model_path=None, quantized=True, num_threads=None):
+        if not HAS_ONNXRUNTIME:
+            raise ImportError("onnxruntime is not installed (pip install onnxruntime)")
+
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.model_path = Path(model_path) if model_path else model_dir(model_name)
+
+        onnx_file = self.model_path / ('model_int8.onnx' if quantized else 'model.onnx')
+        config_file = self.model_path / 'almquist_onnx.json'
+        if not onnx_file.exists() or not config_file.exists():
+            raise FileNotFoundError(
+                f"ONNX model not exported: {onnx_file} "
+                f"(run: python3 almquist_onnx_encoder.py --export {model_name})")
+
+        with open(config_file, 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = onnxruntime.InferenceSession(str(onnx_file), options,
+                                                    providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_path))
+        self.max_seq_length = self.config['max_seq_length']
+
+    def get_sentence_embedding_dimension(self):
+        return self.config['dimension']
+
+    def _encode_batch(self, texts):
+        tokens = self.tokenizer(texts, padding=True, truncation=True,
+                                max_length=self.max_seq_length, return_tensors='np')
+        feed = {name: tokens[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feed)[0]
+
+        if self.config['pooling'] == 'cls':
+            return hidden[:, 0]
+
+        mask = tokens['attention_mask'][..., None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=None,
+               convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        """Jako SentenceTransformer.encode(); vrací numpy float32"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        if not texts:
+            return np.zeros((0, self.config['dimension']), dtype='float32')
+
+        # Sort by length so batches pad as little as possible (as SentenceTransformer does)
+        order = np.argsort([-len(text) for text in texts])
+        embeddings = np.empty((len(texts), self.config['dimension']), dtype='float32')
+
+        for start in range(0, len(texts), batch_size):
+            batch_idx = order[start:start + batch_size]
+            embeddings[batch_idx] = self._encode_batch([texts[i] for i in batch_idx])
+
+        if normalize_embeddings or self.config['normalize']:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+
+        return embeddings[0] if single else embeddings
+
+
+def _load_texts(texts_file):
+    if not texts_file:
+        return list(SAMPLE_TEXTS)
+    with open(texts_file, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def check_drift(model_name, texts=None, top_k=10):
+    """
+    Porovná int8 ONNX vektory s fp32 (PyTorch) vektory téhož modelu
+    Returns: dict s metrikami + 'ok' podle DRIFT_* limitů
+    """
+    from sentence_transformers import SentenceTransformer
+
+    texts = texts or list(SAMPLE_TEXTS)
+
+    reference = SentenceTransformer(model_name, device='cpu').encode(
+        texts, convert_to_numpy=True, normalize_embeddings=True)
+    quantized = OnnxSentenceEncoder(model_name).encode(texts, normalize_embeddings=True)
+
+    cosines = (reference * quantized).sum(axis=1)
+
+    # Do nearest neighbours stay the same? (each text as a query against all others)
+    k = min(top_k, len(texts) - 1)
+    overlaps = []
+    if k > 0:
+        ref_sim = reference @ reference.T
+        q_sim = quantized @ quantized.T
+        np.fill_diagonal(ref_sim, -np.inf)
+        np.fill_diagonal(q_sim, -np.inf)
+        ref_top = np.argsort(-ref_sim, axis=1)[:, :k]
+        q_top = np.argsort(-q_sim, axis=1)[:, :k]
+        overlaps = [len(set(a) & set(b)) / k for a, b in zip(ref_top, q_top)]
+
+    result = {
+        'model': model_name,
+        'texts': len(texts),
+        'mean_cosine': float(cosines.mean()),
+        'min_cosine': float(cosines.min()),
+        'topk_overlap': float(np.mean(overlaps)) if overlaps else 1.0,
+        'top_k': k
+    }
+    result['ok'] = (result['mean_cosine'] >= DRIFT_MIN_MEAN_COSINE
+                    and result['min_cosine'] >= DRIFT_MIN_COSINE
+                    and result['topk_overlap'] >= DRIFT_MIN_TOPK_OVERLAP)
+    return result
+
+
+def benchmark(model_name, texts=None, batch_size=32, repeat=3):
+    """Propustnost (texty/s) PyTorch fp32 vs. ONNX int8 na stejných textech"""
+    from sentence_transformers import SentenceTransformer
+
+    texts = texts or list(SAMPLE_TEXTS) * 16
+
+    encoders = {
+        'torch_fp32': SentenceTransformer(model_name, device='cpu'),
+        'onnx_int8': OnnxSentenceEncoder(model_name),
+    }
+
+    results = {}
+    for name, encoder in encoders.items():
+        encoder.encode(texts[:batch_size], batch_size=batch_size)  # Warm-up
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+            timings.append(time.perf_counter() - start)
+
+        best = min(timings)
+        results[name] = {'seconds': best, 'texts_per_second': len(texts) / best}
+
+    results['speedup'] = results['onnx_int8']['texts_per_second'] / results['torch_fp32']['texts_per_second']
+    return results
+
+
+def main():
+    """Main function"""
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description='Almquist ONNX int8 encoder (export, drift check, benchmark)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Export both models (needs torch + onnxruntime once)
+  python3 almquist_onnx_encoder.py --export all
+
+  # Accuracy drift vs. fp32 on own texts (one per line); exit code 1 on failure
+  python3 almquist_onnx_encoder.py --check-drift paraphrase-multilingual-MiniLM-L12-v2 --texts-file queries.txt
+
+  # Throughput
+  python3 almquist_onnx_encoder.py --benchmark sentence-transformers/all-MiniLM-L6-v2
+
+  # Use ONNX in all tools (embedding service, RAG, merger, code RAG)
+  export ALMQUIST_EMBEDDING_BACKEND=onnx
+        """
+    )
+    parser.add_argument('--export', metavar='MODEL', help="Model name or 'all'")
+    parser.add_argument('--check-drift', metavar='MODEL')
+    parser.add_argument('--benchmark', metavar='MODEL')
+    parser.add_argument('--texts-file', help='Texts for drift check / benchmark (one per line)')
+    parser.add_argument('--batch-size', type=int, default=32)
+
+    args = parser.parse_args()
+    exit_code = 0
+
+    if args.export:
+        models = SUPPORTED_MODELS if args.export == 'all' else (args.export,)
+        for model_name in models:
+            export_model(model_name)
+
+    if args.check_drift:
+        result = check_drift(args.check_drift, _load_texts(args.texts_file))
+        print(f"\n📐 Drift int8 vs fp32 ({result['model']}, {result['texts']} texts)")
+        print(f"   Mean cosine:        {result['mean_cosine']:.4f}  (min {DRIFT_MIN_MEAN_COSINE})")
+        print(f"   Min cosine:         {result['min_cosine']:.4f}  (min {DRIFT_MIN_COSINE})")
+        print(f"   Top-{result['top_k']} overlap:     {result['topk_overlap']:.1%}  (min {DRIFT_MIN_TOPK_OVERLAP:.0%})")
+        print("   ✅ OK" if result['ok'] else "   ❌ Drift above limits - keep the torch backend")
+        exit_code = 0 if result['ok'] else 1
+
+    if args.benchmark:
+        texts = _load_texts(args.texts_file) if args.texts_file else None
+        results = benchmark(args.benchmark, texts, batch_size=args.batch_size)
+        print(f"\n⏱️  Throughput ({args.benchmark}, batch {args.batch_size})")
+        for name in ('torch_fp32', 'onnx_int8'):
+            print(f"   {name:12s} {results[name]['texts_per_second']:8.1f} texts/s")
+        print(f"   Speedup:     {results['speedup']:.2f}x")
+
+    if not (args.export or args.check_drift or args.benchmark):
+        parser.print_help()
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
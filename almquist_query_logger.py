@@ -10,7 +10,11 @@ import json
 from datetime import datetime
 from pathlib import Path
 import numpy as np
-from sentence_transformers import SentenceTransformer
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_embedding_service import get_embedding_model
 
 class AlmquistQueryLogger:
     """Logger pro všechny uživatelské dotazy a feedback"""
@@ -20,7 +24,7 @@ class AlmquistQueryLogger:
         self.init_database()
 
         # Model pro embedding queries (same as RAG)
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        self.model = get_embedding_model('paraphrase-multilingual-MiniLM-L12-v2')
 
     def init_database(self):
         """Inicializace databáze"""
@@ -3,17 +3,35 @@
 ALMQUIST RAG MERGER
 Merge new data from crawlers into Legal RAG
 Runs periodically to keep RAG up-to-date with 24/7 crawlers
+
+Incremental mode (--incremental) reads only rows above the stored id
+watermark or with added_to_rag = 0, embeds just those and appends them
+to the existing FAISS index. New chunks go to metadata_journal.jsonl and
+embeddings.npy is appended in place; the backup hard-links the replaced
+files and records the row count, so a run costs I/O for the new rows only
+(plus the FAISS index write). --restore BACKUP undoes such a run.
 """
 
 import sqlite3
 import json
-import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+import numpy as np
 from pathlib import Path
 from datetime import datetime
 import shutil
-import hashlib
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_embedding_service import get_embedding_model
+from almquist_content_hash import compute_content_hash, backfill_content_hashes, EMPTY_CONTENT_HASH
+from almquist_legal_text_store import get_text_store, TABLE_DOCUMENT_TYPES
+from almquist_chunking import get_chunker
+from almquist_vector_store import append_embeddings, build_index, index_dtype, open_embeddings, resolve_dtype
+from almquist_rag_metadata import (
+    COMPACT_RATIO, JOURNAL_FILE, METADATA_FILE, clear_journal, load_metadata,
+    read_journal, write_journal
+)
 
 
 class RAGMerger:
@@ -30,14 +48,34 @@ class RAGMerger:
         self.backup_dir = Path(backup_dir)
         self.backup_dir.mkdir(exist_ok=True)
 
-        # Load sentence transformer
+        # Load sentence transformer (unchanged chunks come from the embedding cache)
         print("📚 Loading sentence transformer...")
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        self.model = get_embedding_model('paraphrase-multilingual-MiniLM-L12-v2', cache=True)
+        self.chunker = get_chunker('paraphrase-multilingual-MiniLM-L12-v2')
         self.embedding_dim = 384
 
     def compute_content_hash(self, text: str) -> str:
         """Compute SHA256 hash of document text"""
-        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return compute_content_hash(text)
+
+    def _load_full_texts(self, cursor, table, ids):
+        """Načte full_text jen pro vybrané řádky (i z komprimovaného úložiště)"""
+        return get_text_store(self.legal_db).load_full_texts(cursor, TABLE_DOCUMENT_TYPES[table], ids)
+
+    def _attach_texts(self, cursor, table, docs):
+        """
+        Doplní doc['text']; dokumenty bez textu (smazaný / ještě nezapsaný
+        text) vynechá - zůstanou added_to_rag = 0 a zkusí se příště
+        """
+        texts = self._load_full_texts(cursor, table, [doc['id'] for doc in docs])
+        with_text = []
+        for doc in docs:
+            if doc['id'] in texts:
+                doc['text'] = texts[doc['id']]
+                with_text.append(doc)
+        if len(with_text) < len(docs):
+            print(f"   ⚠️  {table}: {len(docs) - len(with_text)} documents without text skipped")
+        return with_text
 
     def backup_current_rag(self):
         """Backup current RAG before merging"""
@@ -47,7 +85,7 @@ class RAGMerger:
 
         print(f"📦 Creating backup: {backup_path}")
 
-        for file in ['embeddings.npy', 'faiss_index.bin', 'metadata.json']:
+        for file in ['embeddings.npy', 'faiss_index.bin', METADATA_FILE, JOURNAL_FILE]:
             src = self.rag_dir / file
             if src.exists():
                 shutil.copy2(src, backup_path / file)
@@ -55,20 +93,93 @@ class RAGMerger:
         print(f"   ✓ Backup created")
         return backup_path
 
+    def backup_incremental(self, index_ntotal, files, new_docs):
+        """
+        Záloha pro incremental merge: files (ty, které merge nahradí přes
+        os.replace) se jen hard-linknou - starý inode pak patří záloze;
+        embeddings.npy se appenduje na místě, takže stačí počet řádků,
+        a pro DB id sloučených dokumentů
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        backup_path = self.backup_dir / f"legal_rag_incremental_{timestamp}"
+        backup_path.mkdir()
+
+        print(f"📦 Creating backup: {backup_path}")
+
+        for file in files:
+            src = self.rag_dir / file
+            if src.exists():
+                try:
+                    os.link(src, backup_path / file)
+                except OSError:
+                    shutil.copy2(src, backup_path / file)  # Other filesystem
+
+        metadata_stat = (self.rag_dir / METADATA_FILE).stat()
+        with open(backup_path / "backup.json", 'w', encoding='utf-8') as f:
+            json.dump({
+                'embeddings_rows': index_ntotal,
+                'files': [file for file in files if (backup_path / file).exists()],
+                'metadata': [metadata_stat.st_size, metadata_stat.st_mtime_ns],
+                'documents': {
+                    table: [doc['id'] for doc in new_docs if doc['type'] == doc_type]
+                    for table, doc_type in (('laws', 'law'), ('court_decisions', 'court_decision'))
+                },
+            }, f, indent=2)
+
+        print(f"   ✓ Backup created")
+        return backup_path
+
+    def restore_incremental(self, backup_path):
+        """Vrátí RAG do stavu před incremental merge se zálohou backup_path"""
+        backup_path = Path(backup_path)
+        with open(backup_path / "backup.json", 'r', encoding='utf-8') as f:
+            backup = json.load(f)
+
+        print(f"♻️  Restoring {self.rag_dir} from {backup_path}...")
+
+        metadata_stat = (self.rag_dir / METADATA_FILE).stat()
+        if METADATA_FILE not in backup['files'] \
+                and [metadata_stat.st_size, metadata_stat.st_mtime_ns] != backup['metadata']:
+            raise ValueError(f"metadata.json was rewritten after {backup_path} - "
+                             f"restore from a full backup instead")
+
+        index = faiss.read_index(str(backup_path / "faiss_index.bin"))
+        append_embeddings(self.rag_dir / "embeddings.npy",
+                          np.empty((0, index.d), dtype='float32'),
+                          rows=backup['embeddings_rows'])
+        # Copy + os.replace: the current files may be hard-linked by a newer backup
+        for file in backup['files']:
+            tmp_path = self.rag_dir / (file + '.tmp')
+            shutil.copy2(backup_path / file, tmp_path)
+            os.replace(tmp_path, self.rag_dir / file)
+        if JOURNAL_FILE not in backup['files']:
+            clear_journal(self.rag_dir)
+
+        # The documents go back to the queue; merge_state keeps the watermark,
+        # added_to_rag = 0 makes --incremental pick them up again
+        conn = sqlite3.connect(self.legal_db)
+        for table, ids in backup['documents'].items():
+            conn.executemany(f"""
+                UPDATE {table} SET added_to_rag = 0, rag_chunk_ids = NULL WHERE id = ?
+            """, [(row_id,) for row_id in ids])
+        conn.commit()
+        conn.close()
+
+        print(f"   ✓ Restored {backup['embeddings_rows']} vectors, "
+              f"{sum(len(ids) for ids in backup['documents'].values())} documents unmarked")
+
     def load_current_rag(self):
         """Load current RAG data"""
         print(f"\n📥 Loading current RAG from {self.rag_dir}...")
 
-        # Load metadata
-        metadata_path = self.rag_dir / "metadata.json"
-        with open(metadata_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            chunks = data['chunks']
-            metadata = data['metadata']
+        # Load metadata (+ chunks from incremental merges)
+        data = load_metadata(self.rag_dir)
+        chunks = data['chunks']
+        metadata = data['metadata']
 
-        # Load embeddings
+        # Map embeddings (read-only memmap, no in-memory copy)
         embeddings_path = self.rag_dir / "embeddings.npy"
-        embeddings = np.load(embeddings_path)
+        embeddings = open_embeddings(embeddings_path)
 
         # Load FAISS index
         index_path = self.rag_dir / "faiss_index.bin"
@@ -96,31 +207,33 @@ class RAGMerger:
             if 'content_hash' in meta:
                 existing_hashes.add(meta['content_hash'])
 
+        # Stored content_hash is filled by the crawlers; hash only legacy rows
+        backfill_content_hashes(self.legal_db, verbose=False)
+
         conn = sqlite3.connect(self.legal_db)
         cursor = conn.cursor()
 
         new_docs = []
 
-        # Check laws
+        # Check laws (metadata + stored hash only, texts are loaded for new rows)
         cursor.execute("""
-            SELECT law_number, law_name, full_text, category, source_url,
-                   effective_from, effective_to
+            SELECT id, law_number, law_name, category, source_url,
+                   effective_from, effective_to, content_hash
             FROM laws
-            WHERE full_text IS NOT NULL AND full_text != ''
-        """)
+            WHERE content_hash IS NOT NULL AND content_hash != ?
+        """, (EMPTY_CONTENT_HASH,))
 
         for row in cursor.fetchall():
-            law_number, law_name, full_text, category, source_url, eff_from, eff_to = row
+            row_id, law_number, law_name, category, source_url, eff_from, eff_to, content_hash = row
             doc_id = f"law_{law_number}"
-            content_hash = self.compute_content_hash(full_text)
 
             # Check both ID and content hash to avoid duplicates
             if doc_id not in existing_ids and content_hash not in existing_hashes:
                 new_docs.append({
                     'type': 'law',
+                    'id': row_id,
                     'law_number': law_number,
                     'law_name': law_name,
-                    'text': full_text,
                     'category': category,
                     'source_url': source_url,
                     'effective_from': eff_from,
@@ -129,26 +242,28 @@ class RAGMerger:
                 })
                 existing_hashes.add(content_hash)  # Prevent duplicates within this batch
 
+        new_docs = self._attach_texts(cursor, 'laws', new_docs)
+
         # Check court decisions
         cursor.execute("""
-            SELECT case_number, court_name, full_text, legal_area,
-                   decision_date, ecli, source_url
+            SELECT id, case_number, court_name, legal_area,
+                   decision_date, ecli, source_url, content_hash
             FROM court_decisions
-            WHERE full_text IS NOT NULL AND full_text != ''
-        """)
+            WHERE content_hash IS NOT NULL AND content_hash != ?
+        """, (EMPTY_CONTENT_HASH,))
 
+        new_case_docs = []
         for row in cursor.fetchall():
-            case_num, court, text, category, date, ecli, url = row
+            row_id, case_num, court, category, date, ecli, url, content_hash = row
             doc_id = f"case_{case_num}"
-            content_hash = self.compute_content_hash(text)
 
             # Check both ID and content hash to avoid duplicates
             if doc_id not in existing_ids and content_hash not in existing_hashes:
-                new_docs.append({
+                new_case_docs.append({
                     'type': 'court_decision',
+                    'id': row_id,
                     'case_number': case_num,
                     'court_name': court,
-                    'text': text,
                     'category': category,
                     'decision_date': date,
                     'ecli': ecli,
@@ -157,6 +272,8 @@ class RAGMerger:
                 })
                 existing_hashes.add(content_hash)  # Prevent duplicates within this batch
 
+        new_docs.extend(self._attach_texts(cursor, 'court_decisions', new_case_docs))
+
         conn.close()
 
         print(f"   ✓ Found {len(new_docs)} new documents")
@@ -165,25 +282,226 @@ class RAGMerger:
 
         return new_docs
 
-    def chunk_text(self, text, max_length=500):
-        """Chunk text into smaller pieces"""
-        # Simple sentence-based chunking
-        sentences = text.split('. ')
-        chunks = []
-        current_chunk = ""
+    # ------------------------------------------------------------------
+    # Incremental merge (watermark + added_to_rag)
+    # ------------------------------------------------------------------
+
+    def load_merge_state(self):
+        """Watermark posledního merge (max id per tabulka), None pokud ještě neběžel"""
+        state_path = self.rag_dir / "merge_state.json"
+        if not state_path.exists():
+            return None
+
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_merge_state(self, state, path=None):
+        """Uloží watermark (path: jiný soubor, např. .tmp před přejmenováním)"""
+        state['updated_at'] = datetime.now().isoformat()
+        with open(path or self.rag_dir / "merge_state.json", 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+
+    def mark_existing_documents(self, existing_metadata):
+        """
+        Inicializace pro incremental mód (a po plném merge): řádky, které už
+        v RAG jsou (podle law_number / case_number nebo content_hash), dostanou
+        added_to_rag = 1. Vrací watermark (max id v tabulkách).
+        """
+        print(f"\n🏁 Syncing merge state from RAG metadata...")
+
+        backfill_content_hashes(self.legal_db, verbose=False)
+
+        conn = sqlite3.connect(self.legal_db)
+        cursor = conn.cursor()
+
+        cursor.execute("CREATE TEMP TABLE rag_keys (document_type TEXT, key TEXT)")
+        cursor.execute("CREATE TEMP TABLE rag_hashes (content_hash TEXT PRIMARY KEY)")
+
+        keys = []
+        hashes = set()
+        for meta in existing_metadata:
+            if meta['document_type'] == 'law':
+                keys.append(('law', meta.get('law_number')))
+            elif meta['document_type'] == 'court_decision':
+                keys.append(('court_decision', meta.get('case_number')))
+            if 'content_hash' in meta:
+                hashes.add(meta['content_hash'])
+
+        cursor.executemany("INSERT INTO rag_keys VALUES (?, ?)", keys)
+        cursor.executemany("INSERT INTO rag_hashes VALUES (?)", [(h,) for h in hashes])
+        cursor.execute("CREATE INDEX temp.idx_rag_keys ON rag_keys(document_type, key)")
+
+        cursor.execute("""
+            UPDATE laws SET added_to_rag = 1
+            WHERE added_to_rag = 0 AND (
+                law_number IN (SELECT key FROM rag_keys WHERE document_type = 'law')
+                OR content_hash IN (SELECT content_hash FROM rag_hashes)
+            )
+        """)
+        laws_marked = cursor.rowcount
+
+        cursor.execute("""
+            UPDATE court_decisions SET added_to_rag = 1
+            WHERE added_to_rag = 0 AND (
+                case_number IN (SELECT key FROM rag_keys WHERE document_type = 'court_decision')
+                OR content_hash IN (SELECT content_hash FROM rag_hashes)
+            )
+        """)
+        decisions_marked = cursor.rowcount
+
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM laws")
+        max_law_id = cursor.fetchone()[0]
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM court_decisions")
+        max_decision_id = cursor.fetchone()[0]
+
+        conn.commit()
+        conn.close()
+
+        print(f"   ✓ Marked as already in RAG: {laws_marked} laws, {decisions_marked} decisions")
+
+        return {'laws': max_law_id, 'court_decisions': max_decision_id}
+
+    def get_unmerged_documents(self, state):
+        """
+        Nové dokumenty pro incremental merge: id > watermark nebo added_to_rag = 0.
+        Řádky, jejichž dokument (case/law number) nebo content_hash už v RAG je,
+        se jen označí. Returns: (new_docs, skipped_ids, new_state)
+        """
+        print(f"\n🔍 Checking for unmerged documents in {self.legal_db}...")
+
+        # Stored content_hash is filled by the crawlers; hash only legacy rows
+        backfill_content_hashes(self.legal_db, verbose=False)
+
+        conn = sqlite3.connect(self.legal_db)
+        cursor = conn.cursor()
+
+        new_docs = []
+        skipped_ids = {'laws': [], 'court_decisions': []}
+        new_state = dict(state)
+        seen_keys = set()
+        seen_hashes = set()
+
+        cursor.execute("""
+            SELECT d.id, d.law_number, d.law_name, d.category, d.source_url,
+                   d.effective_from, d.effective_to, d.content_hash,
+                   EXISTS (
+                       SELECT 1 FROM laws o
+                       WHERE o.law_number = d.law_number AND +o.added_to_rag = 1
+                   ) OR EXISTS (
+                       SELECT 1 FROM laws o
+                       WHERE o.content_hash = d.content_hash AND +o.added_to_rag = 1
+                   ) AS in_rag
+            FROM laws d
+            WHERE (d.id > ? OR d.added_to_rag = 0)
+            AND d.content_hash IS NOT NULL AND d.content_hash != ?
+            ORDER BY d.id
+        """, (state['laws'], EMPTY_CONTENT_HASH))
+
+        for row in cursor.fetchall():
+            row_id, law_number, law_name, category, source_url, eff_from, eff_to, content_hash, in_rag = row
+            new_state['laws'] = max(new_state['laws'], row_id)
+
+            if in_rag or law_number in seen_keys or content_hash in seen_hashes:
+                skipped_ids['laws'].append(row_id)
+                continue
+
+            seen_keys.add(law_number)
+            seen_hashes.add(content_hash)
+            new_docs.append({
+                'type': 'law',
+                'id': row_id,
+                'law_number': law_number,
+                'law_name': law_name,
+                'category': category,
+                'source_url': source_url,
+                'effective_from': eff_from,
+                'effective_to': eff_to,
+                'content_hash': content_hash
+            })
+
+        new_docs = self._attach_texts(cursor, 'laws', new_docs)
+
+        cursor.execute("""
+            SELECT d.id, d.case_number, d.court_name, d.legal_area,
+                   d.decision_date, d.ecli, d.source_url, d.content_hash,
+                   EXISTS (
+                       SELECT 1 FROM court_decisions o
+                       WHERE o.case_number = d.case_number AND +o.added_to_rag = 1
+                   ) OR EXISTS (
+                       SELECT 1 FROM court_decisions o
+                       WHERE o.content_hash = d.content_hash AND +o.added_to_rag = 1
+                   ) AS in_rag
+            FROM court_decisions d
+            WHERE (d.id > ? OR d.added_to_rag = 0)
+            AND d.content_hash IS NOT NULL AND d.content_hash != ?
+            ORDER BY d.id
+        """, (state['court_decisions'], EMPTY_CONTENT_HASH))
+
+        seen_keys = set()
+        new_case_docs = []
+        for row in cursor.fetchall():
+            row_id, case_num, court, category, date, ecli, url, content_hash, in_rag = row
+            new_state['court_decisions'] = max(new_state['court_decisions'], row_id)
+
+            if in_rag or case_num in seen_keys or content_hash in seen_hashes:
+                skipped_ids['court_decisions'].append(row_id)
+                continue
+
+            seen_keys.add(case_num)
+            seen_hashes.add(content_hash)
+            new_case_docs.append({
+                'type': 'court_decision',
+                'id': row_id,
+                'case_number': case_num,
+                'court_name': court,
+                'category': category,
+                'decision_date': date,
+                'ecli': ecli,
+                'url': url,
+                'content_hash': content_hash
+            })
+
+        new_docs.extend(self._attach_texts(cursor, 'court_decisions', new_case_docs))
+
+        conn.close()
 
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) < max_length:
-                current_chunk += sentence + ". "
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + ". "
+        print(f"   ✓ Found {len(new_docs)} new documents")
+        print(f"      Laws: {sum(1 for d in new_docs if d['type'] == 'law')}")
+        print(f"      Court decisions: {sum(1 for d in new_docs if d['type'] == 'court_decision')}")
+        print(f"      Already in RAG (marked only): "
+              f"{len(skipped_ids['laws']) + len(skipped_ids['court_decisions'])}")
+
+        return new_docs, skipped_ids, new_state
 
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+    def mark_documents_as_added(self, new_docs, skipped_ids):
+        """added_to_rag = 1 (+ rag_chunk_ids) pro sloučené a přeskočené řádky"""
+        conn = sqlite3.connect(self.legal_db)
+        self._mark_documents(conn.cursor(), new_docs, skipped_ids)
+        conn.commit()
+        conn.close()
 
-        return chunks
+    @staticmethod
+    def _mark_documents(cursor, new_docs, skipped_ids):
+        """UPDATE příznaků v transakci volajícího"""
+        for table, doc_type in (('laws', 'law'), ('court_decisions', 'court_decision')):
+            cursor.executemany(f"""
+                UPDATE {table}
+                SET added_to_rag = 1, rag_chunk_ids = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, [(json.dumps(doc['chunk_ids']), doc['id'])
+                  for doc in new_docs if doc['type'] == doc_type])
+
+            cursor.executemany(f"""
+                UPDATE {table} SET added_to_rag = 1 WHERE id = ?
+            """, [(row_id,) for row_id in skipped_ids[table]])
+
+    def append_embeddings(self, new_embeddings, rows=None):
+        """Připojí vektory na konec embeddings.npy (bez načtení celého souboru)"""
+        append_embeddings(self.rag_dir / "embeddings.npy", new_embeddings, rows=rows)
+
+    def chunk_text(self, text):
+        """Chunk text by sentences within the model's token limit"""
+        return self.chunker.chunk_text(text)
 
     def process_new_documents(self, new_docs):
         """Process and chunk new documents"""
@@ -193,10 +511,13 @@ class RAGMerger:
         all_metadata = []
 
         for doc in new_docs:
+            doc['chunk_ids'] = []
+
             if doc['type'] == 'law':
                 text_chunks = self.chunk_text(doc['text'])
 
                 for i, chunk in enumerate(text_chunks):
+                    doc['chunk_ids'].append(f"law_{doc['law_number']}_chunk_{i}")
                     all_chunks.append(chunk)
                     all_metadata.append({
                         'chunk_id': f"law_{doc['law_number']}_chunk_{i}",
@@ -218,6 +539,7 @@ class RAGMerger:
                 text_chunks = self.chunk_text(doc['text'])
 
                 for i, chunk in enumerate(text_chunks):
+                    doc['chunk_ids'].append(f"case_{doc['case_number']}_chunk_{i}")
                     all_chunks.append(chunk)
                     all_metadata.append({
                         'chunk_id': f"case_{doc['case_number']}_chunk_{i}",
@@ -272,22 +594,16 @@ class RAGMerger:
             show_progress_bar=True
         )
         print(f"   ✓ Embeddings generated")
+        print(f"   {self.model.report()}")
 
         # 6. Merge
         print(f"\n🔗 Merging...")
         merged_chunks = chunks + new_chunks
         merged_metadata = metadata + new_metadata
-        merged_embeddings = np.vstack([embeddings, new_embeddings])
 
         print(f"   ✓ Total chunks: {len(merged_chunks)} (was {len(chunks)}, +{len(new_chunks)})")
 
-        # 7. Create new FAISS index
-        print(f"\n📊 Creating new FAISS index...")
-        new_index = faiss.IndexFlatIP(self.embedding_dim)
-        new_index.add(merged_embeddings.astype('float32'))
-        print(f"   ✓ Index created with {new_index.ntotal} vectors")
-
-        # 8. Save (if not dry run)
+        # 7. Save (if not dry run)
         if dry_run:
             print(f"\n🔍 DRY RUN - No changes made")
             print(f"   Would add {len(new_chunks)} chunks")
@@ -295,8 +611,16 @@ class RAGMerger:
         else:
             print(f"\n💾 Saving updated RAG...")
 
-            # Save embeddings
-            np.save(self.rag_dir / "embeddings.npy", merged_embeddings)
+            # Append embeddings in place (after the vectors the index has -
+            # rows left over by an interrupted run are overwritten)
+            self.append_embeddings(new_embeddings, rows=index.ntotal)
+
+            # Rebuild FAISS index from the merged file (keeps the index dtype
+            # unless ALMQUIST_VECTOR_DTYPE says otherwise)
+            dtype = resolve_dtype(existing_index=index)
+            print(f"\n📊 Creating new FAISS index ({dtype})...")
+            new_index = build_index(open_embeddings(self.rag_dir / "embeddings.npy"), dtype)
+            print(f"   ✓ Index created with {new_index.ntotal} vectors")
 
             # Save FAISS index
             faiss.write_index(new_index, str(self.rag_dir / "faiss_index.bin"))
@@ -309,6 +633,14 @@ class RAGMerger:
                     'last_updated': datetime.now().isoformat(),
                     'total_vectors': len(merged_chunks)
                 }, f, ensure_ascii=False, indent=2)
+            clear_journal(self.rag_dir)
+
+            # Same bookkeeping as merge_incremental: merged rows get
+            # added_to_rag + rag_chunk_ids, rows already covered by RAG are
+            # marked and the watermark moves, so --incremental does not
+            # embed them a second time
+            self.mark_documents_as_added(new_docs, {'laws': [], 'court_decisions': []})
+            self.save_merge_state(self.mark_existing_documents(merged_metadata))
 
             print(f"   ✓ RAG updated successfully!")
             print(f"   Backup saved to: {backup_path}")
@@ -325,6 +657,150 @@ class RAGMerger:
         print(f"  Growth: +{len(new_chunks)/len(chunks)*100:.1f}%")
 
 
+    def merge_incremental(self, dry_run=False):
+        """
+        Incremental merge: jen řádky nad watermarkem / s added_to_rag = 0,
+        embeddingy jen pro ně a append do existujícího FAISS indexu
+        """
+        print("\n" + "="*70)
+        print("🔄 ALMQUIST RAG MERGER (incremental)")
+        print("="*70)
+        print(f"Mode: {'DRY RUN (no changes)' if dry_run else 'LIVE (will update RAG)'}")
+        print("="*70)
+
+        state = self.load_merge_state()
+        if state is None:
+            if dry_run:
+                print("\n⚠️  No merge state yet - run once without --dry-run to initialize")
+                return
+            state = self.mark_existing_documents(load_metadata(self.rag_dir)['metadata'])
+            self.save_merge_state(dict(state))
+
+        print(f"\n📍 Watermark: laws id > {state['laws']}, decisions id > {state['court_decisions']}")
+
+        new_docs, skipped_ids, new_state = self.get_unmerged_documents(state)
+
+        if not new_docs:
+            if not dry_run:
+                self.mark_documents_as_added(new_docs, skipped_ids)
+                self.save_merge_state(new_state)
+            print("\n✅ No new documents to merge. RAG is up-to-date!")
+            return
+
+        new_chunks, new_metadata = self.process_new_documents(new_docs)
+
+        if dry_run:
+            print(f"\n🔍 DRY RUN - No changes made")
+            print(f"   Would add {len(new_chunks)} chunks")
+            return
+
+        index_path = self.rag_dir / "faiss_index.bin"
+        metadata_path = self.rag_dir / METADATA_FILE
+        journal_path = self.rag_dir / JOURNAL_FILE
+        state_path = self.rag_dir / "merge_state.json"
+
+        index = faiss.read_index(str(index_path))
+        old_size = index.ntotal
+
+        # New chunks go to the journal; metadata.json is rewritten only when
+        # the journal gets large (or does not belong to the current RAG)
+        entries = [{'chunk': chunk, 'metadata': meta}
+                   for chunk, meta in zip(new_chunks, new_metadata)]
+        journal = read_journal(self.rag_dir)
+        if journal is not None and journal[0] + len(journal[1]) == old_size \
+                and len(journal[1]) + len(entries) <= COMPACT_RATIO * journal[0]:
+            compact = False
+        elif journal is None and not journal_path.exists() \
+                and len(entries) <= COMPACT_RATIO * old_size:
+            compact = False
+            journal = (old_size, [])
+        else:
+            compact = True
+
+        backup_path = self.backup_incremental(
+            old_size, ['faiss_index.bin', JOURNAL_FILE, METADATA_FILE] if compact
+            else ['faiss_index.bin', JOURNAL_FILE], new_docs)
+
+        print(f"\n🧠 Generating embeddings for {len(new_chunks)} new chunks...")
+        new_embeddings = self.model.encode(
+            new_chunks,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=True
+        ).astype('float32')
+        print(f"   {self.model.report()}")
+
+        print(f"\n💾 Appending to RAG...")
+        index.add(new_embeddings)
+
+        def write_metadata(path):
+            data = load_metadata(self.rag_dir)
+            if len(data['chunks']) != old_size:
+                raise ValueError(f"{metadata_path} has {len(data['chunks'])} chunks "
+                                 f"but the index has {old_size} vectors")
+            data['chunks'].extend(new_chunks)
+            data['metadata'].extend(new_metadata)
+            data['last_updated'] = datetime.now().isoformat()
+            data['total_vectors'] = len(data['chunks'])
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+
+        # Everything goes to <name>.tmp first; the files are swapped in only
+        # inside the DB transaction that marks the documents, so a crash
+        # while writing leaves the old RAG and unmarked rows (the next run
+        # repeats the merge) instead of an index without its metadata
+        files = {index_path: lambda path: faiss.write_index(index, str(path))}
+        if compact:
+            files[metadata_path] = write_metadata
+        else:
+            files[journal_path] = lambda path: write_journal(
+                path, self.rag_dir, journal[0], journal[1] + entries)
+        files[state_path] = lambda path: self.save_merge_state(new_state, path)
+
+        tmp_files = {}
+        try:
+            for path, write in files.items():
+                tmp_files[path] = path.with_name(path.name + '.tmp')
+                write(tmp_files[path])
+
+            conn = sqlite3.connect(self.legal_db, timeout=30)
+            try:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                self._mark_documents(cursor, new_docs, skipped_ids)
+
+                # In place after the vectors the index has - rows left over
+                # by an interrupted run are overwritten
+                self.append_embeddings(new_embeddings, rows=old_size)
+                try:
+                    for path, tmp_path in tmp_files.items():
+                        os.replace(tmp_path, path)
+                    if compact:
+                        clear_journal(self.rag_dir)
+                    conn.commit()
+                except Exception:
+                    self.append_embeddings(new_embeddings[:0], rows=old_size)
+                    raise
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+        except Exception:
+            for tmp_path in tmp_files.values():
+                if tmp_path.exists():
+                    tmp_path.unlink()
+            raise
+
+        print(f"   ✓ Index: {index.ntotal} vectors, {index_dtype(index)} (was {old_size}, +{len(new_chunks)})")
+        print(f"   ✓ Metadata: {'metadata.json rewritten' if compact else f'{len(journal[1]) + len(entries)} chunks in journal'}")
+        print(f"   Backup saved to: {backup_path}")
+
+        print("\n" + "="*70)
+        print("✅ INCREMENTAL MERGE COMPLETE")
+        print("="*70)
+
+
 def main():
     """Main function"""
     import argparse
@@ -332,11 +808,21 @@ def main():
     parser = argparse.ArgumentParser(description='Almquist RAG Merger')
     parser.add_argument('--dry-run', action='store_true',
                         help='Dry run - show what would be merged without changing anything')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Merge only rows above the watermark / with added_to_rag = 0 '
+                             'and append them to the existing index')
+    parser.add_argument('--restore', metavar='BACKUP',
+                        help='Undo the incremental merge that created this backup directory')
 
     args = parser.parse_args()
 
     merger = RAGMerger()
-    merger.merge(dry_run=args.dry_run)
+    if args.restore:
+        merger.restore_incremental(args.restore)
+    elif args.incremental:
+        merger.merge_incremental(dry_run=args.dry_run)
+    else:
+        merger.merge(dry_run=args.dry_run)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST RAG Metadata
+metadata.json + append-only journal pro incremental merge
+
+- metadata.json: {'chunks': [...], 'metadata': [...], ...} - celý RAG
+- metadata_journal.jsonl: chunky přidané incremental merge od posledního
+  plného zápisu; první řádek je hlavička s velikostí a mtime metadata.json,
+  ke kterému journal patří, pak jeden řádek {"chunk", "metadata"} na chunk
+- load_metadata() vrací metadata.json + platný journal; po přepsání
+  metadata.json (jiná velikost / mtime) se starý journal ignoruje
+- kdo zapisuje celý metadata.json (s chunky z load_metadata), zavolá pak
+  clear_journal()
+
+Usage:
+    from almquist_rag_metadata import load_metadata, clear_journal
+    data = load_metadata(rag_dir)
+"""
+
+import json
+import os
+from pathlib import Path
+
+
+METADATA_FILE = 'metadata.json'
+JOURNAL_FILE = 'metadata_journal.jsonl'
+COMPACT_RATIO = 0.25  # journal larger than 25 % of metadata.json -> full rewrite
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def read_journal(rag_dir):
+    """
+    (base, entries) platného journalu - base = počet chunků v metadata.json;
+    None pokud journal chybí nebo patří ke starší verzi metadata.json
+    """
+    rag_dir = Path(rag_dir)
+    path = rag_dir / JOURNAL_FILE
+    if not path.exists() or not (rag_dir / METADATA_FILE).exists():
+        return None
+
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            return None
+        if header.get('metadata') != _fingerprint(rag_dir / METADATA_FILE):
+            return None
+
+        entries = []
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break  # Torn last line
+    return header['base'], entries
+
+
+def load_metadata(rag_dir):
+    """metadata.json včetně chunků z journalu"""
+    rag_dir = Path(rag_dir)
+    with open(rag_dir / METADATA_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    journal = read_journal(rag_dir)
+    if journal is not None and journal[0] == len(data.get('chunks', [])):
+        for entry in journal[1]:
+            data['chunks'].append(entry['chunk'])
+            data['metadata'].append(entry['metadata'])
+        for key in ('total_chunks', 'total_vectors'):
+            if key in data:
+                data[key] = len(data['chunks'])
+    return data
+
+
+def write_journal(path, rag_dir, base, entries):
+    """Journal pro aktuální metadata.json (base chunků) do path (např. <name>.tmp)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'base': base, 'metadata': _fingerprint(Path(rag_dir) / METADATA_FILE)}) + '\n')
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def clear_journal(rag_dir):
+    """Po zápisu celého metadata.json: journal je v něm obsažený"""
+    path = Path(rag_dir) / JOURNAL_FILE
+    if path.exists():
+        path.unlink()
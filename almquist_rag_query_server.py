@@ -0,0 +1,632 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST RAG Query Server
+Dlouhoběžící dotazovací server (HTTP/JSON) nad AlmquistUniversalRAG
+
+- indexy všech dostupných domén (legal, professions, ...) drží v paměti,
+  start modelu a načtení indexu se neplatí na každý dotaz
+- souběžné dotazy se skládají do mikro-dávek (max N dotazů nebo T ms):
+  jedno volání encoderu pro celou dávku a jeden index.search za doménu
+- /api/stats: p50/p99 latence (posledních LATENCY_WINDOW dotazů),
+  dotazy/s, průměrná velikost dávky, čas encode/search
+- s --llm-endpoint i generování: /api/answer streamuje tokeny odpovědi
+  (NDJSON) hned jak přicházejí z Ollama; /api/stats pak ukazuje i
+  time-to-first-token (p50/p99) a tokeny/s; souběžná generování omezuje
+  sdílený almquist_llm_client (--llm-max-concurrent, fronta, více endpointů)
+
+API:
+    POST /api/search  {"query": ..., "domain": "legal", "top_k": 5, "filters": {...}}
+    POST /api/answer  {"query": ..., "domain": "legal", "top_k": 5, "stream": true}
+                      -> {"results": [...]}, {"token": ...}, ..., {"done": true, "answer": ..., "ttft": ...}
+    GET  /api/stats
+    GET  /api/health
+
+Usage:
+    python3 almquist_rag_query_server.py --serve
+    python3 almquist_rag_query_server.py --query "výpověď z pracovního poměru"
+    python3 almquist_rag_query_server.py --answer "výpověď z pracovního poměru"
+    python3 almquist_rag_query_server.py --load-test 500 --concurrency 32
+"""
+
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import requests
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_embedding_service import get_embedding_model
+from almquist_llm_client import MAX_CONCURRENT as LLM_MAX_CONCURRENT, get_llm_client
+
+
+EMBEDDING_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+LLM_MODEL = 'llama3.2:3b'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = int(os.environ.get('ALMQUIST_RAG_SERVER_PORT', 8766))
+MAX_BATCH_SIZE = 64
+MAX_WAIT_MS = 5
+MAX_TOP_K = 100
+DEFAULT_MAX_TOKENS = 500
+MAX_ANSWER_TOKENS = 4096
+LATENCY_WINDOW = 10000
+THROUGHPUT_WINDOW = 60  # seconds
+
+DEMO_QUERIES = [
+    "Jaké jsou podmínky pro uzavření kupní smlouvy?",
+    "Jaký trest hrozí za krádež?",
+    "Kolik dní dovolené mi náleží?",
+    "Výpověď z pracovního poměru ze strany zaměstnavatele",
+    "Náhrada škody způsobené zaměstnancem",
+    "Jaké jsou povinnosti živnostníka?",
+    "Jaké daně platí OSVČ?",
+    "Promlčení pohledávky z kupní smlouvy",
+]
+
+
+class _QueryRequest:
+    __slots__ = ('query', 'domain', 'top_k', 'filters', 'future')
+
+    def __init__(self, query, domain, top_k, filters):
+        self.query = query
+        self.domain = domain
+        self.top_k = top_k
+        self.filters = filters
+        self.future = Future()
+
+
+class LatencyStats:
+    """Latence posledních `window` dotazů + časy dokončení pro dotazy/s"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._finished = deque(maxlen=window)
+
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            self._finished.append(time.monotonic())
+
+    def summary(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+            finished = list(self._finished)
+
+        now = time.monotonic()
+        recent = sum(1 for t in finished if now - t <= THROUGHPUT_WINDOW)
+        if not len(latencies):
+            return {'p50_ms': None, 'p99_ms': None, 'mean_ms': None, 'qps_recent': 0.0}
+
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        return {
+            'p50_ms': round(float(p50), 2),
+            'p99_ms': round(float(p99), 2),
+            'mean_ms': round(float(latencies.mean()) * 1000, 2),
+            'qps_recent': round(recent / THROUGHPUT_WINDOW, 2),
+        }
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class RAGQueryServer:
+    """Query server - jeden batcher thread volá encoder a FAISS, HTTP vlákna čekají na Future"""
+
+    def __init__(self, domains=None, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                 max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                 llm_endpoint=None, llm_model=LLM_MODEL, llm_max_concurrent=LLM_MAX_CONCURRENT):
+        self.host = host
+        self.port = port
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.domain_names = domains
+        self.llm_endpoint = llm_endpoint
+        self.llm_model = llm_model
+        # Created before the domains so all of them share this concurrency limit
+        self.llm = get_llm_client(llm_endpoint, max_concurrent=llm_max_concurrent) if llm_endpoint else None
+
+        self.rags = {}
+        self.model = None
+        self.latency = LatencyStats()
+        self.ttft = LatencyStats()
+        self.stats = {'requests': 0, 'queries': 0, 'errors': 0, 'batches': 0,
+                      'encode_seconds': 0.0, 'search_seconds': 0.0,
+                      'answers': 0, 'generated_tokens': 0, 'decode_seconds': 0.0}
+        self.started_at = time.time()
+
+        self._queue = queue.Queue()
+        self._server = None
+
+    def load_domains(self):
+        """AlmquistUniversalRAG pro každou doménu, která má index (LLM jen s llm_endpoint)"""
+        from almquist_unified_rag_launcher import UnifiedRAGLauncher
+        from almquist_universal_rag_with_llm import AlmquistUniversalRAG
+
+        available = UnifiedRAGLauncher().available_domains
+        use_llm = bool(self.llm_endpoint)
+        for domain in self.domain_names or available:
+            if domain not in available:
+                print(f"   ⚠️  Unknown domain: {domain}")
+                continue
+            rag_dir = Path(available[domain]['rag_dir'])
+            if not (rag_dir / 'faiss_index.bin').exists():
+                print(f"   ⚠️  Skipping {domain}: no index in {rag_dir}")
+                continue
+            self.rags[domain] = AlmquistUniversalRAG(rag_dir=str(rag_dir), domain=domain, use_llm=use_llm,
+                                                     llm_endpoint=self.llm_endpoint or "http://localhost:11434",
+                                                     llm_model=self.llm_model)
+            use_llm = self.rags[domain].use_llm  # Connection tested once
+
+        if not self.rags:
+            raise RuntimeError("No RAG domain with an index available")
+
+        # All domains share one query encoder
+        self.model = get_embedding_model(EMBEDDING_MODEL)
+        return self.rags
+
+    def submit(self, query, domain, top_k=5, filters=None):
+        """Validace před frontou - chybný dotaz nesmí shodit celou dávku (ValueError = HTTP 400)"""
+        if domain not in self.rags:
+            raise ValueError(f"Unknown or unloaded domain: {domain} (loaded: {', '.join(self.rags)})")
+        if filters is not None and not isinstance(filters, dict):
+            raise ValueError(f"filters must be an object, got {type(filters).__name__}")
+        try:
+            top_k = int(top_k)
+        except (TypeError, ValueError, OverflowError):
+            top_k = 0
+        if not 1 <= top_k <= MAX_TOP_K:
+            raise ValueError(f"top_k must be an integer between 1 and {MAX_TOP_K}")
+        request = _QueryRequest(query, domain, top_k, filters or None)
+        self._queue.put(request)
+        return request.future
+
+    def record_generation(self, result):
+        """TTFT / tokeny z výsledku AlmquistUniversalRAG.stream_answer()"""
+        if result.get('mode') != 'llm_generated':
+            return
+        self.stats['answers'] += 1
+        self.stats['generated_tokens'] += result['tokens']
+        self.stats['decode_seconds'] += result['generation_time'] - (result.get('ttft') or 0.0)
+        if result.get('ttft') is not None:
+            self.ttft.record(result['ttft'])
+
+    def info(self):
+        batches = max(self.stats['batches'], 1)
+        uptime = time.time() - self.started_at
+        generation = {}
+        if self.stats['answers']:
+            ttft = self.ttft.summary()
+            generation = {
+                'llm': self.llm.status(),
+                'ttft_p50_ms': ttft['p50_ms'],
+                'ttft_p99_ms': ttft['p99_ms'],
+                'tokens_per_second': round(self.stats['generated_tokens'] /
+                                           max(self.stats['decode_seconds'], 1e-9), 1),
+            }
+        return {
+            'domains': {domain: rag.index.ntotal for domain, rag in self.rags.items()},
+            'uptime_seconds': round(uptime, 1),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'avg_batch_queries': round(self.stats['queries'] / batches, 1),
+            'qps_lifetime': round(self.stats['queries'] / max(uptime, 1e-9), 2),
+            **self.stats,
+            **self.latency.summary(),
+            **generation
+        }
+
+    # ------------------------------------------------------------------
+    # Micro-batching
+    # ------------------------------------------------------------------
+
+    def _collect_batch(self):
+        """Čeká na první dotaz, pak přibírá další max. max_wait nebo do max_batch_size dotazů"""
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)  # Stop after this batch
+                break
+            batch.append(request)
+
+        return batch
+
+    def _run_batch(self, batch):
+        """Jeden encode pro celou dávku, jeden search_embeddings za doménu"""
+        start = time.perf_counter()
+        embeddings = self.model.encode(
+            [request.query for request in batch],
+            batch_size=self.max_batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype('float32')
+        encoded = time.perf_counter()
+
+        groups = {}
+        for row, request in enumerate(batch):
+            groups.setdefault(request.domain, []).append(row)
+
+        for domain, rows in groups.items():
+            domain_requests = [batch[row] for row in rows]
+            top_k = max(request.top_k for request in domain_requests)
+            try:
+                results = self.rags[domain].search_embeddings(
+                    embeddings[rows], top_k, [request.filters for request in domain_requests])
+            except Exception:
+                # Retry one by one so only the request that breaks the search fails
+                for row, request in zip(rows, domain_requests):
+                    try:
+                        request.future.set_result(self.rags[domain].search_embeddings(
+                            embeddings[[row]], request.top_k, [request.filters])[0])
+                    except Exception as e:
+                        request.future.set_exception(e)
+                continue
+            for request, request_results in zip(domain_requests, results):
+                request.future.set_result(request_results[:request.top_k])
+
+        self.stats['batches'] += 1
+        self.stats['queries'] += len(batch)
+        self.stats['encode_seconds'] += encoded - start
+        self.stats['search_seconds'] += time.perf_counter() - encoded
+
+    def _batch_loop(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                break
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    # ------------------------------------------------------------------
+    # HTTP server
+    # ------------------------------------------------------------------
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive for load clients
+            disable_nagle_algorithm = True  # headers + body are separate writes
+
+            def _send_json(self, data, status=200):
+                body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, data):
+                """One NDJSON line as one HTTP chunk (sent immediately)"""
+                line = json.dumps(data, ensure_ascii=False).encode('utf-8') + b'\n'
+                self.wfile.write(f"{len(line):x}\r\n".encode('ascii') + line + b'\r\n')
+                self.wfile.flush()
+
+            def _send_answer(self, query, domain, results, data, max_tokens):
+                rag = server.rags[domain]
+                if not rag.use_llm:
+                    self._send_json({'error': 'LLM generation is disabled (start with --llm-endpoint)'}, 400)
+                    return
+
+                events = rag.stream_answer(query, results, max_tokens=max_tokens)
+                final = {}
+                if not data.get('stream', True):
+                    for event in events:
+                        final = event
+                    server.record_generation(final)
+                    self._send_json({'query': query, 'domain': domain, 'results': results,
+                                     **{k: v for k, v in final.items() if k != 'sources'}})
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                try:
+                    self._write_chunk({'query': query, 'domain': domain, 'results': results})
+                    for event in events:
+                        if 'token' in event:
+                            self._write_chunk(event)
+                        else:
+                            final = event
+                            self._write_chunk({'done': True, **{k: v for k, v in event.items() if k != 'sources'}})
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # Client went away: stop reading from Ollama
+                finally:
+                    events.close()
+                server.record_generation(final)
+
+            def do_GET(self):
+                if self.path == '/api/stats':
+                    self._send_json(server.info())
+                elif self.path == '/api/health':
+                    self._send_json({'status': 'ok', 'domains': list(server.rags)})
+                else:
+                    self._send_json({'error': 'Not found'}, 404)
+
+            def do_POST(self):
+                if self.path not in ('/api/search', '/api/answer'):
+                    self._send_json({'error': 'Not found'}, 404)
+                    return
+
+                start = time.perf_counter()
+                server.stats['requests'] += 1
+                try:
+                    data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                    query = (data.get('query') or '').strip()
+                    if not query:
+                        self._send_json({'error': 'Query is required'}, 400)
+                        return
+                    domain = data.get('domain', 'legal')
+                    if self.path == '/api/answer':
+                        try:
+                            max_tokens = int(data.get('max_tokens', DEFAULT_MAX_TOKENS))
+                        except (TypeError, ValueError, OverflowError):
+                            max_tokens = 0
+                        if not 1 <= max_tokens <= MAX_ANSWER_TOKENS:
+                            raise ValueError(f"max_tokens must be an integer between 1 and {MAX_ANSWER_TOKENS}")
+                    results = server.submit(query, domain, data.get('top_k', 5),
+                                            data.get('filters')).result()
+                except ValueError as e:
+                    server.stats['errors'] += 1
+                    self._send_json({'error': str(e)}, 400)
+                    return
+                except Exception as e:
+                    server.stats['errors'] += 1
+                    self._send_json({'error': f"{type(e).__name__}: {e}"}, 500)
+                    return
+
+                latency = time.perf_counter() - start
+                server.latency.record(latency)
+                if self.path == '/api/answer':
+                    self._send_answer(query, domain, results, data, max_tokens)
+                    return
+                self._send_json({
+                    'query': query,
+                    'domain': domain,
+                    'results': results,
+                    'count': len(results),
+                    'latency_ms': round(latency * 1000, 2)
+                })
+
+            def log_message(self, format, *args):
+                pass  # One line per query would flood the journal
+
+        return Handler
+
+    def serve_forever(self):
+        """Načte domény a obsluhuje klienty do Ctrl+C"""
+        self.load_domains()
+
+        batcher = threading.Thread(target=self._batch_loop, name="rag-query-batcher", daemon=True)
+        batcher.start()
+
+        self._server = _HTTPServer((self.host, self.port), self._handler())
+
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, stop)  # systemd / kill: clean shutdown
+
+        print(f"🚀 RAG query server listening on http://{self.host}:{self.port}")
+        print(f"   Domains: {', '.join(f'{d} ({r.index.ntotal})' for d, r in self.rags.items())}")
+        print(f"   Micro-batching: max {self.max_batch_size} queries / {self.max_wait * 1000:.0f} ms")
+
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Stopping RAG query server")
+        finally:
+            self.shutdown()
+            batcher.join(timeout=5)
+
+    def shutdown(self):
+        self._queue.put(None)
+        if self._server:
+            self._server.server_close()
+            self._server = None
+
+
+# ----------------------------------------------------------------------
+# Client
+# ----------------------------------------------------------------------
+
+class RAGQueryClient:
+    """HTTP klient (keep-alive session na vlákno)"""
+
+    def __init__(self, url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def search(self, query, domain='legal', top_k=5, filters=None):
+        """Výsledky ve formátu AlmquistUniversalRAG.search()"""
+        response = self._session().post(f"{self.url}/api/search", json={
+            'query': query, 'domain': domain, 'top_k': top_k, 'filters': filters
+        }, timeout=self.timeout)
+        data = response.json()
+        if response.status_code != 200:
+            raise RuntimeError(f"RAG query server error: {data.get('error')}")
+        return data['results']
+
+    def answer(self, query, domain='legal', top_k=5, filters=None, on_token=None):
+        """Streamovaná odpověď: on_token(token) pro každý token, vrací poslední událost + 'results'"""
+        result = {}
+        with self._session().post(f"{self.url}/api/answer", json={
+            'query': query, 'domain': domain, 'top_k': top_k, 'filters': filters
+        }, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"RAG query server error: {response.json().get('error')}")
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if 'token' in event:
+                    if on_token:
+                        on_token(event['token'])
+                else:
+                    result.update(event)
+        return result
+
+    def stats(self):
+        return self._session().get(f"{self.url}/api/stats", timeout=self.timeout).json()
+
+
+def load_test(client, queries, total=500, concurrency=32, domain='legal', top_k=5):
+    """Souběžní klienti; vrací klientské p50/p99 a dotazy/s"""
+    def one(i):
+        start = time.perf_counter()
+        client.search(queries[i % len(queries)], domain=domain, top_k=top_k)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = np.array(list(executor.map(one, range(total))))
+    elapsed = time.perf_counter() - start
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return {'queries': total, 'concurrency': concurrency, 'seconds': elapsed,
+            'qps': total / elapsed, 'p50_ms': p50, 'p99_ms': p99}
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Almquist RAG Query Server (micro-batched search)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Start the server with all domains that have an index
+  python3 almquist_rag_query_server.py --serve
+
+  # Only legal + professions, bigger batches
+  python3 almquist_rag_query_server.py --serve --domains legal professions --max-batch 128
+
+  # With streamed LLM answers (/api/answer)
+  python3 almquist_rag_query_server.py --serve --llm-endpoint http://localhost:11434
+
+  # Query / answer / stats
+  python3 almquist_rag_query_server.py --query "výpověď z pracovního poměru" --domain legal
+  python3 almquist_rag_query_server.py --answer "výpověď z pracovního poměru" --domain legal
+  python3 almquist_rag_query_server.py --stats
+
+  # Throughput vs. concurrency
+  python3 almquist_rag_query_server.py --load-test 1000 --concurrency 1
+  python3 almquist_rag_query_server.py --load-test 1000 --concurrency 32
+        """
+    )
+    parser.add_argument('--serve', action='store_true', help='Run the query server')
+    parser.add_argument('--stats', action='store_true', help='Show server latency/throughput stats')
+    parser.add_argument('--query', metavar='TEXT', help='Search TEXT through the server')
+    parser.add_argument('--answer', metavar='TEXT', help='Stream an LLM answer to TEXT through the server')
+    parser.add_argument('--load-test', type=int, metavar='N', help='Send N concurrent demo queries')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--domain', default='legal', help='Domain for --query / --load-test')
+    parser.add_argument('--domains', nargs='+', help='Domains to load (default: all with an index)')
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH_SIZE, help='Max queries per batch')
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS,
+                        help='How long to wait for more queries before searching')
+    parser.add_argument('--llm-endpoint', metavar='URL',
+                        help='Ollama endpoint(s) for /api/answer, "url1,url2" = routing (default: off)')
+    parser.add_argument('--llm-max-concurrent', type=int, default=LLM_MAX_CONCURRENT,
+                        help='Parallel generations per LLM endpoint (more wait in a queue)')
+    parser.add_argument('--llm-model', default=LLM_MODEL)
+
+    args = parser.parse_args()
+    url = f"http://{args.host}:{args.port}"
+
+    if args.serve:
+        RAGQueryServer(args.domains, args.host, args.port, max_batch_size=args.max_batch,
+                       max_wait_ms=args.max_wait_ms, llm_endpoint=args.llm_endpoint,
+                       llm_model=args.llm_model, llm_max_concurrent=args.llm_max_concurrent).serve_forever()
+        return
+
+    client = RAGQueryClient(url)
+    try:
+        if args.query:
+            start = time.perf_counter()
+            results = client.search(args.query, domain=args.domain, top_k=args.top_k)
+            print(f"✓ {len(results)} results in {(time.perf_counter() - start) * 1000:.1f} ms")
+            for i, result in enumerate(results, 1):
+                meta = result['metadata']
+                label = meta.get('law_name') or meta.get('case_number') or meta.get('source', 'Unknown')
+                print(f"   {i}. [{label}] ({result['score']:.3f}) {result['text'][:100]}")
+        elif args.answer:
+            start = time.perf_counter()
+            first = []
+
+            def show(token):
+                if not first:
+                    first.append(time.perf_counter() - start)
+                print(token, end='', flush=True)
+
+            print("💡 ", end='', flush=True)
+            result = client.answer(args.answer, domain=args.domain, top_k=args.top_k, on_token=show)
+            print()
+            if result.get('mode') != 'llm_generated':
+                print(result.get('answer'))
+            else:
+                print(f"\n⏱️  first token {first[0] * 1000 if first else 0:.0f} ms (LLM {(result.get('ttft') or 0) * 1000:.0f} ms), "
+                      f"{result['tokens_per_second']:.1f} tokens/s, total {(time.perf_counter() - start):.2f}s")
+            for i, res in enumerate(result.get('results', []), 1):
+                meta = res['metadata']
+                print(f"   {i}. [{meta.get('law_name') or meta.get('case_number') or meta.get('source', 'Unknown')}]"
+                      f" ({res['score']:.3f})")
+        elif args.load_test:
+            report = load_test(client, DEMO_QUERIES, args.load_test, args.concurrency,
+                               domain=args.domain, top_k=args.top_k)
+            print(f"⏱️  {report['queries']} queries, concurrency {report['concurrency']}: "
+                  f"{report['qps']:.1f} q/s, p50 {report['p50_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms")
+            info = client.stats()
+            print(f"   Server: avg batch {info['avg_batch_queries']} queries, "
+                  f"p50 {info['p50_ms']} ms, p99 {info['p99_ms']} ms")
+        elif args.stats:
+            print(f"✅ RAG query server running ({url})")
+            for key, value in client.stats().items():
+                print(f"   {key}: {value}")
+        else:
+            parser.print_help()
+    except requests.exceptions.ConnectionError:
+        print(f"❌ RAG query server not running ({url})")
+
+
+if __name__ == "__main__":
+    main()
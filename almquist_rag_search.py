@@ -4,10 +4,16 @@ ALMQUIST RAG - Search Helper
 Snadné vyhledávání v RAG databázi
 """
 
-import json
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_embedding_service import get_embedding_model
+from almquist_rag_metadata import load_metadata
+from almquist_vector_store import (EmbeddingStore, FILTER_OVERSAMPLE, QUERY_BATCH_SIZE, expand_filters,
+                                   index_dtype, match_metadata, search_index)
 from pathlib import Path
 
 class AlmquistRAGSearch:
@@ -19,19 +25,21 @@ class AlmquistRAGSearch:
         print("🔄 Načítám RAG systém...")
 
         # Načíst model (stejný jako při vytváření embeddings)
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        self.model = get_embedding_model('paraphrase-multilingual-MiniLM-L12-v2')
 
         # Načíst FAISS index
         index_path = self.rag_dir / "faiss_index.bin"
         self.index = faiss.read_index(str(index_path))
-        print(f"   ✓ FAISS index načten ({self.index.ntotal} vectors)")
+        print(f"   ✓ FAISS index načten ({self.index.ntotal} vectors, {index_dtype(self.index)})")
+
+        # float32 vektory pro re-rank kvantizovaného indexu (memmap)
+        embeddings_path = self.rag_dir / "embeddings.npy"
+        self.vectors = EmbeddingStore(embeddings_path) if embeddings_path.exists() else None
 
         # Načíst metadata
-        metadata_path = self.rag_dir / "metadata.json"
-        with open(metadata_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.chunks = data['chunks']
-            self.metadata = data['metadata']
+        data = load_metadata(self.rag_dir)
+        self.chunks = data['chunks']
+        self.metadata = data['metadata']
 
         print(f"   ✓ Metadata načtena ({len(self.chunks)} chunks)")
         print("✅ RAG systém připraven\n")
@@ -49,37 +57,65 @@ class AlmquistRAGSearch:
         Returns:
             List of tuples: (score, chunk_text, metadata)
         """
-        # Embedovat query
-        query_embedding = self.model.encode(
-            [query],
-            convert_to_numpy=True,
-            normalize_embeddings=True
-        )
-
-        # Vyhledat v indexu (hledáme více než top_k, protože budeme filtrovat)
-        search_k = top_k * 10 if (profession_filter or chunk_type_filter) else top_k
-        distances, indices = self.index.search(query_embedding.astype('float32'), search_k)
+        metadata_filter = {}
+        if profession_filter:
+            metadata_filter['profession_id'] = profession_filter
+        if chunk_type_filter:
+            metadata_filter['chunk_type'] = chunk_type_filter
 
-        # Sestavit výsledky
-        results = []
-        for idx, score in zip(indices[0], distances[0]):
-            meta = self.metadata[idx]
-            chunk = self.chunks[idx]
+        return self.search_many([query], top_k, [metadata_filter])[0]
 
-            # Aplikovat filtry
-            if profession_filter and meta['profession_id'] != profession_filter:
-                continue
-
-            if chunk_type_filter and meta['chunk_type'] != chunk_type_filter:
-                continue
+    def search_many(self, queries, top_k=5, filters=None):
+        """
+        Vyhledá více dotazů najednou - jedno volání modelu a jeden index.search
 
-            results.append((score, chunk, meta))
+        Args:
+            queries: Seznam textových dotazů
+            top_k: Počet výsledků na dotaz
+            filters: None, jeden filtr metadat pro všechny dotazy
+                     (např. {"profession_id": "zivnostnik_obecny"}),
+                     nebo seznam filtrů (dict / None) po dotazech
 
-            # Zastavit když máme dost výsledků
-            if len(results) >= top_k:
-                break
+        Returns:
+            List (pro každý dotaz) of lists of tuples: (score, chunk_text, metadata)
+        """
+        if not queries:
+            return []
+        filters = expand_filters(filters, len(queries))
+
+        # Embedovat všechny dotazy najednou
+        query_embeddings = self.model.encode(
+            list(queries),
+            batch_size=QUERY_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
 
-        return results
+        # Vyhledat v indexu (hledáme více než top_k, protože budeme filtrovat)
+        search_k = top_k * FILTER_OVERSAMPLE if any(filters) else top_k
+        distances, indices = search_index(self.index, query_embeddings, search_k, self.vectors)
+
+        # Sestavit výsledky po dotazech
+        all_results = []
+        for row_indices, row_scores, metadata_filter in zip(indices, distances, filters):
+            results = []
+            for idx, score in zip(row_indices, row_scores):
+                if idx < 0:
+                    continue
+                meta = self.metadata[idx]
+
+                # Aplikovat filtry
+                if not match_metadata(meta, metadata_filter):
+                    continue
+
+                results.append((score, self.chunks[idx], meta))
+
+                # Zastavit když máme dost výsledků
+                if len(results) >= top_k:
+                    break
+            all_results.append(results)
+
+        return all_results
 
     def search_by_profession(self, profession_id):
         """Vrátí všechny chunks pro danou profesi"""
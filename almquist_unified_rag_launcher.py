@@ -8,13 +8,33 @@ Podporuje:
 - Profese RAG (živnosti, profese) - 41 vektorů
 - Corporate RAG (firemní dokumenty z Paperless-NGX) - auto-sync
 - Dotace RAG (připraveno)
+
+Federované vyhledávání (--federated): všechny domény s indexem se načtou
+jednou, dotaz se zakóduje jednou a domény se prohledají paralelně;
+skóre se před sloučením normalizují po doménách (z-score); zásahy pod
+FEDERATED_MIN_SCORE (cosine) se řadí až za ostatní, takže nejlepší zásah
+domény bez relevantních dokumentů nepředběhne dobré zásahy jiných domén.
 """
 
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+
+import numpy as np
+
 from almquist_universal_rag_with_llm import AlmquistUniversalRAG
 
 
+FEDERATED_DEPTH = 20  # candidates per domain for score normalization
+FEDERATED_MIN_SCORE = 0.3  # raw cosine floor: weaker hits rank after all others
+
+
+def print_token(token):
+    """Streamed answer output (on_token callback)"""
+    print(token, end='', flush=True)
+
+
 class UnifiedRAGLauncher:
     """Unified launcher for all RAG domains"""
 
@@ -46,6 +66,167 @@ class UnifiedRAGLauncher:
             }
         }
 
+        # Federated mode: domain -> loaded AlmquistUniversalRAG
+        self.rags = {}
+        self._executor = None
+
+    def load_all(
+        self,
+        use_llm: bool = False,
+        llm_model: str = "llama3.2:3b",
+        llm_endpoint: str = "http://localhost:11434",
+        domains=None
+    ):
+        """Load every domain that has an index (once); all share one query encoder"""
+        for domain in domains or self.available_domains:
+            if domain in self.rags or domain not in self.available_domains:
+                continue
+            rag_dir = Path(self.available_domains[domain]['rag_dir'])
+            if not (rag_dir / 'faiss_index.bin').exists():
+                print(f"   ⚠️  Skipping {domain}: no index in {rag_dir}")
+                continue
+
+            self.rags[domain] = AlmquistUniversalRAG(
+                rag_dir=str(rag_dir),
+                domain=domain,
+                llm_endpoint=llm_endpoint,
+                llm_model=llm_model,
+                use_llm=use_llm
+            )
+            # The LLM connection was tested once, don't repeat it per domain
+            use_llm = self.rags[domain].use_llm
+
+        if self.rags and self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.available_domains),
+                                                thread_name_prefix="federated-search")
+        return self.rags
+
+    @staticmethod
+    def _normalize_scores(results, method):
+        """
+        Per-domain score normalization: 'zscore', 'minmax' or 'none'
+        (a domain with a single hit / equal scores gets 0 resp. 1, like any
+        other domain without spread - never its raw cosine)
+        """
+        scores = np.array([result['score'] for result in results], dtype='float64')
+        if method == 'none' or not len(scores):
+            return scores
+        if method == 'minmax':
+            spread = scores.max() - scores.min()
+            return (scores - scores.min()) / spread if spread > 0 else np.ones_like(scores)
+        std = scores.std()
+        return (scores - scores.mean()) / std if std > 0 else np.zeros_like(scores)
+
+    def federated_search(self, query: str, top_k: int = 5, domains=None, normalize: str = 'zscore',
+                         min_score: float = FEDERATED_MIN_SCORE):
+        """
+        Search all loaded domains: one query embedding, domain indexes in parallel
+
+        Returns:
+            (results, timings) - results merged by normalized score (hits with
+            cosine below min_score after the rest), each with 'domain',
+            'score' (normalized) and 'raw_score' (cosine similarity)
+        """
+        rags = {domain: rag for domain, rag in self.rags.items() if not domains or domain in domains}
+        if not rags:
+            return [], {}
+
+        start = time.perf_counter()
+        encoder = next(iter(rags.values())).model
+        query_embedding = encoder.encode([query], convert_to_numpy=True, normalize_embeddings=True)
+        encoded = time.perf_counter()
+
+        depth = max(top_k, FEDERATED_DEPTH)
+
+        def search_domain(domain):
+            domain_start = time.perf_counter()
+            results = rags[domain].search_embeddings(query_embedding, depth)[0]
+            return domain, results, time.perf_counter() - domain_start
+
+        timings = {'encode_ms': (encoded - start) * 1000}
+        merged = []
+        for domain, results, seconds in self._executor.map(search_domain, list(rags)):
+            timings[f'{domain}_ms'] = seconds * 1000
+            for result, score in zip(results, self._normalize_scores(results, normalize)):
+                merged.append({**result, 'domain': domain, 'raw_score': result['score'], 'score': float(score)})
+
+        merged.sort(key=lambda result: (result['raw_score'] >= min_score, result['score']), reverse=True)
+        timings['total_ms'] = (time.perf_counter() - start) * 1000
+        return merged[:top_k], timings
+
+    def federated_query(self, question: str, top_k: int = 5, normalize: str = 'zscore', on_token=None):
+        """Federated search + answer from the domain of the best hit (if LLM is enabled)"""
+        results, timings = self.federated_search(question, top_k=top_k, normalize=normalize)
+
+        if not results:
+            return {'query': question, 'search_results': [], 'mode': 'search_only', 'timings': timings}
+
+        rag = self.rags[results[0]['domain']]
+        result = rag.query(question, top_k=top_k, search_results=results, on_token=on_token)
+        result['timings'] = timings
+        return result
+
+    def print_federated_result(self, result, verbose: bool = True, show_answer: bool = True):
+        """Print federated result (domain + normalized/raw score per hit)"""
+        if show_answer:
+            print(f"\n{'='*70}")
+            print(f"❓ QUERY: {result['query']}")
+            print(f"{'='*70}")
+
+        if 'generated_answer' in result and show_answer:
+            print(f"\n💡 GENERATED ANSWER:")
+            print(result['generated_answer'])
+        if result.get('ttft') is not None:
+            print(f"\n⏱️  Generation {result['generation_time']:.2f}s (first token {result['ttft'] * 1000:.0f} ms, "
+                  f"{result['tokens_per_second']:.1f} tokens/s)")
+        if result.get('context'):
+            context = result['context']
+            print(f"   Context: {context['tokens_before']} → {context['tokens']} tokens "
+                  f"({context['duplicates']} duplicates, {context['merged']} merged)")
+
+        timings = result['timings']
+        per_domain = ', '.join(f"{key[:-3]} {value:.1f}" for key, value in timings.items()
+                               if key not in ('encode_ms', 'total_ms'))
+        print(f"\n⏱️  encode {timings.get('encode_ms', 0):.1f} ms | {per_domain} ms | "
+              f"total {timings.get('total_ms', 0):.1f} ms")
+
+        print(f"\n📚 SOURCES ({len(result['search_results'])} results):")
+        for i, res in enumerate(result['search_results'], 1):
+            meta = res['metadata']
+            label = (meta.get('law_name') or meta.get('case_number') or meta.get('profession_name')
+                     or meta.get('source', 'Unknown'))
+            print(f"\n{i}. [{res['domain']}] {label} (score: {res['score']:.2f}, cosine: {res['raw_score']:.3f})")
+            if verbose:
+                print(f"   {res['text'][:200]}{'...' if len(res['text']) > 200 else ''}")
+
+        print(f"\n{'='*70}\n")
+
+    def federated_interactive(self, top_k: int = 5, normalize: str = 'zscore'):
+        """Interactive Q&A across all loaded domains"""
+        print(f"\n{'='*70}")
+        print(f"💬 FEDERATED MODE - {', '.join(d.upper() for d in self.rags)}")
+        print(f"{'='*70}")
+        print("Type 'quit' or 'exit' to end session")
+
+        while True:
+            try:
+                query = input("\n❓ Your question: ").strip()
+                if not query:
+                    continue
+                if query.lower() in ['quit', 'exit', 'q']:
+                    print("\n👋 Goodbye!")
+                    break
+                if any(rag.use_llm for rag in self.rags.values()):
+                    print("\n💡 ", end='', flush=True)
+                result = self.federated_query(query, top_k=top_k, normalize=normalize, on_token=print_token)
+                self.print_federated_result(result, verbose=False,
+                                            show_answer=result['mode'] != 'llm_generated')
+            except KeyboardInterrupt:
+                print("\n\n👋 Session interrupted. Goodbye!")
+                break
+            except Exception as e:
+                print(f"\n❌ Error: {e}")
+
     def list_domains(self):
         """List all available domains"""
         print("\n" + "="*70)
@@ -131,15 +312,18 @@ class UnifiedRAGLauncher:
                     print("  - 'help' - Show this help")
                     continue
 
-                # Query RAG
+                # Query RAG (answer is streamed token by token)
+                if rag.use_llm:
+                    print("\n💡 ", end='', flush=True)
                 result = rag.query(
                     query,
                     top_k=3,
-                    generate_answer=rag.use_llm
+                    generate_answer=rag.use_llm,
+                    on_token=print_token
                 )
 
                 # Display result
-                rag.print_result(result, verbose=False)
+                rag.print_result(result, verbose=False, show_answer=result['mode'] != 'llm_generated')
 
             except KeyboardInterrupt:
                 print("\n\n👋 Session interrupted. Goodbye!")
@@ -217,6 +401,10 @@ Examples:
 
   # Use DGX Ollama for faster inference
   python3 almquist_unified_rag_launcher.py --domain legal --endpoint http://100.90.154.98:11434 --interactive
+
+  # Search all domains at once (one query embedding, parallel search)
+  python3 almquist_unified_rag_launcher.py --federated "Jaké daně platí OSVČ?" --no-llm
+  python3 almquist_unified_rag_launcher.py --federated --interactive
         """
     )
 
@@ -234,7 +422,12 @@ Examples:
     parser.add_argument('--model', type=str, default='llama3.2:3b',
                         help='LLM model (default: llama3.2:3b)')
     parser.add_argument('--endpoint', type=str, default='http://localhost:11434',
-                        help='Ollama endpoint (default: localhost:11434)')
+                        help='Ollama endpoint, "url1,url2" = routing across endpoints (default: localhost:11434)')
+    parser.add_argument('--federated', nargs='?', const='', metavar='QUERY',
+                        help='Search all domains with an index (QUERY or --interactive)')
+    parser.add_argument('--normalize', choices=['zscore', 'minmax', 'none'], default='zscore',
+                        help='Per-domain score normalization for --federated')
+    parser.add_argument('--top-k', type=int, default=5)
 
     args = parser.parse_args()
 
@@ -244,6 +437,17 @@ Examples:
         launcher.list_domains()
         return
 
+    if args.federated is not None:
+        if not launcher.load_all(use_llm=not args.no_llm, llm_model=args.model, llm_endpoint=args.endpoint):
+            print("❌ No domain with an index available")
+            return
+        if args.federated:
+            result = launcher.federated_query(args.federated, top_k=args.top_k, normalize=args.normalize)
+            launcher.print_federated_result(result)
+        else:
+            launcher.federated_interactive(top_k=args.top_k, normalize=args.normalize)
+        return
+
     if not args.domain:
         print("❌ Please specify --domain or use --list to see available domains")
         parser.print_help()
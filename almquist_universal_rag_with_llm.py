@@ -8,9 +8,19 @@ Podporuje všechny domény: legal, profese, dotace, etc.
 import json
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from almquist_context_builder import CONTEXT_TOKENS, ContextBuilder
+from almquist_embedding_service import get_embedding_model
+from almquist_llm_client import LLMError, get_llm_client
+from almquist_rag_metadata import clear_journal, load_metadata
+from almquist_vector_store import (EmbeddingStore, FILTER_OVERSAMPLE, QUERY_BATCH_SIZE, expand_filters,
+                                   index_dtype, match_metadata, search_index)
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Callable
+import threading
 import requests
 from datetime import datetime
 import time
@@ -33,7 +43,8 @@ class AlmquistUniversalRAG:
         domain: str = "legal",
         llm_endpoint: str = "http://localhost:11434",  # Ollama default
         llm_model: str = "llama3.2:3b",
-        use_llm: bool = True
+        use_llm: bool = True,
+        context_tokens: int = CONTEXT_TOKENS
     ):
         """
         Initialize Universal RAG
@@ -41,15 +52,18 @@ class AlmquistUniversalRAG:
         Args:
             rag_dir: Path to RAG embeddings directory
             domain: Domain name (legal, professions, grants, etc.)
-            llm_endpoint: LLM API endpoint (Ollama or vLLM)
+            llm_endpoint: LLM API endpoint (Ollama), "url1,url2" = routing across endpoints
             llm_model: LLM model name
             use_llm: Whether to use LLM for generation (False = search only)
+            context_tokens: Token budget of the LLM context (deduplicated, merged chunks)
         """
         self.rag_dir = Path(rag_dir)
         self.domain = domain
         self.llm_endpoint = llm_endpoint
         self.llm_model = llm_model
         self.use_llm = use_llm
+        self.llm = get_llm_client(llm_endpoint)  # shared: pooled connections, concurrency limit
+        self.context_builder = ContextBuilder(token_budget=context_tokens)
 
         print(f"🔄 Initializing Almquist Universal RAG ({domain})...")
         print(f"   RAG directory: {rag_dir}")
@@ -59,7 +73,8 @@ class AlmquistUniversalRAG:
 
         # Load embedding model
         print("   Loading sentence transformer...")
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        self.model = get_embedding_model('paraphrase-multilingual-MiniLM-L12-v2')
+        self.encoder = get_embedding_model('paraphrase-multilingual-MiniLM-L12-v2', cache=True)
         print("   ✓ Model loaded")
 
         # Load FAISS index
@@ -68,17 +83,20 @@ class AlmquistUniversalRAG:
             raise FileNotFoundError(f"FAISS index not found: {index_path}")
 
         self.index = faiss.read_index(str(index_path))
-        print(f"   ✓ FAISS index loaded ({self.index.ntotal} vectors)")
+        print(f"   ✓ FAISS index loaded ({self.index.ntotal} vectors, {index_dtype(self.index)})")
+
+        # float32 vectors for re-ranking a quantized index (memmap)
+        embeddings_path = self.rag_dir / "embeddings.npy"
+        self.vectors = EmbeddingStore(embeddings_path) if embeddings_path.exists() else None
 
         # Load metadata
         metadata_path = self.rag_dir / "metadata.json"
         if not metadata_path.exists():
             raise FileNotFoundError(f"Metadata not found: {metadata_path}")
 
-        with open(metadata_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.chunks = data['chunks']
-            self.metadata = data['metadata']
+        data = load_metadata(self.rag_dir)
+        self.chunks = data['chunks']
+        self.metadata = data['metadata']
 
         print(f"   ✓ Metadata loaded ({len(self.chunks)} chunks)")
 
@@ -93,22 +111,8 @@ class AlmquistUniversalRAG:
         print("✅ RAG system ready\n")
 
     def test_llm_connection(self) -> bool:
-        """Test if LLM endpoint is accessible"""
-        try:
-            # Try Ollama API
-            response = requests.post(
-                f"{self.llm_endpoint}/api/generate",
-                json={
-                    "model": self.llm_model,
-                    "prompt": "Test",
-                    "stream": False
-                },
-                timeout=5
-            )
-            return response.status_code == 200
-        except Exception as e:
-            print(f"   LLM connection test failed: {e}")
-            return False
+        """Test if LLM endpoint is accessible (loads the model and pins it with keep_alive)"""
+        return self.llm.warm(self.llm_model)
 
     def search(
         self,
@@ -134,16 +138,70 @@ class AlmquistUniversalRAG:
             normalize_embeddings=True
         )
 
-        # Search in FAISS
-        search_k = top_k * 10 if filter_metadata else top_k
-        distances, indices = self.index.search(
-            query_embedding.astype('float32'),
-            search_k
+        return self.search_embeddings(query_embedding, top_k, [filter_metadata])[0]
+
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        filters: Optional[Any] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Batch vector search: one encode call and one FAISS search for all queries
+
+        Args:
+            queries: Search queries
+            top_k: Number of results per query
+            filters: None, one metadata filter for all queries,
+                     or a list with a filter (or None) per query
+
+        Returns:
+            List of result lists, one per query (same format as search())
+        """
+        if not queries:
+            return []
+
+        query_embeddings = self.model.encode(
+            list(queries),
+            batch_size=QUERY_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True
         )
 
-        # Build results
+        return self.search_embeddings(query_embeddings, top_k, expand_filters(filters, len(queries)))
+
+    def search_embeddings(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[List[Optional[Dict[str, Any]]]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Vector search for already embedded queries (one FAISS search for all)
+
+        Args:
+            query_embeddings: Normalized query embeddings, shape (n, dim)
+            top_k: Number of results per query
+            filters: Optional metadata filters per query (None = no filter)
+
+        Returns:
+            List of result lists, one per query (same format as search())
+        """
+        filters = expand_filters(filters, len(query_embeddings))
+
+        # Search in FAISS
+        search_k = top_k * FILTER_OVERSAMPLE if any(filters) else top_k
+        distances, indices = search_index(self.index, query_embeddings, search_k, self.vectors)
+
+        return [
+            self._collect_results(row_indices, row_scores, top_k, filter_metadata)
+            for row_indices, row_scores, filter_metadata in zip(indices, distances, filters)
+        ]
+
+    def _collect_results(self, indices, scores, top_k, filter_metadata=None):
+        """Build results for one query row (filters applied)"""
         results = []
-        for idx, score in zip(indices[0], distances[0]):
+        for idx, score in zip(indices, scores):
             if idx < 0 or idx >= len(self.metadata):
                 continue
 
@@ -151,14 +209,14 @@ class AlmquistUniversalRAG:
             chunk = self.chunks[idx]
 
             # Apply filters if specified
-            if filter_metadata:
-                if not all(meta.get(k) == v for k, v in filter_metadata.items()):
-                    continue
+            if not match_metadata(meta, filter_metadata):
+                continue
 
             results.append({
                 'score': float(score),
                 'text': chunk,
-                'metadata': meta
+                'metadata': meta,
+                'id': int(idx)
             })
 
             if len(results) >= top_k:
@@ -166,12 +224,29 @@ class AlmquistUniversalRAG:
 
         return results
 
+    def result_vectors(self, results: List[Dict[str, Any]]) -> np.ndarray:
+        """Embeddings of search results: stored rows for this domain, encoded otherwise"""
+        own = [i for i, result in enumerate(results)
+               if result.get('id') is not None and result.get('domain', self.domain) == self.domain]
+        if self.vectors is None:
+            own = []
+
+        vectors = np.empty((len(results), self.index.d), dtype='float32')
+        if own:
+            vectors[own] = self.vectors.rows([results[i]['id'] for i in own])
+        other = [i for i in range(len(results)) if i not in set(own)]
+        if other:
+            vectors[other] = self.model.encode([results[i]['text'] for i in other],
+                                               convert_to_numpy=True, normalize_embeddings=True)
+        return vectors
+
     def generate_answer(
         self,
         query: str,
         context_chunks: List[Dict[str, Any]],
         max_tokens: int = 500,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """
         Generate answer using LLM with RAG context
@@ -181,94 +256,111 @@ class AlmquistUniversalRAG:
             context_chunks: Retrieved context chunks
             max_tokens: Maximum tokens in response
             temperature: LLM temperature
+            on_token: Called with each token as it arrives (streaming output)
 
         Returns:
-            Dict with answer, sources, and metadata
+            Dict with answer, sources, and metadata (incl. ttft, tokens_per_second)
+        """
+        result = {}
+        for event in self.stream_answer(query, context_chunks, max_tokens, temperature):
+            if 'token' not in event:
+                result = event
+            elif on_token:
+                on_token(event['token'])
+        return result
+
+    def stream_answer(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        max_tokens: int = 500,
+        temperature: float = 0.7,
+        cancel: Optional[threading.Event] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Generate answer token by token (Ollama "stream": true)
+
+        Waits for a free LLM slot (see almquist_llm_client); cancel.set() or
+        closing the generator stops the generation.
+
+        Yields:
+            {'token': text} as tokens arrive, then the final result (same keys as
+            generate_answer: answer, sources, mode, generation_time, ttft, ...)
         """
         if not self.use_llm:
-            return {
+            yield {
                 'answer': "LLM generation is disabled. Search results only.",
                 'sources': context_chunks,
                 'mode': 'search_only'
             }
+            return
 
-        # Build context from chunks
-        context = self._build_context(context_chunks)
+        # Build context from chunks (deduplicated, merged, within the token budget)
+        context, context_stats = self._build_context(context_chunks)
 
         # Build prompt
         prompt = self._build_prompt(query, context)
 
         # Generate with LLM
-        start_time = time.time()
-
+        start_time = time.perf_counter()
+        ttft = None
+        pieces = []
+        final = {}
+
+        events = self.llm.stream(
+            self.llm_model,
+            prompt,
+            {"temperature": temperature, "num_predict": max_tokens},
+            cancel=cancel
+        )
         try:
-            response = requests.post(
-                f"{self.llm_endpoint}/api/generate",
-                json={
-                    "model": self.llm_model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": temperature,
-                        "num_predict": max_tokens
-                    }
-                },
-                timeout=60
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                answer = result.get('response', '').strip()
-
-                generation_time = time.time() - start_time
-
-                return {
-                    'answer': answer,
-                    'sources': context_chunks,
-                    'mode': 'llm_generated',
-                    'generation_time': generation_time,
-                    'model': self.llm_model,
-                    'timestamp': datetime.now().isoformat()
-                }
-            else:
-                return {
-                    'answer': f"LLM generation failed (status {response.status_code})",
-                    'sources': context_chunks,
-                    'mode': 'error'
-                }
-
-        except Exception as e:
-            return {
-                'answer': f"LLM generation error: {str(e)}",
+            # {"response": "<token>", "done": false} ... {"done": true, "eval_count": ...}
+            for event in events:
+                token = event.get('response', '')
+                if token:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start_time
+                    pieces.append(token)
+                    yield {'token': token}
+
+                if event.get('done'):
+                    final = event
+
+        except (LLMError, requests.exceptions.RequestException) as e:
+            yield {
+                'answer': str(e) if isinstance(e, LLMError) else f"LLM generation error: {str(e)}",
                 'sources': context_chunks,
                 'mode': 'error'
             }
+            return
+        finally:
+            events.close()
+
+        generation_time = time.perf_counter() - start_time
+        tokens = final.get('eval_count') or len(pieces)
+        if final.get('eval_duration'):
+            tokens_per_second = tokens / (final['eval_duration'] / 1e9)
+        else:
+            decode_time = generation_time - (ttft or 0.0)
+            tokens_per_second = tokens / decode_time if decode_time > 0 else 0.0
+
+        yield {
+            'answer': ''.join(pieces).strip(),
+            'sources': context_chunks,
+            'mode': 'llm_generated',
+            'generation_time': generation_time,
+            'ttft': ttft,
+            'tokens': tokens,
+            'tokens_per_second': tokens_per_second,
+            'prompt_tokens': final.get('prompt_eval_count'),
+            'context': context_stats,
+            'model': self.llm_model,
+            'timestamp': datetime.now().isoformat()
+        }
 
-    def _build_context(self, chunks: List[Dict[str, Any]]) -> str:
-        """Build context string from chunks"""
-        context_parts = []
-
-        for i, chunk in enumerate(chunks[:5], 1):  # Use top 5 chunks
-            meta = chunk['metadata']
-            text = chunk['text']
-
-            # Format based on document type
-            doc_type = meta.get('document_type', 'unknown')
-
-            if doc_type == 'law':
-                law_name = meta.get('law_name', 'Unknown')
-                section = meta.get('section', '')
-                source = f"[{law_name} {section}]"
-            elif doc_type == 'court_decision':
-                case = meta.get('case_number', 'Unknown')
-                court = meta.get('court_name', 'Unknown')
-                source = f"[{court}, sp. zn. {case}]"
-            else:
-                source = f"[{meta.get('source', 'Unknown')}]"
-
-            context_parts.append(f"{source}\n{text}\n")
-
-        return "\n---\n\n".join(context_parts)
+    def _build_context(self, chunks: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """Build context string from chunks (see almquist_context_builder); returns (context, stats)"""
+        return self.context_builder.build(chunks, self.result_vectors(chunks) if len(chunks) > 1 else None)
 
     def _build_prompt(self, query: str, context: str) -> str:
         """Build LLM prompt with query and context"""
@@ -317,7 +409,9 @@ ODPOVĚĎ:"""
         self,
         question: str,
         top_k: int = 5,
-        generate_answer: bool = True
+        generate_answer: bool = True,
+        search_results: Optional[List[Dict[str, Any]]] = None,
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """
         Complete RAG query: search + generate answer
@@ -326,16 +420,19 @@ ODPOVĚĎ:"""
             question: User question
             top_k: Number of context chunks to retrieve
             generate_answer: Whether to generate LLM answer
+            search_results: Precomputed results for the question (search_many)
+            on_token: Called with each answer token as it arrives
 
         Returns:
             Dict with search results and optional LLM answer
         """
         # 1. Vector search
-        search_results = self.search(question, top_k=top_k)
+        if search_results is None:
+            search_results = self.search(question, top_k=top_k)
 
         # 2. Generate answer if requested
         if generate_answer and self.use_llm:
-            answer_result = self.generate_answer(question, search_results)
+            answer_result = self.generate_answer(question, search_results, on_token=on_token)
 
             return {
                 'query': question,
@@ -343,6 +440,9 @@ ODPOVĚĎ:"""
                 'generated_answer': answer_result['answer'],
                 'sources': answer_result['sources'],
                 'generation_time': answer_result.get('generation_time'),
+                'ttft': answer_result.get('ttft'),
+                'tokens_per_second': answer_result.get('tokens_per_second'),
+                'context': answer_result.get('context'),
                 'mode': answer_result['mode'],
                 'timestamp': datetime.now().isoformat()
             }
@@ -354,18 +454,29 @@ ODPOVĚĎ:"""
                 'timestamp': datetime.now().isoformat()
             }
 
-    def print_result(self, result: Dict[str, Any], verbose: bool = True):
-        """Pretty print RAG result"""
-        print(f"\n{'='*70}")
-        print(f"❓ QUERY: {result['query']}")
-        print(f"{'='*70}")
+    def print_result(self, result: Dict[str, Any], verbose: bool = True, show_answer: bool = True):
+        """Pretty print RAG result (show_answer=False: answer was already streamed)"""
+        if show_answer:
+            print(f"\n{'='*70}")
+            print(f"❓ QUERY: {result['query']}")
+            print(f"{'='*70}")
 
         if 'generated_answer' in result:
-            print(f"\n💡 GENERATED ANSWER:")
-            print(f"{result['generated_answer']}")
+            if show_answer:
+                print(f"\n💡 GENERATED ANSWER:")
+                print(f"{result['generated_answer']}")
 
             if result.get('generation_time'):
-                print(f"\n⏱️  Generation time: {result['generation_time']:.2f}s")
+                print(f"\n⏱️  Generation time: {result['generation_time']:.2f}s", end='')
+                if result.get('ttft') is not None:
+                    print(f" (first token {result['ttft'] * 1000:.0f} ms, "
+                          f"{result['tokens_per_second']:.1f} tokens/s)", end='')
+                print()
+
+            context = result.get('context')
+            if context:
+                print(f"   Context: {context['tokens_before']} → {context['tokens']} tokens "
+                      f"({context['duplicates']} duplicates, {context['merged']} merged)")
 
         print(f"\n📚 SOURCES ({len(result['search_results'])} results):")
 
@@ -400,7 +511,7 @@ ODPOVĚĎ:"""
             Index of added document
         """
         # Embed document
-        embedding = self.model.encode(
+        embedding = self.encoder.encode(
             [text],
             convert_to_numpy=True,
             normalize_embeddings=True
@@ -408,6 +519,8 @@ ODPOVĚĎ:"""
 
         # Add to FAISS index
         self.index.add(embedding.astype('float32'))
+        if self.vectors is not None:
+            self.vectors.add(embedding)
 
         # Add to chunks and metadata
         self.chunks.append(text)
@@ -420,6 +533,8 @@ ODPOVĚĎ:"""
         # Save FAISS index
         index_path = self.rag_dir / "faiss_index.bin"
         faiss.write_index(self.index, str(index_path))
+        if self.vectors is not None:
+            self.vectors.save()
 
         # Save metadata
         metadata_obj = {
@@ -433,6 +548,7 @@ ODPOVĚĎ:"""
         metadata_path = self.rag_dir / "metadata.json"
         with open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump(metadata_obj, f, ensure_ascii=False, indent=2)
+        clear_journal(self.rag_dir)
 
         print(f"✅ RAG saved: {self.index.ntotal} vectors, {len(self.chunks)} chunks")
 
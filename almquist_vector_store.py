@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+ALMQUIST Vector Store
+Skalárně kvantizované FAISS indexy (float16 / int8) s přesným float32 re-rankem
+
+- faiss_index.bin může být IndexFlatIP (float32, 4 B/dim),
+  IndexScalarQuantizer QT_fp16 (2 B/dim) nebo QT_8bit (1 B/dim)
+- embeddings.npy zůstává float32, ale čte se přes memmap - do RAM se
+  stránkují jen řádky kandidátů při re-ranku, žádná druhá kopie vektorů
+- search_index() u kvantizovaného indexu vezme top_k * RERANK_FACTOR
+  kandidátů a přeřadí je přesným skalárním součinem z embeddings.npy
+- typ nového indexu: ALMQUIST_VECTOR_DTYPE=float32|float16|int8,
+  jinak se zachová typ stávajícího indexu
+- expand_filters() / match_metadata(): filtry po dotazech pro search_many()
+
+Usage:
+    python3 almquist_vector_store.py --rag-dir /home/puzik/almquist_legal_rag --stats
+    python3 almquist_vector_store.py --rag-dir /home/puzik/almquist_legal_rag --convert int8
+    python3 almquist_vector_store.py --rag-dir /home/puzik/almquist_legal_rag --check-recall
+"""
+
+import io
+import os
+import shutil
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+
+VECTOR_DTYPES = ('float32', 'float16', 'int8')
+VECTOR_DTYPE = os.environ.get('ALMQUIST_VECTOR_DTYPE')
+
+RERANK_FACTOR = 4
+TRAIN_SAMPLE_SIZE = 100000
+ADD_BLOCK_SIZE = 65536
+COPY_BLOCK_SIZE = 16 * 1024 * 1024
+QUERY_BATCH_SIZE = 64  # queries per encoder call in search_many()
+FILTER_OVERSAMPLE = 10  # search top_k * 10 candidates when filtering
+
+_QUANTIZERS = {
+    'float16': faiss.ScalarQuantizer.QT_fp16,
+    'int8': faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def index_dtype(index):
+    """'float32', 'float16' nebo 'int8' podle typu FAISS indexu"""
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        for dtype, qtype in _QUANTIZERS.items():
+            if index.sq.qtype == qtype:
+                return dtype
+    return 'float32'
+
+
+def resolve_dtype(dtype=None, existing_index=None):
+    """Explicitní dtype > ALMQUIST_VECTOR_DTYPE > typ stávajícího indexu > float32"""
+    dtype = dtype or VECTOR_DTYPE
+    if dtype is None and existing_index is not None:
+        dtype = index_dtype(existing_index)
+    dtype = dtype or 'float32'
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unknown vector dtype: {dtype} (expected one of {', '.join(VECTOR_DTYPES)})")
+    return dtype
+
+
+def create_index(dim, dtype=None, train_vectors=None):
+    """
+    Prázdný inner-product index
+    int8 potřebuje rozsahy dimenzí z trénovacích vektorů - bez nich
+    se použije float16 (ten trénink nepotřebuje)
+    """
+    dtype = resolve_dtype(dtype)
+
+    if dtype == 'int8' and (train_vectors is None or len(train_vectors) == 0):
+        print("   ⚠️  int8 index needs training vectors, using float16")
+        dtype = 'float16'
+
+    if dtype == 'float32':
+        return faiss.IndexFlatIP(dim)
+
+    index = faiss.IndexScalarQuantizer(dim, _QUANTIZERS[dtype], faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        index.train(_train_sample(train_vectors))
+    return index
+
+
+def _train_sample(vectors):
+    """Rovnoměrný vzorek max. TRAIN_SAMPLE_SIZE řádků (memmap se nečte celý)"""
+    if len(vectors) > TRAIN_SAMPLE_SIZE:
+        rows = np.linspace(0, len(vectors) - 1, TRAIN_SAMPLE_SIZE).astype('int64')
+        vectors = vectors[rows]
+    return np.ascontiguousarray(vectors, dtype='float32')
+
+
+def build_index(vectors, dtype=None):
+    """Index z vektorů (i memmap), přidávané po blocích ADD_BLOCK_SIZE"""
+    index = create_index(vectors.shape[1], dtype, train_vectors=vectors)
+    for start in range(0, len(vectors), ADD_BLOCK_SIZE):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_BLOCK_SIZE], dtype='float32'))
+    return index
+
+
+def is_exact(index):
+    return index_dtype(index) == 'float32'
+
+
+def open_embeddings(path):
+    """embeddings.npy jako read-only memmap, None pokud soubor chybí"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    return np.load(path, mmap_mode='r')
+
+
+def _read_header(f):
+    """(shape, fortran_order, dtype, header_end) hlavičky .npy"""
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    return shape, fortran_order, dtype, f.tell()
+
+
+def _save(path, array):
+    """np.save přes file handle - nepřidá k názvu .npy (např. u .tmp)"""
+    with open(path, 'wb') as f:
+        np.save(f, array)
+
+
+def _replace_with(path, write):
+    """Zapíše soubor přes <name>.tmp a přejmenuje ho (pád nenechá poloviční soubor)"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def append_embeddings(path, new_embeddings, rows=None):
+    """
+    Připojí vektory na konec embeddings.npy. Data se zapíší za poslední
+    platný řádek a hlavička (shape) se přepíše až po nich - pád mezi tím
+    nechá starou hlavičku a nepoužitý konec souboru, který další append
+    přepíše. Když se nová hlavička nevejde do staré, soubor se přepíše po
+    blocích přes <name>.tmp.
+
+    rows: kolik existujících řádků ponechat (výchozí: všechny podle
+    hlavičky) - řádky za ním (zbytek přerušeného merge) se přepíšou;
+    s prázdným new_embeddings soubor zkrátí na rows řádků.
+    """
+    path = Path(path)
+    new_embeddings = np.ascontiguousarray(new_embeddings, dtype='float32')
+
+    if not path.exists():
+        if rows:
+            raise ValueError(f"{path} does not exist - cannot keep {rows} rows")
+        _replace_with(path, lambda tmp_path: _save(tmp_path, new_embeddings))
+        return
+
+    with open(path, 'rb') as f:
+        shape, fortran_order, dtype, header_end = _read_header(f)
+    if rows is None:
+        rows = shape[0]
+    elif rows > shape[0]:
+        raise ValueError(f"{path} has {shape[0]} rows, cannot keep {rows}")
+    compatible = not fortran_order and dtype == np.float32 and len(shape) == 2 \
+        and shape[1] == new_embeddings.shape[1]
+
+    if not compatible:
+        # Legacy file (other dtype/layout): convert once
+        embeddings = np.load(path)[:rows]
+        merged = np.vstack([embeddings, new_embeddings]).astype('float32')
+        _replace_with(path, lambda tmp_path: _save(tmp_path, merged))
+        return
+
+    total = rows + len(new_embeddings)
+    header = {
+        'descr': np.lib.format.dtype_to_descr(dtype),
+        'fortran_order': False,
+        'shape': (total, shape[1])
+    }
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buffer, header)
+    data_end = header_end + rows * shape[1] * dtype.itemsize
+
+    if buffer.tell() != header_end:
+        # Header grew: stream the valid rows into a new file
+        def write(tmp_path):
+            with open(path, 'rb') as f, open(tmp_path, 'wb') as out:
+                out.write(buffer.getvalue())
+                f.seek(header_end)
+                remaining = data_end - header_end
+                while remaining:
+                    block = f.read(min(COPY_BLOCK_SIZE, remaining))
+                    if not block:
+                        raise ValueError(f"{path} is shorter than its header says")
+                    out.write(block)
+                    remaining -= len(block)
+                out.write(new_embeddings.tobytes())
+        _replace_with(path, write)
+        return
+
+    with open(path, 'r+b') as f:
+        if total < shape[0]:
+            # Shrinking: the header must stop pointing at rows before they go
+            f.write(buffer.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+        f.seek(data_end)
+        f.write(new_embeddings.tobytes())
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())  # Data on disk before the header points at it
+        if total >= shape[0]:
+            f.seek(0)
+            f.write(buffer.getvalue())
+
+
+class EmbeddingStore:
+    """
+    float32 vektory pro re-rank: uložené z embeddings.npy (memmap)
+    + nově přidané v paměti, dokud se nezapíšou (write/mark_saved)
+    """
+
+    def __init__(self, path, dim=None):
+        self.path = Path(path)
+        self.pending = []
+        self.stored = open_embeddings(self.path)
+        if dim is None and self.stored is None:
+            raise ValueError(f"{self.path} does not exist - pass dim for a new embedding store")
+        self.dim = dim if dim is not None else self.stored.shape[1]
+
+    @property
+    def stored_count(self):
+        return 0 if self.stored is None else len(self.stored)
+
+    def __len__(self):
+        return self.stored_count + sum(len(v) for v in self.pending)
+
+    @property
+    def shape(self):
+        return (len(self), self.dim)
+
+    def add(self, vectors):
+        self.pending.append(np.asarray(vectors, dtype='float32').reshape(-1, self.dim))
+
+    def rows(self, ids):
+        """float32 řádky pro dané pozice (memmap čte jen tyto řádky)"""
+        ids = np.asarray(ids, dtype='int64')
+        out = np.empty((len(ids), self.dim), dtype='float32')
+
+        stored = ids < self.stored_count
+        if stored.any():
+            order = np.argsort(ids[stored])  # Sequential reads from the memmap
+            positions = np.flatnonzero(stored)[order]
+            out[positions] = self.stored[ids[stored][order]]
+        if not stored.all():
+            if len(self.pending) > 1:
+                self.pending = [np.vstack(self.pending)]
+            out[~stored] = self.pending[0][ids[~stored] - self.stored_count]
+        return out
+
+    def write(self, path=None):
+        """Zapíše kompletní embeddings.npy (uložené + nové) do path"""
+        path = Path(path or self.path)
+        if path != self.path:
+            if self.path.exists():
+                shutil.copyfile(self.path, path)
+            elif path.exists():
+                path.unlink()
+
+        if self.pending:
+            append_embeddings(path, np.vstack(self.pending))
+        elif not path.exists():
+            _save(path, np.zeros((0, self.dim), dtype='float32'))
+
+    def mark_saved(self):
+        """Po zápisu na self.path: nové vektory jsou už v souboru"""
+        self.pending = []
+        self.stored = open_embeddings(self.path)
+
+    def save(self):
+        self.write()
+        self.mark_saved()
+
+
+def search_index(index, queries, k, vectors=None, rerank_factor=RERANK_FACTOR):
+    """
+    index.search() s přesným float32 re-rankem u kvantizovaného indexu
+    vectors: EmbeddingStore se stejným počtem řádků jako index
+    (jinak se vrátí skóre z kvantizovaného indexu bez re-ranku)
+
+    Returns: (scores, ids) stejně jako faiss - tvar (n_queries, k), chybějící id = -1
+    """
+    queries = np.ascontiguousarray(queries, dtype='float32').reshape(-1, index.d)
+
+    if is_exact(index) or vectors is None or len(vectors) != index.ntotal:
+        return index.search(queries, k)
+
+    _, candidates = index.search(queries, k * rerank_factor)
+
+    scores = np.full((len(queries), k), -np.inf, dtype='float32')
+    ids = np.full((len(queries), k), -1, dtype='int64')
+
+    for row, (query, row_candidates) in enumerate(zip(queries, candidates)):
+        row_candidates = row_candidates[row_candidates >= 0]
+        if not len(row_candidates):
+            continue
+        exact = vectors.rows(row_candidates) @ query
+        top = np.argsort(-exact, kind='stable')[:k]
+        scores[row, :len(top)] = exact[top]
+        ids[row, :len(top)] = row_candidates[top]
+
+    return scores, ids
+
+
+def expand_filters(filters, count):
+    """
+    Filtry pro search_many(): None, jeden dict pro všechny dotazy,
+    nebo seznam (dict / None) pro každý dotaz -> seznam délky count
+    """
+    if filters is None or isinstance(filters, dict):
+        return [filters or None] * count
+    filters = [f or None for f in filters]
+    if len(filters) != count:
+        raise ValueError(f"Got {len(filters)} filters for {count} queries")
+    return filters
+
+
+def match_metadata(meta, metadata_filter):
+    """True, pokud metadata odpovídají filtru {klíč: hodnota} (None = bez filtru)"""
+    return not metadata_filter or all(meta.get(k) == v for k, v in metadata_filter.items())
+
+
+def index_size_mb(index):
+    """Velikost kódů indexu v paměti (MB)"""
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        bytes_per_vector = index.code_size
+    else:
+        bytes_per_vector = index.d * 4
+    return index.ntotal * bytes_per_vector / 1024 / 1024
+
+
+def check_recall(index, vectors, samples=200, k=10, rerank_factor=RERANK_FACTOR):
+    """
+    recall@k kvantizovaného indexu (s re-rankem i bez) vůči přesnému
+    float32 vyhledávání; dotazy = náhodné uložené vektory
+    """
+    rng = np.random.default_rng(0)
+    sample = np.sort(rng.choice(len(vectors), size=min(samples, len(vectors)), replace=False))
+    queries = vectors.rows(sample)
+
+    exact = faiss.IndexFlatIP(index.d)
+    for start in range(0, len(vectors), ADD_BLOCK_SIZE):
+        exact.add(vectors.rows(np.arange(start, min(start + ADD_BLOCK_SIZE, len(vectors)))))
+    _, truth = exact.search(queries, k)
+
+    _, raw = index.search(queries, k)
+    _, reranked = search_index(index, queries, k, vectors, rerank_factor)
+
+    def recall(found):
+        return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+    return {'k': k, 'queries': len(sample), 'recall': recall(raw), 'recall_reranked': recall(reranked)}
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Almquist Vector Store - quantized FAISS indexes',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Index type, size and RAM estimate
+  python3 almquist_vector_store.py --rag-dir /home/puzik/almquist_legal_rag --stats
+
+  # Rebuild faiss_index.bin as int8 (from embeddings.npy)
+  python3 almquist_vector_store.py --rag-dir /home/puzik/almquist_legal_rag --convert int8
+
+  # recall@10 vs exact float32 search
+  python3 almquist_vector_store.py --rag-dir /home/puzik/almquist_legal_rag --check-recall
+
+  # New indexes created by the RAG tools
+  ALMQUIST_VECTOR_DTYPE=int8 python3 almquist_rag_merger.py
+        """
+    )
+    parser.add_argument('--rag-dir', default="/home/puzik/almquist_legal_rag")
+    parser.add_argument('--stats', action='store_true', help='Show index type and size')
+    parser.add_argument('--convert', choices=VECTOR_DTYPES, help='Rebuild the index with this dtype')
+    parser.add_argument('--check-recall', action='store_true', help='recall@k vs exact search')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--samples', type=int, default=200)
+
+    args = parser.parse_args()
+
+    rag_dir = Path(args.rag_dir)
+    index_path = rag_dir / "faiss_index.bin"
+    if not (rag_dir / "embeddings.npy").exists():
+        print(f"❌ embeddings.npy not found in {rag_dir}")
+        return
+    vectors = EmbeddingStore(rag_dir / "embeddings.npy")
+
+    if args.convert:
+        start = time.time()
+        index = build_index(vectors.stored, args.convert)
+        tmp_path = index_path.with_name(index_path.name + '.tmp')
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, index_path)
+        print(f"✓ {index_path} rebuilt as {index_dtype(index)}: "
+              f"{index.ntotal} vectors in {time.time() - start:.1f}s")
+
+    if not index_path.exists():
+        print(f"❌ FAISS index not found: {index_path}")
+        return
+    index = faiss.read_index(str(index_path))
+
+    if args.stats or not (args.convert or args.check_recall):
+        per_million = index_size_mb(index) / max(index.ntotal, 1) * 1e6
+        print(f"📊 {index_path}")
+        print(f"   Type:        {index_dtype(index)}")
+        print(f"   Vectors:     {index.ntotal} (embeddings.npy: {vectors.stored_count})")
+        print(f"   Index RAM:   {index_size_mb(index):.1f} MB ({per_million:.0f} MB / 1M vectors)")
+        print(f"   Re-rank:     {'no (exact index)' if is_exact(index) else f'top_k x {RERANK_FACTOR} from embeddings.npy (memmap)'}")
+
+    if args.check_recall:
+        result = check_recall(index, vectors, samples=args.samples, k=args.k)
+        print(f"🎯 recall@{result['k']} over {result['queries']} queries ({index_dtype(index)}):")
+        print(f"   without re-rank: {result['recall']:.4f}")
+        print(f"   with re-rank:    {result['recall_reranked']:.4f}")
+
+
+if __name__ == "__main__":
+    main()